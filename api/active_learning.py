@@ -0,0 +1,315 @@
+"""
+Sélection par apprentissage actif des documents à annoter
+
+Les extractions douteuses sont inscrites comme candidates dans la file de
+feedback (api/feedback.py). Ce module choisit chaque jour, dans un budget
+d'annotation fixe, les candidates les plus utiles au prochain entraînement:
+    - incertitude par label: 1 - confiance minimale des boîtes du label,
+      1 pour un label obligatoire absent
+    - nouveauté de mise en page: distance de l'empreinte de mise en page
+      (labels x cases d'une grille) aux factures du jeu d'entraînement et
+      aux documents déjà retenus
+Le lot est construit de façon gloutonne: chaque document retenu rejoint
+les références, ce qui évite d'envoyer dix factures du même fournisseur.
+
+La notation est incrémentale: seules les nouvelles candidates sont
+notées, une seule fois. Lancement (cron quotidien):
+    python -m api.active_learning
+    python -m api.active_learning --dry-run
+"""
+import argparse
+import json
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
+from .feedback import FeedbackQueue, queue_from_config
+from .label_studio import PLACEHOLDER_VALUES
+
+
+def layout_fingerprint(boxes: Iterable[tuple], labels: Sequence[str], grid_size: int = 4) -> int:
+    """
+    Empreinte de mise en page: un bit par (label, case de la grille)
+
+    Args:
+        boxes: (label, x_centre, y_centre) en coordonnées relatives
+        labels: Ordre des labels (config['labels'])
+        grid_size: Cases par côté
+
+    Returns:
+        Entier dont les bits allumés sont les cases occupées par chaque label
+    """
+    index = {label: i for i, label in enumerate(labels)}
+    fingerprint = 0
+    for label, x, y in boxes:
+        if label not in index:
+            continue
+        column = min(grid_size - 1, max(0, int(x * grid_size)))
+        row = min(grid_size - 1, max(0, int(y * grid_size)))
+        fingerprint |= 1 << (index[label] * grid_size * grid_size + row * grid_size + column)
+    return fingerprint
+
+
+def jaccard_distance(a: int, b: int) -> float:
+    """Distance de Jaccard entre deux empreintes (0: identiques)"""
+    union = bin(a | b).count('1')
+    if union == 0:
+        return 0.0
+    return 1.0 - bin(a & b).count('1') / union
+
+
+def novelty(fingerprint: int, references: Iterable[int]) -> float:
+    """Distance à la référence la plus proche (1 sans référence)"""
+    return min((jaccard_distance(fingerprint, ref) for ref in references), default=1.0)
+
+
+def extraction_fingerprint(extraction: Dict, labels: Sequence[str], grid_size: int = 4) -> int:
+    """Empreinte d'une InvoiceExtraction sérialisée (champs détectés seulement)"""
+    return layout_fingerprint(
+        ((field['label'],
+          field['bbox']['x'] + field['bbox']['width'] / 2,
+          field['bbox']['y'] + field['bbox']['height'] / 2)
+         for field in extraction['fields'] if field['value'] not in PLACEHOLDER_VALUES),
+        labels, grid_size
+    )
+
+
+def training_fingerprints(labels_dir: Path, labels: Sequence[str], grid_size: int = 4) -> List[int]:
+    """
+    Empreintes des factures du jeu d'entraînement (annotations YOLO)
+
+    Args:
+        labels_dir: Dossier des .txt YOLO (classe x_centre y_centre largeur hauteur)
+        labels: Ordre des labels (index de classe)
+        grid_size: Cases par côté
+
+    Returns:
+        Empreintes distinctes
+    """
+    fingerprints = set()
+    for label_file in sorted(Path(labels_dir).glob('*.txt')):
+        boxes = []
+        for line in label_file.read_text(encoding='utf-8').splitlines():
+            parts = line.split()
+            if len(parts) < 5:
+                continue
+            class_id = int(parts[0])
+            if class_id < len(labels):
+                boxes.append((labels[class_id], float(parts[1]), float(parts[2])))
+        fingerprints.add(layout_fingerprint(boxes, labels, grid_size))
+    return list(fingerprints)
+
+
+def label_uncertainty(extraction: Dict, required_labels: Iterable[str] = ()) -> Dict[str, float]:
+    """
+    Incertitude par label d'une extraction
+
+    Returns:
+        {label: incertitude entre 0 et 1}
+    """
+    uncertainty = {label: 1.0 for label in required_labels}
+    detected: Set[str] = set()
+    for field in extraction['fields']:
+        label = field['label']
+        value = 1.0 - field['confidence']
+        # Boîte sans texte lu: au moins aussi douteuse qu'une confiance de 0.5
+        if field['value'] in PLACEHOLDER_VALUES:
+            value = max(value, 0.5)
+        if label in detected:
+            uncertainty[label] = max(uncertainty[label], value)
+        else:
+            uncertainty[label] = value
+            detected.add(label)
+    return uncertainty
+
+
+def document_uncertainty(per_label: Dict[str, float]) -> float:
+    """Incertitude d'un document: moitié pire label, moitié moyenne"""
+    if not per_label:
+        return 1.0
+    values = list(per_label.values())
+    return 0.5 * max(values) + 0.5 * sum(values) / len(values)
+
+
+def start_of_day(now: Optional[float] = None) -> float:
+    """Minuit (heure locale) du jour de `now`"""
+    day = datetime.fromtimestamp(now if now is not None else time.time())
+    return day.replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+
+
+class ActiveLearningSelector:
+    """Notation des candidates et choix du lot quotidien"""
+
+    def __init__(self, queue: FeedbackQueue, labels: Sequence[str], daily_budget: int = 50,
+                 required_labels: Sequence[str] = (), training_labels_dir: Optional[str] = None,
+                 uncertainty_weight: float = 0.6, novelty_weight: float = 0.4,
+                 grid_size: int = 4, prefilter_factor: int = 10):
+        """
+        Args:
+            queue: File de feedback contenant les candidates
+            labels: Labels du modèle (config['labels'])
+            daily_budget: Documents envoyés en annotation par jour
+            required_labels: Labels attendus sur toute facture
+            training_labels_dir: Annotations YOLO du jeu d'entraînement
+            uncertainty_weight: Poids de l'incertitude dans le score
+            novelty_weight: Poids de la nouveauté de mise en page
+            grid_size: Cases par côté de l'empreinte de mise en page
+            prefilter_factor: Candidates les plus incertaines évaluées par document du budget
+        """
+        self.queue = queue
+        self.labels = list(labels)
+        self.daily_budget = daily_budget
+        self.required_labels = list(required_labels)
+        self.training_labels_dir = training_labels_dir
+        self.uncertainty_weight = uncertainty_weight
+        self.novelty_weight = novelty_weight
+        self.grid_size = grid_size
+        self.prefilter_factor = prefilter_factor
+        self._training = None
+
+    @property
+    def training(self) -> List[int]:
+        """Empreintes du jeu d'entraînement (lues une fois)"""
+        if self._training is None:
+            labels_dir = Path(self.training_labels_dir) if self.training_labels_dir else None
+            self._training = (training_fingerprints(labels_dir, self.labels, self.grid_size)
+                              if labels_dir and labels_dir.exists() else [])
+        return self._training
+
+    def score_new(self) -> int:
+        """
+        Noter les candidates inscrites depuis le dernier passage
+
+        Returns:
+            Nombre de candidates notées
+        """
+        scored = 0
+        while True:
+            rows = self.queue.unscored_candidates()
+            if not rows:
+                return scored
+            updates = []
+            for row in rows:
+                extraction = json.loads(row['extraction'])
+                per_label = label_uncertainty(extraction, self.required_labels)
+                uncertain = sorted((label for label, value in per_label.items() if value >= 0.5),
+                                   key=lambda label: -per_label[label])
+                fingerprint = extraction_fingerprint(extraction, self.labels, self.grid_size)
+                updates.append((document_uncertainty(per_label), json.dumps(uncertain),
+                                format(fingerprint, 'x'), row['id']))
+            self.queue.set_scores(updates)
+            scored += len(updates)
+
+    def remaining_budget(self, now: Optional[float] = None) -> int:
+        """Documents encore envoyables aujourd'hui"""
+        return max(0, self.daily_budget - self.queue.selected_count(start_of_day(now)))
+
+    def select(self, budget: Optional[int] = None, now: Optional[float] = None) -> List[Dict]:
+        """
+        Choisir le lot le plus informatif (sans le mettre en file)
+
+        Args:
+            budget: Taille maximale du lot (défaut: reste du budget du jour)
+
+        Returns:
+            Documents retenus, dans l'ordre du choix, avec leur score
+        """
+        if budget is None:
+            budget = self.remaining_budget(now)
+        if budget <= 0:
+            return []
+
+        # Seules les plus incertaines sont comparées aux références
+        candidates = sorted(self.queue.scored_candidates(), key=lambda row: -row['uncertainty'])
+        candidates = candidates[:budget * self.prefilter_factor]
+
+        references = self.training + [int(fp, 16) for fp in self.queue.selected_fingerprints()]
+        pool = []
+        for row in candidates:
+            fingerprint = int(row['fingerprint'] or '0', 16)
+            pool.append({
+                'id': row['id'],
+                'filename': row['filename'],
+                'uncertainty': row['uncertainty'],
+                'fingerprint': fingerprint,
+                'novelty': novelty(fingerprint, references)
+            })
+
+        selected = []
+        while pool and len(selected) < budget:
+            for item in pool:
+                item['score'] = (self.uncertainty_weight * item['uncertainty']
+                                 + self.novelty_weight * item['novelty'])
+            best = max(pool, key=lambda item: item['score'])
+            pool.remove(best)
+            selected.append(best)
+            # Le document retenu devient une référence pour les suivants
+            for item in pool:
+                item['novelty'] = min(item['novelty'], jaccard_distance(item['fingerprint'], best['fingerprint']))
+        return selected
+
+    def run(self, budget: Optional[int] = None, dry_run: bool = False) -> List[Dict]:
+        """Noter, choisir et mettre en file d'envoi le lot du jour"""
+        self.score_new()
+        selected = self.select(budget)
+        if selected and not dry_run:
+            self.queue.promote([(item['score'], item['id']) for item in selected])
+        return selected
+
+
+def selector_from_config(config: Dict, queue: FeedbackQueue) -> ActiveLearningSelector:
+    """ActiveLearningSelector configuré depuis api.feedback_loop.active_learning (settings.yaml)"""
+    al_config = config['api']['feedback_loop'].get('active_learning', {})
+    return ActiveLearningSelector(
+        queue,
+        config['labels'],
+        daily_budget=al_config.get('daily_budget', 50),
+        required_labels=al_config.get('required_labels', []),
+        training_labels_dir=str(Path(config['dataset']['processed_data_path']) / 'yolo_dataset' / 'train' / 'labels'),
+        uncertainty_weight=al_config.get('uncertainty_weight', 0.6),
+        novelty_weight=al_config.get('novelty_weight', 0.4),
+        grid_size=al_config.get('grid_size', 4)
+    )
+
+
+def main(argv: Optional[List[str]] = None):
+    """Point d'entrée: python -m api.active_learning"""
+    from .config import get_config
+
+    parser = argparse.ArgumentParser(
+        prog="python -m api.active_learning",
+        description="Choisir les candidates à annoter dans le budget du jour"
+    )
+    parser.add_argument('--config', help="Configuration (settings.yaml)")
+    parser.add_argument('--budget', type=int, help="Taille du lot (défaut: reste du budget du jour)")
+    parser.add_argument('--dry-run', action='store_true', help="Afficher le lot sans le mettre en file")
+    parser.add_argument('--no-send', action='store_true', help="Mettre en file sans envoyer maintenant")
+    args = parser.parse_args(argv)
+
+    config = get_config(args.config)
+    queue = queue_from_config(config)
+    selector = selector_from_config(config, queue)
+
+    retention_days = config['api']['feedback_loop'].get('active_learning', {}).get('candidate_retention_days', 14)
+    expired = queue.expire_candidates(time.time() - retention_days * 86400)
+    if expired:
+        print(f"🗑️  {expired} candidates expirées (non retenues depuis {retention_days} jours)")
+
+    print(f"🧮 {selector.score_new()} nouvelles candidates notées")
+    selected = selector.run(args.budget, dry_run=args.dry_run)
+    print(f"🎯 {len(selected)} documents retenus (budget restant: {selector.remaining_budget()})")
+    for item in selected:
+        print(f"   {item['score']:.2f}  incertitude {item['uncertainty']:.2f}  "
+              f"nouveauté {item['novelty']:.2f}  {item['filename']}")
+
+    if selected and not args.dry_run and not args.no_send:
+        queue.backoff_seconds = 0
+        print(f"📤 {queue.flush()} documents envoyés vers Label Studio")
+    queue.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
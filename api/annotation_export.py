@@ -0,0 +1,271 @@
+"""
+Export incrémental des annotations Label Studio
+
+Chaque export ne récupère que les tâches annotées ou modifiées depuis le
+curseur du précédent (filtre Data Manager sur updated_at/completed_at),
+page par page, et les écrit au fil de l'eau dans un delta JSONL compact:
+
+    data/exports/deltas/delta_20240101_120000_000000.jsonl   une tâche par ligne
+    data/exports/annotations_index.db                        index fusionné (SQLite)
+
+Les pages sont triées par identifiant: une tâche modifiée pendant
+l'export garde sa place et ne décale pas les pages suivantes. Le curseur
+est l'heure de début de l'export, moins une marge de quelques minutes
+(horloges de l'exportateur et du serveur décalées): les modifications
+faites pendant le parcours sont relues à l'export suivant, les tâches
+relues sans changement sont écartées.
+
+Les tâches ne sont fusionnées dans l'index qu'une fois le delta publié:
+toute tâche de l'index figure dans un delta, même après une interruption.
+
+L'index fusionné garde la dernière version de chaque tâche annotée (une
+tâche dont les annotations ont été supprimées en sort) et le curseur. Les
+images insérées en base64 par les anciens imports ne sont pas recopiées:
+seules les URL de médias, le nom et le chemin du fichier sont conservés.
+
+La durée d'un export dépend du nombre de nouvelles annotations, pas de la
+taille du projet.
+"""
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from .label_studio import LabelStudioClient
+
+# Champs demandés à Label Studio (le reste n'est pas transféré)
+TASK_FIELDS = 'id,data,annotations,updated_at,completed_at'
+
+# Champs conservés par annotation
+ANNOTATION_FIELDS = ('id', 'result', 'was_cancelled', 'ground_truth', 'completed_by', 'updated_at')
+
+# Recouvrement du curseur: couvre le décalage d'horloge avec le serveur (relectures dédoublonnées)
+CURSOR_OVERLAP = timedelta(minutes=5)
+
+
+def compact_task(task: Dict) -> Dict:
+    """Tâche réduite aux champs utiles à l'entraînement (sans image inline)"""
+    data = {key: value for key, value in task.get('data', {}).items()
+            if not (isinstance(value, str) and value.startswith('data:'))}
+    annotations = [
+        {key: annotation[key] for key in ANNOTATION_FIELDS if key in annotation}
+        for annotation in task.get('annotations') or []
+        if not annotation.get('was_cancelled')
+    ]
+    return {
+        'id': task['id'],
+        'updated_at': task.get('updated_at'),
+        'completed_at': task.get('completed_at'),
+        'data': data,
+        'annotations': annotations
+    }
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def changed_since_query(cursor: Optional[str]) -> Optional[str]:
+    """Filtre Data Manager: tâches modifiées ou annotées après le curseur"""
+    if cursor is None:
+        return json.dumps({'filters': {'conjunction': 'and', 'items': [{
+            'filter': 'filter:tasks:total_annotations', 'operator': 'greater', 'type': 'Number', 'value': 0
+        }]}, 'ordering': ['tasks:id']})
+
+    since = (_parse_time(cursor) - CURSOR_OVERLAP).isoformat()
+    return json.dumps({'filters': {'conjunction': 'or', 'items': [
+        {'filter': 'filter:tasks:updated_at', 'operator': 'greater', 'type': 'Datetime', 'value': since},
+        {'filter': 'filter:tasks:completed_at', 'operator': 'greater', 'type': 'Datetime', 'value': since},
+    ]}, 'ordering': ['tasks:id']})
+
+
+class AnnotationIndex:
+    """Dernière version de chaque tâche annotée, et curseur d'export"""
+
+    def __init__(self, db_path: str):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._lock = threading.Lock()
+
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS tasks (
+                    id INTEGER PRIMARY KEY,
+                    updated_at TEXT,
+                    filename TEXT,
+                    task TEXT NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+
+    @property
+    def cursor(self) -> Optional[str]:
+        """Début du dernier export terminé (None: jamais exporté)"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'cursor'").fetchone()
+        return row[0] if row else None
+
+    def set_cursor(self, cursor: Optional[str]):
+        with self._lock:
+            if cursor is None:
+                self._conn.execute("DELETE FROM meta WHERE key = 'cursor'")
+            else:
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('cursor', ?)", (cursor,))
+            self._conn.commit()
+
+    def versions(self, task_ids: List[int]) -> Dict[int, str]:
+        """updated_at des tâches déjà dans l'index"""
+        if not task_ids:
+            return {}
+        placeholders = ','.join('?' * len(task_ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, updated_at FROM tasks WHERE id IN ({placeholders})", task_ids
+            ).fetchall()
+        return dict(rows)
+
+    def merge(self, tasks: List[Dict]) -> Dict[str, int]:
+        """
+        Fusionner des tâches compactes (une transaction)
+
+        Returns:
+            {'upserted': n, 'removed': n}
+        """
+        upserts = [(task['id'], task['updated_at'], task['data'].get('filename'), json.dumps(task, ensure_ascii=False))
+                   for task in tasks if task['annotations']]
+        removals = [(task['id'],) for task in tasks if not task['annotations']]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO tasks (id, updated_at, filename, task) VALUES (?, ?, ?, ?)", upserts
+            )
+            cursor = self._conn.executemany("DELETE FROM tasks WHERE id = ?", removals)
+            self._conn.commit()
+        return {'upserted': len(upserts), 'removed': max(cursor.rowcount, 0)}
+
+    def iter_tasks(self) -> Iterator[Dict]:
+        """Tâches annotées, par identifiant"""
+        with self._lock:
+            rows = self._conn.execute("SELECT task FROM tasks ORDER BY id").fetchall()
+        for (task,) in rows:
+            yield json.loads(task)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def export_incremental(client: LabelStudioClient, index: AnnotationIndex, delta_dir: str,
+                       page_size: int = 100) -> Dict:
+    """
+    Exporter les tâches modifiées depuis le curseur
+
+    Les pages sont écrites dans un delta temporaire, publié puis fusionné
+    dans l'index; le curseur n'avance qu'après la fusion, jusqu'au début de
+    l'export (et non jusqu'à la tâche la plus récente lue). Un export
+    interrompu ne fusionne rien et supprime son delta temporaire: il est
+    repris au suivant. Les tâches relues sans changement (recouvrement du
+    curseur) et les tâches jamais annotées ne sont ni écrites dans le delta
+    ni comptées.
+
+    Args:
+        client: Client Label Studio
+        index: Index fusionné (porte le curseur)
+        delta_dir: Répertoire des deltas JSONL
+        page_size: Tâches par page
+
+    Returns:
+        Résumé: fichier delta (None si rien de nouveau), tâches, curseur, comptes par label
+    """
+    previous = index.cursor
+    delta_dir = Path(delta_dir)
+    delta_dir.mkdir(parents=True, exist_ok=True)
+    delta_file = delta_dir / f"delta_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.jsonl"
+    tmp = delta_file.with_name(f".{delta_file.name}.tmp")
+
+    # Pris avant la première page: rien de modifié pendant le parcours n'est perdu
+    started = datetime.now(timezone.utc)
+    summary = {'tasks': 0, 'upserted': 0, 'removed': 0, 'label_counts': {}}
+    page = []
+
+    def write_page(f):
+        known = index.versions([task['id'] for task in page])
+        changed = [task for task in page
+                   if (task['annotations'] or task['id'] in known) and known.get(task['id']) != task['updated_at']]
+        for task in changed:
+            f.write(json.dumps(task, ensure_ascii=False, separators=(',', ':')) + '\n')
+            for annotation in task['annotations']:
+                for result in annotation.get('result', []):
+                    for label in result.get('value', {}).get('rectanglelabels', []):
+                        summary['label_counts'][label] = summary['label_counts'].get(label, 0) + 1
+        summary['tasks'] += len(changed)
+        page.clear()
+
+    def merge(tasks):
+        counts = index.merge(tasks)
+        summary['upserted'] += counts['upserted']
+        summary['removed'] += counts['removed']
+        tasks.clear()
+
+    try:
+        with open(tmp, 'w', encoding='utf-8') as f:
+            for task in client.iter_tasks(page_size=page_size, fields='all', include=TASK_FIELDS,
+                                          query=changed_since_query(previous)):
+                page.append(compact_task(task))
+                if len(page) >= page_size:
+                    write_page(f)
+            write_page(f)
+            f.flush()
+            os.fsync(f.fileno())
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+    if summary['tasks']:
+        os.replace(tmp, delta_file)
+        # Fusion relue depuis le delta publié, par paquets d'une page
+        with open(delta_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                page.append(json.loads(line))
+                if len(page) >= page_size:
+                    merge(page)
+        merge(page)
+    else:
+        tmp.unlink()
+        delta_file = None
+    index.set_cursor(started.isoformat())
+
+    summary.update({
+        'delta_file': str(delta_file) if delta_file else None,
+        'previous_cursor': previous,
+        'cursor': index.cursor,
+        'annotated_tasks': len(index)
+    })
+    return summary
+
+
+def load_export_tasks(export_file: str) -> List[Dict]:
+    """
+    Tâches annotées d'un export: index fusionné (.db) ou ancien export complet (.json)
+    """
+    path = Path(export_file)
+    if path.suffix == '.db':
+        index = AnnotationIndex(str(path))
+        try:
+            return list(index.iter_tasks())
+        finally:
+            index.close()
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)['tasks']
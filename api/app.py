@@ -5,22 +5,27 @@ API REST pour l'extraction automatique de factures
 Lance l'API avec:
     python api/app.py
 
-Ou avec uvicorn:
-    uvicorn api.app:app --reload --host 0.0.0.0 --port 8000
+Ou avec uvicorn (application factory):
+    uvicorn api.app:create_app --factory --reload --host 0.0.0.0 --port 8000
+
+L'import de ce module ne charge ni la configuration, ni le modèle, ni les
+dépendances lourdes (torch, cv2...): tout est fait par create_app() et au
+démarrage du serveur.
 """
 import os
 import time
+import hmac
+import asyncio
+import hashlib
 import tempfile
-import yaml
 from pathlib import Path
 from typing import Optional
-from datetime import datetime
 
-from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, FastAPI, File, UploadFile, HTTPException, BackgroundTasks, Header, Query, Request
+from fastapi.responses import FileResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-import uvicorn
 
+from .config import get_config
 from .models import (
     ExtractionResponse,
     HealthResponse,
@@ -28,54 +33,155 @@ from .models import (
     InvoiceExtraction
 )
 from .extractor import InvoiceExtractor
+from .pipeline import PipelineFull
+from .profiling import SamplingProfiler
+from .capture import CaptureStore
+from .feedback import queue_from_config
+from .memory import rss_bytes, watchdog_from_config
+from .responses import negotiate_response, server_timing
+from .singleflight import SingleFlight
+
+
+router = APIRouter()
+admin_router = APIRouter(prefix="/admin", tags=["Admin"])
+
+# Délai suggéré au client quand la file d'extraction est pleine (secondes)
+OVERLOAD_RETRY_AFTER_SECONDS = 1
 
 
 # ============================================
-# Configuration
+# Application factory
 # ============================================
 
-def load_config():
-    """Charger la configuration"""
-    config_path = Path(__file__).parent.parent / 'config' / 'settings.yaml'
-    with open(config_path, 'r', encoding='utf-8') as f:
-        return yaml.safe_load(f)
+def create_app(config_path: Optional[str] = None) -> FastAPI:
+    """
+    Construire l'application FastAPI
 
+    Rien n'est chargé à l'import du module: la configuration est lue ici
+    (via le cache de get_config) et le modèle au démarrage du serveur.
 
-config = load_config()
+    Args:
+        config_path: Chemin vers settings.yaml (défaut: config/settings.yaml)
 
-# ============================================
-# FastAPI App
-# ============================================
+    Returns:
+        Application FastAPI
+    """
+    config = get_config(config_path)
 
-app = FastAPI(
-    title="Invoice ML System API",
-    description="API d'extraction automatique de données de factures",
-    version="1.0.0",
-    docs_url="/docs",
-    redoc_url="/redoc"
-)
+    app = FastAPI(
+        title="Invoice ML System API",
+        description="API d'extraction automatique de données de factures",
+        version="1.0.0",
+        docs_url="/docs",
+        redoc_url="/redoc"
+    )
 
-# CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+    # CORS
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # État de l'application (un par worker)
+    app.state.config = config
+    app.state.extractor = InvoiceExtractor(config_path)
+    app.state.start_time = time.time()
+
+    # Regroupement des requêtes /extract identiques en cours
+    app.state.inflight = SingleFlight()
+    app.state.coalescing_enabled = config['api'].get('coalescing', {}).get('enabled', True)
+
+    # Endpoints d'administration (désactivés sans jeton)
+    app.state.admin_token = config['api'].get('admin', {}).get('token') or None
+    app.state.profiling_lock = asyncio.Lock()
+
+    # Capture d'un échantillon des requêtes /extract (rejeu: python -m api.replay)
+    capture_config = config['api'].get('capture', {})
+    app.state.capture_store = None
+    if capture_config.get('enabled', False):
+        app.state.capture_store = CaptureStore(
+            capture_config.get('directory', 'data/captures'),
+            max_bytes=capture_config.get('max_size_mb', 2048) * 1024**2,
+            sample_rate=capture_config.get('sample_rate', 0.01)
+        )
+
+    # Envoi des extractions à revoir vers Label Studio (file durable, hors requête)
+    feedback_config = config['api']['feedback_loop']
+    app.state.feedback_queue = None
+    if feedback_config['enabled'] and feedback_config['auto_send_to_label_studio']:
+        app.state.feedback_queue = queue_from_config(config)
+
+    # Apprentissage actif: les documents douteux deviennent des candidates,
+    # envoyées selon le budget quotidien (python -m api.active_learning)
+    active_learning = feedback_config.get('active_learning', {})
+    app.state.active_learning = active_learning.get('enabled', False)
+    app.state.candidate_field_confidence = active_learning.get('candidate_field_confidence', 0.7)
 
-# Variables globales
-extractor = InvoiceExtractor()
-start_time = time.time()
+    # Surveillance mémoire et recyclage du worker
+    app.state.memory_watchdog = watchdog_from_config(config)
+    app.middleware("http")(recycle_worker)
+
+    app.include_router(router)
+    app.include_router(admin_router)
+    app.add_event_handler("startup", lambda: startup_event(app))
+    app.add_event_handler("shutdown", lambda: shutdown_event(app))
+
+    return app
+
+
+_default_app: Optional[FastAPI] = None
+
+
+def __getattr__(name: str):
+    """`api.app.app` est construit au premier accès (uvicorn api.app:app, tests)"""
+    global _default_app
+    if name == 'app':
+        if _default_app is None:
+            _default_app = create_app()
+        return _default_app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def get_extractor(request: Request) -> InvoiceExtractor:
+    """Dépendance: extracteur de l'application"""
+    return request.app.state.extractor
+
+
+def require_admin(request: Request, x_admin_token: Optional[str] = Header(None)):
+    """Dépendance: jeton d'administration (en-tête X-Admin-Token)"""
+    token = request.app.state.admin_token
+    if token is None:
+        raise HTTPException(status_code=404, detail="Endpoints d'administration désactivés")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token, token):
+        raise HTTPException(status_code=403, detail="Jeton d'administration invalide")
+
+
+async def recycle_worker(request: Request, call_next):
+    """Middleware: compter les extractions, recycler le worker au-delà des seuils"""
+    response = await call_next(request)
+    if request.url.path == "/extract":
+        watchdog = request.app.state.memory_watchdog
+        reason = watchdog.record_request()
+        if reason is not None:
+            # Le client ne réutilise pas cette connexion: uvicorn termine les
+            # requêtes en cours puis s'arrête
+            response.headers['Connection'] = 'close'
+            watchdog.recycle(reason)
+    return response
 
 
 # ============================================
 # Startup / Shutdown
 # ============================================
 
-@app.on_event("startup")
-async def startup_event():
+def startup_event(app: FastAPI):
     """Charger le modèle au démarrage"""
+    config = app.state.config
+    extractor = app.state.extractor
+
     print("\n" + "="*60)
     print("🚀 INVOICE ML SYSTEM API")
     print("="*60)
@@ -87,22 +193,30 @@ async def startup_event():
         print(f"⚠️  Impossible de charger le modèle: {e}")
         print("💡 L'API démarre sans modèle. Entraînez d'abord un modèle.")
 
+    if app.state.feedback_queue is not None:
+        app.state.feedback_queue.start()
+        print("📤 File d'envoi vers Label Studio démarrée")
+
     print(f"\n📡 API disponible sur: http://localhost:{config['api']['port']}")
     print(f"📖 Documentation: http://localhost:{config['api']['port']}/docs")
     print("="*60 + "\n")
 
 
-@app.on_event("shutdown")
-async def shutdown_event():
+def shutdown_event(app: FastAPI):
     """Nettoyage à l'arrêt"""
     print("\n👋 Arrêt de l'API...")
+    app.state.extractor.shutdown()
+    if app.state.feedback_queue is not None:
+        app.state.feedback_queue.close()
+    if app.state.capture_store is not None:
+        app.state.capture_store.close()
 
 
 # ============================================
 # Routes
 # ============================================
 
-@app.get("/", tags=["General"])
+@router.get("/", tags=["General"])
 async def root():
     """Page d'accueil de l'API"""
     return {
@@ -113,102 +227,310 @@ async def root():
     }
 
 
-@app.get("/health", response_model=HealthResponse, tags=["General"])
-async def health_check():
+@router.get("/health", response_model=HealthResponse, tags=["General"])
+async def health_check(request: Request, extractor: InvoiceExtractor = Depends(get_extractor)):
     """Vérifier l'état de l'API"""
     return HealthResponse(
-        status="healthy",
+        status="recycling" if request.app.state.memory_watchdog.recycle_reason else "healthy",
         version="1.0.0",
         model_loaded=extractor.is_model_loaded(),
         model_version=extractor.model_version if extractor.is_model_loaded() else None,
-        uptime_seconds=time.time() - start_time
+        uptime_seconds=time.time() - request.app.state.start_time,
+        rss_mb=rss_bytes() / 1024**2
     )
 
 
-@app.get("/stats", response_model=StatsResponse, tags=["General"])
-async def get_stats():
+@router.get("/stats", response_model=StatsResponse, tags=["General"])
+async def get_stats(extractor: InvoiceExtractor = Depends(get_extractor)):
     """Obtenir les statistiques d'utilisation"""
     if not extractor.is_model_loaded():
         raise HTTPException(status_code=503, detail="Modèle non chargé")
 
-    stats = extractor.get_stats()
+    # Totaux SQLite : hors de la boucle d'événements
+    stats = await asyncio.get_running_loop().run_in_executor(None, extractor.get_stats)
     return StatsResponse(**stats)
 
 
-@app.post("/extract", response_model=ExtractionResponse, tags=["Extraction"])
+@router.get("/stats/metrics", tags=["General"])
+async def get_metrics(
+    scope: str = Query("all", pattern="^(all|worker)$"),
+    extractor: InvoiceExtractor = Depends(get_extractor)
+):
+    """
+    Obtenir les statistiques par fenêtre glissante (1 min, 1 h, 24 h)
+
+    Args:
+        scope: all (tous les workers) ou worker (celui qui répond)
+    """
+    return await asyncio.get_running_loop().run_in_executor(None, extractor.metrics.get_stats, scope)
+
+
+@router.get("/stats/ocr-cache", tags=["General"])
+async def get_ocr_cache_stats(extractor: InvoiceExtractor = Depends(get_extractor)):
+    """Obtenir les statistiques du cache OCR (taux de hit par label)"""
+    if extractor.ocr_cache is None:
+        return {"enabled": False}
+
+    return {"enabled": True, **extractor.ocr_cache.get_stats()}
+
+
+@router.get("/stats/pipeline", tags=["General"])
+async def get_pipeline_stats(extractor: InvoiceExtractor = Depends(get_extractor)):
+    """Obtenir l'état du pipeline d'extraction (workers et profondeur des files)"""
+    if extractor.pipeline is None:
+        return {
+            "running": False,
+            "stages": [
+                {"name": stage.name, "workers": stage.workers,
+                 "queue_size": stage.queue_size, "queue_depth": 0}
+                for stage in extractor.stages
+            ]
+        }
+
+    return extractor.pipeline.get_stats()
+
+
+@router.get("/stats/coalescing", tags=["General"])
+async def get_coalescing_stats(request: Request):
+    """Obtenir le taux de regroupement des requêtes /extract identiques"""
+    state = request.app.state
+    return {"enabled": state.coalescing_enabled, **state.inflight.get_stats()}
+
+
+@router.get("/stats/quality", tags=["General"])
+async def get_quality_stats(extractor: InvoiceExtractor = Depends(get_extractor)):
+    """Obtenir le mode de qualité courant (dégradation sous charge)"""
+    if extractor.load_governor is None:
+        return {"enabled": False, "mode": "full"}
+
+    return {
+        "enabled": True,
+        "pending_documents": extractor.pending_documents(),
+        **extractor.load_governor.get_stats()
+    }
+
+
+@router.get("/stats/capture", tags=["General"])
+async def get_capture_stats(request: Request):
+    """Obtenir l'état de la capture des requêtes (rejeu)"""
+    store = request.app.state.capture_store
+    if store is None:
+        return {"enabled": False}
+
+    return {"enabled": True, **store.get_stats()}
+
+
+@router.get("/stats/feedback", tags=["General"])
+async def get_feedback_stats(request: Request):
+    """Obtenir l'état de la file d'envoi vers Label Studio"""
+    queue = request.app.state.feedback_queue
+    if queue is None:
+        return {"enabled": False}
+
+    stats = await asyncio.get_running_loop().run_in_executor(None, queue.get_stats)
+    return {"enabled": True, **stats}
+
+
+@router.get("/stats/history", tags=["General"])
+async def get_history_stats(
+    days: int = Query(30, ge=1, le=365),
+    extractor: InvoiceExtractor = Depends(get_extractor)
+):
+    """
+    Statistiques de l'historique: par jour, par label, par fournisseur
+
+    Args:
+        days: Période couverte
+    """
+    history = extractor.history
+    if history is None:
+        return {"enabled": False}
+
+    def query():
+        return {
+            "enabled": True,
+            "totals": history.totals(days),
+            "daily": history.daily(days),
+            "labels": history.label_stats(days),
+            "suppliers": history.suppliers(days),
+        }
+
+    return await asyncio.get_running_loop().run_in_executor(None, query)
+
+
+@router.get("/history", tags=["History"])
+async def list_history(
+    limit: int = Query(50, ge=1, le=500),
+    before_id: Optional[int] = None,
+    supplier: Optional[str] = None,
+    max_confidence: Optional[float] = Query(None, ge=0, le=1),
+    extractor: InvoiceExtractor = Depends(get_extractor)
+):
+    """
+    Dernières extractions (pagination par before_id)
+
+    Args:
+        limit: Nombre de résultats
+        before_id: id de la dernière extraction de la page précédente
+        supplier: Filtrer par fournisseur
+        max_confidence: Confiance globale maximale
+    """
+    if extractor.history is None:
+        raise HTTPException(status_code=404, detail="Historique désactivé (api.history)")
+
+    return await asyncio.get_running_loop().run_in_executor(
+        None, lambda: extractor.history.recent(limit, before_id, supplier, max_confidence)
+    )
+
+
+@router.get("/history/{extraction_id}", tags=["History"])
+async def get_history_entry(extraction_id: int, extractor: InvoiceExtractor = Depends(get_extractor)):
+    """Une extraction de l'historique, avec ses champs et ses durées par étage"""
+    if extractor.history is None:
+        raise HTTPException(status_code=404, detail="Historique désactivé (api.history)")
+
+    entry = await asyncio.get_running_loop().run_in_executor(None, extractor.history.get, extraction_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Extraction inconnue")
+    return entry
+
+
+@router.post("/extract", response_model=ExtractionResponse, tags=["Extraction"])
 async def extract_invoice(
+    request: Request,
     file: UploadFile = File(...),
-    background_tasks: BackgroundTasks = None
+    background_tasks: BackgroundTasks = None,
+    extractor: InvoiceExtractor = Depends(get_extractor)
 ):
     """
     Extraire les données d'une facture
 
+    La réponse est en JSON, ou en MessagePack si l'en-tête Accept le
+    demande (application/msgpack) et que le paquet msgpack est installé.
+
     Args:
         file: Fichier PDF ou image de la facture
 
     Returns:
         Données extraites avec confiance et coordonnées
     """
+    state = request.app.state
+    accept = request.headers.get('accept')
+
     if not extractor.is_model_loaded():
-        return ExtractionResponse(
+        return negotiate_response(ExtractionResponse(
             success=False,
             error="Model not loaded",
             message="Le modèle n'est pas chargé. Entraînez d'abord un modèle."
-        )
+        ), accept)
 
     # Vérifier le type de fichier
     allowed_extensions = ['.pdf', '.jpg', '.jpeg', '.png']
     file_extension = Path(file.filename).suffix.lower()
 
     if file_extension not in allowed_extensions:
-        return ExtractionResponse(
+        return negotiate_response(ExtractionResponse(
             success=False,
             error="Invalid file type",
             message=f"Type de fichier non supporté. Utilisez: {', '.join(allowed_extensions)}"
-        )
+        ), accept)
 
-    # Sauvegarder temporairement le fichier
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as tmp:
-            content = await file.read()
-            tmp.write(content)
-            tmp_path = tmp.name
-
-        # Extraire les données
-        extraction = extractor.extract_from_file(tmp_path)
-
-        # Nettoyer le fichier temporaire
-        os.unlink(tmp_path)
-
-        # Si confiance faible et feedback loop activé, envoyer vers Label Studio
-        if extraction.needs_review and config['api']['feedback_loop']['enabled']:
-            if config['api']['feedback_loop']['auto_send_to_label_studio']:
-                # TODO: Implémenter l'envoi automatique vers Label Studio
-                pass
-
-        return ExtractionResponse(
+        content = await file.read()
+
+        # Les requêtes identiques en cours (même contenu, même modèle)
+        # partagent une seule extraction
+        if state.coalescing_enabled:
+            key = f"{hashlib.sha256(content).hexdigest()}:{extractor.model_version}"
+            extraction = await state.inflight.do(
+                key, lambda: run_extraction(extractor, content, file_extension, file.filename)
+            )
+            if extraction.filename != file.filename:
+                extraction = extraction.model_copy(update={'filename': file.filename})
+        else:
+            extraction = await run_extraction(extractor, content, file_extension, file.filename)
+
+        # Si confiance faible et feedback loop activé, mettre en file pour Label
+        # Studio après l'envoi de la réponse (jamais d'appel dans la requête)
+        if state.feedback_queue is not None:
+            if state.active_learning:
+                if extraction.needs_review or any(
+                    field.confidence < state.candidate_field_confidence for field in extraction.fields
+                ):
+                    background_tasks.add_task(
+                        state.feedback_queue.enqueue, content, file_extension, file.filename, extraction,
+                        candidate=True
+                    )
+            elif extraction.needs_review:
+                background_tasks.add_task(
+                    state.feedback_queue.enqueue, content, file_extension, file.filename, extraction
+                )
+
+        # Résultat déjà validé par l'extracteur: construction sans revalidation
+        response = negotiate_response(ExtractionResponse.model_construct(
             success=True,
             data=extraction,
             message="Extraction réussie" if not extraction.needs_review else "Extraction réussie mais nécessite une revue"
-        )
-
+        ), accept)
+        if extraction._stage_timings:
+            response.headers['Server-Timing'] = server_timing(extraction._stage_timings)
+
+        # Capture écrite après l'envoi de la réponse
+        store = state.capture_store
+        if store is not None and store.should_capture():
+            background_tasks.add_task(
+                store.add, content, file_extension, file.filename, extraction, extraction._stage_timings
+            )
+        return response
+
+    except PipelineFull:
+        # File de décodage pleine: refuser tout de suite plutôt que bloquer la boucle asyncio
+        raise HTTPException(status_code=503, detail="Serveur saturé, réessayez plus tard",
+                            headers={'Retry-After': str(OVERLOAD_RETRY_AFTER_SECONDS)})
     except Exception as e:
-        # Nettoyer en cas d'erreur
-        if 'tmp_path' in locals():
-            try:
-                os.unlink(tmp_path)
-            except:
-                pass
-
-        return ExtractionResponse(
+        return negotiate_response(ExtractionResponse(
             success=False,
             error=str(e),
             message=f"Erreur lors de l'extraction: {str(e)}"
+        ), accept)
+
+
+async def run_extraction(extractor: InvoiceExtractor, content: bytes,
+                         file_extension: str, filename: str) -> InvoiceExtraction:
+    """
+    Extraire les données d'un fichier reçu
+
+    Args:
+        extractor: Extracteur de l'application
+        content: Contenu du fichier
+        file_extension: Extension (détermine le décodage)
+        filename: Nom d'origine du fichier
+
+    Returns:
+        Données extraites
+    """
+    # Sauvegarder temporairement le fichier
+    with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as tmp:
+        tmp.write(content)
+        tmp_path = tmp.name
+
+    try:
+        # Extraire les données (pipeline multi-étages, sans bloquer la boucle asyncio:
+        # la soumission lève PipelineFull au lieu d'attendre une place)
+        return await asyncio.wrap_future(
+            extractor.submit(tmp_path, filename=filename, block=False)
         )
+    finally:
+        # Nettoyer le fichier temporaire
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
 
 
-@app.post("/reload-model", tags=["Model"])
-async def reload_model(model_path: Optional[str] = None):
+@router.post("/reload-model", tags=["Model"])
+async def reload_model(model_path: Optional[str] = None,
+                       extractor: InvoiceExtractor = Depends(get_extractor)):
     """
     Recharger le modèle (utile après réentraînement)
 
@@ -226,14 +548,122 @@ async def reload_model(model_path: Optional[str] = None):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# ============================================
+# Administration
+# ============================================
+
+@admin_router.post("/profile", dependencies=[Depends(require_admin)])
+async def capture_profile(
+    request: Request,
+    seconds: float = Query(10.0, gt=0, le=120),
+    interval_ms: float = Query(5.0, ge=1, le=100)
+):
+    """
+    Capturer un profil CPU du worker pendant N secondes
+
+    Toutes les piles de tous les threads sont échantillonnées. Le résultat
+    est au format collapsed stacks (flamegraph.pl, speedscope...).
+
+    Args:
+        seconds: Durée de la capture
+        interval_ms: Intervalle d'échantillonnage
+    """
+    lock = request.app.state.profiling_lock
+    if lock.locked():
+        raise HTTPException(status_code=409, detail="Une capture est déjà en cours")
+
+    async with lock:
+        profiler = SamplingProfiler(interval=interval_ms / 1000)
+        profile = await asyncio.get_running_loop().run_in_executor(None, profiler.run, seconds)
+
+    filename = f"profile-{os.getpid()}-{time.strftime('%Y%m%d_%H%M%S')}.collapsed"
+    return PlainTextResponse(profile, headers={
+        'Content-Disposition': f'attachment; filename="{filename}"',
+        'X-Profile-Samples': str(profiler.sample_count)
+    })
+
+
+@admin_router.get("/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles(extractor: InvoiceExtractor = Depends(get_extractor)):
+    """Profils conservés des requêtes /extract les plus lentes"""
+    if extractor.slowest_profiles is None:
+        return {"enabled": False, "profiles": []}
+
+    return {
+        "enabled": True,
+        "sample_every": extractor.profile_every,
+        "profiles": extractor.slowest_profiles.list()
+    }
+
+
+@admin_router.get("/profiles/{name}", dependencies=[Depends(require_admin)])
+async def get_profile(name: str, extractor: InvoiceExtractor = Depends(get_extractor)):
+    """Télécharger un profil conservé (collapsed stacks)"""
+    path = extractor.slowest_profiles.path(name) if extractor.slowest_profiles else None
+    if path is None or not path.exists():
+        raise HTTPException(status_code=404, detail="Profil inconnu")
+
+    return FileResponse(path, media_type="text/plain", filename=path.name)
+
+
+@admin_router.get("/memory", dependencies=[Depends(require_admin)])
+async def get_memory(request: Request):
+    """RSS du worker, seuils de recyclage et état de tracemalloc"""
+    return request.app.state.memory_watchdog.get_stats()
+
+
+@admin_router.post("/memory/snapshot", dependencies=[Depends(require_admin)])
+async def take_memory_snapshot(request: Request):
+    """
+    Enregistrer un snapshot d'allocations de référence
+
+    Le premier appel démarre tracemalloc: seules les allocations
+    ultérieures sont suivies.
+    """
+    watchdog = request.app.state.memory_watchdog
+    return await asyncio.get_running_loop().run_in_executor(None, watchdog.take_snapshot)
+
+
+@admin_router.get("/memory/diff", dependencies=[Depends(require_admin)])
+async def diff_memory_snapshot(
+    request: Request,
+    limit: int = Query(20, ge=1, le=200),
+    group_by: str = Query("lineno", pattern="^(lineno|filename|traceback)$")
+):
+    """
+    Allocations qui ont le plus grossi depuis le dernier snapshot
+
+    Args:
+        limit: Nombre d'entrées
+        group_by: Regroupement (lineno, filename, traceback)
+    """
+    watchdog = request.app.state.memory_watchdog
+    entries = await asyncio.get_running_loop().run_in_executor(None, watchdog.diff, limit, group_by)
+    if entries is None:
+        raise HTTPException(status_code=409, detail="Aucun snapshot: POST /admin/memory/snapshot d'abord")
+
+    return {"pid": os.getpid(), "entries": entries}
+
+
+@admin_router.delete("/memory/snapshot", dependencies=[Depends(require_admin)])
+async def stop_memory_tracing(request: Request):
+    """Arrêter tracemalloc et oublier le snapshot de référence"""
+    request.app.state.memory_watchdog.stop_tracing()
+    return {"tracing": False}
+
+
 # ============================================
 # Main
 # ============================================
 
 def main():
     """Lancer l'API"""
+    import uvicorn
+
+    config = get_config()
     uvicorn.run(
-        "api.app:app",
+        "api.app:create_app",
+        factory=True,
         host=config['api']['host'],
         port=config['api']['port'],
         reload=config['api']['reload'],
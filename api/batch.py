@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+"""
+Extraction par lot sur une arborescence de factures (backfills)
+
+Usage:
+    python -m api.batch data/raw/invoices
+    python -m api.batch data/raw/invoices -o extractions.parquet --workers 8
+
+Chaque processus du pool charge son propre modèle. Les fichiers terminés
+sont notés dans un checkpoint: une commande interrompue reprend là où
+elle s'était arrêtée. Les résultats sont écrits au fil de l'eau en JSONL
+ou Parquet, une ligne par champ extrait.
+
+Depuis Python (ETL):
+    from api.batch import extract_many
+    for result in extract_many(paths, workers=4):
+        ...
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set
+
+from .config import get_config
+from .models import InvoiceExtraction
+
+
+SUPPORTED_EXTENSIONS = ('.pdf', '.jpg', '.jpeg', '.png')
+
+
+class BatchResult(NamedTuple):
+    """Résultat de l'extraction d'un fichier"""
+    path: str
+    extraction: Optional[InvoiceExtraction]
+    error: Optional[str]
+    seconds: float
+
+
+def iter_invoice_files(root: str, extensions: Iterable[str] = SUPPORTED_EXTENSIONS) -> Iterator[Path]:
+    """
+    Parcourir une arborescence de factures (ordre stable)
+
+    Args:
+        root: Répertoire racine (ou fichier unique)
+        extensions: Extensions acceptées
+
+    Yields:
+        Chemins des fichiers
+    """
+    root = Path(root)
+    extensions = {ext.lower() for ext in extensions}
+    if root.is_file():
+        yield root
+        return
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if Path(name).suffix.lower() in extensions:
+                yield Path(dirpath) / name
+
+
+# ============================================
+# Workers (un extracteur par processus)
+# ============================================
+
+_worker_extractor = None
+
+
+def _init_worker(config_path: Optional[str], model_path: Optional[str]):
+    """Charger l'extracteur et le modèle une fois par processus"""
+    global _worker_extractor
+    from .extractor import InvoiceExtractor
+
+    _worker_extractor = InvoiceExtractor(config_path)
+    _worker_extractor.load_model(model_path)
+    # Traitement par lot: qualité complète, pas de mode dégradé de l'API
+    _worker_extractor.load_governor = None
+
+
+def _extract_one(path: str) -> BatchResult:
+    """Extraire un fichier dans le processus courant"""
+    start = time.perf_counter()
+    try:
+        extraction = _worker_extractor.extract_from_file(path)
+        return BatchResult(path, extraction, None, time.perf_counter() - start)
+    except Exception as e:
+        return BatchResult(path, None, str(e), time.perf_counter() - start)
+
+
+def extract_many(paths: Iterable, workers: int = 1, config_path: Optional[str] = None,
+                 model_path: Optional[str] = None) -> Iterator[BatchResult]:
+    """
+    Extraire un flux de fichiers, résultats dans l'ordre de complétion
+
+    Le flux d'entrée est consommé au fur et à mesure (au plus 2 fichiers
+    en attente par worker): il peut être très long sans occuper de mémoire.
+
+    Args:
+        paths: Chemins des fichiers (PDF ou image)
+        workers: Nombre de processus (1: extraction dans le processus courant)
+        config_path: Chemin vers settings.yaml
+        model_path: Modèle à charger (défaut: le plus récent de data/models)
+
+    Yields:
+        BatchResult par fichier (extraction ou message d'erreur)
+    """
+    paths = (str(path) for path in paths)
+
+    if workers <= 1:
+        _init_worker(config_path, model_path)
+        for path in paths:
+            yield _extract_one(path)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(config_path, model_path)) as executor:
+        pending = set()
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < workers * 2:
+                path = next(paths, None)
+                if path is None:
+                    exhausted = True
+                else:
+                    pending.add(executor.submit(_extract_one, path))
+
+            if not pending:
+                return
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+# ============================================
+# Checkpoint et sorties
+# ============================================
+
+class Checkpoint:
+    """Fichiers déjà traités avec succès (JSONL en ajout seul)"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.done: Set[str] = set()
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # Dernière ligne tronquée par une interruption
+                    if entry.get('status') == 'ok':
+                        self.done.add(entry['path'])
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def __contains__(self, path: str) -> bool:
+        return path in self.done
+
+    def record(self, results: List[BatchResult]):
+        """Noter des fichiers traités (après écriture de leurs lignes)"""
+        for result in results:
+            status = 'ok' if result.error is None else 'error'
+            entry = {'path': result.path, 'status': status}
+            if result.error is not None:
+                entry['error'] = result.error
+            else:
+                self.done.add(result.path)
+            self._file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+def extraction_rows(result: BatchResult) -> List[Dict]:
+    """Une ligne par champ extrait"""
+    extraction = result.extraction
+    common = {
+        'path': result.path,
+        'filename': extraction.filename,
+        'extracted_at': extraction.extracted_at.isoformat(),
+        'model_version': extraction.model_version,
+        'quality_mode': extraction.quality_mode,
+        'overall_confidence': extraction.overall_confidence,
+        'needs_review': extraction.needs_review
+    }
+
+    rows = []
+    for field in extraction.fields:
+        bbox = field.bbox
+        rows.append({
+            **common,
+            'label': field.label,
+            'value': field.value,
+            'confidence': field.confidence,
+            'bbox_x': bbox.x if bbox else None,
+            'bbox_y': bbox.y if bbox else None,
+            'bbox_width': bbox.width if bbox else None,
+            'bbox_height': bbox.height if bbox else None
+        })
+    return rows
+
+
+class JSONLWriter:
+    """Sortie JSONL (ajout, chaque document est écrit immédiatement)"""
+
+    def __init__(self, path: str, append: bool = True):
+        """
+        Args:
+            path: Fichier de sortie
+            append: Compléter le fichier (reprise), sinon le remplacer
+        """
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._file = open(path, 'a' if append else 'w', encoding='utf-8')
+
+    def write(self, rows: List[Dict]) -> bool:
+        """Écrire des lignes; renvoie True si elles sont sur disque"""
+        for row in rows:
+            self._file.write(json.dumps(row, ensure_ascii=False) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return True
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetWriter:
+    """
+    Sortie Parquet par groupes de lignes (nécessite pyarrow)
+
+    Un fichier Parquet n'est lisible qu'une fois son pied de page écrit, à
+    la fermeture: chaque groupe de lignes est donc écrit dans une partie
+    complète et fermée (extractions.parquet, extractions-0001.parquet...)
+    avant d'être noté au checkpoint. Les parties se lisent ensemble via
+    pyarrow.dataset ou pandas.read_parquet sur le répertoire.
+    """
+
+    def __init__(self, path: str, row_group_size: int = 10000, append: bool = True):
+        """
+        Args:
+            path: Première partie (les suivantes sont numérotées)
+            row_group_size: Lignes par partie
+            append: Ajouter des parties à celles existantes (reprise), sinon les supprimer
+        """
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("La sortie Parquet nécessite pyarrow: pip install pyarrow")
+
+        self._base = Path(path)
+        self._base.parent.mkdir(parents=True, exist_ok=True)
+        if not append:
+            parts = self._base.parent.glob(f"{self._base.stem}-[0-9][0-9][0-9][0-9]{self._base.suffix}")
+            for part_path in [self._base, *parts]:
+                if part_path.exists():
+                    part_path.unlink()
+
+        self.path = str(self._next_path())
+        self.paths: List[str] = []
+        self.row_group_size = row_group_size
+        self._pa = pa
+        self._pq = pq
+        self._schema = pa.schema([
+            ('path', pa.string()), ('filename', pa.string()),
+            ('extracted_at', pa.string()), ('model_version', pa.string()),
+            ('quality_mode', pa.string()), ('overall_confidence', pa.float64()),
+            ('needs_review', pa.bool_()), ('label', pa.string()),
+            ('value', pa.string()), ('confidence', pa.float64()),
+            ('bbox_x', pa.float64()), ('bbox_y', pa.float64()),
+            ('bbox_width', pa.float64()), ('bbox_height', pa.float64())
+        ])
+        self._rows: List[Dict] = []
+
+    def _next_path(self) -> Path:
+        """Première partie libre"""
+        path, part = self._base, 0
+        while path.exists():
+            part += 1
+            path = self._base.with_name(f"{self._base.stem}-{part:04d}{self._base.suffix}")
+        return path
+
+    def write(self, rows: List[Dict]) -> bool:
+        """Ajouter des lignes; renvoie True quand elles sont dans une partie fermée et lisible"""
+        self._rows.extend(rows)
+        if len(self._rows) >= self.row_group_size:
+            self.flush()
+            return True
+        return False
+
+    def flush(self):
+        """Écrire les lignes en attente dans une nouvelle partie complète"""
+        if not self._rows:
+            return
+        table = self._pa.Table.from_pylist(self._rows, schema=self._schema)
+        path = self._next_path()
+        tmp = path.with_name(f".{path.name}.tmp")
+        self._pq.write_table(table, str(tmp))
+        with open(tmp, 'rb') as f:
+            os.fsync(f.fileno())
+        # Renommage atomique: une partie visible a toujours son pied de page
+        os.replace(tmp, path)
+        self.paths.append(str(path))
+        self._rows = []
+
+    def close(self):
+        self.flush()
+
+
+def open_writer(path: str, output_format: Optional[str] = None, append: bool = True):
+    """Ouvrir la sortie selon le format (défaut: d'après l'extension)"""
+    output_format = output_format or ('parquet' if str(path).endswith('.parquet') else 'jsonl')
+    if output_format == 'parquet':
+        return ParquetWriter(path, append=append)
+    return JSONLWriter(path, append=append)
+
+
+# ============================================
+# Commande
+# ============================================
+
+def run_batch(root: str, output: str, workers: int = 1, checkpoint_path: Optional[str] = None,
+              output_format: Optional[str] = None, resume: bool = True,
+              config_path: Optional[str] = None, model_path: Optional[str] = None) -> Dict:
+    """
+    Extraire une arborescence vers un fichier de sortie
+
+    Returns:
+        Résumé (fichiers traités, ignorés, en erreur, débit)
+    """
+    from tqdm import tqdm
+
+    checkpoint_path = checkpoint_path or f"{output}.checkpoint"
+    if not resume and Path(checkpoint_path).exists():
+        Path(checkpoint_path).unlink()
+    checkpoint = Checkpoint(checkpoint_path)
+
+    files = [str(path) for path in iter_invoice_files(root)]
+    todo = [path for path in files if path not in checkpoint]
+    skipped = len(files) - len(todo)
+
+    print(f"📂 {len(files)} fichiers trouvés, {skipped} déjà traités (checkpoint)")
+    print(f"⚙️  {workers} worker(s) -> {output}")
+
+    # Sans reprise, la sortie précédente est remplacée: pas de documents en double
+    writer = open_writer(output, output_format, append=resume)
+    summary = {'files': len(files), 'skipped': skipped, 'processed': 0, 'errors': 0, 'rows': 0}
+    uncommitted: List[BatchResult] = []
+    start = time.perf_counter()
+
+    try:
+        with tqdm(total=len(todo), unit="doc") as progress:
+            for result in extract_many(todo, workers=workers,
+                                       config_path=config_path, model_path=model_path):
+                if result.error is None:
+                    rows = extraction_rows(result)
+                    summary['rows'] += len(rows)
+                    summary['processed'] += 1
+                    on_disk = writer.write(rows)
+                else:
+                    summary['errors'] += 1
+                    on_disk = False
+                    tqdm.write(f"⚠️  {result.path}: {result.error}")
+
+                # Le checkpoint ne note un fichier qu'une fois ses lignes sur disque
+                uncommitted.append(result)
+                if on_disk:
+                    checkpoint.record(uncommitted)
+                    uncommitted = []
+
+                elapsed = time.perf_counter() - start
+                progress.update(1)
+                progress.set_postfix(docs_s=f"{progress.n / elapsed:.2f}", errors=summary['errors'])
+    finally:
+        writer.close()
+        checkpoint.record(uncommitted)
+        checkpoint.close()
+
+    elapsed = time.perf_counter() - start
+    summary['seconds'] = elapsed
+    summary['docs_per_second'] = (summary['processed'] + summary['errors']) / elapsed if elapsed else 0.0
+    summary['output'] = writer.path
+    return summary
+
+
+def main(argv: Optional[List[str]] = None):
+    """Point d'entrée: python -m api.batch"""
+    parser = argparse.ArgumentParser(
+        prog="python -m api.batch",
+        description="Extraction par lot sur une arborescence de factures"
+    )
+    parser.add_argument('root', help="Répertoire des factures (parcouru récursivement)")
+    parser.add_argument('-o', '--output', help="Fichier de sortie (.jsonl ou .parquet)")
+    parser.add_argument('--format', choices=['jsonl', 'parquet'], help="Format (défaut: d'après l'extension)")
+    parser.add_argument('-w', '--workers', type=int, help="Nombre de processus")
+    parser.add_argument('--checkpoint', help="Fichier de checkpoint (défaut: <output>.checkpoint)")
+    parser.add_argument('--no-resume', action='store_true', help="Ignorer le checkpoint existant et remplacer la sortie")
+    parser.add_argument('--model', help="Modèle à utiliser (défaut: le plus récent)")
+    parser.add_argument('--config', help="Chemin vers settings.yaml")
+    args = parser.parse_args(argv)
+
+    batch_config = get_config(args.config)['api'].get('batch', {})
+    output = args.output or batch_config.get('output', 'data/processed/extractions.jsonl')
+    workers = args.workers or batch_config.get('workers') or os.cpu_count() or 1
+
+    summary = run_batch(
+        args.root, output, workers=workers, checkpoint_path=args.checkpoint,
+        output_format=args.format, resume=not args.no_resume,
+        config_path=args.config, model_path=args.model
+    )
+
+    print(f"\n✅ {summary['processed']} fichiers extraits ({summary['rows']} champs) "
+          f"en {summary['seconds']:.1f}s - {summary['docs_per_second']:.2f} docs/s")
+    if summary['errors']:
+        print(f"⚠️  {summary['errors']} fichiers en erreur (relancés à la prochaine reprise)")
+    print(f"💾 Résultats: {summary['output']}")
+    return 1 if summary['errors'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
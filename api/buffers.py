@@ -0,0 +1,120 @@
+"""
+Pools de buffers numpy réutilisables
+
+Format de pixel canonique: toutes les images de page manipulées par
+l'extracteur sont en BGR uint8 contigu (convention OpenCV et YOLO pour
+les tableaux numpy), qu'elles viennent d'un PDF ou de cv2.imread.
+
+- PagePool: buffers de page partagés entre threads (une page traverse
+  plusieurs étages du pipeline avant d'être rendue au pool)
+- BufferPool: buffers de travail par thread pour le prétraitement des ROI
+"""
+import threading
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+
+class BufferPool:
+    """
+    Buffers de travail locaux au thread, réutilisés d'un appel à l'autre
+
+    Chaque buffer nommé est un tableau plat qui ne fait que grandir; get()
+    renvoie une vue contiguë de la forme demandée, utilisable comme `dst`
+    par les fonctions OpenCV.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def get(self, name: str, shape: Tuple[int, ...], dtype=np.uint8) -> np.ndarray:
+        """
+        Obtenir un buffer de travail
+
+        Args:
+            name: Nom du buffer (un buffer par étape de prétraitement)
+            shape: Forme souhaitée
+            dtype: Type des éléments
+
+        Returns:
+            Vue contiguë sur le buffer du thread courant (contenu non initialisé)
+        """
+        buffers: Dict[str, np.ndarray] = getattr(self._local, 'buffers', None)
+        if buffers is None:
+            buffers = self._local.buffers = {}
+
+        size = int(np.prod(shape))
+        buf = buffers.get(name)
+        if buf is None or buf.dtype != np.dtype(dtype) or buf.size < size:
+            buf = np.empty(size, dtype=dtype)
+            buffers[name] = buf
+
+        return buf[:size].reshape(shape)
+
+    def nbytes(self) -> int:
+        """Mémoire occupée par les buffers du thread courant"""
+        buffers = getattr(self._local, 'buffers', {})
+        return sum(buf.nbytes for buf in buffers.values())
+
+
+class PagePool:
+    """
+    Pool borné de buffers de page (BGR uint8), partagé entre threads
+
+    Les pages d'une même facture ont presque toujours la même taille:
+    un buffer rendu est réutilisé tel quel pour le document suivant.
+    """
+
+    def __init__(self, max_free: int = 8):
+        """
+        Args:
+            max_free: Nombre maximal de buffers libres conservés
+        """
+        self.max_free = max_free
+        self._free: List[np.ndarray] = []
+        self._lock = threading.Lock()
+        self.allocations = 0
+        self.reuses = 0
+
+    def acquire(self, shape: Tuple[int, ...]) -> np.ndarray:
+        """Obtenir un buffer de page de la forme demandée"""
+        size = int(np.prod(shape))
+        with self._lock:
+            for i, buf in enumerate(self._free):
+                if buf.size >= size:
+                    del self._free[i]
+                    self.reuses += 1
+                    return buf[:size].reshape(shape)
+            self.allocations += 1
+
+        return np.empty(size, dtype=np.uint8).reshape(shape)
+
+    def release(self, array: np.ndarray):
+        """Rendre un buffer au pool"""
+        # Remonter au tableau plat d'origine pour garder toute sa capacité
+        base = array
+        while base.base is not None and isinstance(base.base, np.ndarray):
+            base = base.base
+        if base.ndim != 1 or base.dtype != np.uint8:
+            return
+
+        with self._lock:
+            if any(buf is base for buf in self._free):
+                return
+            if len(self._free) < self.max_free:
+                self._free.append(base)
+            else:
+                # Garder les plus grands buffers (réutilisables pour toutes les tailles)
+                smallest = min(range(len(self._free)), key=lambda i: self._free[i].size)
+                if self._free[smallest].size < base.size:
+                    self._free[smallest] = base
+
+    def get_stats(self) -> Dict:
+        """Statistiques du pool"""
+        with self._lock:
+            return {
+                'free_buffers': len(self._free),
+                'free_bytes': sum(buf.nbytes for buf in self._free),
+                'allocations': self.allocations,
+                'reuses': self.reuses
+            }
@@ -0,0 +1,242 @@
+"""
+Capture des requêtes /extract (rejeu et tests de non-régression)
+
+Mode opt-in: une fraction des fichiers reçus est conservée avec le
+résultat d'extraction et les durées par étage. Les fichiers sont stockés
+une seule fois (adressés par SHA-256); la taille totale est plafonnée,
+les captures les plus anciennes sont supprimées au-delà.
+
+    <directory>/files/<sha256><ext>      contenu du fichier reçu
+    <directory>/<capture_id>.json        métadonnées, extraction, durées
+    <directory>/index.db                 index partagé (captures, fichiers, tailles)
+
+L'index est une base SQLite partagée par tous les workers de l'API: le
+plafond s'applique au répertoire entier, et une capture n'est ajoutée ou
+supprimée que sous le verrou d'écriture de la base (BEGIN IMMEDIATE).
+
+Rejeu: python -m api.replay <directory>
+"""
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+
+class CaptureStore:
+    """Stockage local et plafonné des requêtes capturées (index partagé entre workers)"""
+
+    def __init__(self, directory: str, max_bytes: int = 2 * 1024**3,
+                 sample_rate: float = 0.01, seed: Optional[int] = None):
+        """
+        Args:
+            directory: Répertoire des captures
+            max_bytes: Taille maximale (fichiers + métadonnées), tous workers confondus
+            sample_rate: Fraction des requêtes capturées (0-1)
+            seed: Graine de l'échantillonnage (tests)
+        """
+        self.directory = Path(directory)
+        self.files_dir = self.directory / 'files'
+        self.max_bytes = max_bytes
+        self.sample_rate = sample_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.directory / 'index.db'), check_same_thread=False,
+                                     timeout=30, isolation_level=None)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS captures (
+                    id TEXT PRIMARY KEY,            -- horodatage en tête: ordre chronologique
+                    captured_at TEXT NOT NULL,
+                    file TEXT NOT NULL,
+                    meta_size INTEGER NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS files (
+                    name TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    refs INTEGER NOT NULL
+                )
+            """)
+            with self._transaction():
+                self._load()
+
+    @contextmanager
+    def _transaction(self):
+        """Transaction avec verrou d'écriture immédiat (exclusion entre workers), sous self._lock"""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def _load(self):
+        """Reconstruire l'index depuis le disque (répertoire créé avant l'index partagé)"""
+        if self._conn.execute("SELECT EXISTS (SELECT 1 FROM captures)").fetchone()[0]:
+            return
+        metas = []
+        for meta_path in self.directory.glob('*.json'):
+            try:
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+                metas.append((meta['captured_at'], meta_path, meta['file']))
+            except (OSError, ValueError, KeyError):
+                continue
+
+        for captured_at, meta_path, file_name in sorted(metas):
+            file_path = self.files_dir / file_name
+            self._index(meta_path.stem, captured_at, file_name, meta_path.stat().st_size,
+                        file_path.stat().st_size if file_path.exists() else 0)
+
+    def _index(self, capture_id: str, captured_at: str, file_name: str, meta_size: int, file_size: int):
+        """Ajouter une capture à l'index (dans une transaction)"""
+        self._conn.execute(
+            "INSERT OR REPLACE INTO captures (id, captured_at, file, meta_size) VALUES (?, ?, ?, ?)",
+            (capture_id, captured_at, file_name, meta_size)
+        )
+        self._conn.execute(
+            "INSERT INTO files (name, size, refs) VALUES (?, ?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET refs = refs + 1", (file_name, file_size)
+        )
+
+    @property
+    def total_bytes(self) -> int:
+        """Taille occupée (fichiers + métadonnées), tous workers confondus"""
+        with self._lock:
+            return self._total_bytes()
+
+    def _total_bytes(self) -> int:
+        return self._conn.execute(
+            "SELECT (SELECT COALESCE(SUM(meta_size), 0) FROM captures) + (SELECT COALESCE(SUM(size), 0) FROM files)"
+        ).fetchone()[0]
+
+    def should_capture(self) -> bool:
+        """Tirage de l'échantillonnage"""
+        return self.sample_rate > 0 and self._random.random() < self.sample_rate
+
+    def add(self, content: bytes, extension: str, filename: str, extraction,
+            timings: Optional[Dict[str, float]] = None) -> str:
+        """
+        Enregistrer une requête capturée
+
+        Args:
+            content: Contenu du fichier reçu
+            extension: Extension (.pdf, .png...)
+            filename: Nom d'origine
+            extraction: InvoiceExtraction renvoyée
+            timings: Durées par étage (secondes)
+
+        Returns:
+            Identifiant de la capture
+        """
+        sha256 = hashlib.sha256(content).hexdigest()
+        file_name = f"{sha256}{extension.lower()}"
+        captured_at = datetime.now()
+        capture_id = f"{captured_at.strftime('%Y%m%d_%H%M%S_%f')}_{sha256[:12]}"
+
+        meta = json.dumps({
+            'id': capture_id,
+            'captured_at': captured_at.isoformat(),
+            'file': file_name,
+            'sha256': sha256,
+            'filename': filename,
+            'timings_ms': {name: seconds * 1000 for name, seconds in (timings or {}).items()},
+            'extraction': json.loads(extraction.model_dump_json())
+        }, ensure_ascii=False, indent=2)
+
+        # Sous le verrou d'écriture: un autre worker ne peut pas supprimer le fichier entre-temps
+        with self._lock, self._transaction():
+            self.files_dir.mkdir(parents=True, exist_ok=True)
+            file_path = self.files_dir / file_name
+            if not file_path.exists():
+                tmp = file_path.with_name(f".{file_name}.tmp")
+                tmp.write_bytes(content)
+                os.replace(tmp, file_path)
+
+            meta_path = self.directory / f"{capture_id}.json"
+            meta_path.write_text(meta, encoding='utf-8')
+            self._index(capture_id, captured_at.isoformat(), file_name, meta_path.stat().st_size, len(content))
+            self._evict()
+
+        return capture_id
+
+    def _evict(self):
+        """Supprimer les captures les plus anciennes au-delà du plafond (dans une transaction)"""
+        total = self._total_bytes()
+        while total > self.max_bytes:
+            oldest = self._conn.execute(
+                "SELECT id, file, meta_size FROM captures ORDER BY id LIMIT 2"
+            ).fetchall()
+            if len(oldest) < 2:
+                return
+            capture_id, file_name, meta_size = oldest[0]
+            self._conn.execute("DELETE FROM captures WHERE id = ?", (capture_id,))
+            self._unlink(self.directory / f"{capture_id}.json")
+            total -= meta_size
+
+            self._conn.execute("UPDATE files SET refs = refs - 1 WHERE name = ?", (file_name,))
+            size, refs = self._conn.execute("SELECT size, refs FROM files WHERE name = ?", (file_name,)).fetchone()
+            if refs <= 0:
+                self._conn.execute("DELETE FROM files WHERE name = ?", (file_name,))
+                self._unlink(self.files_dir / file_name)
+                total -= size
+
+    @staticmethod
+    def _unlink(path: Path):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM captures").fetchone()[0]
+
+    def iter_captures(self, limit: Optional[int] = None) -> Iterator[Dict]:
+        """
+        Captures dans l'ordre chronologique (ordre de rejeu déterministe)
+
+        Yields:
+            Métadonnées, avec 'path' vers le fichier capturé
+        """
+        with self._lock:
+            ids = [row[0] for row in self._conn.execute(
+                "SELECT id FROM captures ORDER BY id LIMIT ?", (-1 if limit is None else limit,)
+            )]
+        for capture_id in ids:
+            try:
+                with open(self.directory / f"{capture_id}.json", 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                continue
+            meta['path'] = str(self.files_dir / meta['file'])
+            yield meta
+
+    def get_stats(self) -> Dict:
+        """Nombre de captures et taille occupée (tous workers confondus)"""
+        with self._lock:
+            captures = self._conn.execute("SELECT COUNT(*) FROM captures").fetchone()[0]
+            files = self._conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+            total_bytes = self._total_bytes()
+        return {
+            'captures': captures,
+            'files': files,
+            'size_mb': total_bytes / 1024**2,
+            'max_size_mb': self.max_bytes / 1024**2,
+            'sample_rate': self.sample_rate
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
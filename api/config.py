@@ -0,0 +1,39 @@
+"""
+Chargement de la configuration (settings.yaml)
+
+La configuration est lue une seule fois par chemin, au premier appel,
+et non à l'import des modules.
+"""
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional, Union
+
+import yaml
+
+
+DEFAULT_CONFIG_PATH = Path(__file__).parent.parent / 'config' / 'settings.yaml'
+
+
+@lru_cache(maxsize=None)
+def _load_config(config_path: str) -> dict:
+    with open(config_path, 'r', encoding='utf-8') as f:
+        return yaml.safe_load(f)
+
+
+def get_config(config_path: Optional[Union[str, Path]] = None) -> dict:
+    """
+    Obtenir la configuration (mise en cache)
+
+    Args:
+        config_path: Chemin vers settings.yaml (défaut: config/settings.yaml du projet)
+
+    Returns:
+        Configuration sous forme de dictionnaire
+    """
+    path = Path(config_path) if config_path is not None else DEFAULT_CONFIG_PATH
+    return _load_config(str(path.resolve()))
+
+
+def clear_config_cache():
+    """Oublier les configurations chargées (relire settings.yaml au prochain appel)"""
+    _load_config.cache_clear()
@@ -0,0 +1,244 @@
+"""
+Index local des documents importés: doublons exacts et quasi-doublons
+
+Chaque document importé dans Label Studio est noté avec deux empreintes:
+    - SHA-256 du fichier: doublon exact (même fichier renommé), recherche
+      par clé primaire
+    - dHash 64 bits de la première page: quasi-doublon (rescan, autre
+      résolution, PDF régénéré), distance de Hamming
+
+Les quasi-doublons sont cherchés sans parcourir l'index: le hash est
+découpé en 8 octets indexés séparément. Deux hash à distance < 8 ont au
+moins un octet identique (principe des tiroirs), seuls ces candidats sont
+comparés bit à bit.
+
+L'import n'a plus besoin de lister les tâches du projet Label Studio.
+"""
+import hashlib
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .lazy import lazy_import
+
+fitz = lazy_import('fitz')  # PyMuPDF
+
+# dHash: 9x8 niveaux de gris, 1 bit par comparaison de voisins horizontaux
+HASH_WIDTH = 9
+HASH_HEIGHT = 8
+BANDS = 8
+
+# Écart minimal entre voisins pour allumer un bit: les marges blanches
+# d'une facture donnent des bits stables (0) au lieu de bits tirés par le bruit
+DHASH_MARGIN = 2.0
+
+# Distance de Hamming maximale d'un quasi-doublon (< BANDS)
+DEFAULT_MAX_DISTANCE = 6
+
+
+def dhash(pixels: Sequence[int], width: int, height: int) -> int:
+    """
+    dHash d'une image en niveaux de gris
+
+    L'image est réduite à 9x8 par moyenne de blocs, puis chaque pixel est
+    comparé à son voisin de droite (bit allumé s'il est plus clair de plus
+    de DHASH_MARGIN niveaux).
+
+    Args:
+        pixels: Niveaux de gris ligne par ligne (width x height)
+        width, height: Dimensions
+
+    Returns:
+        Hash sur 64 bits
+    """
+    grid = []
+    for row in range(HASH_HEIGHT):
+        y0 = row * height // HASH_HEIGHT
+        y1 = max((row + 1) * height // HASH_HEIGHT, y0 + 1)
+        line = []
+        for column in range(HASH_WIDTH):
+            x0 = column * width // HASH_WIDTH
+            x1 = max((column + 1) * width // HASH_WIDTH, x0 + 1)
+            total = sum(sum(pixels[y * width + x0:y * width + x1]) for y in range(y0, y1))
+            line.append(total / ((x1 - x0) * (y1 - y0)))
+        grid.append(line)
+
+    value = 0
+    for line in grid:
+        for column in range(HASH_WIDTH - 1):
+            value = (value << 1) | (line[column] > line[column + 1] + DHASH_MARGIN)
+    return value
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+def first_page_hash(path: str) -> int:
+    """dHash de la première page d'un PDF ou d'une image (rendu réduit)"""
+    doc = fitz.open(str(path))
+    try:
+        page = doc[0]
+        scale = 64 / max(page.rect.width, 1)
+        pix = page.get_pixmap(matrix=fitz.Matrix(scale, scale), colorspace=fitz.csGRAY, alpha=False)
+        # Lignes éventuellement alignées: recopier sans le remplissage
+        samples = pix.samples
+        pixels = b''.join(samples[y * pix.stride:y * pix.stride + pix.width] for y in range(pix.height))
+        return dhash(pixels, pix.width, pix.height)
+    finally:
+        doc.close()
+
+
+def fingerprint_file(path: str) -> Tuple[str, Optional[int]]:
+    """
+    Empreintes d'un fichier (exécutée dans un pool de processus)
+
+    Returns:
+        (sha256, dhash de la première page ou None si illisible)
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    try:
+        perceptual = first_page_hash(path)
+    except Exception:
+        perceptual = None
+    return digest.hexdigest(), perceptual
+
+
+def fingerprint_files(paths: List[str], workers: Optional[int] = None) -> List[Tuple[str, Optional[int]]]:
+    """Empreintes de plusieurs fichiers, réparties sur un pool de processus (0: séquentiel)"""
+    if workers == 0 or len(paths) < 2:
+        return [fingerprint_file(path) for path in paths]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(fingerprint_file, paths, chunksize=16))
+
+
+def _signed(value: int) -> int:
+    """Entier 64 bits non signé -> INTEGER SQLite (signé)"""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _bands(value: int) -> List[int]:
+    return [(value >> (8 * band)) & 0xFF for band in range(BANDS)]
+
+
+class HashIndex:
+    """Index SQLite des documents importés (SHA-256 + dHash par octets)"""
+
+    def __init__(self, db_path: str = ':memory:'):
+        """
+        Args:
+            db_path: Base SQLite (':memory:' pour un index temporaire)
+        """
+        if db_path != ':memory:':
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.db_path = db_path
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+
+        with self._lock:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    sha256 TEXT PRIMARY KEY,
+                    phash INTEGER,
+                    path TEXT NOT NULL,
+                    filename TEXT NOT NULL,
+                    task_id INTEGER,
+                    imported_at REAL NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS phash_bands (
+                    band INTEGER NOT NULL,
+                    value INTEGER NOT NULL,
+                    sha256 TEXT NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_phash_bands ON phash_bands (band, value)")
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def get(self, sha256: str) -> Optional[Dict]:
+        """Document déjà importé avec ce contenu exact"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM documents WHERE sha256 = ?", (sha256,)).fetchone()
+        return dict(row) if row else None
+
+    def near(self, phash: int, max_distance: int = DEFAULT_MAX_DISTANCE) -> List[Dict]:
+        """
+        Documents dont la première page est visuellement proche
+
+        Returns:
+            Documents avec leur distance, du plus proche au plus éloigné
+        """
+        if max_distance >= BANDS:
+            raise ValueError(f"max_distance doit être < {BANDS}")
+        conditions = ' OR '.join('(band = ? AND value = ?)' for _ in range(BANDS))
+        params = [p for band, value in enumerate(_bands(phash)) for p in (band, value)]
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM documents WHERE sha256 IN "
+                f"(SELECT sha256 FROM phash_bands WHERE {conditions})", params
+            ).fetchall()
+
+        matches = []
+        for row in rows:
+            distance = hamming(phash, row['phash'] & ((1 << 64) - 1))
+            if distance <= max_distance:
+                matches.append({**dict(row), 'distance': distance})
+        return sorted(matches, key=lambda match: match['distance'])
+
+    def add_many(self, documents: List[Dict]) -> int:
+        """
+        Noter des documents importés
+
+        Args:
+            documents: Dictionnaires sha256, phash (ou None), path, filename, task_id
+        """
+        now = time.time()
+        with self._lock:
+            for doc in documents:
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO documents (sha256, phash, path, filename, task_id, imported_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (doc['sha256'], _signed(doc['phash']) if doc.get('phash') is not None else None,
+                     doc['path'], doc['filename'], doc.get('task_id'), now)
+                )
+                if cursor.rowcount and doc.get('phash') is not None:
+                    self._conn.executemany(
+                        "INSERT INTO phash_bands (band, value, sha256) VALUES (?, ?, ?)",
+                        [(band, value, doc['sha256']) for band, value in enumerate(_bands(doc['phash']))]
+                    )
+            self._conn.commit()
+        return len(documents)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def classify(index: HashIndex, path: str, sha256: str, phash: Optional[int],
+             max_distance: int = DEFAULT_MAX_DISTANCE) -> Tuple[str, Optional[Dict]]:
+    """
+    Statut d'un nouveau fichier face à l'index
+
+    Returns:
+        ('duplicate', document) | ('near_duplicate', plus proche) | ('new', None)
+    """
+    existing = index.get(sha256)
+    if existing:
+        return 'duplicate', existing
+    if phash is not None:
+        matches = index.near(phash, max_distance)
+        if matches:
+            return 'near_duplicate', matches[0]
+    return 'new', None
@@ -0,0 +1,201 @@
+"""
+Modes de qualité dégradés sous charge
+
+Aux pics de fin de mois, la file d'extraction grossit et la latence
+dépasse les objectifs. Le LoadGovernor choisit pour chaque document un
+mode de qualité selon la profondeur de file et le p95 récent:
+
+    full     -> traitement complet
+    reduced  -> pas de débruitage NL-means
+    fast     -> + détection à plus faible résolution, ligne_produit différé
+    minimal  -> + OCR limité aux labels prioritaires
+
+Les seuils sont définis dans settings.yaml (api.degradation). Le seuil
+de file s'exprime de préférence en fraction de la capacité des files du
+pipeline (queue_fill): il suit les queue_size configurés. La montée
+en dégradation est immédiate; le retour à un mode plus complet attend
+`cooldown_seconds` pour éviter les oscillations.
+"""
+import math
+import threading
+import time
+from collections import deque
+from typing import Dict, FrozenSet, Iterable, List, Optional
+
+
+DEFAULT_PRIORITY_LABELS = ['montant_ttc', 'numero_facture', 'date_facture']
+DEFAULT_DEFERRED_LABELS = ['ligne_produit']
+
+
+class QualityMode:
+    """Un niveau de qualité et ses seuils d'activation"""
+
+    def __init__(self, name: str, queue_depth: Optional[int] = None,
+                 p95_ms: Optional[float] = None, skip_denoise: bool = False,
+                 imgsz: Optional[int] = None, defer_labels: Iterable[str] = (),
+                 priority_only: bool = False, priority_labels: Iterable[str] = ()):
+        """
+        Args:
+            name: Nom du mode (reporté dans chaque réponse)
+            queue_depth: Profondeur de file à partir de laquelle le mode s'active
+            p95_ms: Latence p95 récente (ms) à partir de laquelle le mode s'active
+            skip_denoise: Ne pas débruiter les ROI avant l'OCR
+            imgsz: Taille d'entrée de la détection (défaut: celle du modèle)
+            defer_labels: Labels non OCRisés dans ce mode
+            priority_only: Limiter l'OCR aux labels prioritaires
+            priority_labels: Labels prioritaires
+        """
+        self.name = name
+        self.queue_depth = queue_depth
+        self.p95_ms = p95_ms
+        self.skip_denoise = skip_denoise
+        self.imgsz = imgsz
+        self.defer_labels: FrozenSet[str] = frozenset(defer_labels)
+        self.priority_only = priority_only
+        self.priority_labels: FrozenSet[str] = frozenset(priority_labels)
+
+    def triggered(self, queue_depth: int, p95_ms: Optional[float]) -> bool:
+        """Les seuils du mode sont-ils atteints ?"""
+        if self.queue_depth is not None and queue_depth >= self.queue_depth:
+            return True
+        return self.p95_ms is not None and p95_ms is not None and p95_ms >= self.p95_ms
+
+    def should_ocr(self, label_name: str) -> bool:
+        """Le label doit-il être OCRisé dans ce mode ?"""
+        if label_name in self.defer_labels:
+            return False
+        return not self.priority_only or label_name in self.priority_labels
+
+    def __repr__(self) -> str:
+        return f"QualityMode({self.name!r})"
+
+
+FULL = QualityMode('full')
+
+
+def queue_threshold(mode_config: Dict, capacity: Optional[int] = None) -> Optional[int]:
+    """
+    Seuil de profondeur de file d'un mode
+
+    queue_fill (fraction de la capacité des files) est prioritaire sur
+    queue_depth (absolu). Un seuil absolu au-delà de la capacité ne
+    pourrait jamais être atteint: il est ramené à la capacité.
+    """
+    fill = mode_config.get('queue_fill')
+    if fill is not None:
+        if capacity is None:
+            raise ValueError(f"Mode '{mode_config['name']}': queue_fill sans capacité de file connue")
+        return max(1, min(capacity, math.ceil(fill * capacity)))
+    depth = mode_config.get('queue_depth')
+    if depth is not None and capacity is not None:
+        return min(depth, capacity)
+    return depth
+
+
+def modes_from_config(config: Dict, capacity: Optional[int] = None) -> List[QualityMode]:
+    """
+    Construire les modes dégradés depuis api.degradation
+
+    Args:
+        config: Section api.degradation de settings.yaml
+        capacity: Somme des queue_size des étages du pipeline
+
+    Returns:
+        Modes, du moins dégradé au plus dégradé (sans le mode complet)
+    """
+    priority = config.get('priority_labels', DEFAULT_PRIORITY_LABELS)
+    deferred = config.get('deferred_labels', DEFAULT_DEFERRED_LABELS)
+
+    modes = []
+    for mode_config in config.get('modes', []):
+        modes.append(QualityMode(
+            mode_config['name'],
+            queue_depth=queue_threshold(mode_config, capacity),
+            p95_ms=mode_config.get('p95_ms'),
+            skip_denoise=mode_config.get('skip_denoise', False),
+            imgsz=mode_config.get('imgsz'),
+            defer_labels=deferred if mode_config.get('defer', False) else (),
+            priority_only=mode_config.get('priority_only', False),
+            priority_labels=priority
+        ))
+    return modes
+
+
+class LoadGovernor:
+    """Sélection du mode de qualité selon la charge"""
+
+    def __init__(self, modes: List[QualityMode], window: int = 200,
+                 cooldown_seconds: float = 10.0, min_samples: int = 20):
+        """
+        Args:
+            modes: Modes dégradés, du moins au plus dégradé
+            window: Nombre de latences récentes pour le calcul du p95
+            cooldown_seconds: Délai avant de revenir à un mode moins dégradé
+            min_samples: Nombre minimum de latences avant d'utiliser le p95
+        """
+        self.modes = [FULL] + list(modes)
+        self.cooldown_seconds = cooldown_seconds
+        self.min_samples = min_samples
+        self._latencies = deque(maxlen=window)
+        self._level = 0
+        self._level_since = time.monotonic()
+        self._lock = threading.Lock()
+        self.applied = {mode.name: 0 for mode in self.modes}
+        self.switches = 0
+
+    def record_latency(self, seconds: float):
+        """Enregistrer la latence de bout en bout d'un document"""
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def p95_ms(self) -> Optional[float]:
+        """Latence p95 récente (ms), None tant qu'il n'y a pas assez de mesures"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if len(latencies) < self.min_samples:
+            return None
+        return latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))] * 1000
+
+    def select(self, queue_depth: int) -> QualityMode:
+        """
+        Choisir le mode de qualité d'un nouveau document
+
+        Args:
+            queue_depth: Nombre de documents en attente dans le pipeline
+
+        Returns:
+            Mode à appliquer
+        """
+        p95 = self.p95_ms()
+        target = 0
+        for level, mode in enumerate(self.modes):
+            if level and mode.triggered(queue_depth, p95):
+                target = level
+
+        with self._lock:
+            now = time.monotonic()
+            if target > self._level or (
+                    target < self._level and now - self._level_since >= self.cooldown_seconds):
+                self._level = target
+                self._level_since = now
+                self.switches += 1
+            elif target == self._level:
+                # Charge toujours au niveau courant: repousser le retour
+                self._level_since = now
+
+            mode = self.modes[self._level]
+            self.applied[mode.name] += 1
+            return mode
+
+    def current(self) -> QualityMode:
+        """Mode actuellement appliqué"""
+        return self.modes[self._level]
+
+    def get_stats(self) -> Dict:
+        """Mode courant, p95 récent et répartition des modes appliqués"""
+        return {
+            'mode': self.current().name,
+            'p95_ms': self.p95_ms(),
+            'switches': self.switches,
+            'applied': dict(self.applied)
+        }
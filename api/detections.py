@@ -0,0 +1,97 @@
+"""
+Résultats de détection compacts (tableau numpy structuré)
+
+Les boîtes sont extraites de `results.boxes` en un seul transfert
+depuis le device, puis manipulées de façon vectorisée. Les objets
+pydantic ne sont construits qu'à la frontière de l'API.
+"""
+from typing import Dict, List
+
+import numpy as np
+
+
+DETECTION_DTYPE = np.dtype([
+    ('xyxy', np.float32, (4,)),   # Coordonnées en pixels (x1, y1, x2, y2)
+    ('conf', np.float32),         # Confiance du modèle
+    ('cls', np.int32)             # Identifiant de classe
+])
+
+
+class Detections:
+    """Détections d'une page: un tableau structuré + la table des noms de classes"""
+
+    def __init__(self, array: np.ndarray, names: Dict[int, str]):
+        """
+        Args:
+            array: Tableau structuré de dtype DETECTION_DTYPE
+            names: Correspondance identifiant de classe -> nom du label
+        """
+        self.array = array
+        self.names = names
+
+    @classmethod
+    def from_results(cls, results) -> "Detections":
+        """
+        Construire les détections depuis un résultat ultralytics
+
+        `results.boxes.data` (N x 6: xyxy, conf, cls) est copié vers le CPU
+        en un seul transfert, au lieu d'un aller-retour par boîte.
+        """
+        data = results.boxes.data
+        if hasattr(data, 'cpu'):
+            data = data.cpu().numpy()
+        data = np.asarray(data, dtype=np.float32)
+
+        array = np.empty(len(data), dtype=DETECTION_DTYPE)
+        if len(data):
+            array['xyxy'] = data[:, :4]
+            # Les colonnes conf/cls sont les deux dernières (un id de suivi peut s'intercaler)
+            array['conf'] = data[:, -2]
+            array['cls'] = data[:, -1].astype(np.int32)
+        return cls(array, results.names)
+
+    @classmethod
+    def empty(cls, names: Dict[int, str] = None) -> "Detections":
+        """Aucune détection"""
+        return cls(np.empty(0, dtype=DETECTION_DTYPE), names or {})
+
+    def __len__(self) -> int:
+        return len(self.array)
+
+    @property
+    def xyxy(self) -> np.ndarray:
+        """Coordonnées en pixels (N x 4)"""
+        return self.array['xyxy']
+
+    @property
+    def conf(self) -> np.ndarray:
+        """Confiances (N)"""
+        return self.array['conf']
+
+    @property
+    def cls(self) -> np.ndarray:
+        """Identifiants de classe (N)"""
+        return self.array['cls']
+
+    def labels(self) -> List[str]:
+        """Noms des labels, dans l'ordre des détections"""
+        return [self.names[int(c)] for c in self.cls]
+
+    def normalized(self, width: int, height: int) -> np.ndarray:
+        """
+        Boîtes normalisées par la taille de la page
+
+        Returns:
+            Tableau N x 4 (x, y, largeur, hauteur) en fraction de la page
+        """
+        xyxy = self.xyxy.astype(np.float64)
+        boxes = np.empty_like(xyxy)
+        boxes[:, 0] = xyxy[:, 0] / width
+        boxes[:, 1] = xyxy[:, 1] / height
+        boxes[:, 2] = (xyxy[:, 2] - xyxy[:, 0]) / width
+        boxes[:, 3] = (xyxy[:, 3] - xyxy[:, 1]) / height
+        return boxes
+
+    def select(self, mask) -> "Detections":
+        """Sous-ensemble des détections (masque booléen ou indices)"""
+        return Detections(self.array[mask], self.names)
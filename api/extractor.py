@@ -2,49 +2,126 @@
 Logique d'extraction de factures utilisant le modèle YOLO
 """
 import os
-import yaml
-import torch
-import cv2
 import numpy as np
 from pathlib import Path
 from typing import List, Dict, Optional
-from PIL import Image
-import fitz  # PyMuPDF
-from datetime import datetime
-import pytesseract
 import re
+import threading
+import time
+from concurrent.futures import Future
+from difflib import SequenceMatcher
 
+from .config import get_config
+from .lazy import lazy_import
 from .models import ExtractedField, InvoiceExtraction, BoundingBox
+from .ocr_cache import UNCACHEABLE_LABELS, OCRCache
+from .degradation import FULL, LoadGovernor, modes_from_config
+from .profiling import RequestProfile, SlowestProfiles, get_request_sampler
+from .metrics import metrics_from_config
+from .history import file_sha256, history_from_config
+from .supplier_registry import SupplierRegistry, is_valid_siret, normalize_siret
+from .buffers import BufferPool, PagePool
+from .raster import preprocess_roi, render_pdf_page, to_gray
+from .detections import Detections
+from .pipeline import DocumentContext, Pipeline, Stage, run_stages
+
+# Dépendances lourdes chargées au premier usage
+cv2 = lazy_import('cv2')
+pytesseract = lazy_import('pytesseract')
+torch = lazy_import('torch')
+
+
+# Champs fournisseur pouvant être remplis depuis le registre (label -> colonne)
+REGISTRY_FIELDS = {
+    'nom_fournisseur': 'nom',
+    'adresse_fournisseur': 'adresse'
+}
 
 
 class InvoiceExtractor:
     """Extracteur de données de factures"""
 
-    def __init__(self, config_path: str = "config/settings.yaml"):
+    def __init__(self, config_path: Optional[str] = None):
         """
         Initialiser l'extracteur
 
+        Aucune dépendance lourde (torch, cv2...) n'est chargée ici: elles le
+        sont au premier chargement de modèle ou au premier document.
+
         Args:
             config_path: Chemin vers le fichier de configuration
+                         (défaut: config/settings.yaml du projet)
         """
-        self.config = self._load_config(config_path)
+        self.config = get_config(config_path)
         self.model = None
         self.model_version = "not_loaded"
-        self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        self.device = None
         self.confidence_threshold = self.config['api']['confidence_threshold']
 
-        # Statistiques
-        self.stats = {
-            'total_extractions': 0,
-            'total_confidence': 0.0,
-            'extractions_today': 0,
-            'last_reset': datetime.now().date()
-        }
+        # Cache OCR inter-documents pour les blocs répétitifs (fournisseur)
+        cache_config = self.config['api'].get('ocr_cache', {})
+        self.ocr_cache = None
+        # Les identifiants propres au document ne sont jamais servis depuis le cache
+        self.ocr_cache_labels = set(cache_config.get('labels', [])) - UNCACHEABLE_LABELS
+        if cache_config.get('enabled', False):
+            self.ocr_cache = OCRCache(
+                max_entries=cache_config.get('max_entries', 10000),
+                max_distance=cache_config.get('max_hamming_distance', 0),
+                hash_size=cache_config.get('hash_size', 16)
+            )
+
+        # Registre fournisseurs (SIRET -> nom, adresse)
+        registry_config = self.config['api'].get('supplier_registry', {})
+        self.supplier_registry = None
+        self.registry_fuzzy = registry_config.get('fuzzy', True)
+        self.registry_mode = registry_config.get('mode', 'skip')
+        self.registry_min_similarity = registry_config.get('verify_min_similarity', 0.6)
+        if registry_config.get('enabled', False):
+            self.supplier_registry = SupplierRegistry(registry_config['db_path'])
+            csv_path = registry_config.get('csv_path')
+            if csv_path and Path(csv_path).exists() and len(self.supplier_registry) == 0:
+                count = self.supplier_registry.load_csv(csv_path)
+                print(f"✅ Registre fournisseurs chargé: {count} fournisseurs")
+
+        # Profilage d'une requête sur N (profils des plus lentes conservés)
+        profiling_config = self.config['api'].get('profiling', {})
+        self.profile_every = profiling_config.get('sample_every', 0)
+        self.slowest_profiles = None
+        self._profile_counter = 0
+        if self.profile_every:
+            get_request_sampler(profiling_config.get('interval_ms', 5) / 1000)
+            self.slowest_profiles = SlowestProfiles(
+                profiling_config.get('directory', 'data/profiles'),
+                keep=profiling_config.get('keep_slowest', 20)
+            )
+
+        # Buffers réutilisables: pages (partagés) et prétraitement des ROI (par thread)
+        self.page_pool = PagePool()
+        self.roi_buffers = BufferPool()
+
+        # Étages d'extraction (pipeline démarré à la demande)
+        self.stages = self._build_stages()
+        self.pipeline = None
+        self._pipeline_lock = threading.Lock()
+
+        # Modes de qualité dégradés sous charge (seuils dans api.degradation)
+        degradation_config = self.config['api'].get('degradation', {})
+        self.load_governor = None
+        if degradation_config.get('enabled', False):
+            # Seuils relatifs à la capacité réelle des files configurées
+            capacity = sum(stage.queue_size for stage in self.stages)
+            self.load_governor = LoadGovernor(
+                modes_from_config(degradation_config, capacity),
+                window=degradation_config.get('window', 200),
+                cooldown_seconds=degradation_config.get('cooldown_seconds', 10),
+                min_samples=degradation_config.get('min_samples', 20)
+            )
+
+        # Statistiques (fenêtres glissantes, agrégées entre workers)
+        self.metrics = metrics_from_config(self.config)
 
-    def _load_config(self, config_path: str) -> dict:
-        """Charger la configuration"""
-        with open(config_path, 'r', encoding='utf-8') as f:
-            return yaml.safe_load(f)
+        # Historique persistant des extractions (écriture par lots en arrière-plan)
+        self.history = history_from_config(self.config)
 
     def load_model(self, model_path: Optional[str] = None):
         """
@@ -68,6 +145,7 @@ class InvoiceExtractor:
 
         try:
             from ultralytics import YOLO
+            self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
             self.model = YOLO(model_path)
             self.model_version = Path(model_path).stem
             print(f"✅ Modèle chargé: {model_path} (device: {self.device})")
@@ -78,32 +156,41 @@ class InvoiceExtractor:
         """Vérifier si le modèle est chargé"""
         return self.model is not None
 
-    def pdf_to_image(self, pdf_path: str) -> np.ndarray:
+    def pdf_to_image(self, pdf_path: str, page_pool: Optional[PagePool] = None) -> np.ndarray:
         """
         Convertir la première page d'un PDF en image
 
         Args:
             pdf_path: Chemin vers le PDF
+            page_pool: Pool de buffers de page (défaut: nouveau tableau)
 
         Returns:
-            Image au format numpy array
+            Image BGR au format numpy array
         """
-        doc = fitz.open(pdf_path)
-        page = doc[0]  # Première page
+        return render_pdf_page(pdf_path, page_pool=page_pool)
 
-        # Convertir en image avec bonne résolution
-        pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))  # 2x zoom
-        img = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.h, pix.w, pix.n)
+    def _ocr_profile(self, label_name: str) -> str:
+        """
+        Profil OCR d'un label (configuration Tesseract)
 
-        # Convertir RGBA en RGB si nécessaire
-        if img.shape[2] == 4:
-            img = cv2.cvtColor(img, cv2.COLOR_RGBA2RGB)
+        Args:
+            label_name: Nom du label
 
-        doc.close()
-        return img
+        Returns:
+            Configuration Tesseract à utiliser
+        """
+        # Configuration Tesseract basée sur le type de champ
+        custom_config = r'--oem 3 --psm 6'  # PSM 6: assume a single uniform block of text
+
+        # Pour les nombres, optimiser la configuration
+        if any(label in label_name.lower() for label in ['montant', 'numero', 'tva']):
+            custom_config = r'--oem 3 --psm 7 -c tessedit_char_whitelist=0123456789.,-€$%'
+
+        return custom_config
 
     def _extract_text_from_bbox(self, image: np.ndarray, x1: float, y1: float,
-                                 x2: float, y2: float, label_name: str) -> str:
+                                 x2: float, y2: float, label_name: str,
+                                 denoise: bool = True) -> str:
         """
         Extraire le texte d'une région de l'image avec OCR
 
@@ -111,6 +198,7 @@ class InvoiceExtractor:
             image: Image complète au format numpy array
             x1, y1, x2, y2: Coordonnées du bounding box (en pixels)
             label_name: Nom du label pour optimiser l'OCR
+            denoise: Débruiter la ROI avant l'OCR (désactivé en mode dégradé)
 
         Returns:
             Texte extrait et nettoyé
@@ -126,34 +214,20 @@ class InvoiceExtractor:
 
             # Prétraitement de l'image pour améliorer l'OCR
             # Convertir en niveaux de gris
-            if len(roi.shape) == 3:
-                roi_gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
-            else:
-                roi_gray = roi
+            roi_gray = to_gray(roi, self.roi_buffers)
 
-            # Augmenter la taille pour améliorer la précision
-            scale_factor = 2
-            roi_resized = cv2.resize(roi_gray, None, fx=scale_factor, fy=scale_factor,
-                                    interpolation=cv2.INTER_CUBIC)
+            custom_config = self._ocr_profile(label_name)
 
-            # Améliorer le contraste
-            roi_enhanced = cv2.equalizeHist(roi_resized)
-
-            # Débruitage
-            roi_denoised = cv2.fastNlMeansDenoising(roi_enhanced)
-
-            # Binarisation adaptative pour améliorer la lisibilité
-            roi_binary = cv2.adaptiveThreshold(
-                roi_denoised, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                cv2.THRESH_BINARY, 11, 2
-            )
+            # Cache OCR: l'empreinte est calculée avant le débruitage (coûteux)
+            roi_hash = None
+            cache_profile = f"{label_name}|{custom_config}"
+            if self.ocr_cache is not None and label_name in self.ocr_cache_labels:
+                roi_hash = self.ocr_cache.fingerprint(roi_gray)
+                cached = self.ocr_cache.get(label_name, cache_profile, roi_hash)
+                if cached is not None:
+                    return cached
 
-            # Configuration Tesseract basée sur le type de champ
-            custom_config = r'--oem 3 --psm 6'  # PSM 6: assume a single uniform block of text
-
-            # Pour les nombres, optimiser la configuration
-            if any(label in label_name.lower() for label in ['montant', 'numero', 'tva']):
-                custom_config = r'--oem 3 --psm 7 -c tessedit_char_whitelist=0123456789.,-€$%'
+            roi_binary = preprocess_roi(roi_gray, self.roi_buffers, denoise=denoise)
 
             # Extraire le texte
             text = pytesseract.image_to_string(roi_binary, lang='fra+eng', config=custom_config)
@@ -175,116 +249,338 @@ class InvoiceExtractor:
                 # Essayer de normaliser le format de date
                 text = re.sub(r'[^\d/\-.]', '', text)
 
-            return text if text else ""
+            text = text if text else ""
+
+            # Seuls les résultats en qualité complète alimentent le cache
+            if roi_hash is not None and denoise:
+                self.ocr_cache.put(cache_profile, roi_hash, text)
+
+            return text
 
         except Exception as e:
             print(f"⚠️  Erreur OCR sur le champ {label_name}: {e}")
             return ""
 
-    def extract_from_file(self, file_path: str) -> InvoiceExtraction:
+    def _value_from_registry(self, image: np.ndarray, x1: float, y1: float,
+                             x2: float, y2: float, label_name: str,
+                             supplier: Dict[str, str]) -> Optional[str]:
         """
-        Extraire les données d'une facture
+        Valeur d'un champ fournisseur depuis le registre
 
-        Args:
-            file_path: Chemin vers le fichier (PDF ou image)
+        En mode "verify", un OCR rapide (sans débruitage) doit confirmer la
+        valeur du registre; sinon l'OCR complet reprend la main.
 
         Returns:
-            Données extraites
+            Valeur du registre, ou None si le champ doit être OCRisé
         """
-        if not self.is_model_loaded():
-            raise RuntimeError("Modèle non chargé. Appelez load_model() d'abord.")
+        key = REGISTRY_FIELDS.get(label_name)
+        if key is None or not supplier.get(key):
+            return None
+
+        expected = supplier[key]
+        if self.registry_mode != 'verify':
+            return expected
+
+        roi = image[int(y1):int(y2), int(x1):int(x2)]
+        if roi.size == 0:
+            return None
+        roi = to_gray(roi, self.roi_buffers)
+
+        try:
+            text = pytesseract.image_to_string(roi, lang='fra+eng', config=r'--oem 3 --psm 6')
+        except Exception as e:
+            print(f"⚠️  Erreur OCR de vérification sur le champ {label_name}: {e}")
+            return None
+
+        def _norm(value: str) -> str:
+            return re.sub(r'\s+', ' ', value).strip().lower()
+
+        similarity = SequenceMatcher(None, _norm(text), _norm(expected)).ratio()
+        return expected if similarity >= self.registry_min_similarity else None
 
-        # Charger l'image
-        file_extension = Path(file_path).suffix.lower()
+    # ============================================
+    # Étages du pipeline d'extraction
+    # ============================================
+
+    def _stage_decode(self, ctx: DocumentContext):
+        """Étage 1: charger l'image de la page"""
+        file_extension = Path(ctx.file_path).suffix.lower()
+        if self.history is not None:
+            ctx.sha256 = file_sha256(ctx.file_path)
 
         if file_extension == '.pdf':
-            image = self.pdf_to_image(file_path)
+            image = self.pdf_to_image(ctx.file_path, page_pool=self.page_pool)
+            ctx.on_close(lambda: self.page_pool.release(image))
+            ctx.image = image
         else:
-            image = cv2.imread(file_path)
-            if image is None:
-                raise ValueError(f"Impossible de lire l'image: {file_path}")
-
-        # Prédiction
-        results = self.model(image, verbose=False)[0]
+            # cv2.imread renvoie déjà du BGR (format canonique)
+            ctx.image = cv2.imread(ctx.file_path, cv2.IMREAD_COLOR)
+            if ctx.image is None:
+                raise ValueError(f"Impossible de lire l'image: {ctx.file_path}")
 
-        # Extraire les champs
-        fields = []
-        confidences = []
-
-        for box in results.boxes:
-            # Coordonnées normalisées (0-1)
-            x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-            h, w = image.shape[:2]
-
-            bbox = BoundingBox(
-                x=float(x1 / w),
-                y=float(y1 / h),
-                width=float((x2 - x1) / w),
-                height=float((y2 - y1) / h)
-            )
+    def _stage_detect(self, ctx: DocumentContext):
+        """Étage 2: détection des champs par le modèle YOLO"""
+        if not self.is_model_loaded():
+            raise RuntimeError("Modèle non chargé. Appelez load_model() d'abord.")
 
-            confidence = float(box.conf[0])
-            class_id = int(box.cls[0])
-            label_name = results.names[class_id]
+        # Mode dégradé: détection à plus faible résolution
+        quality = ctx.quality or FULL
+        options = {'imgsz': quality.imgsz} if quality.imgsz else {}
+
+        results = self.model(ctx.image, verbose=False, **options)[0]
+        ctx.detections = Detections.from_results(results)
+        ctx.labels = ctx.detections.labels()
+
+    def _stage_ocr(self, ctx: DocumentContext):
+        """Étage 3: OCR des champs détectés"""
+        xyxy = ctx.detections.xyxy
+        quality = ctx.quality or FULL
+        denoise = not quality.skip_denoise
+
+        # Labels non OCRisés dans le mode de qualité courant (différés)
+        for i, label_name in enumerate(ctx.labels):
+            if not quality.should_ocr(label_name):
+                ctx.values[i] = ""
+                if label_name not in ctx.deferred:
+                    ctx.deferred.append(label_name)
+
+        # Lire le SIRET en premier: s'il est connu du registre fournisseurs,
+        # le nom et l'adresse n'ont pas besoin d'être OCRisés
+        supplier = None
+        for i, label_name in enumerate(ctx.labels):
+            if label_name != 'siret_fournisseur' or i in ctx.values:
+                continue
+            x1, y1, x2, y2 = xyxy[i]
+            ctx.values[i] = self._extract_text_from_bbox(ctx.image, x1, y1, x2, y2, label_name, denoise)
+            if supplier is None and self.supplier_registry is not None:
+                supplier = self.supplier_registry.lookup(ctx.values[i], fuzzy=self.registry_fuzzy)
+                # Un SIRET lu valide n'est jamais remplacé, seule une lecture erronée est corrigée
+                if supplier is not None and not is_valid_siret(normalize_siret(ctx.values[i])):
+                    ctx.values[i] = supplier['siret']
+
+        for i, label_name in enumerate(ctx.labels):
+            if i in ctx.values:
+                continue
+
+            x1, y1, x2, y2 = xyxy[i]
+
+            value = None
+            if supplier is not None:
+                value = self._value_from_registry(ctx.image, x1, y1, x2, y2, label_name, supplier)
 
             # Extraire le texte avec OCR
-            value = self._extract_text_from_bbox(
-                image, x1, y1, x2, y2, label_name
-            )
+            if value is None:
+                value = self._extract_text_from_bbox(
+                    ctx.image, x1, y1, x2, y2, label_name, denoise
+                )
+
+            ctx.values[i] = value
+
+    def _stage_assemble(self, ctx: DocumentContext):
+        """Étage 4: normaliser les boîtes et calculer la confiance globale"""
+        h, w = ctx.image.shape[:2]
+
+        # Coordonnées normalisées (0-1), pour toutes les boîtes à la fois
+        ctx.boxes = ctx.detections.normalized(w, h)
+
+        # Calculer la confiance moyenne
+        conf = ctx.detections.conf
+        ctx.overall_confidence = float(conf.mean()) if len(conf) else 0.0
+        ctx.needs_review = ctx.overall_confidence < self.confidence_threshold
+
+    def to_extraction(self, ctx: DocumentContext) -> InvoiceExtraction:
+        """
+        Construire le résultat pydantic d'un document traité
+
+        Seul endroit où les objets pydantic sont créés (frontière de l'API).
+        Les valeurs sont produites par les étages et déjà typées: les
+        modèles sont construits sans revalidation (model_construct).
+        """
+        # Latence de bout en bout (file d'attente comprise) pour le choix du mode
+        total = time.perf_counter() - ctx.submitted_at
+        if self.load_governor is not None:
+            self.load_governor.record_latency(total)
+        if ctx.profile is not None:
+            self.slowest_profiles.offer(ctx.profile, total, ctx.timings)
+
+        deferred = set(ctx.deferred)
+        fields = []
+        for i, (label_name, confidence, box) in enumerate(
+                zip(ctx.labels, ctx.detections.conf.tolist(), ctx.boxes.tolist())):
+            bbox = BoundingBox.model_construct(x=box[0], y=box[1], width=box[2], height=box[3])
 
             # Si l'OCR n'a rien extrait, marquer comme vide
-            if not value:
-                value = "[Non détecté]"
+            if label_name in deferred:
+                value = "[Différé]"
+            else:
+                value = ctx.values.get(i) or "[Non détecté]"
 
-            field = ExtractedField(
+            fields.append(ExtractedField.model_construct(
                 label=label_name,
                 value=value,
                 confidence=confidence,
                 bbox=bbox
-            )
+            ))
+
+        ctx.extraction = InvoiceExtraction.model_construct(
+            filename=ctx.filename,
+            fields=fields,
+            overall_confidence=ctx.overall_confidence,
+            needs_review=bool(ctx.needs_review),
+            model_version=self.model_version,
+            quality_mode=(ctx.quality or FULL).name,
+            deferred_fields=list(ctx.deferred)
+        )
+        ctx.extraction._stage_timings = {
+            **ctx.timings,
+            'queue': max(0.0, total - sum(ctx.timings.values())),
+            'total': total
+        }
+        self.metrics.record_extraction(ctx.overall_confidence, bool(ctx.needs_review), total)
+        if self.history is not None:
+            self.history.record(ctx.extraction, ctx.sha256, ctx.extraction._stage_timings)
+        return ctx.extraction
+
+    def _build_stages(self) -> List[Stage]:
+        """Étages par défaut, configurés depuis api.pipeline dans settings.yaml"""
+        pipeline_config = self.config['api'].get('pipeline', {})
+        defaults = {
+            'decode': (self._stage_decode, 2, 8),
+            'detect': (self._stage_detect, 1, 4),
+            'ocr': (self._stage_ocr, 4, 8),
+            'assemble': (self._stage_assemble, 1, 8)
+        }
 
-            fields.append(field)
-            confidences.append(confidence)
+        stages = []
+        for name, (func, workers, queue_size) in defaults.items():
+            stage_config = pipeline_config.get(name, {})
+            stages.append(Stage(
+                name, func,
+                workers=stage_config.get('workers', workers),
+                queue_size=stage_config.get('queue_size', queue_size)
+            ))
+        return stages
+
+    def add_stage(self, stage: Stage, after: Optional[str] = None):
+        """
+        Insérer un étage supplémentaire (lecture de la couche texte, cache, validation...)
 
-        # Calculer la confiance moyenne
-        overall_confidence = np.mean(confidences) if confidences else 0.0
-        needs_review = overall_confidence < self.confidence_threshold
+        Args:
+            stage: Étage à insérer
+            after: Nom de l'étage après lequel l'insérer (défaut: en dernier)
+        """
+        if self.pipeline is not None:
+            raise RuntimeError("Impossible d'ajouter un étage: le pipeline est déjà démarré")
 
-        # Mettre à jour les stats
-        self._update_stats(overall_confidence)
+        if after is None:
+            self.stages.append(stage)
+            return
 
-        return InvoiceExtraction(
-            filename=Path(file_path).name,
-            fields=fields,
-            overall_confidence=float(overall_confidence),
-            needs_review=needs_review,
-            model_version=self.model_version
-        )
+        names = [s.name for s in self.stages]
+        if after not in names:
+            raise ValueError(f"Étage inconnu: {after}")
+        self.stages.insert(names.index(after) + 1, stage)
+
+    def extract_from_file(self, file_path: str, filename: Optional[str] = None) -> InvoiceExtraction:
+        """
+        Extraire les données d'une facture
 
-    def _update_stats(self, confidence: float):
-        """Mettre à jour les statistiques"""
-        today = datetime.now().date()
+        Les étages sont exécutés en séquence dans le thread appelant.
+        Pour traiter plusieurs documents en parallèle, utiliser submit().
 
-        # Reset des stats journalières si nouveau jour
-        if today != self.stats['last_reset']:
-            self.stats['extractions_today'] = 0
-            self.stats['last_reset'] = today
+        Args:
+            file_path: Chemin vers le fichier (PDF ou image)
+            filename: Nom à reporter dans le résultat (défaut: nom du fichier)
+
+        Returns:
+            Données extraites
+        """
+        if not self.is_model_loaded():
+            raise RuntimeError("Modèle non chargé. Appelez load_model() d'abord.")
+
+        ctx = self._new_context(file_path, filename)
+        try:
+            run_stages(self.stages, ctx)
+        except Exception:
+            self.metrics.record_error()
+            raise
+        finally:
+            ctx.close()
+        return self.to_extraction(ctx)
+
+    def submit(self, file_path: str, filename: Optional[str] = None, block: bool = True) -> Future:
+        """
+        Soumettre une facture au pipeline d'extraction
 
-        self.stats['total_extractions'] += 1
-        self.stats['total_confidence'] += confidence
-        self.stats['extractions_today'] += 1
+        Les documents se chevauchent entre étages: pendant qu'un document
+        est en OCR, le suivant est déjà en détection.
+
+        Args:
+            file_path: Chemin vers le fichier (PDF ou image)
+            filename: Nom à reporter dans le résultat (défaut: nom du fichier)
+            block: Attendre une place dans la file de décodage (False: lever PipelineFull)
+
+        Returns:
+            Future résolue avec l'InvoiceExtraction
+        """
+        if not self.is_model_loaded():
+            raise RuntimeError("Modèle non chargé. Appelez load_model() d'abord.")
+
+        pipeline = self.get_pipeline()
+        future = pipeline.submit(self._new_context(file_path, filename), block=block)
+        future.add_done_callback(self._record_failure)
+        return future
+
+    def _record_failure(self, future: Future):
+        """Compter les documents en échec dans le pipeline"""
+        if not future.cancelled() and future.exception() is not None:
+            self.metrics.record_error()
+
+    def _new_context(self, file_path: str, filename: Optional[str] = None) -> DocumentContext:
+        """Contexte d'un nouveau document, avec le mode de qualité adapté à la charge"""
+        ctx = DocumentContext(file_path, filename)
+        if self.load_governor is not None:
+            ctx.quality = self.load_governor.select(self.pending_documents())
+        if self.profile_every:
+            self._profile_counter += 1
+            if self._profile_counter % self.profile_every == 0:
+                ctx.profile = RequestProfile(ctx.filename)
+        return ctx
+
+    def pending_documents(self) -> int:
+        """Nombre de documents en attente dans les files du pipeline"""
+        if self.pipeline is None:
+            return 0
+        return sum(self.pipeline.queue_depths().values())
+
+    def get_pipeline(self) -> Pipeline:
+        """Pipeline multi-étages (démarré au premier appel)"""
+        with self._pipeline_lock:
+            if self.pipeline is None:
+                self.pipeline = Pipeline(self.stages, output=self.to_extraction)
+                self.pipeline.start()
+            return self.pipeline
+
+    def shutdown(self):
+        """Arrêter le pipeline après traitement des documents en cours"""
+        with self._pipeline_lock:
+            if self.pipeline is not None:
+                self.pipeline.shutdown()
+                self.pipeline = None
+        self.metrics.close()
+        if self.history is not None:
+            self.history.close()
 
     def get_stats(self) -> Dict:
         """Obtenir les statistiques"""
-        avg_confidence = (
-            self.stats['total_confidence'] / self.stats['total_extractions']
-            if self.stats['total_extractions'] > 0 else 0.0
-        )
-
+        stats = self.metrics.get_stats()
+        # Totaux depuis l'historique (persistants), sinon depuis les compteurs
+        totals = self.history.totals() if self.history is not None else stats['total']
         return {
-            'total_extractions': self.stats['total_extractions'],
-            'average_confidence': avg_confidence,
-            'extractions_last_24h': self.stats['extractions_today'],
+            'total_extractions': totals['extractions'],
+            'average_confidence': totals['average_confidence'],
+            'extractions_last_24h': stats['24h']['extractions'],
             'model_version': self.model_version,
-            'success_rate': 0.95  # TODO: Calculer basé sur le feedback
+            'success_rate': stats['24h']['success_rate'] or 0.0,
+            'workers': stats['workers']
         }
@@ -0,0 +1,524 @@
+"""
+File durable d'envoi des extractions à revoir vers Label Studio
+
+/extract ne contacte jamais Label Studio: les documents dont la
+confiance est sous le seuil sont copiés localement et inscrits dans une
+file SQLite, après l'envoi de la réponse. Un thread de fond les importe
+par lots dans le projet configuré, avec leurs boîtes prédites:
+    - débit limité (max_requests_per_minute, Retry-After respecté)
+    - nouvelles tentatives avec délai exponentiel, puis abandon ('failed')
+    - la file survit aux redémarrages; plusieurs workers peuvent la
+      vider en parallèle (réservation des lots avec bail)
+
+Avec l'apprentissage actif (api/active_learning.py), les documents sont
+d'abord inscrits comme candidats ('candidate'): seuls ceux retenus par
+le sélecteur dans le budget du jour passent en attente d'envoi.
+
+Vider la file à la main ou relancer les échecs:
+    python -m api.feedback
+    python -m api.feedback --retry-failed
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .label_studio import (
+    LabelStudioClient,
+    LabelStudioError,
+    client_from_config,
+    image_data_url,
+    prediction_from_extraction
+)
+
+
+# Scores de l'apprentissage actif, calculés une fois par document
+SCORE_COLUMNS = {
+    'uncertainty': 'REAL',
+    'uncertain_labels': 'TEXT',
+    'fingerprint': 'TEXT',
+    'score': 'REAL',
+    'selected_at': 'REAL',
+}
+
+
+class FeedbackQueue:
+    """File locale (SQLite + fichiers) des documents à envoyer en revue"""
+
+    def __init__(self, db_path: str, spool_dir: str, client: LabelStudioClient,
+                 batch_size: int = 20, flush_interval: float = 10.0, max_attempts: int = 8,
+                 backoff_seconds: float = 30.0, max_backoff_seconds: float = 3600.0,
+                 lease_seconds: float = 300.0):
+        """
+        Args:
+            db_path: Base SQLite de la file
+            spool_dir: Copies des fichiers en attente d'envoi
+            client: Client Label Studio
+            batch_size: Documents par import
+            flush_interval: Intervalle entre deux passages du thread d'envoi (secondes)
+            max_attempts: Tentatives avant abandon
+            backoff_seconds: Délai avant la première nouvelle tentative (doublé ensuite)
+            max_backoff_seconds: Délai maximal entre deux tentatives
+            lease_seconds: Durée de réservation d'un lot (reprise après arrêt brutal)
+        """
+        self.db_path = Path(db_path)
+        self.spool_dir = Path(spool_dir)
+        self.client = client
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.lease_seconds = lease_seconds
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False,
+                                     timeout=10, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS feedback_queue (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    sha256 TEXT NOT NULL UNIQUE,
+                    file TEXT NOT NULL,
+                    filename TEXT NOT NULL,
+                    extraction TEXT NOT NULL,
+                    queued_at REAL NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt_at REAL NOT NULL DEFAULT 0,
+                    claimed_at REAL,
+                    sent_at REAL,
+                    task_id INTEGER,
+                    last_error TEXT
+                )
+            """)
+            # Colonnes de l'apprentissage actif (bases créées avant leur ajout)
+            columns = {row['name'] for row in self._conn.execute("PRAGMA table_info(feedback_queue)")}
+            for name, kind in SCORE_COLUMNS.items():
+                if name not in columns:
+                    self._conn.execute(f"ALTER TABLE feedback_queue ADD COLUMN {name} {kind}")
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_feedback_due ON feedback_queue (status, next_attempt_at)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_feedback_selected ON feedback_queue (selected_at)"
+            )
+
+    # ----- Mise en file (chemin de la requête, après la réponse) -----
+
+    def enqueue(self, content: bytes, extension: str, filename: str, extraction,
+                candidate: bool = False) -> bool:
+        """
+        Inscrire un document à revoir
+
+        Args:
+            content: Contenu du fichier reçu
+            extension: Extension (.pdf, .png...)
+            filename: Nom d'origine
+            extraction: InvoiceExtraction renvoyée au client
+            candidate: Envoi soumis au sélecteur d'apprentissage actif
+
+        Returns:
+            False si ce document est déjà dans la file (même contenu)
+        """
+        sha256 = hashlib.sha256(content).hexdigest()
+        file_path = self.spool_dir / f"{sha256}{extension.lower()}"
+        if not file_path.exists():
+            tmp = file_path.with_name(f".{file_path.name}.tmp")
+            tmp.write_bytes(content)
+            os.replace(tmp, file_path)
+
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO feedback_queue (sha256, file, filename, extraction, queued_at, status) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (sha256, file_path.name, filename, extraction.model_dump_json(), time.time(),
+                 'candidate' if candidate else 'pending')
+            )
+        return cursor.rowcount == 1
+
+    @contextmanager
+    def _transaction(self):
+        """Transaction explicite (connexion en autocommit), sous self._lock"""
+        self._conn.execute("BEGIN")
+        try:
+            yield
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    # ----- Envoi -----
+
+    def _claim(self, now: float) -> List[sqlite3.Row]:
+        """Réserver le prochain lot de documents à envoyer"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Lots réservés par un worker arrêté brutalement
+                self._conn.execute(
+                    "UPDATE feedback_queue SET status = 'pending' WHERE status = 'sending' AND claimed_at < ?",
+                    (now - self.lease_seconds,)
+                )
+                rows = self._conn.execute(
+                    "SELECT * FROM feedback_queue WHERE status = 'pending' AND next_attempt_at <= ? "
+                    "ORDER BY id LIMIT ?",
+                    (now, self.batch_size)
+                ).fetchall()
+                if rows:
+                    self._conn.executemany(
+                        "UPDATE feedback_queue SET status = 'sending', claimed_at = ? WHERE id = ?",
+                        [(now, row['id']) for row in rows]
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return rows
+
+    def _task(self, row: sqlite3.Row) -> Dict:
+        """Tâche Label Studio d'un document de la file"""
+        extraction = json.loads(row['extraction'])
+        return {
+            'data': {
+                'image': image_data_url(str(self.spool_dir / row['file'])),
+                'filename': row['filename'],
+                'sha256': row['sha256'],  # Clé de réconciliation après un envoi incertain
+                'source': 'feedback_loop',
+                'overall_confidence': extraction['overall_confidence']
+            },
+            'meta': {
+                'sha256': row['sha256'],
+                'quality_mode': extraction.get('quality_mode', 'full'),
+                'active_learning_score': row['score'],
+                'uncertain_labels': json.loads(row['uncertain_labels'] or '[]')
+            },
+            'predictions': [prediction_from_extraction(extraction)]
+        }
+
+    def _retry_later(self, rows: List[sqlite3.Row], error: str, retryable: bool,
+                     retry_after: Optional[float], now: float):
+        updates = []
+        for row in rows:
+            attempts = row['attempts'] + 1
+            if not retryable or attempts >= self.max_attempts:
+                updates.append(('failed', attempts, now, error, row['id']))
+            else:
+                delay = min(self.max_backoff_seconds, self.backoff_seconds * 2 ** (attempts - 1))
+                updates.append(('pending', attempts, now + max(delay, retry_after or 0), error, row['id']))
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE feedback_queue SET status = ?, attempts = ?, next_attempt_at = ?, "
+                "last_error = ?, claimed_at = NULL WHERE id = ?",
+                updates
+            )
+
+    def send_batch(self) -> int:
+        """
+        Envoyer un lot de documents dus
+
+        Returns:
+            Nombre de documents importés dans Label Studio
+        """
+        return self._send_batch()[1]
+
+    def _reconcile(self, rows: List[sqlite3.Row]) -> List[sqlite3.Row]:
+        """
+        Marquer envoyés les documents déjà présents dans Label Studio
+
+        L'import n'est pas idempotent: un envoi précédent (délai dépassé, 5xx,
+        réponse illisible, worker arrêté pendant l'appel) a pu être appliqué.
+        Ces documents sont retrouvés par data.sha256 au lieu d'être renvoyés.
+
+        Returns:
+            Documents restant à envoyer
+        """
+        # Déjà tentés, ou réservés par un worker arrêté brutalement
+        uncertain = [row for row in rows if row['attempts'] > 0 or row['claimed_at'] is not None]
+        if not uncertain:
+            return rows
+        existing = self.client.tasks_by_data('sha256', [row['sha256'] for row in uncertain])
+        if not existing:
+            return rows
+        done = [row for row in rows if row['sha256'] in existing]
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE feedback_queue SET status = 'sent', sent_at = ?, task_id = ?, last_error = NULL "
+                "WHERE id = ?",
+                [(time.time(), existing[row['sha256']], row['id']) for row in done]
+            )
+        for row in done:
+            self._remove_file(row['file'])
+        return [row for row in rows if row['sha256'] not in existing]
+
+    def _send_batch(self) -> tuple:
+        """Envoyer un lot; renvoie (documents réservés, documents importés)"""
+        now = time.time()
+        rows = self._claim(now)
+        if not rows:
+            return 0, 0
+
+        try:
+            pending = self._reconcile(rows)
+        except LabelStudioError as e:
+            self._retry_later(rows, str(e), e.retryable, e.retry_after, now)
+            raise
+        reconciled = len(rows) - len(pending)
+
+        tasks, ready = [], []
+        for row in pending:
+            try:
+                tasks.append(self._task(row))
+                ready.append(row)
+            except Exception as e:
+                # Fichier illisible: inutile de réessayer
+                self._retry_later([row], f"Préparation impossible: {e}", False, None, now)
+
+        if not tasks:
+            return len(rows), reconciled
+        try:
+            task_ids = self.client.import_tasks(tasks)
+        except LabelStudioError as e:
+            self._retry_later(ready, str(e), e.retryable, e.retry_after, now)
+            raise
+
+        if len(task_ids) != len(ready):
+            task_ids = [None] * len(ready)
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE feedback_queue SET status = 'sent', sent_at = ?, task_id = ?, "
+                "attempts = attempts + 1, last_error = NULL WHERE id = ?",
+                [(time.time(), task_id, row['id']) for row, task_id in zip(ready, task_ids)]
+            )
+        for row in ready:
+            self._remove_file(row['file'])
+        return len(rows), reconciled + len(ready)
+
+    def _remove_file(self, file_name: str):
+        with self._lock:
+            still_needed = self._conn.execute(
+                "SELECT 1 FROM feedback_queue WHERE file = ? AND status NOT IN ('sent', 'expired') LIMIT 1",
+                (file_name,)
+            ).fetchone()
+        if not still_needed:
+            try:
+                os.unlink(self.spool_dir / file_name)
+            except FileNotFoundError:
+                pass
+
+    def flush(self) -> int:
+        """
+        Envoyer tous les documents dus (arrêt au premier échec)
+
+        Returns:
+            Nombre de documents importés
+        """
+        sent = 0
+        while not self._stop.is_set():
+            try:
+                claimed, count = self._send_batch()
+            except LabelStudioError as e:
+                print(f"⚠️  Envoi vers Label Studio reporté: {e}")
+                break
+            # Un lot entièrement illisible n'arrête pas l'envoi des suivants
+            if not claimed:
+                break
+            sent += count
+        return sent
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                print(f"⚠️  File de feedback indisponible: {e}")
+            except Exception as e:
+                # Le thread d'envoi doit survivre: les documents restent en file
+                print(f"⚠️  Envoi du feedback interrompu: {type(e).__name__}: {e}")
+
+    def start(self):
+        """Démarrer le thread d'envoi"""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="feedback-sender", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Arrêter le thread d'envoi (les documents restent en file)"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.client.timeout + 5)
+            self._thread = None
+
+    def make_due(self) -> int:
+        """Rendre dus tout de suite les documents en attente d'une nouvelle tentative"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE feedback_queue SET next_attempt_at = 0 WHERE status = 'pending' AND next_attempt_at > 0"
+            )
+        return cursor.rowcount
+
+    def retry_failed(self) -> int:
+        """Remettre en file les documents abandonnés"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE feedback_queue SET status = 'pending', attempts = 0, next_attempt_at = 0 "
+                "WHERE status = 'failed'"
+            )
+        return cursor.rowcount
+
+    # ----- Candidats (apprentissage actif) -----
+
+    def unscored_candidates(self, limit: int = 1000) -> List[sqlite3.Row]:
+        """Candidats pas encore notés (notation incrémentale)"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, extraction FROM feedback_queue WHERE status = 'candidate' AND uncertainty IS NULL "
+                "ORDER BY id LIMIT ?", (limit,)
+            ).fetchall()
+
+    def set_scores(self, scores: List[tuple]):
+        """Enregistrer (incertitude, labels incertains, empreinte de mise en page, id)"""
+        with self._lock, self._transaction():
+            self._conn.executemany(
+                "UPDATE feedback_queue SET uncertainty = ?, uncertain_labels = ?, fingerprint = ? WHERE id = ?",
+                scores
+            )
+
+    def scored_candidates(self) -> List[sqlite3.Row]:
+        """Candidats notés, en attente de sélection"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, sha256, filename, uncertainty, fingerprint FROM feedback_queue "
+                "WHERE status = 'candidate' AND uncertainty IS NOT NULL"
+            ).fetchall()
+
+    def selected_fingerprints(self, since: float = 0) -> List[str]:
+        """Empreintes des documents déjà retenus (diversité du lot)"""
+        with self._lock:
+            return [row[0] for row in self._conn.execute(
+                "SELECT fingerprint FROM feedback_queue WHERE selected_at >= ? AND fingerprint IS NOT NULL",
+                (since,)
+            )]
+
+    def selected_count(self, since: float) -> int:
+        """Documents retenus depuis `since` (consommation du budget)"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM feedback_queue WHERE selected_at >= ?", (since,)
+            ).fetchone()[0]
+
+    def promote(self, selections: List[tuple]):
+        """Passer des candidats en attente d'envoi: liste de (score, id)"""
+        now = time.time()
+        with self._lock, self._transaction():
+            self._conn.executemany(
+                "UPDATE feedback_queue SET status = 'pending', score = ?, selected_at = ?, next_attempt_at = 0 "
+                "WHERE id = ? AND status = 'candidate'",
+                [(score, now, row_id) for score, row_id in selections]
+            )
+
+    def expire_candidates(self, older_than: float) -> int:
+        """Oublier les candidats jamais retenus (et leurs fichiers)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, file FROM feedback_queue WHERE status = 'candidate' AND queued_at < ?", (older_than,)
+            ).fetchall()
+            with self._transaction():
+                self._conn.executemany(
+                    "UPDATE feedback_queue SET status = 'expired' WHERE id = ?", [(row['id'],) for row in rows]
+                )
+        for row in rows:
+            self._remove_file(row['file'])
+        return len(rows)
+
+    def get_stats(self) -> Dict:
+        """Documents par statut, ancienneté du plus ancien en attente, dernière erreur"""
+        with self._lock:
+            counts = dict(self._conn.execute(
+                "SELECT status, COUNT(*) FROM feedback_queue GROUP BY status"
+            ).fetchall())
+            oldest = self._conn.execute(
+                "SELECT MIN(queued_at) FROM feedback_queue WHERE status IN ('pending', 'sending')"
+            ).fetchone()[0]
+            last_error = self._conn.execute(
+                "SELECT last_error FROM feedback_queue WHERE last_error IS NOT NULL "
+                "ORDER BY next_attempt_at DESC LIMIT 1"
+            ).fetchone()
+        return {
+            'candidates': counts.get('candidate', 0),
+            'pending': counts.get('pending', 0) + counts.get('sending', 0),
+            'sent': counts.get('sent', 0),
+            'failed': counts.get('failed', 0),
+            'oldest_pending_seconds': time.time() - oldest if oldest else None,
+            'last_error': last_error[0] if last_error else None
+        }
+
+    def close(self):
+        self.stop()
+        with self._lock:
+            self._conn.close()
+
+
+def queue_from_config(config: Dict) -> FeedbackQueue:
+    """FeedbackQueue configurée depuis api.feedback_loop (settings.yaml)"""
+    feedback_config = config['api']['feedback_loop']
+    return FeedbackQueue(
+        feedback_config.get('queue_database', 'data/feedback/queue.db'),
+        feedback_config.get('spool_directory', 'data/feedback/files'),
+        client_from_config(config, feedback_config.get('max_requests_per_minute', 30)),
+        batch_size=feedback_config.get('batch_size', 20),
+        flush_interval=feedback_config.get('flush_interval', 10),
+        max_attempts=feedback_config.get('max_attempts', 8),
+        backoff_seconds=feedback_config.get('backoff_seconds', 30)
+    )
+
+
+def main(argv: Optional[List[str]] = None):
+    """Point d'entrée: python -m api.feedback"""
+    from .config import get_config
+
+    parser = argparse.ArgumentParser(
+        prog="python -m api.feedback",
+        description="Vider la file d'envoi des extractions à revoir vers Label Studio"
+    )
+    parser.add_argument('--config', help="Configuration (settings.yaml)")
+    parser.add_argument('--retry-failed', action='store_true', help="Relancer les documents abandonnés")
+    parser.add_argument('--stats', action='store_true', help="Afficher l'état de la file sans envoyer")
+    args = parser.parse_args(argv)
+
+    queue = queue_from_config(get_config(args.config))
+    if args.retry_failed:
+        print(f"🔁 {queue.retry_failed()} documents remis en file")
+
+    if not args.stats:
+        # Lancement manuel: ne pas attendre les délais, ni ceux déjà programmés
+        queue.backoff_seconds = 0
+        queue.make_due()
+        sent = queue.flush()
+        print(f"📤 {sent} documents envoyés vers Label Studio")
+
+    stats = queue.get_stats()
+    print(f"📊 En attente: {stats['pending']}, envoyés: {stats['sent']}, abandonnés: {stats['failed']}")
+    if stats['last_error']:
+        print(f"   Dernière erreur: {stats['last_error']}")
+    queue.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,412 @@
+"""
+Historique persistant des extractions (SQLite, mode WAL)
+
+Chaque InvoiceExtraction est conservée: empreinte du document, valeurs,
+confiances et boîtes par champ, durées par étage, version du modèle.
+L'écriture est asynchrone: les résultats sont mis en file et écrits par
+lots dans une seule transaction par un thread dédié, hors du chemin des
+requêtes. Plusieurs workers peuvent écrire dans la même base.
+
+Tables:
+    extractions   un document extrait (index: date, fournisseur, confiance, empreinte)
+    fields        un champ extrait (index: label + confiance, label + date)
+    daily         agrégats par jour et par modèle, tenus à jour à l'écriture:
+                  /stats et le dashboard n'ont pas à parcourir l'historique
+    label_daily   agrégats par jour et par label (confiance, champs sans texte)
+    supplier_daily agrégats par jour et par fournisseur
+"""
+import hashlib
+import json
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS extractions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sha256 TEXT,
+    filename TEXT NOT NULL,
+    extracted_at REAL NOT NULL,
+    day TEXT NOT NULL,
+    model_version TEXT NOT NULL,
+    overall_confidence REAL NOT NULL,
+    needs_review INTEGER NOT NULL,
+    quality_mode TEXT NOT NULL,
+    supplier TEXT,
+    siret TEXT,
+    total_ms REAL,
+    timings TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_extractions_time ON extractions (extracted_at);
+CREATE INDEX IF NOT EXISTS idx_extractions_supplier ON extractions (supplier, extracted_at);
+CREATE INDEX IF NOT EXISTS idx_extractions_siret ON extractions (siret);
+CREATE INDEX IF NOT EXISTS idx_extractions_confidence ON extractions (overall_confidence);
+CREATE INDEX IF NOT EXISTS idx_extractions_sha256 ON extractions (sha256);
+
+CREATE TABLE IF NOT EXISTS fields (
+    extraction_id INTEGER NOT NULL REFERENCES extractions (id),
+    extracted_at REAL NOT NULL,
+    label TEXT NOT NULL,
+    value TEXT NOT NULL,
+    confidence REAL NOT NULL,
+    x REAL NOT NULL,
+    y REAL NOT NULL,
+    width REAL NOT NULL,
+    height REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_fields_extraction ON fields (extraction_id);
+CREATE INDEX IF NOT EXISTS idx_fields_label_confidence ON fields (label, confidence);
+CREATE INDEX IF NOT EXISTS idx_fields_label_time ON fields (label, extracted_at);
+
+CREATE TABLE IF NOT EXISTS daily (
+    day TEXT NOT NULL,
+    model_version TEXT NOT NULL,
+    extractions INTEGER NOT NULL DEFAULT 0,
+    needs_review INTEGER NOT NULL DEFAULT 0,
+    confidence_sum REAL NOT NULL DEFAULT 0,
+    total_ms_sum REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, model_version)
+);
+
+CREATE TABLE IF NOT EXISTS label_daily (
+    day TEXT NOT NULL,
+    label TEXT NOT NULL,
+    fields INTEGER NOT NULL DEFAULT 0,
+    missing INTEGER NOT NULL DEFAULT 0,
+    confidence_sum REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, label)
+);
+
+CREATE TABLE IF NOT EXISTS supplier_daily (
+    day TEXT NOT NULL,
+    supplier TEXT NOT NULL,
+    extractions INTEGER NOT NULL DEFAULT 0,
+    needs_review INTEGER NOT NULL DEFAULT 0,
+    confidence_sum REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, supplier)
+);
+"""
+
+# Valeurs de remplacement de l'extracteur (champ sans texte lu)
+MISSING_VALUES = ("[Non détecté]", "[Différé]")
+
+# Bases antérieures aux agrégats par label et par fournisseur: calcul unique
+BACKFILL_LABELS = (
+    "INSERT INTO label_daily (day, label, fields, missing, confidence_sum) "
+    f"SELECT e.day, f.label, COUNT(*), SUM(f.value IN ({', '.join('?' for _ in MISSING_VALUES)})), "
+    "SUM(f.confidence) "
+    "FROM fields f JOIN extractions e ON e.id = f.extraction_id GROUP BY e.day, f.label"
+)
+BACKFILL_SUPPLIERS = (
+    "INSERT INTO supplier_daily (day, supplier, extractions, needs_review, confidence_sum) "
+    "SELECT day, supplier, COUNT(*), SUM(needs_review), SUM(overall_confidence) "
+    "FROM extractions WHERE supplier IS NOT NULL GROUP BY day, supplier"
+)
+
+
+def file_sha256(file_path: str) -> str:
+    """Empreinte SHA-256 d'un fichier (lu par blocs)"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class HistoryStore:
+    """Historique des extractions: écriture par lots en arrière-plan, requêtes indexées"""
+
+    def __init__(self, db_path: str, batch_size: int = 100, flush_interval: float = 1.0,
+                 max_pending: int = 10000):
+        """
+        Args:
+            db_path: Base SQLite
+            batch_size: Extractions écrites par transaction
+            flush_interval: Attente maximale avant l'écriture d'un lot incomplet (secondes)
+            max_pending: Extractions en attente au-delà desquelles les nouvelles sont ignorées
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=10)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+            self._backfill()
+
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_pending)
+        self.dropped = 0
+        self._writer = None
+        self._writer_lock = threading.Lock()
+
+    def _backfill(self):
+        """Remplir les agrégats par label et par fournisseur d'une base existante"""
+        empty = self._conn.execute("SELECT NOT EXISTS (SELECT 1 FROM label_daily)").fetchone()[0]
+        if not empty or not self._conn.execute("SELECT EXISTS (SELECT 1 FROM extractions)").fetchone()[0]:
+            return
+        with self._conn:
+            self._conn.execute(BACKFILL_LABELS, MISSING_VALUES)
+            self._conn.execute(BACKFILL_SUPPLIERS)
+
+    # ----- Écriture -----
+
+    def record(self, extraction, sha256: Optional[str] = None,
+               timings: Optional[Dict[str, float]] = None):
+        """
+        Mettre une extraction en file d'écriture (ne bloque pas)
+
+        Args:
+            extraction: InvoiceExtraction
+            sha256: Empreinte du document
+            timings: Durées par étage (secondes)
+        """
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._run, name="history-writer", daemon=True)
+                self._writer.start()
+        try:
+            self._queue.put_nowait((extraction, sha256, timings, time.time()))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            try:
+                self._write(batch)
+            except Exception as e:
+                # Le thread d'écriture doit survivre à un lot invalide
+                print(f"⚠️  Écriture de l'historique impossible ({len(batch)} extractions): {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if stop:
+                return
+
+    def _write(self, batch: List[tuple]):
+        """Écrire un lot d'extractions dans une seule transaction"""
+        with self._lock, self._conn:
+            for extraction, sha256, timings, recorded_at in batch:
+                data = json.loads(extraction.model_dump_json())
+                values = {field['label']: field['value'] for field in data['fields']
+                          if field['value'] not in MISSING_VALUES}
+                timings_ms = {stage: seconds * 1000 for stage, seconds in (timings or {}).items()}
+                day = datetime.fromtimestamp(recorded_at).strftime('%Y-%m-%d')
+                total_ms = timings_ms.get('total')
+
+                cursor = self._conn.execute(
+                    "INSERT INTO extractions (sha256, filename, extracted_at, day, model_version, "
+                    "overall_confidence, needs_review, quality_mode, supplier, siret, total_ms, timings) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (sha256, data['filename'], recorded_at, day, data['model_version'],
+                     data['overall_confidence'], int(data['needs_review']),
+                     data.get('quality_mode', 'full'), values.get('nom_fournisseur'),
+                     values.get('siret_fournisseur'), total_ms, json.dumps(timings_ms))
+                )
+                rows = []
+                for field in data['fields']:
+                    # Champ sans boîte (non détecté): boîte vide
+                    bbox = field.get('bbox') or {}
+                    rows.append((cursor.lastrowid, recorded_at, field['label'], field['value'], field['confidence'],
+                                 bbox.get('x', 0.0), bbox.get('y', 0.0),
+                                 bbox.get('width', 0.0), bbox.get('height', 0.0)))
+                self._conn.executemany(
+                    "INSERT INTO fields (extraction_id, extracted_at, label, value, confidence, "
+                    "x, y, width, height) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+                )
+                self._conn.executemany(
+                    "INSERT INTO label_daily (day, label, fields, missing, confidence_sum) "
+                    "VALUES (?, ?, 1, ?, ?) ON CONFLICT(day, label) DO UPDATE SET "
+                    "fields = fields + 1, missing = missing + excluded.missing, "
+                    "confidence_sum = confidence_sum + excluded.confidence_sum",
+                    [(day, field['label'], int(field['value'] in MISSING_VALUES), field['confidence'])
+                     for field in data['fields']]
+                )
+                supplier = values.get('nom_fournisseur')
+                if supplier is not None:
+                    self._conn.execute(
+                        "INSERT INTO supplier_daily (day, supplier, extractions, needs_review, confidence_sum) "
+                        "VALUES (?, ?, 1, ?, ?) ON CONFLICT(day, supplier) DO UPDATE SET "
+                        "extractions = extractions + 1, needs_review = needs_review + excluded.needs_review, "
+                        "confidence_sum = confidence_sum + excluded.confidence_sum",
+                        (day, supplier, int(data['needs_review']), data['overall_confidence'])
+                    )
+                self._conn.execute(
+                    "INSERT INTO daily (day, model_version, extractions, needs_review, confidence_sum, "
+                    "total_ms_sum) VALUES (?, ?, 1, ?, ?, ?) ON CONFLICT(day, model_version) DO UPDATE SET "
+                    "extractions = extractions + 1, needs_review = needs_review + excluded.needs_review, "
+                    "confidence_sum = confidence_sum + excluded.confidence_sum, "
+                    "total_ms_sum = total_ms_sum + excluded.total_ms_sum",
+                    (day, data['model_version'], int(data['needs_review']),
+                     data['overall_confidence'], total_ms or 0.0)
+                )
+
+    def flush(self, timeout: float = 10.0):
+        """Attendre l'écriture des extractions en file (tests, arrêt)"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def close(self):
+        """Écrire les extractions en attente et fermer la base"""
+        with self._writer_lock:
+            writer, self._writer = self._writer, None
+        if writer is not None:
+            self._queue.put(None)
+            writer.join(timeout=30)
+        with self._lock:
+            self._conn.close()
+
+    # ----- Requêtes -----
+
+    def _query(self, sql: str, params=()) -> List[Dict]:
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params).fetchall()]
+
+    def totals(self, days: Optional[int] = None) -> Dict:
+        """
+        Extractions, confiance moyenne et taux de revue (agrégats journaliers)
+
+        Args:
+            days: Limiter aux N derniers jours (défaut: tout l'historique)
+        """
+        where, params = '', ()
+        if days is not None:
+            where, params = "WHERE day >= ?", ((datetime.now() - timedelta(days=days - 1)).strftime('%Y-%m-%d'),)
+        row = self._query(
+            f"SELECT COALESCE(SUM(extractions), 0) AS extractions, COALESCE(SUM(needs_review), 0) AS needs_review, "
+            f"COALESCE(SUM(confidence_sum), 0) AS confidence_sum, COALESCE(SUM(total_ms_sum), 0) AS total_ms_sum "
+            f"FROM daily {where}", params
+        )[0]
+        count = row['extractions']
+        return {
+            'extractions': count,
+            'average_confidence': row['confidence_sum'] / count if count else 0.0,
+            'review_rate': row['needs_review'] / count if count else None,
+            'average_latency_ms': row['total_ms_sum'] / count if count else None
+        }
+
+    def daily(self, days: int = 30) -> List[Dict]:
+        """Extractions par jour et par version de modèle (dashboard)"""
+        since = (datetime.now() - timedelta(days=days - 1)).strftime('%Y-%m-%d')
+        rows = self._query(
+            "SELECT day, model_version, extractions, needs_review, confidence_sum FROM daily "
+            "WHERE day >= ? ORDER BY day, model_version", (since,)
+        )
+        for row in rows:
+            row['average_confidence'] = row.pop('confidence_sum') / row['extractions']
+        return rows
+
+    def recent(self, limit: int = 50, before_id: Optional[int] = None, supplier: Optional[str] = None,
+               max_confidence: Optional[float] = None, since: Optional[float] = None) -> List[Dict]:
+        """
+        Dernières extractions (sans les champs), filtrées
+
+        Args:
+            limit: Nombre de résultats
+            before_id: Pagination (id de la dernière ligne de la page précédente)
+            supplier: Nom du fournisseur
+            max_confidence: Confiance globale maximale (extractions douteuses)
+            since: Timestamp minimal
+        """
+        conditions, params = [], []
+        if before_id is not None:
+            conditions.append("id < ?")
+            params.append(before_id)
+        if supplier is not None:
+            conditions.append("supplier = ?")
+            params.append(supplier)
+        if max_confidence is not None:
+            conditions.append("overall_confidence <= ?")
+            params.append(max_confidence)
+        if since is not None:
+            conditions.append("extracted_at >= ?")
+            params.append(since)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        rows = self._query(
+            "SELECT id, sha256, filename, extracted_at, model_version, overall_confidence, needs_review, "
+            f"quality_mode, supplier, siret, total_ms FROM extractions {where} ORDER BY id DESC LIMIT ?",
+            (*params, limit)
+        )
+        for row in rows:
+            row['needs_review'] = bool(row['needs_review'])
+        return rows
+
+    def get(self, extraction_id: int) -> Optional[Dict]:
+        """Une extraction avec ses champs et ses durées"""
+        rows = self._query("SELECT * FROM extractions WHERE id = ?", (extraction_id,))
+        if not rows:
+            return None
+        extraction = rows[0]
+        extraction['needs_review'] = bool(extraction['needs_review'])
+        extraction['timings'] = json.loads(extraction['timings'] or '{}')
+        extraction['fields'] = self._query(
+            "SELECT label, value, confidence, x, y, width, height FROM fields "
+            "WHERE extraction_id = ? ORDER BY rowid", (extraction_id,)
+        )
+        return extraction
+
+    def label_stats(self, days: int = 7) -> List[Dict]:
+        """Par label: nombre de champs, confiance moyenne, taux de champs sans texte (agrégats journaliers)"""
+        since = (datetime.now() - timedelta(days=days - 1)).strftime('%Y-%m-%d')
+        return self._query(
+            "SELECT label, SUM(fields) AS fields, SUM(confidence_sum) / SUM(fields) AS average_confidence, "
+            "CAST(SUM(missing) AS REAL) / SUM(fields) AS missing_rate FROM label_daily "
+            "WHERE day >= ? GROUP BY label ORDER BY label", (since,)
+        )
+
+    def suppliers(self, days: int = 30, limit: int = 20) -> List[Dict]:
+        """Fournisseurs les plus fréquents et leur confiance moyenne (agrégats journaliers)"""
+        since = (datetime.now() - timedelta(days=days - 1)).strftime('%Y-%m-%d')
+        return self._query(
+            "SELECT supplier, SUM(extractions) AS extractions, "
+            "SUM(confidence_sum) / SUM(extractions) AS average_confidence, "
+            "CAST(SUM(needs_review) AS REAL) / SUM(extractions) AS review_rate FROM supplier_daily "
+            "WHERE day >= ? GROUP BY supplier ORDER BY extractions DESC, supplier LIMIT ?",
+            (since, limit)
+        )
+
+    def low_confidence_fields(self, label: str, threshold: float, limit: int = 100) -> List[Dict]:
+        """Champs d'un label sous un seuil de confiance (candidats au réannotage)"""
+        return self._query(
+            "SELECT f.extraction_id, e.sha256, e.filename, f.value, f.confidence FROM fields f "
+            "JOIN extractions e ON e.id = f.extraction_id "
+            "WHERE f.label = ? AND f.confidence < ? ORDER BY f.confidence LIMIT ?",
+            (label, threshold, limit)
+        )
+
+
+def history_from_config(config: Dict) -> Optional[HistoryStore]:
+    """HistoryStore configuré depuis api.history (None si désactivé)"""
+    history_config = config['api'].get('history', {})
+    if not history_config.get('enabled', False):
+        return None
+    return HistoryStore(
+        history_config.get('database', 'data/history.db'),
+        batch_size=history_config.get('batch_size', 100),
+        flush_interval=history_config.get('flush_interval', 1.0)
+    )
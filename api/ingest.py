@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+Service d'ingestion sur répertoire surveillé
+
+Les scanners et la passerelle mail déposent les PDF dans un répertoire
+partagé. Le service les détecte (inotify via watchdog, sinon scrutation
+périodique), attend qu'ils soient entièrement écrits, les envoie au
+pipeline d'extraction puis les range:
+
+    <spool>/facture.pdf
+      -> <spool>/.processing/facture.pdf    (réservé, renommage atomique)
+      -> <processed>/facture.pdf            (+ <results>/facture.json)
+      -> <failed>/facture.pdf               (+ <failed>/facture.error.json)
+
+Usage:
+    python -m api.ingest
+    python -m api.ingest --spool /mnt/scans --max-in-flight 16
+
+Au redémarrage, les fichiers restés dans .processing (arrêt brutal) sont
+remis dans le répertoire surveillé.
+"""
+import argparse
+import json
+import os
+import shutil
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .batch import SUPPORTED_EXTENSIONS
+from .config import get_config
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # Scrutation périodique uniquement
+    FileSystemEventHandler = object
+    Observer = None
+
+
+# Fichiers en cours d'écriture par les outils de dépôt courants
+PARTIAL_SUFFIXES = ('.part', '.tmp', '.crdownload', '.filepart', '~')
+
+
+def write_atomic(path: Path, text: str):
+    """Écrire un fichier d'un coup (fichier temporaire puis renommage)"""
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def move_file(src: Path, dst: Path):
+    """
+    Déplacer un fichier
+
+    Atomique sur un même système de fichiers; sinon copie vers un fichier
+    temporaire du répertoire cible puis renommage.
+    """
+    try:
+        os.replace(src, dst)
+    except OSError:
+        tmp = dst.with_name(f".{dst.name}.tmp")
+        shutil.copy2(src, tmp)
+        os.replace(tmp, dst)
+        os.unlink(src)
+
+
+def unique_path(directory: Path, name: str) -> Path:
+    """Chemin libre dans un répertoire (horodatage ajouté en cas de doublon)"""
+    path = directory / name
+    if not path.exists():
+        return path
+    stem, suffix = Path(name).stem, Path(name).suffix
+    stamp = datetime.now().strftime('%Y%m%d%H%M%S')
+    n = 1
+    while path.exists():
+        path = directory / f"{stem}-{stamp}-{n}{suffix}"
+        n += 1
+    return path
+
+
+class _WakeHandler(FileSystemEventHandler):
+    """Réveiller la boucle du service à chaque événement inotify"""
+
+    def __init__(self, wake: threading.Event):
+        self.wake = wake
+
+    def on_any_event(self, event):
+        self.wake.set()
+
+
+class IngestService:
+    """Ingestion continue des fichiers déposés dans un répertoire"""
+
+    def __init__(self, extractor, spool_dir: str, processed_dir: str, failed_dir: str,
+                 results_dir: str, settle_seconds: float = 2.0, poll_interval: float = 1.0,
+                 rescan_interval: float = 30.0, max_in_flight: int = 8,
+                 use_inotify: bool = True):
+        """
+        Args:
+            extractor: InvoiceExtractor avec modèle chargé (ou objet exposant submit())
+            spool_dir: Répertoire surveillé
+            processed_dir: Destination des fichiers traités
+            failed_dir: Destination des fichiers en erreur
+            results_dir: Destination des résultats JSON
+            settle_seconds: Durée sans changement de taille ni de date avant traitement
+            poll_interval: Intervalle de scrutation (sans inotify)
+            rescan_interval: Rescan complet avec inotify (événements perdus)
+            max_in_flight: Nombre maximum de documents en cours d'extraction
+            use_inotify: Utiliser watchdog s'il est installé
+        """
+        self.extractor = extractor
+        self.spool_dir = Path(spool_dir)
+        self.claim_dir = self.spool_dir / '.processing'
+        self.processed_dir = Path(processed_dir)
+        self.failed_dir = Path(failed_dir)
+        self.results_dir = Path(results_dir)
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self.rescan_interval = rescan_interval
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.use_inotify = use_inotify and Observer is not None
+
+        # Fichiers vus: chemin -> (taille, mtime, instant du dernier changement)
+        self._candidates: Dict[str, Tuple[int, int, float]] = {}
+        self._slots = threading.BoundedSemaphore(self.max_in_flight)
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._observer = None
+        self._lock = threading.Lock()
+        self.stats = {'ingested': 0, 'failed': 0, 'in_flight': 0, 'started_at': None}
+
+    def start(self):
+        """Créer les répertoires, récupérer les fichiers orphelins et démarrer la surveillance"""
+        for directory in (self.spool_dir, self.claim_dir, self.processed_dir,
+                          self.failed_dir, self.results_dir):
+            directory.mkdir(parents=True, exist_ok=True)
+
+        # Fichiers réservés lors d'une exécution interrompue
+        for orphan in self.claim_dir.iterdir():
+            if orphan.is_file():
+                move_file(orphan, unique_path(self.spool_dir, orphan.name))
+
+        if self.use_inotify:
+            self._observer = Observer()
+            self._observer.schedule(_WakeHandler(self._wake), str(self.spool_dir), recursive=False)
+            self._observer.start()
+
+        self.stats['started_at'] = time.time()
+
+    def scan(self) -> List[Path]:
+        """
+        Lister les fichiers prêts (taille et date stables depuis settle_seconds)
+
+        Returns:
+            Fichiers à traiter
+        """
+        now = time.monotonic()
+        seen = {}
+        ready = []
+
+        with os.scandir(self.spool_dir) as entries:
+            for entry in entries:
+                name = entry.name
+                if name.startswith('.') or name.endswith(PARTIAL_SUFFIXES):
+                    continue
+                if Path(name).suffix.lower() not in SUPPORTED_EXTENSIONS:
+                    continue
+                try:
+                    if not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+
+                previous = self._candidates.get(entry.path)
+                signature = (stat.st_size, stat.st_mtime_ns)
+                if previous is None or previous[:2] != signature:
+                    seen[entry.path] = (*signature, now)
+                    continue
+
+                seen[entry.path] = previous
+                if stat.st_size > 0 and now - previous[2] >= self.settle_seconds:
+                    ready.append(Path(entry.path))
+
+        self._candidates = seen
+        return ready
+
+    def dispatch(self, path: Path) -> Optional[Future]:
+        """
+        Réserver un fichier et l'envoyer au pipeline d'extraction
+
+        Bloque tant que max_in_flight documents sont en cours (contre-pression).
+
+        Returns:
+            Future de l'extraction, None si le fichier a disparu entre-temps
+        """
+        self._slots.acquire()
+        # Noms réutilisés par les scanners (scan.pdf): ne pas écraser un fichier encore en cours
+        claimed = unique_path(self.claim_dir, path.name)
+        try:
+            os.replace(path, claimed)
+        except FileNotFoundError:
+            self._slots.release()
+            return None
+        self._candidates.pop(str(path), None)
+
+        with self._lock:
+            self.stats['in_flight'] += 1
+
+        try:
+            future = self.extractor.submit(str(claimed), filename=path.name)
+        except Exception as e:
+            future = Future()
+            future.set_exception(e)
+        future.add_done_callback(lambda f: self._finish(claimed, path.name, f))
+        return future
+
+    def _finish(self, claimed: Path, name: str, future: Future):
+        """Écrire le résultat et ranger le fichier traité (sous son nom d'origine)"""
+        key = 'failed'
+        try:
+            try:
+                extraction = future.result()
+            except Exception as e:
+                target = unique_path(self.failed_dir, name)
+                write_atomic(target.with_suffix('.error.json'), json.dumps({
+                    'filename': name,
+                    'error': str(e),
+                    'failed_at': datetime.now().isoformat()
+                }, ensure_ascii=False, indent=2))
+                move_file(claimed, target)
+                print(f"❌ {name}: {e}")
+            else:
+                target = unique_path(self.processed_dir, name)
+                write_atomic(self.results_dir / f"{target.stem}.json",
+                             extraction.model_dump_json(indent=2))
+                move_file(claimed, target)
+                status = "⚠️  revue" if extraction.needs_review else "✅"
+                print(f"{status} {name} ({extraction.overall_confidence:.2f})")
+                key = 'ingested'
+        except OSError as e:
+            # Fichier laissé dans .processing: repris au prochain démarrage
+            print(f"❌ Rangement impossible pour {name}: {e}")
+        finally:
+            with self._lock:
+                self.stats['in_flight'] -= 1
+                self.stats[key] += 1
+            self._slots.release()
+
+    def run_forever(self):
+        """Boucle principale: détecter, attendre la stabilité, traiter"""
+        self.start()
+        mode = "inotify" if self.use_inotify else f"scrutation toutes les {self.poll_interval}s"
+        print(f"👀 Surveillance de {self.spool_dir} ({mode}, {self.max_in_flight} documents en parallèle)")
+
+        while not self._stopping.is_set():
+            for path in self.scan():
+                if self._stopping.is_set():
+                    break
+                self.dispatch(path)
+
+            if self.use_inotify:
+                # Revenir vérifier les fichiers en cours d'écriture, sinon attendre un événement
+                timeout = self.settle_seconds if self._candidates else self.rescan_interval
+            else:
+                timeout = self.poll_interval
+            self._wake.wait(timeout)
+            self._wake.clear()
+
+        self.drain()
+
+    def stop(self):
+        """Demander l'arrêt (les documents en cours sont terminés)"""
+        self._stopping.set()
+        self._wake.set()
+
+    def drain(self):
+        """Attendre la fin des documents en cours puis arrêter la surveillance"""
+        for _ in range(self.max_in_flight):
+            self._slots.acquire()
+        for _ in range(self.max_in_flight):
+            self._slots.release()
+
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+
+    def get_stats(self) -> Dict:
+        """Compteurs du service"""
+        with self._lock:
+            stats = dict(self.stats)
+        stats['pending'] = len(self._candidates)
+        return stats
+
+
+def service_from_config(extractor, config: Dict, spool_dir: Optional[str] = None,
+                        max_in_flight: Optional[int] = None,
+                        use_inotify: Optional[bool] = None) -> IngestService:
+    """
+    Construire le service depuis api.ingest
+
+    Le répertoire surveillé est api.ingest.spool_dir, ou à défaut
+    dataset.raw_data_path. Les arguments non nuls remplacent la configuration.
+    """
+    ingest_config = config['api'].get('ingest', {})
+    if max_in_flight is None:
+        max_in_flight = ingest_config.get('max_in_flight', 8)
+    if use_inotify is None:
+        use_inotify = ingest_config.get('use_inotify', True)
+
+    return IngestService(
+        extractor,
+        spool_dir=spool_dir or ingest_config.get('spool_dir') or config['dataset']['raw_data_path'],
+        processed_dir=ingest_config.get('processed_dir', 'data/ingest/processed'),
+        failed_dir=ingest_config.get('failed_dir', 'data/ingest/failed'),
+        results_dir=ingest_config.get('results_dir', 'data/ingest/results'),
+        settle_seconds=ingest_config.get('settle_seconds', 2.0),
+        poll_interval=ingest_config.get('poll_interval', 1.0),
+        rescan_interval=ingest_config.get('rescan_interval', 30.0),
+        max_in_flight=max_in_flight,
+        use_inotify=use_inotify
+    )
+
+
+def main(argv: Optional[List[str]] = None):
+    """Point d'entrée: python -m api.ingest"""
+    parser = argparse.ArgumentParser(
+        prog="python -m api.ingest",
+        description="Ingestion continue des factures déposées dans un répertoire"
+    )
+    parser.add_argument('--spool', help="Répertoire surveillé (défaut: api.ingest.spool_dir)")
+    parser.add_argument('--max-in-flight', type=int, help="Documents en cours simultanément")
+    parser.add_argument('--polling', action='store_true', help="Forcer la scrutation périodique")
+    parser.add_argument('--model', help="Modèle à utiliser (défaut: le plus récent)")
+    parser.add_argument('--config', help="Chemin vers settings.yaml")
+    args = parser.parse_args(argv)
+
+    from .extractor import InvoiceExtractor
+
+    config = get_config(args.config)
+    extractor = InvoiceExtractor(args.config)
+    extractor.load_model(args.model)
+    # Ingestion de fond: qualité complète, pas de mode dégradé de l'API
+    extractor.load_governor = None
+
+    service = service_from_config(
+        extractor, config, spool_dir=args.spool, max_in_flight=args.max_in_flight,
+        use_inotify=False if args.polling else None
+    )
+
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: service.stop())
+
+    try:
+        service.run_forever()
+    finally:
+        extractor.shutdown()
+
+    stats = service.get_stats()
+    print(f"\n👋 Arrêt: {stats['ingested']} factures traitées, {stats['failed']} en erreur")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
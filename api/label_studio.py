@@ -0,0 +1,325 @@
+"""
+Client HTTP minimal pour Label Studio (import de tâches avec prédictions)
+
+Utilisé par les traitements de fond de l'API (file de feedback,
+pré-annotation...) et par l'import et l'export en masse (scripts/), qui ont besoin
+de timeouts courts, d'erreurs distinguant les échecs temporaires des
+refus définitifs, d'un débit limité et de connexions réutilisées.
+Les autres scripts interactifs utilisent directement label_studio_sdk.
+"""
+import base64
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+from .lazy import lazy_import
+
+fitz = lazy_import('fitz')  # PyMuPDF
+
+
+# Noms des balises du template (label-studio/invoice-template.xml)
+FROM_NAME = 'label'
+TO_NAME = 'image'
+
+# Valeurs de remplacement produites par l'extracteur (pas de texte lu)
+PLACEHOLDER_VALUES = {"[Non détecté]", "[Différé]"}
+
+MIME_TYPES = {
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png'
+}
+
+
+class LabelStudioError(Exception):
+    """Échec d'un appel à Label Studio"""
+
+    def __init__(self, message: str, retryable: bool = True, retry_after: Optional[float] = None,
+                 status_code: Optional[int] = None):
+        """
+        Args:
+            message: Description de l'erreur
+            retryable: L'appel peut réussir plus tard (réseau, 429, 5xx)
+            retry_after: Délai demandé par le serveur (secondes)
+            status_code: Code HTTP (None si le serveur est injoignable)
+        """
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+        self.status_code = status_code
+
+
+def image_data_url(file_path: str) -> str:
+    """
+    Image d'une facture en data URL (première page pour un PDF)
+
+    Les coordonnées des prédictions sont en pourcentage: la résolution
+    du rendu n'a pas besoin de correspondre à celle de l'extraction.
+    """
+    path = Path(file_path)
+    extension = path.suffix.lower()
+    if extension == '.pdf':
+        doc = fitz.open(str(path))
+        try:
+            content = doc[0].get_pixmap(matrix=fitz.Matrix(2, 2)).tobytes("png")
+        finally:
+            doc.close()
+        mime_type = 'image/png'
+    else:
+        content = path.read_bytes()
+        mime_type = MIME_TYPES.get(extension, 'image/jpeg')
+
+    return f"data:{mime_type};base64,{base64.b64encode(content).decode('ascii')}"
+
+
+def prediction_from_extraction(extraction: Dict, model_version: Optional[str] = None) -> Dict:
+    """
+    Prédiction Label Studio (RectangleLabels) depuis une InvoiceExtraction
+
+    Args:
+        extraction: InvoiceExtraction sérialisée (model_dump)
+        model_version: Version à afficher (défaut: celle de l'extraction)
+
+    Returns:
+        Prédiction au format d'import de Label Studio
+    """
+    result = []
+    for i, field in enumerate(extraction['fields']):
+        bbox = field['bbox']
+        region = {
+            'id': f"pred_{i}",
+            'from_name': FROM_NAME,
+            'to_name': TO_NAME,
+            'type': 'rectanglelabels',
+            'value': {
+                'x': bbox['x'] * 100,
+                'y': bbox['y'] * 100,
+                'width': bbox['width'] * 100,
+                'height': bbox['height'] * 100,
+                'rotation': 0,
+                'rectanglelabels': [field['label']]
+            },
+            'score': field['confidence']
+        }
+        if field['value'] not in PLACEHOLDER_VALUES:
+            region['meta'] = {'text': [field['value']]}
+        result.append(region)
+
+    return {
+        'model_version': model_version or extraction.get('model_version'),
+        'score': extraction.get('overall_confidence'),
+        'result': result
+    }
+
+
+class RateLimiter:
+    """Espacement minimal entre deux appels (partagé entre threads)"""
+
+    def __init__(self, max_per_minute: float):
+        self.interval = 60.0 / max_per_minute if max_per_minute else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+    def pause(self, seconds: float):
+        """Repousser les appels suivants (429 avec Retry-After)"""
+        with self._lock:
+            self._next = max(self._next, time.monotonic() + seconds)
+
+
+class LabelStudioClient:
+    """Import de tâches dans un projet Label Studio (API REST)"""
+
+    def __init__(self, url: str, api_key: str, project_id: int, timeout: float = 30.0,
+                 max_requests_per_minute: float = 60, session=None, pool_size: int = 10):
+        """
+        Args:
+            url: URL de Label Studio
+            api_key: Jeton d'accès (Account Settings > Access Token)
+            project_id: Projet cible
+            timeout: Timeout d'un appel (secondes)
+            max_requests_per_minute: Débit maximal (0: illimité)
+            session: Session requests (défaut: nouvelle session)
+            pool_size: Connexions gardées ouvertes (>= threads appelant le client)
+        """
+        self.url = url.rstrip('/')
+        self.project_id = project_id
+        self.timeout = timeout
+        self.rate_limiter = RateLimiter(max_requests_per_minute)
+
+        if session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+        self.session.headers.update({'Authorization': f'Token {api_key}'})
+
+    def _post(self, path: str, payload, params: Optional[Dict] = None) -> Dict:
+        return self._request('post', path, json=payload, params=params)
+
+    def _get(self, path: str, params: Optional[Dict] = None) -> Dict:
+        return self._request('get', path, params=params)
+
+    def _request(self, method: str, path: str, **kwargs) -> Dict:
+        self.rate_limiter.wait()
+        try:
+            response = getattr(self.session, method)(f"{self.url}{path}", timeout=self.timeout, **kwargs)
+        except OSError as e:  # requests.RequestException hérite d'IOError
+            raise LabelStudioError(f"Label Studio injoignable: {e}")
+
+        if response.status_code == 429 or response.status_code >= 500:
+            retry_after = response.headers.get('Retry-After')
+            retry_after = float(retry_after) if retry_after and retry_after.isdigit() else None
+            if retry_after:
+                self.rate_limiter.pause(retry_after)
+            raise LabelStudioError(f"HTTP {response.status_code}: {response.text[:200]}",
+                                   retry_after=retry_after, status_code=response.status_code)
+        if response.status_code >= 400:
+            # Jeton ou droits: réessayer une fois la configuration corrigée
+            raise LabelStudioError(f"HTTP {response.status_code}: {response.text[:200]}",
+                                   retryable=response.status_code in (401, 403, 408),
+                                   status_code=response.status_code)
+        try:
+            return response.json()
+        except ValueError as e:
+            # Page HTML d'un proxy, réponse tronquée: réessayable comme une erreur réseau
+            raise LabelStudioError(f"Réponse invalide (HTTP {response.status_code}): {e}",
+                                   status_code=response.status_code)
+
+    def import_tasks(self, tasks: List[Dict]) -> List[int]:
+        """
+        Importer des tâches (avec leurs prédictions) en un seul appel
+
+        Returns:
+            Identifiants des tâches créées (si Label Studio les renvoie)
+        """
+        result = self._post(f"/api/projects/{self.project_id}/import", tasks,
+                            params={'return_task_ids': 'true'})
+        return result.get('task_ids') or []
+
+    def tasks_by_data(self, field: str, values: List[str]) -> Dict[str, int]:
+        """
+        Tâches existantes dont data.<field> vaut l'une des valeurs (clé stable d'import)
+
+        Returns:
+            Valeur -> identifiant de la tâche
+        """
+        if not values:
+            return {}
+        query = json.dumps({'filters': {'conjunction': 'or', 'items': [
+            {'filter': f'filter:tasks:data.{field}', 'operator': 'equal', 'type': 'String', 'value': value}
+            for value in values
+        ]}, 'ordering': ['tasks:id']})
+        found = {}
+        for task in self.iter_tasks(page_size=max(len(values), 1), fields='all', query=query,
+                                    include='id,data'):
+            found.setdefault(task['data'].get(field), task['id'])
+        return found
+
+    def tasks_by_file_path(self, file_paths: List[str]) -> Dict[str, int]:
+        """Tâches déjà importées pour ces fichiers (data.file_path -> identifiant)"""
+        return self.tasks_by_data('file_path', file_paths)
+
+    def import_predictions(self, predictions: List[Dict]) -> int:
+        """
+        Ajouter des prédictions à des tâches existantes en un seul appel
+
+        Args:
+            predictions: Prédictions (prediction_from_extraction) avec l'identifiant 'task'
+
+        Returns:
+            Nombre de prédictions créées
+        """
+        result = self._post(f"/api/projects/{self.project_id}/import/predictions", predictions)
+        return result.get('created', len(predictions))
+
+    def get_project(self) -> Dict:
+        """Projet cible (titre, nombre de tâches...)"""
+        return self._get(f"/api/projects/{self.project_id}")
+
+    def ensure_local_storage(self, path: str, title: str = 'Médias des factures') -> Dict:
+        """
+        Stockage « local files » du projet couvrant `path` (créé s'il manque)
+
+        Label Studio ne sert /data/local-files/ que pour les chemins d'un
+        stockage déclaré dans le projet. Aucune synchronisation n'est
+        lancée: les tâches sont importées avec leurs URL.
+        """
+        storages = self._get("/api/storages/localfiles", params={'project': self.project_id})
+        for storage in storages:
+            if storage.get('path') == path:
+                return storage
+        return self._post("/api/storages/localfiles", {
+            'project': self.project_id,
+            'path': path,
+            'title': title,
+            'use_blob_urls': True
+        })
+
+    def iter_tasks(self, page_size: int = 1000, **params) -> Iterator[Dict]:
+        """
+        Tâches du projet, page par page
+
+        Args:
+            page_size: Tâches par page
+            **params: Paramètres de /api/tasks (query: filtre Data Manager en JSON,
+                fields/include: champs renvoyés)
+        """
+        page = 1
+        while True:
+            try:
+                result = self._get("/api/tasks", params={**params, 'project': self.project_id, 'page': page,
+                                                         'page_size': page_size})
+            except LabelStudioError as e:
+                # Label Studio répond 404 après la dernière page
+                if e.status_code == 404:
+                    return
+                raise
+            tasks = result.get('tasks', []) if isinstance(result, dict) else result
+            yield from tasks
+            if len(tasks) < page_size:
+                return
+            page += 1
+
+
+def with_retries(call: Callable, max_attempts: int = 5, backoff_seconds: float = 2.0,
+                 max_backoff_seconds: float = 60.0):
+    """
+    Appeler Label Studio en réessayant les échecs temporaires
+
+    Le délai double à chaque échec (Retry-After respecté s'il est plus long);
+    les refus définitifs (4xx) sont levés immédiatement.
+    """
+    for attempt in range(1, max_attempts + 1):
+        try:
+            return call()
+        except LabelStudioError as e:
+            if not e.retryable or attempt >= max_attempts:
+                raise
+            delay = min(max_backoff_seconds, backoff_seconds * 2 ** (attempt - 1))
+            time.sleep(max(delay, e.retry_after or 0))
+
+
+def client_from_config(config: Dict, max_requests_per_minute: float = 60,
+                       pool_size: int = 10) -> LabelStudioClient:
+    """LabelStudioClient configuré depuis la section label_studio (settings.yaml)"""
+    ls_config = config['label_studio']
+    return LabelStudioClient(
+        ls_config['url'],
+        ls_config['api_key'],
+        ls_config['project_id'],
+        max_requests_per_minute=max_requests_per_minute,
+        pool_size=pool_size
+    )
@@ -0,0 +1,68 @@
+"""
+Imports paresseux des dépendances lourdes
+
+torch, ultralytics, cv2, fitz et pytesseract coûtent plusieurs secondes
+à l'import. Ils ne sont chargés qu'au premier accès à un attribut, pour
+que /health, la suite de tests et les scripts démarrent immédiatement.
+
+Usage:
+    cv2 = lazy_import('cv2')   # rien n'est chargé ici
+    cv2.resize(...)            # import réel au premier appel
+"""
+import importlib
+import sys
+import threading
+from types import ModuleType
+
+
+class LazyModule(ModuleType):
+    """
+    Module chargé au premier accès à un attribut
+
+    Le vrai module est importé normalement (importlib.import_module), ce
+    qui reste compatible avec les paquets qui manipulent sys.modules
+    pendant leur initialisation (cv2 notamment).
+    """
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__['_lazy_module'] = None
+        self.__dict__['_lazy_lock'] = threading.Lock()
+
+    def _load(self) -> ModuleType:
+        module = self.__dict__['_lazy_module']
+        if module is None:
+            with self.__dict__['_lazy_lock']:
+                module = self.__dict__['_lazy_module']
+                if module is None:
+                    module = importlib.import_module(self.__name__)
+                    self.__dict__['_lazy_module'] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def is_loaded(self) -> bool:
+        """Le module réel a-t-il été importé ?"""
+        return self.__dict__['_lazy_module'] is not None
+
+
+def lazy_import(name: str) -> ModuleType:
+    """
+    Importer un module de façon paresseuse
+
+    Si le module est déjà chargé, il est renvoyé tel quel. S'il n'est pas
+    installé, l'ImportError est levée au premier accès (comme un import local).
+
+    Args:
+        name: Nom complet du module
+
+    Returns:
+        Module (chargé réellement au premier accès à un attribut)
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    return LazyModule(name)
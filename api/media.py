@@ -0,0 +1,123 @@
+"""
+Médias des tâches Label Studio, adressés par contenu
+
+Plutôt que d'insérer chaque image en base64 dans le JSON des tâches (un
+tiers de plus en base et dans chaque export), les pages rendues sont
+écrites une fois dans un répertoire servi par le stockage « local files »
+de Label Studio, et les tâches ne portent qu'une URL:
+
+    media/ab/ab12...ef.p1x2.png   ->   /data/local-files/?d=media/ab/ab12...ef.p1x2.png
+
+Le nom dérive de l'empreinte SHA-256 du fichier source et des paramètres
+de rendu: un fichier déjà rendu n'est jamais recalculé, deux copies d'une
+même facture partagent la même image. Le rendu des PDF (PyMuPDF, lié au
+CPU) est réparti sur un pool de processus.
+"""
+import hashlib
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Union
+from urllib.parse import quote
+
+from .lazy import lazy_import
+
+fitz = lazy_import('fitz')  # PyMuPDF
+
+# Zoom de rendu des PDF (même qualité que l'ancien import en base64)
+RENDER_ZOOM = 2
+
+LOCAL_FILES_URL = '/data/local-files/?d='
+
+
+def media_name(source: Path, zoom: float = RENDER_ZOOM) -> str:
+    """Chemin relatif d'un média: <2 caractères>/<sha256>[.p1x<zoom>].<ext>"""
+    digest = hashlib.sha256()
+    with open(source, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    sha256 = digest.hexdigest()
+    extension = source.suffix.lower()
+    if extension == '.pdf':
+        return f"{sha256[:2]}/{sha256}.p1x{zoom:g}.png"
+    return f"{sha256[:2]}/{sha256}{'.jpg' if extension == '.jpeg' else extension}"
+
+
+def publish_file(source: Union[str, Path], media_dir: Union[str, Path], zoom: float = RENDER_ZOOM) -> str:
+    """
+    Écrire le média d'une facture (première page pour un PDF), s'il n'existe pas
+
+    Fonction de module: exécutée dans les processus du pool.
+
+    Returns:
+        Chemin relatif au répertoire des médias
+    """
+    source = Path(source)
+    name = media_name(source, zoom)
+    target = Path(media_dir) / name
+    if target.exists():
+        return name
+
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+    if source.suffix.lower() == '.pdf':
+        doc = fitz.open(str(source))
+        try:
+            tmp.write_bytes(doc[0].get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False).tobytes("png"))
+        finally:
+            doc.close()
+    else:
+        shutil.copyfile(source, tmp)
+    os.replace(tmp, target)
+    return name
+
+
+class MediaStore:
+    """Répertoire des médias et pool de rendu"""
+
+    def __init__(self, media_dir: str, url_prefix: str = 'media', workers: Optional[int] = None,
+                 zoom: float = RENDER_ZOOM):
+        """
+        Args:
+            media_dir: Répertoire des médias (côté script)
+            url_prefix: Chemin du même répertoire relatif à
+                LABEL_STUDIO_LOCAL_FILES_DOCUMENT_ROOT (côté Label Studio)
+            workers: Processus de rendu (défaut: nombre de CPU, 0: rendu dans le thread appelant)
+            zoom: Zoom de rendu des PDF
+        """
+        self.media_dir = Path(media_dir)
+        self.url_prefix = url_prefix.strip('/')
+        self.zoom = zoom
+        self.media_dir.mkdir(parents=True, exist_ok=True)
+        self._pool = ProcessPoolExecutor(max_workers=workers) if workers != 0 else None
+
+    def url(self, name: str) -> str:
+        """URL servie par Label Studio pour un média"""
+        path = f"{self.url_prefix}/{name}" if self.url_prefix else name
+        return LOCAL_FILES_URL + quote(path)
+
+    def publish(self, files: List[Path]) -> List[Union[str, Exception]]:
+        """
+        Rendre un lot de factures en parallèle
+
+        Returns:
+            Par fichier: URL du média, ou l'exception du rendu
+        """
+        if self._pool is None:
+            futures = None
+        else:
+            futures = [self._pool.submit(publish_file, str(f), str(self.media_dir), self.zoom) for f in files]
+
+        results = []
+        for i, source in enumerate(files):
+            try:
+                name = futures[i].result() if futures else publish_file(source, self.media_dir, self.zoom)
+                results.append(self.url(name))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
@@ -0,0 +1,202 @@
+"""
+Surveillance mémoire des workers de l'API
+
+Les workers grossissent au fil des jours (copies de ROI, documents
+PyMuPDF, caches torch). Le MemoryWatchdog suit la RSS du processus et
+déclenche un recyclage propre du worker:
+    - après `max_requests` extractions (± jitter, pour ne pas recycler
+      tous les workers en même temps)
+    - au-delà de `max_rss_mb`
+
+Le recyclage envoie SIGTERM au worker: uvicorn cesse d'accepter des
+connexions, termine les requêtes en cours puis arrête le pipeline
+(shutdown_event). Le processus parent (uvicorn --workers, gunicorn,
+systemd, docker restart) relance un worker neuf.
+
+Diagnostic des fuites: tracemalloc est démarré à la demande, les
+snapshots successifs sont comparés (/admin/memory/diff).
+"""
+import gc
+import os
+import random
+import signal
+import sys
+import threading
+import tracemalloc
+from typing import Dict, List, Optional
+
+
+# Frames sans intérêt dans les différences de snapshots
+_IGNORED_FILES = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+
+def rss_bytes() -> int:
+    """RSS courante du processus (pic si /proc n'est pas disponible)"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def torch_memory() -> Optional[Dict]:
+    """Mémoire GPU de torch (None si torch n'est pas chargé ou sans CUDA)"""
+    torch = sys.modules.get('torch')
+    if torch is None or not torch.cuda.is_available():
+        return None
+    return {
+        'allocated_mb': torch.cuda.memory_allocated() / 1024**2,
+        'reserved_mb': torch.cuda.memory_reserved() / 1024**2
+    }
+
+
+class MemoryWatchdog:
+    """RSS, compteur de requêtes et snapshots tracemalloc d'un worker"""
+
+    def __init__(self, max_requests: int = 0, max_rss_mb: float = 0,
+                 jitter: float = 0.1, tracemalloc_frames: int = 10,
+                 seed: Optional[int] = None):
+        """
+        Args:
+            max_requests: Recycler après N extractions (0: jamais)
+            max_rss_mb: Recycler au-delà de cette RSS (0: jamais)
+            jitter: Variation aléatoire de max_requests (fraction)
+            tracemalloc_frames: Profondeur des piles enregistrées par tracemalloc
+            seed: Graine du jitter (tests)
+        """
+        self.max_requests = max_requests
+        if max_requests and jitter:
+            spread = int(max_requests * jitter)
+            self.max_requests = max_requests + random.Random(seed).randint(-spread, spread)
+        self.max_rss_bytes = int(max_rss_mb * 1024**2)
+        self.tracemalloc_frames = tracemalloc_frames
+
+        self.requests = 0
+        self.peak_rss = rss_bytes()
+        self.recycle_reason: Optional[str] = None
+        self._snapshot: Optional[tracemalloc.Snapshot] = None
+        self._snapshot_count = 0
+        self._lock = threading.Lock()
+
+    def record_request(self) -> Optional[str]:
+        """
+        Compter une extraction et vérifier les seuils
+
+        Returns:
+            Raison du recyclage, une seule fois (None sinon)
+        """
+        rss = rss_bytes()
+        with self._lock:
+            self.requests += 1
+            self.peak_rss = max(self.peak_rss, rss)
+            if self.recycle_reason is not None:
+                return None
+
+            if self.max_requests and self.requests >= self.max_requests:
+                self.recycle_reason = f"{self.requests} requêtes traitées"
+            elif self.max_rss_bytes and rss >= self.max_rss_bytes:
+                self.recycle_reason = f"RSS {rss / 1024**2:.0f} Mo >= {self.max_rss_bytes / 1024**2:.0f} Mo"
+            return self.recycle_reason
+
+    def recycle(self, reason: str):
+        """Arrêt propre du worker (les requêtes en cours sont terminées)"""
+        print(f"♻️  Recyclage du worker {os.getpid()}: {reason}")
+        os.kill(os.getpid(), signal.SIGTERM)
+
+    # ----- tracemalloc -----
+
+    def take_snapshot(self) -> Dict:
+        """
+        Enregistrer un snapshot de référence (démarre tracemalloc au besoin)
+
+        Les allocations antérieures au démarrage de tracemalloc ne sont
+        pas suivies: le premier snapshot sert de point de départ.
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.tracemalloc_frames)
+        gc.collect()
+        snapshot = tracemalloc.take_snapshot().filter_traces(_IGNORED_FILES)
+        with self._lock:
+            self._snapshot = snapshot
+            self._snapshot_count += 1
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            'snapshot': self._snapshot_count,
+            'traced_mb': current / 1024**2,
+            'traced_peak_mb': peak / 1024**2,
+            'rss_mb': rss_bytes() / 1024**2
+        }
+
+    def diff(self, limit: int = 20, group_by: str = 'lineno') -> Optional[List[Dict]]:
+        """
+        Allocations qui ont le plus grossi depuis le dernier snapshot
+
+        Args:
+            limit: Nombre d'entrées
+            group_by: 'lineno', 'filename' ou 'traceback'
+
+        Returns:
+            Entrées triées par croissance (None sans snapshot de référence)
+        """
+        with self._lock:
+            baseline = self._snapshot
+        if baseline is None or not tracemalloc.is_tracing():
+            return None
+
+        gc.collect()
+        current = tracemalloc.take_snapshot().filter_traces(_IGNORED_FILES)
+        entries = []
+        for stat in current.compare_to(baseline, group_by)[:limit]:
+            frame = stat.traceback[-1]  # Frame la plus récente
+            entries.append({
+                'location': f"{frame.filename}:{frame.lineno}",
+                'traceback': stat.traceback.format() if group_by == 'traceback' else None,
+                'size_diff_kb': stat.size_diff / 1024,
+                'count_diff': stat.count_diff,
+                'size_kb': stat.size / 1024,
+                'count': stat.count
+            })
+        return entries
+
+    def stop_tracing(self):
+        """Arrêter tracemalloc (surcoût mémoire et CPU non négligeable)"""
+        with self._lock:
+            self._snapshot = None
+        tracemalloc.stop()
+
+    def get_stats(self) -> Dict:
+        """RSS, seuils de recyclage et état de tracemalloc"""
+        stats = {
+            'pid': os.getpid(),
+            'rss_mb': rss_bytes() / 1024**2,
+            'peak_rss_mb': self.peak_rss / 1024**2,
+            'requests': self.requests,
+            'max_requests': self.max_requests or None,
+            'max_rss_mb': self.max_rss_bytes / 1024**2 or None,
+            'recycle_pending': self.recycle_reason,
+            'tracing': tracemalloc.is_tracing(),
+            'snapshots': self._snapshot_count,
+            'gc_objects': len(gc.get_objects())
+        }
+        gpu = torch_memory()
+        if gpu is not None:
+            stats['torch_cuda'] = gpu
+        return stats
+
+
+def watchdog_from_config(config: Dict) -> MemoryWatchdog:
+    """MemoryWatchdog configuré depuis api.memory (settings.yaml)"""
+    memory_config = config['api'].get('memory', {})
+    return MemoryWatchdog(
+        max_requests=memory_config.get('max_requests', 0),
+        max_rss_mb=memory_config.get('max_rss_mb', 0),
+        jitter=memory_config.get('max_requests_jitter', 0.1),
+        tracemalloc_frames=memory_config.get('tracemalloc_frames', 10)
+    )
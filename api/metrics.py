@@ -0,0 +1,286 @@
+"""
+Statistiques d'extraction par fenêtres glissantes, agrégées entre workers
+
+Chaque worker compte ses extractions dans des tampons circulaires
+(1 min, 1 h, 24 h): un seau par intervalle, recyclé quand la fenêtre
+avance. Les compteurs sont aussi reportés périodiquement dans une base
+SQLite locale (mode WAL) partagée par tous les workers de la machine:
+/stats agrège ainsi les uvicorn --workers, les lots et l'ingestion.
+
+Taux calculés:
+    success_rate  extractions acceptées sans revue / documents traités
+    error_rate    extractions en échec / documents traités
+    review_rate   extractions à revoir / extractions réussies
+"""
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+# Compteurs d'un seau (dans cet ordre en base)
+COUNTERS = ('extractions', 'errors', 'needs_review', 'confidence_sum', 'latency_sum')
+
+# Fenêtres glissantes: (durée, largeur d'un seau) en secondes
+WINDOWS = {
+    '1m': (60, 1),
+    '1h': (3600, 60),
+    '24h': (86400, 600),
+}
+
+# Largeur des seaux en base (résolution des fenêtres agrégées)
+DB_BUCKET_SECONDS = 10
+
+
+def _empty() -> List[float]:
+    return [0] * len(COUNTERS)
+
+
+def _add(target: List[float], values: List[float]):
+    for i, value in enumerate(values):
+        target[i] += value
+
+
+def summarize(counts: List[float]) -> Dict:
+    """Compteurs bruts -> statistiques (taux, moyennes)"""
+    extractions, errors, needs_review, confidence_sum, latency_sum = counts
+    processed = extractions + errors
+    return {
+        'extractions': int(extractions),
+        'errors': int(errors),
+        'needs_review': int(needs_review),
+        'average_confidence': confidence_sum / extractions if extractions else 0.0,
+        'average_latency_ms': latency_sum * 1000 / extractions if extractions else None,
+        'success_rate': (extractions - needs_review) / processed if processed else None,
+        'error_rate': errors / processed if processed else None,
+        'review_rate': needs_review / extractions if extractions else None,
+    }
+
+
+class RingWindow:
+    """Fenêtre glissante: tampon circulaire de seaux de largeur fixe"""
+
+    def __init__(self, span_seconds: int, bucket_seconds: int):
+        self.bucket_seconds = bucket_seconds
+        self.size = span_seconds // bucket_seconds
+        self._epochs = [-1] * self.size   # Index absolu du seau occupant chaque case
+        self._counts = [_empty() for _ in range(self.size)]
+
+    def add(self, now: float, values: List[float]):
+        epoch = int(now // self.bucket_seconds)
+        slot = epoch % self.size
+        if self._epochs[slot] != epoch:
+            # Case occupée par un seau sorti de la fenêtre: la recycler
+            self._epochs[slot] = epoch
+            self._counts[slot] = _empty()
+        _add(self._counts[slot], values)
+
+    def totals(self, now: float) -> List[float]:
+        oldest = int(now // self.bucket_seconds) - self.size
+        totals = _empty()
+        for epoch, counts in zip(self._epochs, self._counts):
+            if epoch > oldest:
+                _add(totals, counts)
+        return totals
+
+
+class MetricsStore:
+    """Compteurs d'extraction d'un worker, fenêtres glissantes et agrégation SQLite"""
+
+    def __init__(self, db_path: Optional[str] = None, flush_interval: float = 5.0):
+        """
+        Args:
+            db_path: Base SQLite partagée entre workers (None: worker seul)
+            flush_interval: Intervalle d'écriture en base (secondes)
+        """
+        self.flush_interval = flush_interval
+        self.started_at = time.time()
+        self._windows = {name: RingWindow(*spec) for name, spec in WINDOWS.items()}
+        self._totals = _empty()
+        self._pending: Dict[int, List[float]] = {}  # Seau en base -> compteurs non écrits
+        self._lock = threading.Lock()
+
+        self._conn = None
+        self._db_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._flusher = None
+        if db_path:
+            self._open(Path(db_path))
+
+    def _open(self, db_path: Path):
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False, timeout=10)
+        columns = ', '.join(f"{name} REAL NOT NULL DEFAULT 0" for name in COUNTERS)
+        with self._db_lock:
+            # WAL: les lectures de /stats ne bloquent pas les écritures des autres workers
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS buckets (bucket INTEGER PRIMARY KEY, {columns})")
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS totals (id INTEGER PRIMARY KEY CHECK (id = 0), {columns})")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS workers (
+                    pid INTEGER PRIMARY KEY,
+                    last_flush REAL NOT NULL
+                )
+            """)
+            self._conn.commit()
+
+        self._flusher = threading.Thread(target=self._flush_loop, name="metrics-flush", daemon=True)
+        self._flusher.start()
+
+    # ----- Enregistrement -----
+
+    def _record(self, values: List[float], now: Optional[float] = None):
+        now = time.time() if now is None else now
+        with self._lock:
+            for window in self._windows.values():
+                window.add(now, values)
+            _add(self._totals, values)
+            if self._conn is not None:
+                _add(self._pending.setdefault(int(now // DB_BUCKET_SECONDS), _empty()), values)
+
+    def record_extraction(self, confidence: float, needs_review: bool, latency: float = 0.0,
+                          now: Optional[float] = None):
+        """
+        Compter une extraction réussie
+
+        Args:
+            confidence: Confiance globale
+            needs_review: Extraction à revoir (confiance sous le seuil)
+            latency: Durée de bout en bout (secondes)
+        """
+        self._record([1, 0, int(needs_review), confidence, latency], now)
+
+    def record_error(self, now: Optional[float] = None):
+        """Compter une extraction en échec"""
+        self._record([0, 1, 0, 0, 0], now)
+
+    # ----- Agrégation entre workers -----
+
+    def flush(self):
+        """Écrire les compteurs en attente dans la base partagée"""
+        if self._conn is None:
+            return
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+
+        totals = _empty()
+        for counts in pending.values():
+            _add(totals, counts)
+
+        try:
+            self._write(pending, totals)
+        except sqlite3.Error:
+            # Écriture refusée (base verrouillée...) : les compteurs repartent au prochain flush
+            with self._lock:
+                for bucket, counts in pending.items():
+                    _add(self._pending.setdefault(bucket, _empty()), counts)
+            raise
+
+    def _write(self, pending: Dict[int, List[float]], totals: List[float]):
+        names = ', '.join(COUNTERS)
+        placeholders = ', '.join('?' for _ in COUNTERS)
+        updates = ', '.join(f"{name} = {name} + excluded.{name}" for name in COUNTERS)
+        with self._db_lock:
+            with self._conn:
+                self._conn.executemany(
+                    f"INSERT INTO buckets (bucket, {names}) VALUES (?, {placeholders}) "
+                    f"ON CONFLICT(bucket) DO UPDATE SET {updates}",
+                    [(bucket, *counts) for bucket, counts in pending.items()]
+                )
+                self._conn.execute(
+                    f"INSERT INTO totals (id, {names}) VALUES (0, {placeholders}) "
+                    f"ON CONFLICT(id) DO UPDATE SET {updates}",
+                    totals
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO workers (pid, last_flush) VALUES (?, ?)",
+                    (os.getpid(), time.time())
+                )
+                # Seaux sortis de la plus longue fenêtre
+                horizon = (time.time() - max(span for span, _ in WINDOWS.values())) // DB_BUCKET_SECONDS
+                self._conn.execute("DELETE FROM buckets WHERE bucket < ?", (horizon,))
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                print(f"⚠️  Écriture des statistiques impossible: {e}")
+
+    def _aggregated(self, now: float) -> Dict[str, List[float]]:
+        """Compteurs de tous les workers (base + compteurs locaux non écrits)"""
+        with self._lock:
+            pending = {bucket: list(counts) for bucket, counts in self._pending.items()}
+
+        sums = ', '.join(f"COALESCE(SUM({name}), 0)" for name in COUNTERS)
+        result = {}
+        with self._db_lock:
+            row = self._conn.execute(f"SELECT {', '.join(COUNTERS)} FROM totals WHERE id = 0").fetchone()
+            result['total'] = list(row) if row else _empty()
+            for name, (span, _) in WINDOWS.items():
+                oldest = int(now // DB_BUCKET_SECONDS) - span // DB_BUCKET_SECONDS
+                result[name] = list(self._conn.execute(
+                    f"SELECT {sums} FROM buckets WHERE bucket > ?", (oldest,)
+                ).fetchone())
+            active = self._conn.execute(
+                "SELECT COUNT(*) FROM workers WHERE last_flush >= ?", (now - 3 * self.flush_interval,)
+            ).fetchone()[0]
+
+        for bucket, counts in pending.items():
+            _add(result['total'], counts)
+            for name, (span, _) in WINDOWS.items():
+                if bucket > int(now // DB_BUCKET_SECONDS) - span // DB_BUCKET_SECONDS:
+                    _add(result[name], counts)
+        result['workers'] = max(active, 1)
+        return result
+
+    def get_stats(self, scope: str = 'all', now: Optional[float] = None) -> Dict:
+        """
+        Statistiques totales et par fenêtre glissante
+
+        Args:
+            scope: 'all' (tous les workers, si la base est configurée) ou 'worker'
+
+        Returns:
+            {'scope', 'workers', 'total', '1m', '1h', '24h'}
+        """
+        now = time.time() if now is None else now
+        if scope == 'all' and self._conn is not None:
+            counts = self._aggregated(now)
+            workers = counts.pop('workers')
+        else:
+            scope, workers = 'worker', 1
+            with self._lock:
+                counts = {name: window.totals(now) for name, window in self._windows.items()}
+                counts['total'] = list(self._totals)
+
+        return {
+            'scope': scope,
+            'workers': workers,
+            **{name: summarize(values) for name, values in counts.items()}
+        }
+
+    def close(self):
+        """Écrire les derniers compteurs et fermer la base"""
+        if self._conn is None:
+            return
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join(timeout=self.flush_interval + 1)
+        self.flush()
+        with self._db_lock:
+            self._conn.close()
+            self._conn = None
+
+
+def metrics_from_config(config: Dict) -> MetricsStore:
+    """MetricsStore configuré depuis api.metrics (settings.yaml)"""
+    metrics_config = config['api'].get('metrics', {})
+    return MetricsStore(
+        db_path=metrics_config.get('database'),
+        flush_interval=metrics_config.get('flush_interval', 5.0)
+    )
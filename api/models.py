@@ -1,7 +1,7 @@
 """
 Pydantic models pour l'API
 """
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 from typing import List, Optional, Dict
 from datetime import datetime
 
@@ -30,6 +30,11 @@ class InvoiceExtraction(BaseModel):
     overall_confidence: float = Field(..., description="Confiance moyenne")
     needs_review: bool = Field(..., description="Nécessite une revue humaine")
     model_version: str = Field(..., description="Version du modèle utilisé")
+    quality_mode: str = Field("full", description="Mode de qualité appliqué (dégradé sous charge)")
+    deferred_fields: List[str] = Field(default_factory=list, description="Labels non OCRisés dans ce mode")
+
+    # Durées par étage (secondes), exposées dans l'en-tête Server-Timing
+    _stage_timings: Dict[str, float] = PrivateAttr(default_factory=dict)
 
 
 class ExtractionResponse(BaseModel):
@@ -47,6 +52,7 @@ class HealthResponse(BaseModel):
     model_loaded: bool
     model_version: Optional[str] = None
     uptime_seconds: float
+    rss_mb: Optional[float] = None
 
 
 class StatsResponse(BaseModel):
@@ -56,3 +62,4 @@ class StatsResponse(BaseModel):
     extractions_last_24h: int
     model_version: str
     success_rate: float
+    workers: int = 1
@@ -0,0 +1,218 @@
+"""
+Cache inter-documents des résultats OCR
+
+Les blocs fournisseur (nom, adresse) d'un même fournisseur sont
+identiques au pixel près d'une facture à l'autre lorsqu'elles sont
+générées par le même logiciel. Ce cache associe une empreinte de la ROI
+en niveaux de gris au texte déjà extrait, pour éviter de relancer le
+débruitage et Tesseract.
+
+Par défaut l'empreinte est un hash exact du contenu: un hash perceptuel
+ne distingue pas deux lignes de texte voisines ("ACME SARL" / "ACME SAS")
+et renverrait le texte d'un autre document. Les identifiants (SIRET,
+numéro, dates, montants) ne sont jamais mis en cache.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+# Labels propres à chaque document: jamais servis depuis le cache
+UNCACHEABLE_LABELS = frozenset({
+    'siret_fournisseur', 'numero_facture', 'date_facture',
+    'montant_ht', 'montant_tva', 'montant_ttc', 'ligne_produit'
+})
+
+
+def content_hash(gray: np.ndarray) -> int:
+    """Empreinte exacte d'une ROI (dimensions et pixels), sur 128 bits"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(np.asarray(gray.shape, dtype=np.int64).tobytes())
+    digest.update(np.ascontiguousarray(gray).tobytes())
+    return int.from_bytes(digest.digest(), 'big')
+
+
+def dhash(gray: np.ndarray, hash_size: int = 16, max_aspect: int = 16) -> int:
+    """
+    Calculer le hash perceptuel (difference hash) d'une image en niveaux de gris
+
+    La grille garde le rapport largeur/hauteur de la ROI (hash_size lignes,
+    jusqu'à hash_size * max_aspect colonnes): une ligne de texte n'est pas
+    écrasée en carré. Un bit de tête à 1 encode la taille de la grille,
+    deux ROI de proportions différentes n'ont jamais le même hash.
+
+    Args:
+        gray: Image en niveaux de gris (uint8)
+        hash_size: Nombre de lignes de la grille de comparaison
+        max_aspect: Rapport largeur/hauteur maximal pris en compte
+
+    Returns:
+        Hash sous forme d'entier
+    """
+    import cv2
+
+    height, width = gray.shape[:2]
+    aspect = min(max(round(width / max(height, 1)), 1), max_aspect)
+    columns = hash_size * aspect
+    small = cv2.resize(gray, (columns + 1, hash_size), interpolation=cv2.INTER_AREA)
+    diff = small[:, 1:] > small[:, :-1]
+    return (1 << diff.size) | int.from_bytes(np.packbits(diff).tobytes(), 'big') >> (-diff.size % 8)
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Distance de Hamming entre deux hashs"""
+    return bin(a ^ b).count('1')
+
+
+class OCRCache:
+    """
+    Cache LRU borné des textes OCR, indexé par (profil OCR, hash perceptuel)
+
+    Par défaut (`max_distance` 0) seule une empreinte identique est un hit.
+    Avec une tolérance, le hash est découpé en `max_distance + 1` bandes,
+    et deux hashs de même longueur à distance <= max_distance partagent
+    forcément au moins une bande identique (principe des tiroirs). Seuls
+    les candidats d'une même bande sont comparés, la recherche reste donc
+    en O(1) en pratique.
+    """
+
+    def __init__(self, max_entries: int = 10000, max_distance: int = 0,
+                 hash_size: int = 16):
+        """
+        Initialiser le cache
+
+        Args:
+            max_entries: Nombre maximal d'entrées conservées (éviction LRU)
+            max_distance: Distance de Hamming maximale pour un hit
+                (0: empreinte exacte du contenu)
+            hash_size: Lignes du dHash (utilisé seulement si max_distance > 0)
+        """
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.hash_size = hash_size
+        self._n_bands = max_distance + 1
+
+        self._entries: "OrderedDict[Tuple[str, int], str]" = OrderedDict()
+        self._bands: Dict[Tuple[str, int, int, int], set] = {}
+        self._lock = threading.Lock()
+
+        # Statistiques par label
+        self._hits: Dict[str, int] = {}
+        self._misses: Dict[str, int] = {}
+
+    def fingerprint(self, gray: np.ndarray) -> int:
+        """Empreinte d'une ROI selon la tolérance du cache"""
+        if self.max_distance == 0:
+            return content_hash(gray)
+        return dhash(gray, self.hash_size)
+
+    def _band_keys(self, profile: str, h: int):
+        """Clés des bandes d'un hash (découpage propre à sa longueur)"""
+        n_bits = h.bit_length()
+        band_bits = max(-(-n_bits // self._n_bands), 1)  # division arrondie au supérieur
+        mask = (1 << band_bits) - 1
+        for i in range(self._n_bands):
+            yield (profile, n_bits, i, (h >> (i * band_bits)) & mask)
+
+    def get(self, label: str, profile: str, h: int) -> Optional[str]:
+        """
+        Chercher un texte déjà extrait pour une ROI similaire
+
+        Args:
+            label: Nom du label (pour les statistiques)
+            profile: Profil OCR du label (configuration Tesseract + nettoyage)
+            h: Hash perceptuel de la ROI
+
+        Returns:
+            Le texte en cache, ou None si aucune entrée assez proche
+        """
+        with self._lock:
+            key = (profile, h)
+            text = self._entries.get(key)
+
+            if text is None and self.max_distance > 0:
+                best = None
+                for band_key in self._band_keys(profile, h):
+                    for candidate in self._bands.get(band_key, ()):
+                        if candidate.bit_length() != h.bit_length():
+                            continue
+                        distance = hamming_distance(h, candidate)
+                        if distance <= self.max_distance and (best is None or distance < best[0]):
+                            best = (distance, candidate)
+                if best is not None:
+                    key = (profile, best[1])
+                    text = self._entries[key]
+
+            if text is None:
+                self._misses[label] = self._misses.get(label, 0) + 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._hits[label] = self._hits.get(label, 0) + 1
+            return text
+
+    def put(self, profile: str, h: int, text: str):
+        """Enregistrer le texte extrait pour une ROI"""
+        with self._lock:
+            key = (profile, h)
+            if key in self._entries:
+                self._entries[key] = text
+                self._entries.move_to_end(key)
+                return
+
+            self._entries[key] = text
+            if self.max_distance > 0:
+                for band_key in self._band_keys(profile, h):
+                    self._bands.setdefault(band_key, set()).add(h)
+
+            while len(self._entries) > self.max_entries:
+                self._evict_oldest()
+
+    def _evict_oldest(self):
+        """Retirer l'entrée la moins récemment utilisée (verrou déjà pris)"""
+        (profile, h), _ = self._entries.popitem(last=False)
+        if self.max_distance == 0:
+            return
+        for band_key in self._band_keys(profile, h):
+            bucket = self._bands.get(band_key)
+            if bucket is not None:
+                bucket.discard(h)
+                if not bucket:
+                    del self._bands[band_key]
+
+    def clear(self):
+        """Vider le cache et remettre les statistiques à zéro"""
+        with self._lock:
+            self._entries.clear()
+            self._bands.clear()
+            self._hits.clear()
+            self._misses.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict:
+        """Statistiques du cache (taux de hit par label)"""
+        with self._lock:
+            labels = sorted(set(self._hits) | set(self._misses))
+            per_label = {}
+            for label in labels:
+                hits = self._hits.get(label, 0)
+                misses = self._misses.get(label, 0)
+                per_label[label] = {
+                    'hits': hits,
+                    'misses': misses,
+                    'hit_rate': hits / (hits + misses) if hits + misses else 0.0
+                }
+
+            total_hits = sum(self._hits.values())
+            total_lookups = total_hits + sum(self._misses.values())
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'max_distance': self.max_distance,
+                'hit_rate': total_hits / total_lookups if total_lookups else 0.0,
+                'labels': per_label
+            }
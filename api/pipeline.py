@@ -0,0 +1,291 @@
+"""
+Pipeline d'extraction par étages découplés
+
+Chaque étage (décodage, détection, OCR, assemblage...) dispose de ses
+propres workers et d'une file d'entrée bornée: pendant qu'un document
+est en OCR, le détecteur traite déjà le suivant. Les files bornées
+assurent la contre-pression quand un étage aval est saturé.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+
+class DocumentContext:
+    """État d'un document qui traverse les étages du pipeline"""
+
+    def __init__(self, file_path: str, filename: Optional[str] = None):
+        """
+        Args:
+            file_path: Chemin vers le fichier (PDF ou image)
+            filename: Nom à reporter dans le résultat (défaut: nom du fichier)
+        """
+        self.file_path = str(file_path)
+        self.filename = filename or Path(file_path).name
+        self.image = None          # Image de la page (numpy array)
+        self.detections = None     # Detections (tableau structuré xyxy/conf/cls)
+        self.labels: List[str] = []
+        self.values: Dict[int, str] = {}
+        self.boxes = None          # Boîtes normalisées (N x 4: x, y, largeur, hauteur)
+        self.overall_confidence = 0.0
+        self.needs_review = True
+        self.extraction = None     # InvoiceExtraction finale (construite en sortie)
+        self.timings: Dict[str, float] = {}
+        self.quality = None        # Mode de qualité appliqué (dégradation sous charge)
+        self.deferred: List[str] = []  # Labels non OCRisés à cause du mode de qualité
+        self.submitted_at = time.perf_counter()
+        self.profile = None        # RequestProfile si ce document est profilé
+        self.sha256 = None         # Empreinte du fichier (historique des extractions)
+        self.extras: Dict[str, Any] = {}  # Données libres pour les étages additionnels
+        self._on_close: List[Callable[[], None]] = []
+
+    def on_close(self, callback: Callable[[], None]):
+        """Enregistrer une fonction de libération (ex: rendre un buffer au pool)"""
+        self._on_close.append(callback)
+
+    def close(self):
+        """Libérer les ressources du document (l'image n'est plus utilisable)"""
+        callbacks, self._on_close = self._on_close, []
+        for callback in callbacks:
+            callback()
+        self.image = None
+
+
+class Stage:
+    """Un étage du pipeline"""
+
+    def __init__(self, name: str, func: Callable[[DocumentContext], None],
+                 workers: int = 1, queue_size: int = 8):
+        """
+        Args:
+            name: Nom de l'étage (utilisé pour les timings et les métriques)
+            func: Fonction appliquée au contexte (le modifie en place)
+            workers: Nombre de threads dédiés à l'étage
+            queue_size: Taille maximale de la file d'entrée
+        """
+        self.name = name
+        self.func = func
+        self.workers = max(1, int(workers))
+        self.queue_size = max(1, int(queue_size))
+
+
+def run_stage(stage: Stage, ctx: DocumentContext):
+    """Exécuter un étage sur un document (chronométré, profilé si demandé)"""
+    start = time.perf_counter()
+    if ctx.profile is not None:
+        with ctx.profile.attach(stage.name):
+            stage.func(ctx)
+    else:
+        stage.func(ctx)
+    ctx.timings[stage.name] = time.perf_counter() - start
+
+
+def run_stages(stages: List[Stage], ctx: DocumentContext) -> DocumentContext:
+    """
+    Exécuter les étages en séquence sur un document (sans threads)
+
+    L'appelant doit appeler ctx.close() une fois le résultat exploité.
+    """
+    for stage in stages:
+        run_stage(stage, ctx)
+    return ctx
+
+
+_STOP = object()
+
+
+class PipelineFull(RuntimeError):
+    """File d'entrée du pipeline pleine (soumission non bloquante)"""
+
+
+class Pipeline:
+    """
+    Pipeline multi-étages relié par des files bornées
+
+    Usage:
+        pipeline = Pipeline([Stage('decode', decode, workers=2), ...])
+        future = pipeline.submit(DocumentContext('facture.pdf'))
+        ctx = future.result()
+    """
+
+    def __init__(self, stages: List[Stage],
+                 output: Optional[Callable[[DocumentContext], Any]] = None):
+        """
+        Args:
+            stages: Étages, dans l'ordre de traitement
+            output: Transformation du contexte final en résultat des futures
+                    (défaut: le contexte lui-même)
+        """
+        if not stages:
+            raise ValueError("Le pipeline doit contenir au moins un étage")
+
+        self.stages = stages
+        self.output = output or (lambda ctx: ctx)
+        self._queues = [queue.Queue(maxsize=stage.queue_size) for stage in stages]
+        self._alive = [0] * len(stages)
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._started = False
+        self._closed = False
+
+    def start(self):
+        """Démarrer les workers de chaque étage"""
+        with self._lock:
+            if self._started:
+                return
+            for index, stage in enumerate(self.stages):
+                self._alive[index] = stage.workers
+                for n in range(stage.workers):
+                    thread = threading.Thread(
+                        target=self._worker, args=(index,),
+                        name=f"pipeline-{stage.name}-{n}", daemon=True
+                    )
+                    thread.start()
+                    self._threads.append(thread)
+            self._started = True
+
+    def _worker(self, index: int):
+        """Boucle d'un worker: file d'entrée -> étage -> file suivante"""
+        stage = self.stages[index]
+        inbox = self._queues[index]
+
+        while True:
+            item = inbox.get()
+            if item is _STOP:
+                self._worker_stopped(index)
+                return
+
+            ctx, future = item
+            # Un document annulé avant son entrée dans le pipeline est ignoré
+            if index == 0 and not future.set_running_or_notify_cancel():
+                continue
+
+            try:
+                run_stage(stage, ctx)
+            except Exception as e:
+                ctx.close()
+                future.set_exception(e)
+                continue
+
+            if index + 1 < len(self.stages):
+                # Bloque si l'étage suivant est saturé (contre-pression)
+                self._queues[index + 1].put((ctx, future))
+            else:
+                try:
+                    result = self.output(ctx)
+                except Exception as e:
+                    ctx.close()
+                    future.set_exception(e)
+                else:
+                    ctx.close()
+                    future.set_result(result)
+
+    def _worker_stopped(self, index: int):
+        """Propager l'arrêt à l'étage suivant une fois tous les workers sortis"""
+        with self._lock:
+            self._alive[index] -= 1
+            last = self._alive[index] == 0
+        if last and index + 1 < len(self.stages):
+            for _ in range(self.stages[index + 1].workers):
+                self._queues[index + 1].put(_STOP)
+
+    def submit(self, ctx: DocumentContext, block: bool = True) -> Future:
+        """
+        Soumettre un document au pipeline
+
+        Args:
+            ctx: Contexte du document
+            block: Attendre une place si la file du premier étage est pleine
+                (False: lever PipelineFull, pour ne jamais bloquer une boucle asyncio)
+
+        Returns:
+            Future résolue avec le résultat (voir `output`)
+        """
+        if self._closed:
+            raise RuntimeError("Pipeline arrêté")
+        self.start()
+
+        future = Future()
+        try:
+            self._queues[0].put((ctx, future), block=block)
+        except queue.Full:
+            raise PipelineFull(f"File '{self.stages[0].name}' pleine ({self.stages[0].queue_size} documents)")
+        return future
+
+    def imap(self, contexts: Iterable[DocumentContext]) -> Iterator[Future]:
+        """
+        Traiter un flux de documents, résultats dans l'ordre de complétion
+
+        Les documents sont soumis par un thread d'alimentation, le flux
+        d'entrée n'est donc jamais chargé entièrement en mémoire.
+
+        Yields:
+            Futures terminées (appeler .result() pour obtenir le résultat
+            ou l'exception de l'étage en échec)
+        """
+        done: "queue.Queue" = queue.Queue()
+        submitted = [0]
+
+        def feed():
+            try:
+                for ctx in contexts:
+                    future = self.submit(ctx)
+                    submitted[0] += 1
+                    future.add_done_callback(done.put)
+            finally:
+                done.put(None)
+
+        threading.Thread(target=feed, name="pipeline-feeder", daemon=True).start()
+
+        received = 0
+        while True:
+            future = done.get()
+            if future is None:
+                # Le thread d'alimentation a terminé: vider les résultats restants
+                while received < submitted[0]:
+                    yield done.get()
+                    received += 1
+                return
+            received += 1
+            yield future
+
+    def queue_depths(self) -> Dict[str, int]:
+        """Profondeur actuelle de la file d'entrée de chaque étage"""
+        return {stage.name: q.qsize() for stage, q in zip(self.stages, self._queues)}
+
+    def get_stats(self) -> Dict:
+        """Configuration et état des étages"""
+        depths = self.queue_depths()
+        return {
+            'running': self._started and not self._closed,
+            'stages': [
+                {
+                    'name': stage.name,
+                    'workers': stage.workers,
+                    'queue_size': stage.queue_size,
+                    'queue_depth': depths[stage.name]
+                }
+                for stage in self.stages
+            ]
+        }
+
+    def shutdown(self, wait: bool = True):
+        """Arrêter le pipeline après traitement des documents déjà soumis"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            started = self._started
+
+        if not started:
+            return
+
+        for _ in range(self.stages[0].workers):
+            self._queues[0].put(_STOP)
+
+        if wait:
+            for thread in self._threads:
+                thread.join()
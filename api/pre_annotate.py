@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Pré-annotation des tâches Label Studio par le modèle courant
+
+Les tâches sans annotation reçoivent les boîtes détectées par
+l'InvoiceExtractor, en prédictions RectangleLabels (template
+label-studio/invoice-template.xml) marquées du model_version: les
+annotateurs corrigent les boîtes au lieu de les tracer.
+
+    - les documents d'un lot passent ensemble dans le pipeline de
+      l'extracteur (décodage, détection et OCR se chevauchent)
+    - l'OCR est facultatif: sans lui, seules les boîtes sont proposées
+    - chaque lot est envoyé en un appel (import/predictions), pendant que
+      le lot suivant est traité
+    - une tâche qui a déjà une prédiction de ce model_version est ignorée:
+      le job peut être relancé après une interruption ou un nouveau modèle
+
+Usage:
+    python -m api.pre_annotate
+    python -m api.pre_annotate --no-ocr --limit 500
+"""
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+from .label_studio import LabelStudioClient, LabelStudioError, prediction_from_extraction, with_retries
+
+
+def unlabeled_query(after_id: int = 0) -> str:
+    """Filtre Data Manager: tâches sans annotation d'identifiant supérieur à after_id, par identifiant"""
+    return json.dumps({'filters': {'conjunction': 'and', 'items': [
+        {'filter': 'filter:tasks:total_annotations', 'operator': 'equal', 'type': 'Number', 'value': 0},
+        {'filter': 'filter:tasks:id', 'operator': 'greater', 'type': 'Number', 'value': after_id},
+    ]}, 'ordering': ['tasks:id']})
+
+
+def pending_tasks(client: LabelStudioClient, model_version: str, page_size: int = 500) -> Iterator[Dict]:
+    """
+    Tâches sans annotation ni prédiction de ce model_version
+
+    Parcours par curseur sur l'identifiant (et non par numéro de page): une
+    tâche annotée pendant le job sort du filtre sans décaler les suivantes.
+    Le filtre sur les prédictions est appliqué ici et non côté serveur, pour
+    la même raison.
+    """
+    last_id = 0
+    while True:
+        # Première page seulement: la suivante repart du dernier identifiant lu
+        page = list(islice(client.iter_tasks(page_size=page_size, fields='all', query=unlabeled_query(last_id),
+                                             include='id,data,predictions_model_versions'), page_size))
+        for task in page:
+            if model_version not in (task.get('predictions_model_versions') or []):
+                yield task
+        if len(page) < page_size:
+            return
+        last_id = page[-1]['id']
+
+
+def task_file(task: Dict, invoices_dir: Optional[Path] = None) -> Optional[Path]:
+    """Fichier source d'une tâche (file_path de l'import, sinon nom dans invoices_dir)"""
+    data = task.get('data', {})
+    if data.get('file_path') and Path(data['file_path']).exists():
+        return Path(data['file_path'])
+    if invoices_dir is not None and data.get('filename'):
+        candidate = Path(invoices_dir) / data['filename']
+        if candidate.exists():
+            return candidate
+    return None
+
+
+def without_ocr(extractor):
+    """Retirer l'étage OCR (avant le démarrage du pipeline): boîtes seules"""
+    extractor.stages = [stage for stage in extractor.stages if stage.name != 'ocr']
+    return extractor
+
+
+def pre_annotate(client: LabelStudioClient, extractor, batch_size: int = 32,
+                 invoices_dir: Optional[Path] = None, limit: Optional[int] = None,
+                 max_attempts: int = 5, backoff_seconds: float = 2.0,
+                 progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+    """
+    Prédire et envoyer les boîtes des tâches non annotées, par lots
+
+    Args:
+        client: Client Label Studio
+        extractor: InvoiceExtractor chargé (submit() et model_version)
+        batch_size: Documents par lot (un appel d'envoi par lot)
+        invoices_dir: Répertoire où chercher les fichiers sans file_path valide
+        limit: Nombre maximum de tâches traitées
+        max_attempts: Tentatives par envoi (échecs temporaires)
+        backoff_seconds: Délai avant la première nouvelle tentative (doublé ensuite)
+        progress: Appelé avec le résultat de chaque lot envoyé
+
+    Returns:
+        Résumé: tâches prédites, boîtes, fichiers introuvables, erreurs, débit
+    """
+    started = time.perf_counter()
+    model_version = extractor.model_version
+    summary = {'model_version': model_version, 'tasks': 0, 'predicted': 0, 'boxes': 0, 'missing_files': [],
+               'errors': [], 'batches': 0}
+
+    def upload(batch: List) -> Dict:
+        predictions = [{**prediction_from_extraction(extraction, model_version), 'task': task_id}
+                       for task_id, extraction in batch]
+        try:
+            with_retries(lambda: client.import_predictions(predictions), max_attempts, backoff_seconds)
+        except LabelStudioError as e:
+            return {'predicted': 0, 'boxes': 0, 'errors': [(task_id, f"Envoi: {e}") for task_id, _ in batch]}
+        return {'predicted': len(predictions), 'boxes': sum(len(p['result']) for p in predictions), 'errors': []}
+
+    def collect(result: Dict):
+        summary['predicted'] += result['predicted']
+        summary['boxes'] += result['boxes']
+        summary['errors'].extend(result['errors'])
+        summary['batches'] += 1
+        if progress:
+            progress(result)
+
+    def run_batch(tasks: List[Dict]) -> List:
+        """Extraire un lot dans le pipeline; renvoie (task_id, extraction) des réussites"""
+        submitted = []
+        for task in tasks:
+            path = task_file(task, invoices_dir)
+            if path is None:
+                summary['missing_files'].append(task['id'])
+                continue
+            submitted.append((task['id'], extractor.submit(str(path), task['data'].get('filename'))))
+
+        extracted = []
+        for task_id, future in submitted:
+            try:
+                extracted.append((task_id, future.result().model_dump()))
+            except Exception as e:
+                summary['errors'].append((task_id, f"Extraction: {e}"))
+        return extracted
+
+    def batches() -> Iterator[List[Dict]]:
+        batch = []
+        for task in pending_tasks(client, model_version):
+            if limit is not None and summary['tasks'] >= limit:
+                break
+            summary['tasks'] += 1
+            batch.append(task)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    # Un envoi en cours pendant l'extraction du lot suivant
+    with ThreadPoolExecutor(max_workers=1) as uploader:
+        sending = None
+        for batch in batches():
+            extracted = run_batch(batch)
+            if sending is not None:
+                collect(sending.result())
+            sending = uploader.submit(upload, extracted) if extracted else None
+        if sending is not None:
+            collect(sending.result())
+
+    elapsed = time.perf_counter() - started
+    summary.update({
+        'elapsed_s': elapsed,
+        'tasks_per_second': summary['predicted'] / elapsed if elapsed > 0 else 0.0
+    })
+    return summary
+
+
+def main(argv: Optional[List[str]] = None):
+    """Point d'entrée: python -m api.pre_annotate"""
+    from .config import get_config
+    from .label_studio import client_from_config
+
+    parser = argparse.ArgumentParser(
+        prog="python -m api.pre_annotate",
+        description="Pré-annoter les tâches Label Studio non annotées avec le modèle courant"
+    )
+    parser.add_argument('--config', help="Configuration (settings.yaml)")
+    parser.add_argument('--model', help="Modèle à utiliser (défaut: le plus récent)")
+    parser.add_argument('--batch-size', type=int, help="Documents par lot")
+    parser.add_argument('--limit', type=int, help="Nombre maximum de tâches")
+    parser.add_argument('--no-ocr', action='store_true', help="Boîtes seules (sans texte lu)")
+    args = parser.parse_args(argv)
+
+    config = get_config(args.config)
+    job_config = config['label_studio'].get('pre_annotation', {})
+    ocr = job_config.get('ocr', True) and not args.no_ocr
+
+    from .extractor import InvoiceExtractor
+
+    extractor = InvoiceExtractor(args.config)
+    try:
+        extractor.load_model(args.model)
+    except FileNotFoundError as e:
+        print(f"❌ {e}")
+        return 1
+    # Traitement de fond: ni mode dégradé ni historique des extractions de l'API
+    extractor.load_governor = None
+    extractor.history = None
+    if not ocr:
+        without_ocr(extractor)
+
+    client = client_from_config(config, max_requests_per_minute=0)
+    print(f"🤖 Pré-annotation avec {extractor.model_version}{'' if ocr else ' (sans OCR)'}")
+
+    def progress(result):
+        errors = f", {len(result['errors'])} erreurs" if result['errors'] else ""
+        print(f"   📤 {result['predicted']} tâches, {result['boxes']} boîtes{errors}")
+
+    summary = pre_annotate(
+        client, extractor,
+        batch_size=args.batch_size or job_config.get('batch_size', 32),
+        invoices_dir=Path(config['dataset']['raw_data_path']),
+        limit=args.limit,
+        max_attempts=job_config.get('max_attempts', 5),
+        backoff_seconds=job_config.get('backoff_seconds', 2),
+        progress=progress
+    )
+    extractor.shutdown()
+
+    print(f"\n📊 {summary['predicted']}/{summary['tasks']} tâches pré-annotées "
+          f"({summary['boxes']} boîtes, {summary['tasks_per_second']:.1f} tâches/s)")
+    if summary['missing_files']:
+        print(f"⚠️  {len(summary['missing_files'])} fichiers introuvables (tâches {summary['missing_files'][:10]})")
+    for task_id, message in summary['errors'][:10]:
+        print(f"❌ Tâche {task_id}: {message}")
+    return 0 if not summary['errors'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,251 @@
+"""
+Profilage CPU par échantillonnage
+
+Deux usages:
+    - capture à la demande: toutes les piles de tous les threads du worker
+      sont échantillonnées pendant N secondes (/admin/profile)
+    - profilage par requête: un /extract sur N est suivi étage par étage,
+      seuls les threads qui traitent ce document sont échantillonnés; les
+      profils des requêtes les plus lentes sont conservés sur disque
+
+Le résultat est au format « collapsed stacks » (une pile par ligne,
+frames séparées par ';', suivie du nombre d'échantillons), lisible par
+flamegraph.pl, speedscope ou inferno.
+"""
+import heapq
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+def _frame_stack(frame, prefix: List[str]) -> str:
+    """Pile d'appels d'une frame, de la racine vers la feuille"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})")
+        frame = frame.f_back
+    names.extend(reversed(prefix))
+    return ';'.join(reversed(names))
+
+
+def collapsed(samples: Counter) -> str:
+    """Format collapsed stacks (piles les plus fréquentes en premier)"""
+    return ''.join(f"{stack} {count}\n" for stack, count in samples.most_common())
+
+
+class SamplingProfiler:
+    """Échantillonnage périodique des piles de tous les threads"""
+
+    def __init__(self, interval: float = 0.005):
+        """
+        Args:
+            interval: Intervalle entre deux échantillons (secondes)
+        """
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+
+    def run(self, seconds: float) -> str:
+        """
+        Échantillonner pendant `seconds` (bloque le thread appelant)
+
+        Returns:
+            Profil au format collapsed stacks
+        """
+        me = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        deadline = time.perf_counter() + seconds
+
+        while time.perf_counter() < deadline:
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                if ident not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                self.samples[_frame_stack(frame, [names.get(ident, str(ident))])] += 1
+            self.sample_count += 1
+            time.sleep(self.interval)
+
+        return collapsed(self.samples)
+
+
+class RequestProfile:
+    """Profil d'un document: échantillons des threads qui le traitent"""
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.samples: Counter = Counter()
+        self.started_at = datetime.now()
+        # Le thread d'échantillonnage écrit pendant que la requête peut lire
+        self._lock = threading.Lock()
+
+    def add_sample(self, stack: str):
+        """Compter un échantillon (thread d'échantillonnage)"""
+        with self._lock:
+            self.samples[stack] += 1
+
+    def snapshot(self) -> Counter:
+        """Copie cohérente des échantillons"""
+        with self._lock:
+            return Counter(self.samples)
+
+    @contextmanager
+    def attach(self, stage: str):
+        """Échantillonner le thread courant pendant l'exécution d'un étage"""
+        sampler = get_request_sampler()
+        ident = threading.get_ident()
+        sampler.track(ident, self, stage)
+        try:
+            yield
+        finally:
+            sampler.untrack(ident)
+
+    def collapsed(self) -> str:
+        return collapsed(self.snapshot())
+
+
+class RequestSampler:
+    """Thread d'échantillonnage des threads rattachés à un RequestProfile"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self._tracked: Dict[int, tuple] = {}
+        self._lock = threading.Lock()
+        self._active = threading.Event()
+        self._thread = None
+
+    def track(self, ident: int, profile: RequestProfile, stage: str):
+        with self._lock:
+            self._tracked[ident] = (profile, stage)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-sampler", daemon=True)
+                self._thread.start()
+        self._active.set()
+
+    def untrack(self, ident: int):
+        with self._lock:
+            self._tracked.pop(ident, None)
+            if not self._tracked:
+                self._active.clear()
+
+    def _run(self):
+        while True:
+            # Aucun coût quand aucune requête n'est profilée
+            self._active.wait()
+            with self._lock:
+                tracked = dict(self._tracked)
+            frames = sys._current_frames()
+            for ident, (profile, stage) in tracked.items():
+                frame = frames.get(ident)
+                if frame is not None:
+                    profile.add_sample(_frame_stack(frame, [stage]))
+            time.sleep(self.interval)
+
+
+_request_sampler: Optional[RequestSampler] = None
+_request_sampler_lock = threading.Lock()
+
+
+def get_request_sampler(interval: Optional[float] = None) -> RequestSampler:
+    """Échantillonneur partagé du processus (créé au premier usage)"""
+    global _request_sampler
+    with _request_sampler_lock:
+        if _request_sampler is None:
+            _request_sampler = RequestSampler(interval or 0.005)
+        elif interval is not None:
+            _request_sampler.interval = interval
+        return _request_sampler
+
+
+class SlowestProfiles:
+    """Conserver sur disque les profils des requêtes les plus lentes"""
+
+    def __init__(self, directory: str, keep: int = 20):
+        """
+        Args:
+            directory: Répertoire des profils (.collapsed + .json)
+            keep: Nombre de profils conservés
+        """
+        self.directory = Path(directory)
+        self.keep = keep
+        self._heap = []  # (durée, nom): le plus rapide en tête
+        self._lock = threading.Lock()
+
+        if self.directory.exists():
+            for meta_path in self.directory.glob('*.json'):
+                try:
+                    with open(meta_path, 'r', encoding='utf-8') as f:
+                        meta = json.load(f)
+                    self._heap.append((meta['total_ms'], meta_path.stem))
+                except (OSError, ValueError, KeyError):
+                    continue
+            heapq.heapify(self._heap)
+
+    def offer(self, profile: RequestProfile, total: float, timings: Dict[str, float]) -> bool:
+        """
+        Proposer un profil: conservé s'il fait partie des plus lents
+
+        Args:
+            profile: Profil de la requête
+            total: Durée de bout en bout (secondes)
+            timings: Durées par étage (secondes)
+
+        Returns:
+            True si le profil a été enregistré
+        """
+        total_ms = total * 1000
+        with self._lock:
+            if len(self._heap) >= self.keep and total_ms <= self._heap[0][0]:
+                return False
+
+            name = f"{profile.started_at.strftime('%Y%m%d_%H%M%S_%f')}_{total_ms:.0f}ms"
+            samples = profile.snapshot()
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with open(self.directory / f"{name}.collapsed", 'w', encoding='utf-8') as f:
+                f.write(collapsed(samples))
+            with open(self.directory / f"{name}.json", 'w', encoding='utf-8') as f:
+                json.dump({
+                    'name': name,
+                    'filename': profile.filename,
+                    'started_at': profile.started_at.isoformat(),
+                    'total_ms': total_ms,
+                    'stages_ms': {stage: seconds * 1000 for stage, seconds in timings.items()},
+                    'samples': sum(samples.values())
+                }, f, indent=2, ensure_ascii=False)
+
+            heapq.heappush(self._heap, (total_ms, name))
+            while len(self._heap) > self.keep:
+                _, evicted = heapq.heappop(self._heap)
+                for suffix in ('.collapsed', '.json'):
+                    try:
+                        os.unlink(self.directory / f"{evicted}{suffix}")
+                    except FileNotFoundError:
+                        pass
+            return True
+
+    def list(self) -> List[Dict]:
+        """Profils conservés, du plus lent au plus rapide"""
+        profiles = []
+        with self._lock:
+            names = [name for _, name in sorted(self._heap, reverse=True)]
+        for name in names:
+            try:
+                with open(self.directory / f"{name}.json", 'r', encoding='utf-8') as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return profiles
+
+    def path(self, name: str) -> Optional[Path]:
+        """Fichier collapsed d'un profil conservé (None si inconnu)"""
+        with self._lock:
+            known = any(entry == name for _, entry in self._heap)
+        return self.directory / f"{name}.collapsed" if known else None
@@ -0,0 +1,102 @@
+"""
+Rendu des pages et prétraitement des ROI au format canonique BGR
+
+Les fonctions écrivent dans des buffers réutilisables (voir buffers.py)
+plutôt que d'allouer une copie à chaque étape.
+"""
+from typing import Optional
+
+import numpy as np
+
+from .buffers import BufferPool, PagePool
+from .lazy import lazy_import
+
+# Dépendances lourdes chargées au premier usage
+cv2 = lazy_import('cv2')
+fitz = lazy_import('fitz')  # PyMuPDF
+
+
+# Zoom de rendu des PDF (2x pour une bonne qualité OCR)
+PDF_ZOOM = 2
+
+
+def render_pdf_page(pdf_path: str, page_pool: Optional[PagePool] = None,
+                    page_number: int = 0, zoom: float = PDF_ZOOM) -> np.ndarray:
+    """
+    Rendre une page de PDF en image BGR
+
+    La page est rendue sans canal alpha puis convertie directement dans
+    le buffer de destination, sans copie intermédiaire des pixels.
+
+    Args:
+        pdf_path: Chemin vers le PDF
+        page_pool: Pool de buffers de page (défaut: nouveau tableau)
+        page_number: Numéro de la page (0 = première)
+        zoom: Facteur de zoom du rendu
+
+    Returns:
+        Image BGR uint8
+    """
+    doc = fitz.open(pdf_path)
+    try:
+        pix = doc[page_number].get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+
+        # Vue sur les pixels du pixmap (pas de copie comme avec pix.samples)
+        src = np.frombuffer(pix.samples_mv, dtype=np.uint8).reshape(pix.h, pix.w, pix.n)
+
+        shape = (pix.h, pix.w, 3)
+        img = page_pool.acquire(shape) if page_pool is not None else np.empty(shape, dtype=np.uint8)
+        code = cv2.COLOR_GRAY2BGR if pix.n == 1 else cv2.COLOR_RGB2BGR
+        cv2.cvtColor(src, code, dst=img)
+    finally:
+        doc.close()
+
+    return img
+
+
+def to_gray(roi: np.ndarray, buffers: BufferPool) -> np.ndarray:
+    """Convertir une ROI BGR en niveaux de gris (buffer du thread courant)"""
+    if len(roi.shape) != 3:
+        return roi
+    return cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY, dst=buffers.get('gray', roi.shape[:2]))
+
+
+def preprocess_roi(roi_gray: np.ndarray, buffers: BufferPool, denoise: bool = True) -> np.ndarray:
+    """
+    Prétraiter une ROI en niveaux de gris pour l'OCR
+
+    Agrandissement x2, égalisation d'histogramme, débruitage puis
+    binarisation adaptative. Le résultat vit dans les buffers du thread
+    courant: il n'est valable que jusqu'au prochain appel dans ce thread.
+
+    Args:
+        roi_gray: ROI en niveaux de gris
+        buffers: Pool de buffers de travail
+        denoise: Débruitage NL-means (désactivé en mode dégradé)
+
+    Returns:
+        ROI binarisée
+    """
+    h, w = roi_gray.shape[:2]
+
+    # Augmenter la taille pour améliorer la précision
+    scale_factor = 2
+    size = (h * scale_factor, w * scale_factor)
+    roi_resized = cv2.resize(roi_gray, (size[1], size[0]),
+                             dst=buffers.get('resized', size),
+                             interpolation=cv2.INTER_CUBIC)
+
+    # Améliorer le contraste (en place)
+    cv2.equalizeHist(roi_resized, dst=roi_resized)
+
+    # Débruitage (étape la plus coûteuse)
+    if denoise:
+        roi_denoised = cv2.fastNlMeansDenoising(roi_resized, dst=buffers.get('denoised', size))
+    else:
+        roi_denoised = roi_resized
+
+    # Binarisation adaptative pour améliorer la lisibilité (en place)
+    return cv2.adaptiveThreshold(
+        roi_denoised, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+        cv2.THRESH_BINARY, 11, 2, dst=roi_denoised
+    )
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Rejeu des requêtes capturées (performance et non-régression)
+
+Relance les fichiers capturés par /extract (voir api/capture.py) avec
+une configuration ou un modèle donné, puis compare au résultat capturé:
+    - latence de bout en bout et par étage
+    - valeurs des champs (modifiés, disparus, apparus)
+
+Le rejeu est déterministe: captures dans l'ordre chronologique, un
+document à la fois, sans cache OCR ni mode dégradé.
+
+Usage:
+    python -m api.replay data/captures
+    python -m api.replay data/captures --model data/models/candidat.pt --output rejeu.json
+"""
+import argparse
+import json
+import sys
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+
+from .capture import CaptureStore
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+def _fields_by_label(fields: List[Dict]) -> Dict[str, List[Dict]]:
+    """Champs groupés par label, triés par position (haut -> bas, gauche -> droite)"""
+    grouped = defaultdict(list)
+    for field in fields:
+        grouped[field['label']].append(field)
+    for label in grouped:
+        grouped[label].sort(key=lambda f: ((f.get('bbox') or {}).get('y', 0), (f.get('bbox') or {}).get('x', 0)))
+    return grouped
+
+
+def diff_fields(captured: List[Dict], replayed: List[Dict]) -> Dict:
+    """
+    Comparer les champs capturés et rejoués
+
+    Les champs de même label sont appariés dans l'ordre de lecture
+    (plusieurs ligne_produit par facture).
+
+    Returns:
+        Champs identiques, modifiés, disparus et apparus
+    """
+    before, after = _fields_by_label(captured), _fields_by_label(replayed)
+    result = {'same': 0, 'changed': [], 'missing': [], 'added': []}
+
+    for label in sorted(set(before) | set(after)):
+        old, new = before.get(label, []), after.get(label, [])
+        for i in range(max(len(old), len(new))):
+            if i >= len(new):
+                result['missing'].append({'label': label, 'value': old[i]['value']})
+            elif i >= len(old):
+                result['added'].append({'label': label, 'value': new[i]['value']})
+            elif old[i]['value'] == new[i]['value']:
+                result['same'] += 1
+            else:
+                result['changed'].append({
+                    'label': label,
+                    'before': old[i]['value'],
+                    'after': new[i]['value'],
+                    'confidence_delta': new[i]['confidence'] - old[i]['confidence']
+                })
+    return result
+
+
+def replay(store: CaptureStore, extractor, limit: Optional[int] = None, progress=None) -> Dict:
+    """
+    Rejouer les captures avec un extracteur
+
+    Args:
+        store: Captures
+        extractor: InvoiceExtractor (modèle chargé)
+        limit: Nombre maximum de captures
+        progress: Fonction appelée après chaque document (capture, résultat)
+
+    Returns:
+        Rapport: résumé, latences par étage, différences par document
+    """
+    documents = []
+    latency = defaultdict(lambda: {'captured': [], 'replayed': []})
+    changed_labels = Counter()
+    totals = Counter()
+
+    for capture in store.iter_captures(limit):
+        entry = {'id': capture['id'], 'filename': capture['filename']}
+        start = time.perf_counter()
+        try:
+            extraction = extractor.extract_from_file(capture['path'], filename=capture['filename'])
+        except Exception as e:
+            entry['error'] = str(e)
+            totals['errors'] += 1
+            documents.append(entry)
+            if progress:
+                progress(capture, entry)
+            continue
+        elapsed = time.perf_counter() - start
+
+        replayed_timings = {name: seconds * 1000 for name, seconds in extraction._stage_timings.items()}
+        replayed_timings.setdefault('total', elapsed * 1000)
+        for stage, ms in capture['timings_ms'].items():
+            if stage in replayed_timings:
+                latency[stage]['captured'].append(ms)
+                latency[stage]['replayed'].append(replayed_timings[stage])
+
+        replayed = json.loads(extraction.model_dump_json())
+        diff = diff_fields(capture['extraction']['fields'], replayed['fields'])
+        for key in ('changed', 'missing', 'added'):
+            totals[key] += len(diff[key])
+            changed_labels.update(item['label'] for item in diff[key])
+        totals['same'] += diff['same']
+
+        entry.update({
+            'captured_ms': capture['timings_ms'].get('total'),
+            'replayed_ms': replayed_timings['total'],
+            'captured_model': capture['extraction']['model_version'],
+            'replayed_model': extraction.model_version,
+            'overall_confidence_delta': extraction.overall_confidence
+                                        - capture['extraction']['overall_confidence'],
+            'diff': diff
+        })
+        documents.append(entry)
+        if progress:
+            progress(capture, entry)
+
+    compared = totals['same'] + totals['changed'] + totals['missing'] + totals['added']
+    stages = {}
+    for stage, series in latency.items():
+        stages[stage] = {
+            side: {'p50_ms': _percentile(values, 50), 'p95_ms': _percentile(values, 95),
+                   'mean_ms': sum(values) / len(values) if values else None}
+            for side, values in series.items()
+        }
+
+    return {
+        'summary': {
+            'documents': len(documents),
+            'errors': totals['errors'],
+            'fields_compared': compared,
+            'field_agreement': totals['same'] / compared if compared else None,
+            'fields_changed': totals['changed'],
+            'fields_missing': totals['missing'],
+            'fields_added': totals['added'],
+            'changes_by_label': dict(changed_labels.most_common())
+        },
+        'latency': stages,
+        'documents': documents
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    """Point d'entrée: python -m api.replay"""
+    parser = argparse.ArgumentParser(
+        prog="python -m api.replay",
+        description="Rejouer les requêtes capturées et comparer latences et champs"
+    )
+    parser.add_argument('captures', help="Répertoire des captures (api.capture.directory)")
+    parser.add_argument('--model', help="Modèle à évaluer (défaut: le plus récent)")
+    parser.add_argument('--config', help="Configuration à évaluer (settings.yaml)")
+    parser.add_argument('--limit', type=int, help="Nombre maximum de captures")
+    parser.add_argument('--keep-cache', action='store_true', help="Garder le cache OCR (rejeu non déterministe)")
+    parser.add_argument('--output', help="Rapport JSON")
+    args = parser.parse_args(argv)
+
+    from .extractor import InvoiceExtractor
+
+    store = CaptureStore(args.captures, max_bytes=float('inf'))
+    if not len(store):
+        print(f"❌ Aucune capture dans {args.captures}")
+        return 1
+
+    extractor = InvoiceExtractor(args.config)
+    extractor.load_model(args.model)
+    extractor.load_governor = None
+    # Rejeu: ne pas mêler les résultats à l'historique de production
+    extractor.history = None
+    if not args.keep_cache:
+        extractor.ocr_cache = None
+
+    print(f"🔁 Rejeu de {min(len(store), args.limit or len(store))} captures avec {extractor.model_version}")
+
+    def progress(capture, entry):
+        if 'error' in entry:
+            print(f"   ❌ {entry['filename']}: {entry['error']}")
+            return
+        diff = entry['diff']
+        changes = len(diff['changed']) + len(diff['missing']) + len(diff['added'])
+        status = "✅" if not changes else f"⚠️  {changes} champ(s) différent(s)"
+        print(f"   {status} {entry['filename']} "
+              f"({entry['captured_ms'] or 0:.0f} ms -> {entry['replayed_ms']:.0f} ms)")
+
+    report = replay(store, extractor, limit=args.limit, progress=progress)
+    summary = report['summary']
+
+    print(f"\n📊 {summary['documents']} documents, {summary['errors']} erreurs")
+    if summary['field_agreement'] is not None:
+        print(f"   Champs identiques: {summary['field_agreement']:.1%} "
+              f"({summary['fields_changed']} modifiés, {summary['fields_missing']} disparus, "
+              f"{summary['fields_added']} apparus)")
+    for stage, sides in report['latency'].items():
+        before, after = sides['captured']['p50_ms'], sides['replayed']['p50_ms']
+        print(f"   {stage:10s} p50 {before:8.1f} ms -> {after:8.1f} ms")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"💾 Rapport: {args.output}")
+
+    extractor.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""
+Réponses HTTP à sérialisation rapide
+
+Les modèles de réponse sont construits en interne à partir de données
+déjà validées: ils sont sérialisés directement en octets par
+pydantic-core, sans repasser par la validation du response_model ni
+par l'encodeur JSON générique de FastAPI.
+
+Le format est choisi selon l'en-tête Accept:
+    - application/json (défaut)
+    - application/msgpack / application/x-msgpack (si msgpack est installé)
+"""
+from typing import Dict, Optional
+
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+try:
+    import msgpack
+except ImportError:  # Dépendance optionnelle
+    msgpack = None
+
+
+MSGPACK_MEDIA_TYPES = ('application/msgpack', 'application/x-msgpack')
+
+
+class FastJSONResponse(Response):
+    """Réponse JSON sérialisée directement par pydantic-core"""
+
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        if isinstance(content, BaseModel):
+            return content.__pydantic_serializer__.to_json(content)
+        if isinstance(content, bytes):
+            return content
+        # Contenu non pydantic (dict...): même sérialiseur, sans validation
+        from pydantic_core import to_json
+        return to_json(content)
+
+
+class MsgPackResponse(Response):
+    """Réponse MessagePack (nécessite le paquet msgpack)"""
+
+    media_type = "application/msgpack"
+
+    def render(self, content) -> bytes:
+        if msgpack is None:
+            raise RuntimeError("msgpack n'est pas installé (pip install msgpack)")
+        if isinstance(content, BaseModel):
+            content = content.model_dump(mode='json')
+        return msgpack.packb(content, use_bin_type=True)
+
+
+def wants_msgpack(accept: Optional[str]) -> bool:
+    """Le client demande-t-il du MessagePack (et est-il disponible) ?"""
+    if not accept or msgpack is None:
+        return False
+    return any(media_type in accept for media_type in MSGPACK_MEDIA_TYPES)
+
+
+def negotiate_response(content, accept: Optional[str] = None, status_code: int = 200) -> Response:
+    """
+    Construire la réponse dans le format demandé par l'en-tête Accept
+
+    Args:
+        content: Modèle pydantic (ou dict) à renvoyer
+        accept: Valeur de l'en-tête Accept de la requête
+        status_code: Code HTTP
+
+    Returns:
+        FastJSONResponse ou MsgPackResponse
+    """
+    if wants_msgpack(accept):
+        return MsgPackResponse(content, status_code=status_code)
+    return FastJSONResponse(content, status_code=status_code)
+
+
+def server_timing(timings: Dict[str, float]) -> str:
+    """
+    En-tête Server-Timing à partir des durées par étage
+
+    Args:
+        timings: Durées en secondes (decode, detect, ocr, assemble, queue, total...)
+
+    Returns:
+        Valeur de l'en-tête, ex: "decode;dur=12.1, detect;dur=48.0"
+    """
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items())
@@ -0,0 +1,70 @@
+"""
+Regroupement des requêtes identiques en cours (single-flight)
+
+Quand un client relance une requête après un timeout, ou que deux
+systèmes envoient le même fichier en même temps, une seule extraction
+est lancée: les requêtes identiques arrivées pendant son exécution s'y
+rattachent et reçoivent le même résultat.
+
+Ce n'est pas un cache: la clé est oubliée dès que l'extraction se
+termine. Le regroupement est local au worker (une boucle asyncio).
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """Exécution unique des tâches concurrentes de même clé"""
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Exécuter func() ou se rattacher à l'exécution en cours pour la même clé
+
+        L'exécution tourne dans une tâche indépendante: si la requête qui
+        l'a lancée est annulée (client déconnecté), les autres requêtes
+        rattachées reçoivent quand même le résultat.
+
+        Args:
+            key: Clé de regroupement
+            func: Coroutine à exécuter (appelée seulement si aucune n'est en cours)
+
+        Returns:
+            Résultat de l'exécution (partagé entre les requêtes regroupées)
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+            self.executions += 1
+        else:
+            self.coalesced += 1
+
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Future):
+        """Retirer une exécution terminée"""
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Marquer l'exception comme lue (elle a été propagée aux appelants)
+        if not task.cancelled():
+            task.exception()
+
+    def in_flight(self) -> int:
+        """Nombre d'exécutions en cours"""
+        return len(self._inflight)
+
+    def get_stats(self) -> Dict:
+        """Statistiques de regroupement"""
+        total = self.executions + self.coalesced
+        return {
+            'in_flight': len(self._inflight),
+            'executions': self.executions,
+            'coalesced': self.coalesced,
+            'coalescing_rate': self.coalesced / total if total else 0.0
+        }
@@ -0,0 +1,224 @@
+"""
+Registre local des fournisseurs indexé par SIRET
+
+Une fois le SIRET lu et validé, le nom et l'adresse du fournisseur sont
+connus: inutile d'OCRiser les blocs d'adresse (les plus grandes ROI).
+Le registre est une base SQLite alimentée depuis un export CSV du
+référentiel fournisseurs.
+"""
+import csv
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+
+# Corrections OCR courantes sur des champs numériques
+OCR_DIGIT_FIXES = str.maketrans({'O': '0', 'o': '0', 'I': '1', 'l': '1', 'S': '5', 'B': '8'})
+
+
+def normalize_siret(text: str) -> str:
+    """Ne garder que les chiffres d'un SIRET lu par OCR"""
+    # Séquences de chiffres (et de lettres souvent confondues avec des chiffres)
+    runs = re.findall(r'[0-9OoIlSB][0-9OoIlSB .]*', text)
+
+    candidates = []
+    for run in runs:
+        # Lettres en bordure: souvent le mot suivant (« 00074 SAS »), pas un chiffre mal lu
+        bounded = re.sub(r'^[ .OoIlSB]+|[ .OoIlSB]+$', '', run)
+        for variant, substituted_edges in ((bounded, False), (run, True)):
+            digits = re.sub(r'\D', '', variant.translate(OCR_DIGIT_FIXES))
+            if digits:
+                real_digits = sum(c.isdigit() for c in variant)
+                candidates.append(((len(digits) == 14, real_digits, not substituted_edges), digits))
+    if not candidates:
+        return ''
+
+    # Une séquence de 14 chiffres d'abord, puis celle qui contient le plus de vrais chiffres
+    return max(candidates)[1]
+
+
+def is_valid_siret(siret: str) -> bool:
+    """
+    Vérifier un SIRET (14 chiffres, clé de Luhn)
+
+    Les établissements de La Poste (SIREN 356000000) suivent une règle
+    particulière: la somme des chiffres est un multiple de 5.
+    """
+    if len(siret) != 14 or not siret.isdigit():
+        return False
+
+    if siret.startswith('356000000'):
+        return sum(int(c) for c in siret) % 5 == 0
+
+    total = 0
+    for i, c in enumerate(reversed(siret)):
+        digit = int(c)
+        if i % 2 == 1:
+            digit *= 2
+            if digit > 9:
+                digit -= 9
+        total += digit
+    return total % 10 == 0
+
+
+def _substitution_variants(siret: str) -> List[str]:
+    """Tous les SIRET valides à un chiffre près (erreur OCR d'un caractère)"""
+    variants = []
+    for i, original in enumerate(siret):
+        for digit in '0123456789':
+            if digit != original:
+                candidate = siret[:i] + digit + siret[i + 1:]
+                if is_valid_siret(candidate):
+                    variants.append(candidate)
+    return variants
+
+
+class SupplierRegistry:
+    """Registre des fournisseurs (SQLite), recherche exacte et approchée par SIRET"""
+
+    def __init__(self, db_path: str):
+        """
+        Ouvrir (ou créer) le registre
+
+        Args:
+            db_path: Chemin vers la base SQLite
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+
+        with self._lock:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS suppliers (
+                    siret TEXT PRIMARY KEY,
+                    siren TEXT NOT NULL,
+                    nom TEXT NOT NULL,
+                    adresse TEXT NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_suppliers_siren ON suppliers (siren)")
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM suppliers").fetchone()[0]
+
+    def add_many(self, rows: Iterable[Dict[str, str]]) -> int:
+        """
+        Ajouter ou remplacer des fournisseurs
+
+        Args:
+            rows: Dictionnaires avec les clés siret, nom, adresse
+
+        Returns:
+            Nombre de fournisseurs enregistrés
+        """
+        records = []
+        for row in rows:
+            siret = normalize_siret(row.get('siret', ''))
+            if len(siret) != 14:
+                continue
+            records.append((siret, siret[:9], row.get('nom', '').strip(), row.get('adresse', '').strip()))
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO suppliers (siret, siren, nom, adresse) VALUES (?, ?, ?, ?)",
+                records
+            )
+            self._conn.commit()
+        return len(records)
+
+    def load_csv(self, csv_path: str, siret_column: str = 'siret',
+                 name_column: str = 'nom', address_column: str = 'adresse') -> int:
+        """
+        Charger un export CSV du référentiel fournisseurs
+
+        Le séparateur (virgule ou point-virgule) est détecté automatiquement.
+
+        Args:
+            csv_path: Chemin vers le fichier CSV
+            siret_column, name_column, address_column: Noms des colonnes
+
+        Returns:
+            Nombre de fournisseurs chargés
+        """
+        with open(csv_path, 'r', encoding='utf-8-sig', newline='') as f:
+            sample = f.read(4096)
+            f.seek(0)
+            try:
+                dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+            except csv.Error:
+                dialect = csv.excel
+
+            reader = csv.DictReader(f, dialect=dialect)
+            rows = (
+                {
+                    'siret': row.get(siret_column) or '',
+                    'nom': row.get(name_column) or '',
+                    'adresse': row.get(address_column) or ''
+                }
+                for row in reader
+            )
+            return self.add_many(rows)
+
+    def lookup(self, siret_text: str, fuzzy: bool = True) -> Optional[Dict[str, str]]:
+        """
+        Chercher un fournisseur à partir d'un SIRET lu par OCR
+
+        Ordre de recherche:
+            1. SIRET exact
+            2. SIRET valide à un chiffre près (un seul candidat connu)
+            3. SIREN (9 premiers chiffres) correspondant à un seul établissement
+
+        Les recherches approchées ne servent qu'à corriger une erreur de
+        lecture: un SIRET lu dont la clé de Luhn est valide mais absent du
+        registre est celui d'un autre établissement, jamais remplacé.
+
+        Args:
+            siret_text: Texte OCR du champ SIRET
+            fuzzy: Autoriser les recherches approchées (2 et 3)
+
+        Returns:
+            Dictionnaire siret/nom/adresse/match, ou None
+        """
+        siret = normalize_siret(siret_text)
+        if len(siret) != 14:
+            return None
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT siret, nom, adresse FROM suppliers WHERE siret = ?", (siret,)
+            ).fetchone()
+            if row is not None:
+                return {**dict(row), 'match': 'exact'}
+
+            if not fuzzy or is_valid_siret(siret):
+                return None
+
+            variants = _substitution_variants(siret)
+            if variants:
+                placeholders = ','.join('?' * len(variants))
+                rows = self._conn.execute(
+                    f"SELECT siret, nom, adresse FROM suppliers WHERE siret IN ({placeholders})",
+                    variants
+                ).fetchall()
+                if len(rows) == 1:
+                    return {**dict(rows[0]), 'match': 'fuzzy'}
+
+            rows = self._conn.execute(
+                "SELECT siret, nom, adresse FROM suppliers WHERE siren = ? LIMIT 2", (siret[:9],)
+            ).fetchall()
+            if len(rows) == 1:
+                return {**dict(rows[0]), 'match': 'siren'}
+
+        return None
+
+    def close(self):
+        """Fermer la base"""
+        with self._lock:
+            self._conn.close()
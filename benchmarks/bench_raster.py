@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Benchmark du rendu des pages et du prétraitement des ROI
+
+Compare l'ancien chemin (copie de pix.samples, conversion RGBA->RGB,
+une copie par étape de prétraitement) au chemin actuel (rendu sans alpha
+vers un buffer de page réutilisé, buffers de travail par thread).
+
+Mesures par requête:
+    - temps moyen
+    - pic de mémoire transitoire (tracemalloc)
+    - RSS maximal du processus (mesuré dans un sous-processus par variante)
+
+Usage:
+    python benchmarks/bench_raster.py
+    python benchmarks/bench_raster.py --iterations 50 --rois 12
+"""
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import cv2
+import fitz  # PyMuPDF
+import numpy as np
+
+from api.buffers import BufferPool, PagePool
+from api.raster import preprocess_roi, render_pdf_page, to_gray
+
+# Couleurs
+class Colors:
+    GREEN = '\033[92m'
+    YELLOW = '\033[93m'
+    RED = '\033[91m'
+    BLUE = '\033[94m'
+    RESET = '\033[0m'
+
+
+# ============================================
+# Ancien chemin (référence)
+# ============================================
+
+def legacy_pdf_to_image(pdf_path: str) -> np.ndarray:
+    """Rendu tel qu'il était fait avant les pools de buffers"""
+    doc = fitz.open(pdf_path)
+    page = doc[0]
+    pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))
+    img = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.h, pix.w, pix.n)
+    if img.shape[2] == 4:
+        img = cv2.cvtColor(img, cv2.COLOR_RGBA2RGB)
+    doc.close()
+    return img
+
+
+def legacy_preprocess(roi: np.ndarray) -> np.ndarray:
+    """Prétraitement tel qu'il était fait avant les pools de buffers"""
+    roi_gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
+    roi_resized = cv2.resize(roi_gray, None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC)
+    roi_enhanced = cv2.equalizeHist(roi_resized)
+    roi_denoised = cv2.fastNlMeansDenoising(roi_enhanced)
+    return cv2.adaptiveThreshold(roi_denoised, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                 cv2.THRESH_BINARY, 11, 2)
+
+
+# ============================================
+# Variantes mesurées
+# ============================================
+
+def make_pdf(path: Path):
+    """Créer une facture PDF synthétique (A4, quelques blocs de texte)"""
+    doc = fitz.open()
+    page = doc.new_page(width=595, height=842)
+    page.insert_text((50, 60), "ACME SARL - 1 rue de Paris, 75001 Paris", fontsize=12)
+    page.insert_text((50, 80), "SIRET 732 829 320 00074", fontsize=10)
+    page.insert_text((400, 60), "Facture N° FA-2024-0042", fontsize=12)
+    for i in range(20):
+        page.insert_text((50, 200 + i * 20), f"Ligne {i + 1}  Prestation  {100 + i},00 €", fontsize=10)
+    page.insert_text((400, 700), "Total TTC : 2 450,00 €", fontsize=12)
+    doc.save(str(path))
+    doc.close()
+
+
+def roi_boxes(image: np.ndarray, count: int):
+    """Boîtes de ROI de tailles variées (du montant au bloc d'adresse)"""
+    h, w = image.shape[:2]
+    rng = np.random.default_rng(0)
+    boxes = []
+    for _ in range(count):
+        bw = int(rng.integers(w // 10, w // 2))
+        bh = int(rng.integers(h // 60, h // 8))
+        x = int(rng.integers(0, w - bw))
+        y = int(rng.integers(0, h - bh))
+        boxes.append((x, y, x + bw, y + bh))
+    return boxes
+
+
+def request_legacy(pdf_path: str, n_rois: int):
+    """Une requête avec l'ancien chemin"""
+    image = legacy_pdf_to_image(pdf_path)
+    # L'ancien chemin passait du RGB à un prétraitement BGR
+    for x1, y1, x2, y2 in roi_boxes(image, n_rois):
+        legacy_preprocess(image[y1:y2, x1:x2])
+
+
+def make_request_pooled():
+    """Une requête avec le chemin actuel (pools partagés entre requêtes)"""
+    page_pool = PagePool()
+    buffers = BufferPool()
+
+    def request(pdf_path: str, n_rois: int):
+        image = render_pdf_page(pdf_path, page_pool=page_pool)
+        for x1, y1, x2, y2 in roi_boxes(image, n_rois):
+            preprocess_roi(to_gray(image[y1:y2, x1:x2], buffers), buffers)
+        page_pool.release(image)
+
+    return request
+
+
+VARIANTS = {
+    'legacy': lambda: request_legacy,
+    'pooled': make_request_pooled
+}
+
+
+def measure(variant: str, pdf_path: str, iterations: int, n_rois: int) -> dict:
+    """Mesurer une variante dans le processus courant"""
+    request = VARIANTS[variant]()
+
+    # Échauffement (remplit les pools)
+    request(pdf_path, n_rois)
+
+    tracemalloc.start()
+    peaks = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        tracemalloc.reset_peak()
+        current_before, _ = tracemalloc.get_traced_memory()
+        request(pdf_path, n_rois)
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - current_before)
+    elapsed = time.perf_counter() - start
+    tracemalloc.stop()
+
+    return {
+        'variant': variant,
+        'iterations': iterations,
+        'rois_per_request': n_rois,
+        'mean_ms': elapsed / iterations * 1000,
+        'transient_peak_mb': float(np.mean(peaks)) / 1e6,
+        'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    }
+
+
+def main():
+    """Main"""
+    parser = argparse.ArgumentParser(description="Benchmark rendu PDF + prétraitement ROI")
+    parser.add_argument('--iterations', type=int, default=20, help='Requêtes mesurées par variante')
+    parser.add_argument('--rois', type=int, default=9, help='ROI prétraitées par requête')
+    parser.add_argument('--output', type=str, help='Fichier JSON de résultats')
+    parser.add_argument('--variant', choices=list(VARIANTS), help=argparse.SUPPRESS)
+    parser.add_argument('--pdf', type=str, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # Mode sous-processus: une seule variante, résultat JSON sur stdout
+    if args.variant:
+        print(json.dumps(measure(args.variant, args.pdf, args.iterations, args.rois)))
+        return
+
+    print(f"\n{Colors.BLUE}{'='*60}{Colors.RESET}")
+    print(f"{Colors.BLUE}⏱️  BENCHMARK RENDU + PRÉTRAITEMENT{Colors.RESET}")
+    print(f"{Colors.BLUE}{'='*60}{Colors.RESET}\n")
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = Path(tmp) / 'facture.pdf'
+        make_pdf(pdf_path)
+
+        # Un sous-processus par variante pour un RSS maximal comparable
+        for variant in VARIANTS:
+            output = subprocess.run(
+                [sys.executable, __file__, '--variant', variant, '--pdf', str(pdf_path),
+                 '--iterations', str(args.iterations), '--rois', str(args.rois)],
+                capture_output=True, text=True, check=True
+            ).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"  {'Variante':10s} {'ms/requête':>12s} {'pic transitoire':>16s} {'RSS max':>10s}")
+    for r in results:
+        print(f"  {r['variant']:10s} {r['mean_ms']:12.1f} {r['transient_peak_mb']:13.1f} MB {r['max_rss_mb']:7.0f} MB")
+
+    legacy, pooled = results
+    if legacy['transient_peak_mb'] > 0:
+        gain = 1 - pooled['transient_peak_mb'] / legacy['transient_peak_mb']
+        print(f"\n{Colors.GREEN}✅ Pic mémoire transitoire réduit de {gain:.0%}{Colors.RESET}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Résultats: {args.output}")
+
+    print()
+
+
+if __name__ == '__main__':
+    main()
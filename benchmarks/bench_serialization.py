@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la construction + sérialisation des réponses d'extraction
+
+Compare pour 10, 100 et 1000 champs:
+    - default: construction validée, puis chemin FastAPI par défaut
+      (revalidation par le response_model, encodage générique, json.dumps)
+    - fast:    construction sans revalidation + FastJSONResponse
+    - msgpack: construction sans revalidation + MsgPackResponse (si installé)
+
+Usage:
+    python benchmarks/bench_serialization.py
+    python benchmarks/bench_serialization.py --sizes 10 100 1000 10000 --output serialization.json
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi.encoders import jsonable_encoder
+
+from api.models import BoundingBox, ExtractedField, ExtractionResponse, InvoiceExtraction
+from api.responses import FastJSONResponse, MsgPackResponse, msgpack
+
+# Couleurs
+class Colors:
+    GREEN = '\033[92m'
+    YELLOW = '\033[93m'
+    RED = '\033[91m'
+    BLUE = '\033[94m'
+    RESET = '\033[0m'
+
+
+def make_rows(n_fields: int):
+    """Données brutes d'extraction (comme produites par les étages)"""
+    labels = ['numero_facture', 'date_facture', 'montant_ttc', 'ligne_produit']
+    return [
+        (labels[i % len(labels)], f"Prestation {i} - 1 234,56", 0.5 + (i % 50) / 100,
+         [0.1, i / (n_fields + 1), 0.3, 0.02])
+        for i in range(n_fields)
+    ]
+
+
+def default_path(rows) -> bytes:
+    """Construction validée + chemin de sérialisation par défaut de FastAPI"""
+    fields = [
+        ExtractedField(label=label, value=value, confidence=conf,
+                       bbox=BoundingBox(x=box[0], y=box[1], width=box[2], height=box[3]))
+        for label, value, conf, box in rows
+    ]
+    response = ExtractionResponse(
+        success=True,
+        data=InvoiceExtraction(filename="facture.pdf", fields=fields, overall_confidence=0.9,
+                               needs_review=False, model_version="bench"),
+        message="Extraction réussie"
+    )
+
+    # Ce que fait FastAPI avec response_model: dump, revalidation, encodage, json.dumps
+    revalidated = ExtractionResponse.model_validate(response.model_dump())
+    content = jsonable_encoder(revalidated)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def trusted_response(rows) -> ExtractionResponse:
+    """Construction sans revalidation (comme InvoiceExtractor.to_extraction)"""
+    fields = [
+        ExtractedField.model_construct(
+            label=label, value=value, confidence=conf,
+            bbox=BoundingBox.model_construct(x=box[0], y=box[1], width=box[2], height=box[3]))
+        for label, value, conf, box in rows
+    ]
+    return ExtractionResponse.model_construct(
+        success=True,
+        data=InvoiceExtraction.model_construct(filename="facture.pdf", fields=fields, overall_confidence=0.9,
+                                               needs_review=False, model_version="bench"),
+        message="Extraction réussie"
+    )
+
+
+def fast_path(rows) -> bytes:
+    return FastJSONResponse(trusted_response(rows)).body
+
+
+def msgpack_path(rows) -> bytes:
+    return MsgPackResponse(trusted_response(rows)).body
+
+
+def time_path(func, rows, min_time: float = 0.5) -> dict:
+    """Temps moyen par réponse (répété pendant au moins min_time secondes)"""
+    func(rows)  # Échauffement
+    iterations = 0
+    start = time.perf_counter()
+    while True:
+        body = func(rows)
+        iterations += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+    return {'mean_ms': elapsed / iterations * 1000, 'iterations': iterations, 'bytes': len(body)}
+
+
+def main():
+    """Main"""
+    parser = argparse.ArgumentParser(description="Benchmark de sérialisation des réponses")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000], help='Nombres de champs')
+    parser.add_argument('--min-time', type=float, default=0.5, help='Durée minimale par mesure (s)')
+    parser.add_argument('--output', type=str, help='Fichier JSON de résultats')
+    args = parser.parse_args()
+
+    paths = {'default': default_path, 'fast': fast_path}
+    if msgpack is not None:
+        paths['msgpack'] = msgpack_path
+
+    print(f"\n{Colors.BLUE}{'='*60}{Colors.RESET}")
+    print(f"{Colors.BLUE}⏱️  BENCHMARK SÉRIALISATION DES RÉPONSES{Colors.RESET}")
+    print(f"{Colors.BLUE}{'='*60}{Colors.RESET}\n")
+
+    if msgpack is None:
+        print(f"{Colors.YELLOW}💡 msgpack non installé: variante MessagePack ignorée{Colors.RESET}\n")
+
+    # Les deux chemins JSON doivent produire le même contenu
+    sample = make_rows(3)
+    assert json.loads(default_path(sample))['data']['fields'] == json.loads(fast_path(sample))['data']['fields']
+
+    results = []
+    print(f"  {'Champs':>7s} {'Chemin':10s} {'ms/réponse':>11s} {'octets':>10s} {'gain':>7s}")
+    for size in args.sizes:
+        rows = make_rows(size)
+        baseline = None
+        for name, func in paths.items():
+            r = time_path(func, rows, args.min_time)
+            r.update({'fields': size, 'path': name})
+            baseline = baseline or r['mean_ms']
+            r['speedup'] = baseline / r['mean_ms']
+            results.append(r)
+            print(f"  {size:7d} {name:10s} {r['mean_ms']:11.3f} {r['bytes']:10d} {r['speedup']:6.1f}x")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Résultats: {args.output}")
+
+    print()
+
+
+if __name__ == '__main__':
+    main()
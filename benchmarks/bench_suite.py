@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Suite de benchmarks de l'extraction sur le corpus synthétique
+
+Mesure chaque étape sur le corpus généré par benchmarks/corpus.py:
+    - pdf_to_image           (par type de document, résolution, pages, densité)
+    - ocr                    (_extract_text_from_bbox par label et profil Tesseract)
+    - detect                 (inférence YOLO, si un modèle est disponible)
+    - extract_from_file      (bout en bout, si un modèle est disponible)
+
+L'OCR est mesuré sur les positions réelles des champs (manifest du
+corpus): aucun modèle n'est nécessaire pour les deux premières étapes.
+
+Le rapport JSON (environnement, commit, versions, statistiques par étape)
+permet de comparer deux commits ou deux backends OCR/inférence:
+
+Usage:
+    python benchmarks/bench_suite.py
+    python benchmarks/bench_suite.py --model data/models/best.pt --tag gpu-t4
+    python benchmarks/bench_suite.py --compare avant.json apres.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import cv2
+import numpy as np
+
+from benchmarks.corpus import DEFAULT_OUTPUT as DEFAULT_CORPUS, generate_corpus
+
+RESULTS_DIR = Path(__file__).parent / 'results'
+
+# Couleurs
+class Colors:
+    GREEN = '\033[92m'
+    YELLOW = '\033[93m'
+    RED = '\033[91m'
+    BLUE = '\033[94m'
+    RESET = '\033[0m'
+
+
+def stage_stats(samples) -> dict:
+    """Statistiques d'une série de durées (secondes -> millisecondes)"""
+    values = np.asarray(samples, dtype=np.float64) * 1000
+    if values.size == 0:
+        return {'n': 0}
+    return {
+        'n': int(values.size),
+        'mean_ms': float(values.mean()),
+        'p50_ms': float(np.percentile(values, 50)),
+        'p95_ms': float(np.percentile(values, 95)),
+        'min_ms': float(values.min()),
+        'max_ms': float(values.max())
+    }
+
+
+def timed(func, *args, **kwargs):
+    """Exécuter une fonction et renvoyer (résultat, durée en secondes)"""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def environment(tag: str = None) -> dict:
+    """Commit, machine et versions des backends (pour comparer les rapports)"""
+    root = Path(__file__).parent.parent
+
+    def git(*args):
+        try:
+            return subprocess.run(['git', *args], cwd=root, capture_output=True,
+                                  text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    versions = {'numpy': np.__version__, 'opencv': cv2.__version__}
+    try:
+        import fitz
+        versions['pymupdf'] = fitz.VersionBind
+    except ImportError:
+        pass
+    try:
+        import pytesseract
+        versions['tesseract'] = str(pytesseract.get_tesseract_version())
+    except Exception:
+        pass
+    try:
+        import torch
+        versions['torch'] = torch.__version__
+        versions['cuda'] = torch.version.cuda if torch.cuda.is_available() else None
+    except ImportError:
+        pass
+    try:
+        import ultralytics
+        versions['ultralytics'] = ultralytics.__version__
+    except ImportError:
+        pass
+
+    return {
+        'tag': tag,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': git('rev-parse', '--short', 'HEAD'),
+        'dirty': bool(git('status', '--porcelain', '--untracked-files=no')),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'versions': versions
+    }
+
+
+def load_page(extractor, path: Path) -> np.ndarray:
+    """Image de la première page (comme l'étage de décodage)"""
+    if path.suffix.lower() == '.pdf':
+        return extractor.pdf_to_image(str(path))
+    return cv2.imread(str(path), cv2.IMREAD_COLOR)
+
+
+def variant_key(doc: dict) -> str:
+    """Clé de regroupement d'un document du corpus"""
+    resolution = f"{doc['dpi']}dpi" if doc['dpi'] else "vector"
+    return f"{doc['kind']}/{resolution}/{doc['pages']}p/{doc['density']}"
+
+
+def bench_render(extractor, corpus_dir: Path, documents: list, repeat: int) -> dict:
+    """pdf_to_image par variante de document"""
+    samples = defaultdict(list)
+    for doc in documents:
+        if not doc['file'].endswith('.pdf'):
+            continue
+        path = str(corpus_dir / doc['file'])
+        extractor.pdf_to_image(path)  # Échauffement
+        for _ in range(repeat):
+            samples[variant_key(doc)].append(timed(extractor.pdf_to_image, path)[1])
+
+    everything = [s for series in samples.values() for s in series]
+    return {
+        'all': stage_stats(everything),
+        'by_variant': {key: stage_stats(series) for key, series in sorted(samples.items())}
+    }
+
+
+def bench_ocr(extractor, corpus_dir: Path, documents: list, repeat: int) -> dict:
+    """_extract_text_from_bbox par label et par profil Tesseract"""
+    by_label = defaultdict(list)
+    by_profile = defaultdict(list)
+    by_kind = defaultdict(list)
+
+    for doc in documents:
+        image = load_page(extractor, corpus_dir / doc['file'])
+        h, w = image.shape[:2]
+        for field in doc['fields']:
+            label = field['label']
+            x1, y1, x2, y2 = field['bbox']
+            box = (x1 * w, y1 * h, x2 * w, y2 * h)
+            for _ in range(repeat):
+                _, seconds = timed(extractor._extract_text_from_bbox, image, *box, label)
+                by_label[label].append(seconds)
+                by_profile[extractor._ocr_profile(label)].append(seconds)
+                by_kind[doc['kind']].append(seconds)
+
+    return {
+        'by_label': {label: {**stage_stats(series), 'profile': extractor._ocr_profile(label)}
+                     for label, series in sorted(by_label.items())},
+        'by_profile': {profile: stage_stats(series) for profile, series in by_profile.items()},
+        'by_kind': {kind: stage_stats(series) for kind, series in sorted(by_kind.items())}
+    }
+
+
+def bench_detect(extractor, corpus_dir: Path, documents: list, repeat: int) -> dict:
+    """Inférence YOLO par type de document"""
+    samples = defaultdict(list)
+    for doc in documents:
+        image = load_page(extractor, corpus_dir / doc['file'])
+        extractor.model(image, verbose=False)  # Échauffement
+        for _ in range(repeat):
+            samples[doc['kind']].append(timed(extractor.model, image, verbose=False)[1])
+
+    everything = [s for series in samples.values() for s in series]
+    return {
+        'device': extractor.device,
+        'all': stage_stats(everything),
+        'by_kind': {kind: stage_stats(series) for kind, series in sorted(samples.items())}
+    }
+
+
+def bench_end_to_end(extractor, corpus_dir: Path, documents: list, repeat: int) -> dict:
+    """extract_from_file par variante de document"""
+    samples = defaultdict(list)
+    for doc in documents:
+        path = str(corpus_dir / doc['file'])
+        for _ in range(repeat):
+            samples[variant_key(doc)].append(timed(extractor.extract_from_file, path)[1])
+
+    everything = [s for series in samples.values() for s in series]
+    return {
+        'all': stage_stats(everything),
+        'by_variant': {key: stage_stats(series) for key, series in sorted(samples.items())}
+    }
+
+
+def flatten(report: dict) -> dict:
+    """Moyennes (ms) par étape, à plat: {'ocr/by_label/montant_ttc': 12.3, ...}"""
+    flat = {}
+
+    def walk(prefix, node):
+        if isinstance(node, dict):
+            if 'mean_ms' in node:
+                flat[prefix] = node['mean_ms']
+                return
+            for key, value in node.items():
+                walk(f"{prefix}/{key}" if prefix else key, value)
+
+    walk('', report.get('stages', {}))
+    return flat
+
+
+def compare(base_path: str, new_path: str):
+    """Comparer deux rapports (moyennes par étape)"""
+    with open(base_path, 'r', encoding='utf-8') as f:
+        base = json.load(f)
+    with open(new_path, 'r', encoding='utf-8') as f:
+        new = json.load(f)
+
+    print(f"\n{Colors.BLUE}Base:     {base['environment'].get('commit')} {base['environment'].get('tag') or ''}{Colors.RESET}")
+    print(f"{Colors.BLUE}Nouveau:  {new['environment'].get('commit')} {new['environment'].get('tag') or ''}{Colors.RESET}\n")
+
+    base_flat, new_flat = flatten(base), flatten(new)
+    print(f"  {'Étape':60s} {'base ms':>10s} {'nouveau ms':>11s} {'écart':>8s}")
+    for key in sorted(set(base_flat) & set(new_flat)):
+        before, after = base_flat[key], new_flat[key]
+        change = (after - before) / before if before else 0.0
+        color = Colors.GREEN if change < -0.05 else Colors.RED if change > 0.05 else Colors.RESET
+        print(f"  {key:60s} {before:10.1f} {after:11.1f} {color}{change:+7.0%}{Colors.RESET}")
+
+
+def main():
+    """Main"""
+    parser = argparse.ArgumentParser(description="Suite de benchmarks de l'extraction")
+    parser.add_argument('--corpus', type=str, default=str(DEFAULT_CORPUS), help='Répertoire du corpus')
+    parser.add_argument('--seed', type=int, default=0, help='Graine du corpus')
+    parser.add_argument('--per-variant', type=int, default=1, help='Documents par variante du corpus')
+    parser.add_argument('--repeat', type=int, default=3, help='Mesures par document')
+    parser.add_argument('--model', type=str, help='Modèle YOLO (défaut: le plus récent de data/models)')
+    parser.add_argument('--config', type=str, help='Chemin vers settings.yaml')
+    parser.add_argument('--tag', type=str, help='Étiquette du rapport (backend, machine...)')
+    parser.add_argument('--output', type=str, help='Rapport JSON (défaut: benchmarks/results/)')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NOUVEAU'), help='Comparer deux rapports')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    from api.extractor import InvoiceExtractor
+
+    print(f"\n{Colors.BLUE}{'='*60}{Colors.RESET}")
+    print(f"{Colors.BLUE}⏱️  SUITE DE BENCHMARKS{Colors.RESET}")
+    print(f"{Colors.BLUE}{'='*60}{Colors.RESET}\n")
+
+    corpus_dir = Path(args.corpus)
+    manifest = generate_corpus(corpus_dir, seed=args.seed, per_variant=args.per_variant)
+    documents = manifest['documents']
+    print(f"📂 Corpus {manifest['corpus_id']}: {len(documents)} documents")
+
+    config_path = args.config
+    if config_path is None and not Path('config/settings.yaml').exists():
+        config_path = 'config/settings.example.yaml'
+    extractor = InvoiceExtractor(config_path)
+    # Mesurer le coût réel: pas de cache OCR, de mode dégradé ni d'historique
+    extractor.ocr_cache = None
+    extractor.load_governor = None
+    extractor.history = None
+
+    report = {
+        'environment': environment(args.tag),
+        'corpus': {k: manifest[k] for k in ('corpus_id', 'seed', 'per_variant')},
+        'repeat': args.repeat,
+        'stages': {},
+        'skipped': {}
+    }
+
+    print(f"{Colors.YELLOW}🖼️  pdf_to_image...{Colors.RESET}")
+    report['stages']['pdf_to_image'] = bench_render(extractor, corpus_dir, documents, args.repeat)
+
+    print(f"{Colors.YELLOW}🔤 OCR par label...{Colors.RESET}")
+    report['stages']['ocr'] = bench_ocr(extractor, corpus_dir, documents, args.repeat)
+
+    try:
+        extractor.load_model(args.model)
+    except Exception as e:
+        print(f"{Colors.YELLOW}⚠️  Pas de modèle ({e}): détection et bout en bout ignorés{Colors.RESET}")
+        report['skipped']['detect'] = report['skipped']['extract_from_file'] = str(e)
+    else:
+        report['environment']['model_version'] = extractor.model_version
+        print(f"{Colors.YELLOW}🎯 Détection...{Colors.RESET}")
+        report['stages']['detect'] = bench_detect(extractor, corpus_dir, documents, args.repeat)
+        print(f"{Colors.YELLOW}📄 extract_from_file...{Colors.RESET}")
+        report['stages']['extract_from_file'] = bench_end_to_end(extractor, corpus_dir, documents, args.repeat)
+
+    # Résumé
+    print()
+    summary = {name: stage['all'] for name, stage in report['stages'].items() if 'all' in stage}
+    summary.update({f"ocr [{profile}]": stats
+                    for profile, stats in report['stages']['ocr']['by_profile'].items()})
+    for name, stats in summary.items():
+        print(f"  {name:70s} {stats['mean_ms']:8.1f} ms (p95 {stats['p95_ms']:.1f})")
+
+    output = Path(args.output) if args.output else RESULTS_DIR / (
+        f"bench-{report['environment']['commit'] or 'nogit'}-"
+        f"{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\n{Colors.GREEN}💾 Rapport: {output}{Colors.RESET}\n")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Corpus synthétique de factures pour les benchmarks
+
+Génère, de façon déterministe (graine fixe), des factures:
+    - pdf       : PDF vectoriel (couche texte, comme un export comptable)
+    - scan_pdf  : PDF image (page scannée à une résolution donnée)
+    - scan_png  : image scannée (PNG, première page)
+
+à différentes résolutions, nombres de pages et densités de lignes.
+Un manifest.json décrit chaque document et la position (normalisée)
+de chaque champ, ce qui permet de mesurer l'OCR sans modèle entraîné.
+
+Usage:
+    python benchmarks/corpus.py
+    python benchmarks/corpus.py --output benchmarks/corpus --seed 42
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import sys
+from pathlib import Path
+
+import cv2
+import fitz  # PyMuPDF
+import numpy as np
+
+
+DEFAULT_OUTPUT = Path(__file__).parent / 'corpus'
+
+CORPUS_VERSION = 1
+
+# Variantes générées
+DPIS = (150, 200, 300)
+PAGE_COUNTS = (1, 3)
+DENSITIES = {'sparse': 3, 'normal': 12, 'dense': 30}  # Lignes produit par page
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # A4 en points
+
+SUPPLIERS = [
+    ("ACME SARL", "1 rue de Paris, 75001 Paris", "73282932000074"),
+    ("Dupont & Fils", "12 avenue Jean Jaurès, 69007 Lyon", "55210055400013"),
+    ("Bureau Services SAS", "45 boulevard Carnot, 59000 Lille", "40483304800022"),
+    ("Transports Martin", "8 quai de la Fosse, 44000 Nantes", "35600000000048"),
+]
+
+PRODUCTS = ["Prestation de conseil", "Maintenance annuelle", "Licence logicielle",
+            "Fournitures de bureau", "Transport", "Formation", "Support technique"]
+
+
+def _add_text(page, fields, label, text, x, y, fontsize=10):
+    """Écrire un texte et noter sa boîte (normalisée) dans les champs"""
+    page.insert_text((x, y), text, fontsize=fontsize)
+    if label is None:
+        return
+    width = fitz.get_text_length(text, fontsize=fontsize)
+    fields.append({
+        'label': label,
+        'text': text,
+        'bbox': [
+            round((x - 2) / PAGE_WIDTH, 5),
+            round((y - fontsize - 2) / PAGE_HEIGHT, 5),
+            round((x + width + 2) / PAGE_WIDTH, 5),
+            round((y + 4) / PAGE_HEIGHT, 5)
+        ]
+    })
+
+
+def make_invoice_pdf(path: Path, rng: random.Random, pages: int, lines_per_page: int) -> list:
+    """
+    Créer une facture PDF vectorielle
+
+    Returns:
+        Champs de la première page (label, texte, bbox normalisée)
+    """
+    name, address, siret = rng.choice(SUPPLIERS)
+    number = f"FA-{rng.randint(2020, 2025)}-{rng.randint(1, 9999):04d}"
+    date = f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.randint(2020, 2025)}"
+
+    doc = fitz.open()
+    first_page_fields = []
+    total_ht = 0.0
+
+    for page_index in range(pages):
+        page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        fields = first_page_fields if page_index == 0 else []
+
+        if page_index == 0:
+            _add_text(page, fields, 'nom_fournisseur', name, 50, 60, fontsize=14)
+            _add_text(page, fields, 'adresse_fournisseur', address, 50, 80)
+            _add_text(page, fields, 'siret_fournisseur', f"SIRET {siret}", 50, 98)
+            _add_text(page, fields, 'numero_facture', f"Facture N° {number}", 360, 60, fontsize=12)
+            _add_text(page, fields, 'date_facture', f"Date : {date}", 360, 80)
+        _add_text(page, None, None, f"Page {page_index + 1}/{pages}", 500, 820, fontsize=8)
+
+        # Lignes produit (espacement resserré pour les pages denses)
+        y = 160
+        step = min(20, 520 / max(1, lines_per_page))
+        for _ in range(lines_per_page):
+            amount = rng.randint(1000, 250000) / 100
+            total_ht += amount
+            text = f"{rng.choice(PRODUCTS)}  x{rng.randint(1, 20)}  {amount:,.2f} €".replace(',', ' ')
+            _add_text(page, fields, 'ligne_produit', text, 50, y, fontsize=9)
+            y += step
+
+        if page_index == pages - 1:
+            tva = round(total_ht * 0.2, 2)
+            _add_text(page, fields, 'montant_ht', f"Total HT : {total_ht:,.2f} €".replace(',', ' '), 360, 720)
+            _add_text(page, fields, 'montant_tva', f"TVA 20% : {tva:,.2f} €".replace(',', ' '), 360, 740)
+            _add_text(page, fields, 'montant_ttc',
+                      f"Total TTC : {total_ht + tva:,.2f} €".replace(',', ' '), 360, 765, fontsize=12)
+
+    doc.save(str(path))
+    doc.close()
+    return first_page_fields
+
+
+def scan_page(page, dpi: int, rng: random.Random) -> np.ndarray:
+    """Simuler le scan d'une page (niveaux de gris, bruit, légère rotation)"""
+    pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+    image = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.h, pix.w).copy()
+
+    angle = rng.uniform(-0.5, 0.5)
+    matrix = cv2.getRotationMatrix2D((pix.w / 2, pix.h / 2), angle, 1.0)
+    image = cv2.warpAffine(image, matrix, (pix.w, pix.h), borderValue=255)
+
+    noise = np.random.default_rng(rng.randint(0, 2**31)).normal(0, 8, image.shape)
+    return np.clip(image.astype(np.float32) + noise, 0, 255).astype(np.uint8)
+
+
+def make_scan_pdf(source: Path, path: Path, dpi: int, rng: random.Random):
+    """PDF image: chaque page scannée insérée comme image"""
+    src = fitz.open(str(source))
+    doc = fitz.open()
+    for page in src:
+        _, png = cv2.imencode('.png', scan_page(page, dpi, rng))
+        new_page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        new_page.insert_image(new_page.rect, stream=png.tobytes())
+    doc.save(str(path))
+    doc.close()
+    src.close()
+
+
+def corpus_variants():
+    """Variantes du corpus (type, résolution, pages, densité)"""
+    for density in DENSITIES:
+        for pages in PAGE_COUNTS:
+            yield ('pdf', None, pages, density)
+            for dpi in DPIS:
+                yield ('scan_pdf', dpi, pages, density)
+        for dpi in DPIS:
+            yield ('scan_png', dpi, 1, density)
+
+
+def generate_corpus(output: Path = DEFAULT_OUTPUT, seed: int = 0, per_variant: int = 1) -> dict:
+    """
+    Générer le corpus (réutilisé s'il existe déjà pour les mêmes paramètres)
+
+    Args:
+        output: Répertoire de sortie
+        seed: Graine (même graine = mêmes documents)
+        per_variant: Documents par variante
+
+    Returns:
+        Manifest du corpus
+    """
+    output = Path(output)
+    params = {'version': CORPUS_VERSION, 'seed': seed, 'per_variant': per_variant}
+    corpus_id = hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()[:12]
+
+    manifest_path = output / 'manifest.json'
+    if manifest_path.exists():
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('corpus_id') == corpus_id and all(
+                (output / doc['file']).exists() for doc in manifest['documents']):
+            return manifest
+
+    output.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    documents = []
+
+    for kind, dpi, pages, density in corpus_variants():
+        for n in range(per_variant):
+            resolution = f"{dpi}dpi" if dpi else "vector"
+            stem = f"{kind}_{resolution}_{pages}p_{density}_{n}"
+            vector_path = output / f"{stem}.pdf"
+            fields = make_invoice_pdf(vector_path, rng, pages, DENSITIES[density])
+
+            if kind == 'scan_pdf':
+                scanned = output / f"{stem}.scan.pdf"
+                make_scan_pdf(vector_path, scanned, dpi, rng)
+                vector_path.unlink()
+                scanned.rename(vector_path)
+                file_name = vector_path.name
+            elif kind == 'scan_png':
+                doc = fitz.open(str(vector_path))
+                cv2.imwrite(str(output / f"{stem}.png"), scan_page(doc[0], dpi, rng))
+                doc.close()
+                vector_path.unlink()
+                file_name = f"{stem}.png"
+            else:
+                file_name = vector_path.name
+
+            documents.append({
+                'file': file_name,
+                'kind': kind,
+                'dpi': dpi,
+                'pages': pages,
+                'density': density,
+                'fields': fields
+            })
+
+    manifest = {'corpus_id': corpus_id, **params, 'documents': documents}
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    return manifest
+
+
+def main():
+    """Main"""
+    parser = argparse.ArgumentParser(description="Générer le corpus synthétique de benchmark")
+    parser.add_argument('--output', type=str, default=str(DEFAULT_OUTPUT), help='Répertoire de sortie')
+    parser.add_argument('--seed', type=int, default=0, help='Graine aléatoire')
+    parser.add_argument('--per-variant', type=int, default=1, help='Documents par variante')
+    args = parser.parse_args()
+
+    manifest = generate_corpus(Path(args.output), seed=args.seed, per_variant=args.per_variant)
+    print(f"✅ Corpus {manifest['corpus_id']}: {len(manifest['documents'])} documents dans {args.output}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+Serveur Label Studio simulé (API REST minimale, en mémoire)
+
+Permet de mesurer et de tester l'import en masse sans Label Studio:
+    GET  /api/projects/{id}           titre et nombre de tâches
+    GET  /api/tasks?project=&page=    tâches paginées (404 après la dernière page),
+                                      filtre Data Manager (query) et champs (include)
+    POST /api/projects/{id}/import    import en masse (return_task_ids)
+    POST /api/projects/{id}/import/predictions   prédictions sur des tâches existantes
+    GET/POST /api/storages/localfiles stockages « local files » du projet
+
+Latence par appel et par tâche, taux d'échecs 503 (avec Retry-After),
+taux de réponses perdues (import appliqué mais répondu en 504) et jeton
+d'accès sont configurables pour reproduire un serveur chargé.
+
+Usage:
+    python benchmarks/mock_label_studio.py --port 8081 --latency 0.05 --failure-rate 0.05
+    python benchmarks/mock_label_studio.py --bench 2000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# Couleurs
+class Colors:
+    GREEN = '\033[92m'
+    YELLOW = '\033[93m'
+    RED = '\033[91m'
+    BLUE = '\033[94m'
+    RESET = '\033[0m'
+
+
+def _now(when: Optional[datetime] = None) -> str:
+    """Horodatage au format de Label Studio (ISO 8601, UTC, suffixe Z)"""
+    moment = when or datetime.now(timezone.utc)
+    return moment.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+def _parse(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+class MockLabelStudio:
+    """Serveur simulé dans un thread (utilisable comme context manager)"""
+
+    def __init__(self, api_key: str = 'mock-token', project_id: int = 1, port: int = 0,
+                 latency: float = 0.0, latency_per_task: float = 0.0,
+                 failure_rate: float = 0.0, lost_response_rate: float = 0.0, seed: int = 0):
+        """
+        Args:
+            api_key: Jeton attendu (en-tête Authorization: Token ...)
+            project_id: Seul projet existant
+            port: Port d'écoute (0: port libre)
+            latency: Délai fixe par appel (secondes)
+            latency_per_task: Délai supplémentaire par tâche importée
+            failure_rate: Proportion d'imports refusés en 503
+            lost_response_rate: Proportion d'imports appliqués puis répondus en 504 (proxy)
+            seed: Graine du tirage des échecs
+        """
+        self.api_key = api_key
+        self.project_id = project_id
+        self.latency = latency
+        self.latency_per_task = latency_per_task
+        self.failure_rate = failure_rate
+        self.lost_response_rate = lost_response_rate
+        self.tasks = []
+        self.storages = []
+        self.stats = {'requests': 0, 'imports': 0, 'prediction_imports': 0, 'failures': 0, 'lost_responses': 0}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'MockLabelStudio':
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-label-studio", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _import(self, tasks):
+        """Enregistrer des tâches; None si l'appel doit échouer (503)"""
+        time.sleep(self.latency + self.latency_per_task * len(tasks))
+        with self._lock:
+            self.stats['imports'] += 1
+            if self._random.random() < self.failure_rate:
+                self.stats['failures'] += 1
+                return None
+            first_id = len(self.tasks) + 1
+            now = _now()
+            for i, task in enumerate(tasks):
+                self.tasks.append({'id': first_id + i, 'project': self.project_id, 'data': task['data'],
+                                   'predictions': task.get('predictions', []), 'annotations': [],
+                                   'total_annotations': 0, 'created_at': now, 'updated_at': now,
+                                   'completed_at': None})
+            return list(range(first_id, first_id + len(tasks)))
+
+    def annotate(self, task_id: int, labels: List[str], when: Optional[datetime] = None) -> Dict:
+        """Simuler l'annotation d'une tâche (une boîte par label)"""
+        moment = _now(when)
+        with self._lock:
+            task = self.tasks[task_id - 1]
+            task['annotations'].append({
+                'id': sum(len(t['annotations']) for t in self.tasks) + 1,
+                'result': [{'type': 'rectanglelabels', 'from_name': 'label', 'to_name': 'image',
+                            'value': {'x': 10, 'y': 10, 'width': 20, 'height': 5, 'rectanglelabels': [label]}}
+                           for label in labels],
+                'was_cancelled': False, 'ground_truth': False, 'completed_by': 1,
+                'created_at': moment, 'updated_at': moment, 'lead_time': 12.5
+            })
+            task['total_annotations'] = len(task['annotations'])
+            task['updated_at'] = task['completed_at'] = moment
+            return task
+
+    def _import_predictions(self, predictions) -> Optional[int]:
+        """Ajouter des prédictions; None si l'appel doit échouer (503), -1 si une tâche est inconnue"""
+        time.sleep(self.latency + self.latency_per_task * len(predictions))
+        with self._lock:
+            self.stats['prediction_imports'] += 1
+            if self._random.random() < self.failure_rate:
+                self.stats['failures'] += 1
+                return None
+            if any(not 1 <= prediction.get('task', 0) <= len(self.tasks) for prediction in predictions):
+                return -1
+            for prediction in predictions:
+                task = self.tasks[prediction['task'] - 1]
+                task['predictions'].append({key: value for key, value in prediction.items() if key != 'task'})
+            return len(predictions)
+
+    def _query_tasks(self, query: Optional[str], include: Optional[str]) -> List[Dict]:
+        """Filtre Data Manager (sous-ensemble: dates et nombre d'annotations, et/ou)"""
+        with self._lock:
+            tasks = [{**task, 'total_predictions': len(task['predictions']),
+                      'predictions_model_versions': sorted({p.get('model_version') for p in task['predictions']})}
+                     for task in self.tasks]
+        if query:
+            spec = json.loads(query)
+            filters = spec.get('filters', {})
+            items = filters.get('items', [])
+            combine = any if filters.get('conjunction') == 'or' else all
+
+            def matches(task, item):
+                key = item['filter'].split(':')[-1]
+                value = task['data'].get(key[5:]) if key.startswith('data.') else task.get(key)
+                if value is None:
+                    return False
+                if item['type'] == 'Datetime':
+                    return _parse(value) > _parse(item['value'])
+                if item['operator'] == 'equal':
+                    return value == item['value']
+                return value > item['value']
+
+            if items:
+                tasks = [task for task in tasks if combine(matches(task, item) for item in items)]
+            for field in spec.get('ordering', []):
+                key = field.lstrip('-').split(':')[-1]
+                tasks.sort(key=lambda task: task.get(key) or '', reverse=field.startswith('-'))
+        if include:
+            fields = include.split(',')
+            tasks = [{key: task[key] for key in fields if key in task} for task in tasks]
+        return tasks
+
+    def _lose_response(self) -> bool:
+        """Tirage d'une réponse perdue (l'import est appliqué quand même)"""
+        with self._lock:
+            lost = self._random.random() < self.lost_response_rate
+            if lost:
+                self.stats['lost_responses'] += 1
+            return lost
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # Connexions persistantes (pool côté client)
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, body, headers=None):
+                payload = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _authorized(self) -> bool:
+                with mock._lock:
+                    mock.stats['requests'] += 1
+                if self.headers.get('Authorization') != f"Token {mock.api_key}":
+                    self._send(401, {'detail': 'Invalid token'})
+                    return False
+                return True
+
+            def do_GET(self):
+                if not self._authorized():
+                    return
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                if url.path == f"/api/projects/{mock.project_id}":
+                    self._send(200, {'id': mock.project_id, 'title': 'Mock invoices',
+                                     'task_number': len(mock.tasks)})
+                elif url.path == "/api/tasks":
+                    page = int(query.get('page', ['1'])[0])
+                    page_size = int(query.get('page_size', ['100'])[0])
+                    matching = mock._query_tasks(query.get('query', [None])[0], query.get('include', [None])[0])
+                    tasks = matching[(page - 1) * page_size:page * page_size]
+                    if page > 1 and not tasks:
+                        self._send(404, {'detail': 'Invalid page.'})
+                    else:
+                        self._send(200, {'tasks': tasks, 'total': len(matching)})
+                elif url.path == "/api/storages/localfiles":
+                    self._send(200, mock.storages)
+                else:
+                    self._send(404, {'detail': 'Not found.'})
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                body = self.rfile.read(length)
+                if not self._authorized():
+                    return
+                url = urlparse(self.path)
+                try:
+                    payload = json.loads(body)
+                except json.JSONDecodeError:
+                    self._send(400, {'detail': 'Invalid JSON'})
+                    return
+                if url.path == "/api/storages/localfiles":
+                    with mock._lock:
+                        storage = {**payload, 'id': len(mock.storages) + 1, 'type': 'localfiles'}
+                        mock.storages.append(storage)
+                    self._send(201, storage)
+                    return
+                if url.path == f"/api/projects/{mock.project_id}/import/predictions":
+                    created = mock._import_predictions(payload)
+                    if created is None:
+                        self._send(503, {'detail': 'Service unavailable'}, {'Retry-After': '0'})
+                    elif created < 0:
+                        self._send(400, {'detail': 'Unknown task'})
+                    else:
+                        self._send(201, {'created': created})
+                    return
+                if url.path != f"/api/projects/{mock.project_id}/import":
+                    self._send(404, {'detail': 'Not found.'})
+                    return
+                tasks = payload
+                lost = mock._lose_response()
+                task_ids = mock._import(tasks)
+                if task_ids is None:
+                    self._send(503, {'detail': 'Service unavailable'}, {'Retry-After': '0'})
+                elif lost:
+                    self._send(504, {'detail': 'Gateway timeout'})
+                else:
+                    self._send(201, {'task_count': len(task_ids), 'task_ids': task_ids})
+
+        return Handler
+
+
+def bench(n_files: int, latency: float, failure_rate: float):
+    """Débit d'import: appels unitaires en série vs lots parallèles"""
+    from api.label_studio import LabelStudioClient
+    from api.media import MediaStore
+    from scripts.import_to_label_studio import ImportManifest, import_files
+
+    print(f"\n{Colors.BLUE}{'='*60}{Colors.RESET}")
+    print(f"{Colors.BLUE}📤 BENCHMARK IMPORT LABEL STUDIO ({n_files} factures){Colors.RESET}")
+    print(f"{Colors.BLUE}{'='*60}{Colors.RESET}\n")
+
+    configurations = [(1, 1), (50, 1), (50, 4), (100, 8)]
+    with tempfile.TemporaryDirectory() as tmp:
+        files = []
+        for i in range(n_files):
+            path = Path(tmp) / f"facture_{i:05d}.png"
+            path.write_bytes(os.urandom(2048))
+            files.append(path)
+
+        for batch_size, workers in configurations:
+            with MockLabelStudio(latency=latency, latency_per_task=0.0005, failure_rate=failure_rate) as server:
+                client = LabelStudioClient(server.url, server.api_key, server.project_id,
+                                           max_requests_per_minute=0, pool_size=workers)
+                manifest = ImportManifest(Path(tmp) / f"manifest_{batch_size}_{workers}.jsonl")
+                media = MediaStore(Path(tmp) / f"media_{batch_size}_{workers}")
+                try:
+                    summary = import_files(client, files, manifest, media, batch_size=batch_size,
+                                           workers=workers, backoff_seconds=0.05)
+                finally:
+                    media.close()
+                print(f"   lots de {batch_size:>3}, {workers} en parallèle: "
+                      f"{summary['tasks_per_second']:8.1f} tâches/s  "
+                      f"({summary['elapsed_s']:.1f} s, {server.stats['failures']} échecs 503 réessayés, "
+                      f"{len(summary['errors'])} erreurs)")
+    print()
+
+
+def main():
+    """Main"""
+    parser = argparse.ArgumentParser(description="Serveur Label Studio simulé")
+    parser.add_argument('--port', type=int, default=8081, help="Port d'écoute")
+    parser.add_argument('--api-key', type=str, default='mock-token', help="Jeton attendu")
+    parser.add_argument('--project-id', type=int, default=1, help="Identifiant du projet")
+    parser.add_argument('--latency', type=float, default=0.02, help="Délai par appel (secondes)")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="Proportion d'imports en 503")
+    parser.add_argument('--bench', type=int, metavar='N', help="Mesurer le débit d'import de N factures")
+    args = parser.parse_args()
+
+    if args.bench:
+        bench(args.bench, args.latency, args.failure_rate)
+        return
+
+    server = MockLabelStudio(args.api_key, args.project_id, args.port, args.latency,
+                             failure_rate=args.failure_rate)
+    print(f"{Colors.GREEN}🧪 Label Studio simulé sur {server.url} "
+          f"(jeton: {args.api_key}, projet: {args.project_id}){Colors.RESET}")
+    try:
+        server.start()._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -8,6 +8,7 @@ Usage:
     python monitoring/dashboard.py
 """
 
+import sys
 import yaml
 import json
 from pathlib import Path
@@ -18,6 +19,10 @@ import socketserver
 import webbrowser
 from threading import Timer
 
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from api.annotation_export import AnnotationIndex
+from api.history import HistoryStore
+
 # Couleurs
 class Colors:
     GREEN = '\033[92m'
@@ -43,9 +48,19 @@ def gather_statistics() -> Dict:
         'api': {}
     }
 
-    # Stats Label Studio (depuis les exports)
+    # Stats Label Studio (index de l'export incrémental, sinon ancien export complet)
     exports_dir = Path('data/exports')
-    if exports_dir.exists():
+    index_file = exports_dir / 'annotations_index.db'
+    if index_file.exists():
+        index = AnnotationIndex(str(index_file))
+        try:
+            stats['label_studio'] = {
+                'completed_tasks': len(index),
+                'last_export': index.cursor or ''
+            }
+        finally:
+            index.close()
+    elif exports_dir.exists():
         export_files = list(exports_dir.glob('annotations_*.json'))
         if export_files:
             latest_export = max(export_files, key=lambda p: p.stat().st_mtime)
@@ -66,6 +81,24 @@ def gather_statistics() -> Dict:
             'latest_model': max(model_files, key=lambda p: p.stat().st_mtime).name if model_files else None
         }
 
+    # Stats de l'API (historique des extractions, requêtes sur index et agrégats)
+    history_db = Path(load_config()['api'].get('history', {}).get('database', 'data/history.db'))
+    if history_db.exists():
+        history = HistoryStore(history_db)
+        try:
+            today = history.totals(days=1)
+            week = history.totals(days=7)
+            labels = history.label_stats(days=7)
+            stats['api'] = {
+                'total_extractions': history.totals()['extractions'],
+                'extractions_today': today['extractions'],
+                'average_confidence_7d': week['average_confidence'],
+                'review_rate_7d': week['review_rate'],
+                'weakest_label': min(labels, key=lambda row: row['average_confidence']) if labels else None
+            }
+        finally:
+            history.close()
+
     return stats
 
 
@@ -209,7 +242,7 @@ def generate_html(stats: Dict) -> str:
                 <h2>📝 Annotation (Label Studio)</h2>
                 <div class="stat">
                     <span class="stat-label">Total de tâches</span>
-                    <span class="stat-value">{stats['label_studio'].get('total_tasks', 0)}</span>
+                    <span class="stat-value">{stats['label_studio'].get('total_tasks', '—')}</span>
                 </div>
                 <div class="stat">
                     <span class="stat-label">Factures annotées</span>
@@ -238,6 +271,33 @@ def generate_html(stats: Dict) -> str:
                 </div>
             </div>
 
+            <!-- API Stats -->
+            <div class="card">
+                <h2>📡 Extractions (API)</h2>
+                <div class="stat">
+                    <span class="stat-label">Total</span>
+                    <span class="stat-value">{stats['api'].get('total_extractions', 0)}</span>
+                </div>
+                <div class="stat">
+                    <span class="stat-label">Aujourd'hui</span>
+                    <span class="stat-value">{stats['api'].get('extractions_today', 0)}</span>
+                </div>
+                <div class="stat">
+                    <span class="stat-label">Confiance moyenne (7 j)</span>
+                    <span class="stat-value {'good' if stats['api'].get('average_confidence_7d', 0) >= 0.85 else 'warning'}">
+                        {stats['api'].get('average_confidence_7d', 0):.1%}
+                    </span>
+                </div>
+                <div class="stat">
+                    <span class="stat-label">À revoir (7 j)</span>
+                    <span class="stat-value">{(stats['api'].get('review_rate_7d') or 0):.1%}</span>
+                </div>
+                <div class="stat">
+                    <span class="stat-label">Label le plus faible</span>
+                    <span class="stat-value">{stats['api']['weakest_label']['label'] if stats['api'].get('weakest_label') else '-'}</span>
+                </div>
+            </div>
+
             <!-- System Info -->
             <div class="card">
                 <h2>ℹ️ Informations Système</h2>
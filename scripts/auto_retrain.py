@@ -10,6 +10,7 @@ Usage:
 """
 
 import os
+import sys
 import json
 import yaml
 import argparse
@@ -17,6 +18,11 @@ from pathlib import Path
 from datetime import datetime
 import subprocess
 
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api.annotation_export import AnnotationIndex
+
 # Couleurs
 class Colors:
     GREEN = '\033[92m'
@@ -39,6 +45,15 @@ def get_latest_export() -> dict:
     if not exports_dir.exists():
         return None
 
+    # Index fusionné de l'export incrémental
+    index_file = exports_dir / 'annotations_index.db'
+    if index_file.exists():
+        index = AnnotationIndex(str(index_file))
+        try:
+            return {'completed_tasks': len(index), 'cursor': index.cursor}
+        finally:
+            index.close()
+
     export_files = list(exports_dir.glob('annotations_*.json'))
     if not export_files:
         return None
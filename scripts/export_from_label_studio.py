@@ -2,19 +2,30 @@
 """
 Script d'export des annotations depuis Label Studio
 
-Exporte toutes les factures annotées depuis Label Studio
+Exporte les factures annotées depuis Label Studio
 pour préparer l'entraînement du modèle.
 
+L'export est incrémental: seules les tâches annotées ou modifiées depuis
+le dernier export sont récupérées, page par page, et écrites dans un
+delta JSONL compact (data/exports/deltas/). L'index fusionné
+data/exports/annotations_index.db garde toutes les tâches annotées et
+sert d'entrée à prepare_dataset.py.
+
 Usage:
     python scripts/export_from_label_studio.py
+    python scripts/export_from_label_studio.py --full   # Tout réexporter (curseur remis à zéro)
 """
 
-import os
-import json
+import sys
 import yaml
+import argparse
 from pathlib import Path
-from datetime import datetime
-from label_studio_sdk import LabelStudio
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api.annotation_export import AnnotationIndex, export_incremental
+from api.label_studio import LabelStudioError, client_from_config
 
 # Couleurs
 class Colors:
@@ -25,133 +36,122 @@ class Colors:
     RESET = '\033[0m'
 
 
+INDEX_FILENAME = 'annotations_index.db'
+
+
 def load_config():
     """Charger la configuration"""
     config_path = Path(__file__).parent.parent / 'config' / 'settings.yaml'
-    
+
     if not config_path.exists():
         print(f"{Colors.RED}❌ Fichier de configuration non trouvé !{Colors.RESET}")
         print(f"{Colors.YELLOW}💡 Copiez settings.example.yaml vers settings.yaml{Colors.RESET}")
         exit(1)
-    
+
     with open(config_path, 'r', encoding='utf-8') as f:
         return yaml.safe_load(f)
 
 
-def export_annotations(config):
+def export_annotations(config, full=False):
     """Exporter les annotations depuis Label Studio"""
-    
+
     print(f"\n{Colors.BLUE}{'='*60}{Colors.RESET}")
     print(f"{Colors.BLUE}📤 EXPORT DES ANNOTATIONS{Colors.RESET}")
     print(f"{Colors.BLUE}{'='*60}{Colors.RESET}\n")
-    
+
     # Connexion
     print(f"{Colors.YELLOW}📡 Connexion à Label Studio...{Colors.RESET}")
+    client = client_from_config(config, max_requests_per_minute=0)
     try:
-        client = LabelStudio(
-            base_url=config['label_studio']['url'],
-            api_key=config['label_studio']['api_key']
-        )
+        project = client.get_project()
         print(f"{Colors.GREEN}✅ Connecté !{Colors.RESET}\n")
-    except Exception as e:
+        print(f"{Colors.GREEN}📁 Projet : {project.get('title')}{Colors.RESET}")
+    except LabelStudioError as e:
         print(f"{Colors.RED}❌ Erreur de connexion : {e}{Colors.RESET}")
         exit(1)
 
-    # Récupérer le projet
+    # Index fusionné et curseur du dernier export
+    export_dir = Path(config['dataset']['processed_data_path']).parent / 'exports'
+    index = AnnotationIndex(str(export_dir / INDEX_FILENAME))
+    if full:
+        index.set_cursor(None)
+    cursor = index.cursor
+    if cursor:
+        print(f"{Colors.YELLOW}🔍 Tâches modifiées depuis {cursor}...{Colors.RESET}")
+    else:
+        print(f"{Colors.YELLOW}🔍 Premier export: toutes les tâches annotées...{Colors.RESET}")
+
     try:
-        project = client.projects.get(id=config['label_studio']['project_id'])
-        print(f"{Colors.GREEN}📁 Projet : {project.title}{Colors.RESET}")
-    except Exception as e:
-        print(f"{Colors.RED}❌ Projet non trouvé : {e}{Colors.RESET}")
+        summary = export_incremental(
+            client, index, str(export_dir / 'deltas'),
+            page_size=config['label_studio'].get('export', {}).get('page_size', 100)
+        )
+    except LabelStudioError as e:
+        print(f"{Colors.RED}❌ Erreur d'export : {e}{Colors.RESET}")
+        print(f"{Colors.YELLOW}💡 Relancez: le curseur n'a pas avancé{Colors.RESET}")
         exit(1)
+    finally:
+        index.close()
+
+    print(f"  Tâches modifiées : {summary['tasks']}")
+    print(f"  Ajoutées/mises à jour : {summary['upserted']}")
+    print(f"  Retirées (annotations supprimées) : {summary['removed']}")
+    print(f"  Total annoté (index) : {summary['annotated_tasks']}\n")
 
-    # Récupérer les tâches
-    print(f"{Colors.YELLOW}🔍 Récupération des tâches...{Colors.RESET}")
-    tasks_obj = client.tasks.list(project=project.id)
-    # Convertir les objets Task en dictionnaires pour compatibilité
-    tasks = [task.model_dump() if hasattr(task, 'model_dump') else task.dict() for task in tasks_obj]
-    
-    # Filtrer les tâches complètes (annotées)
-    completed_tasks = [t for t in tasks if t.get('annotations')]
-    
-    print(f"  Total de tâches : {len(tasks)}")
-    print(f"  Annotées : {len(completed_tasks)}")
-    print(f"  Non annotées : {len(tasks) - len(completed_tasks)}\n")
-    
-    if len(completed_tasks) == 0:
+    completed = summary['annotated_tasks']
+    if completed == 0:
         print(f"{Colors.YELLOW}⚠️  Aucune facture annotée trouvée !{Colors.RESET}")
         print(f"{Colors.YELLOW}💡 Annotez au moins quelques factures avant d'exporter{Colors.RESET}")
         exit(0)
-    
-    if len(completed_tasks) < 50:
-        print(f"{Colors.YELLOW}⚠️  Seulement {len(completed_tasks)} factures annotées{Colors.RESET}")
+
+    if completed < 50:
+        print(f"{Colors.YELLOW}⚠️  Seulement {completed} factures annotées{Colors.RESET}")
         print(f"{Colors.YELLOW}💡 Recommandation : annotez au moins 100 factures pour de bons résultats{Colors.RESET}\n")
-    
-    # Créer le dossier d'export
-    export_dir = Path(config['dataset']['processed_data_path']).parent / 'exports'
-    export_dir.mkdir(parents=True, exist_ok=True)
-    
-    # Nom du fichier avec timestamp
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    export_file = export_dir / f'annotations_{timestamp}.json'
-    
-    # Sauvegarder
-    print(f"{Colors.YELLOW}💾 Sauvegarde des annotations...{Colors.RESET}")
-    
-    export_data = {
-        'project_name': project.title,
-        'export_date': datetime.now().isoformat(),
-        'total_tasks': len(tasks),
-        'completed_tasks': len(completed_tasks),
-        'tasks': completed_tasks
-    }
-    
-    with open(export_file, 'w', encoding='utf-8') as f:
-        json.dump(export_data, f, indent=2, ensure_ascii=False)
-    
-    print(f"{Colors.GREEN}✅ Export sauvegardé : {export_file}{Colors.RESET}")
-    
-    # Statistiques
-    print(f"\n{Colors.BLUE}{'='*60}{Colors.RESET}")
-    print(f"{Colors.BLUE}📊 STATISTIQUES{Colors.RESET}")
-    print(f"{Colors.BLUE}{'='*60}{Colors.RESET}")
-    
-    # Compter les labels
-    label_counts = {}
-    for task in completed_tasks:
-        for annotation in task.get('annotations', []):
-            for result in annotation.get('result', []):
-                if 'value' in result and 'rectanglelabels' in result['value']:
-                    for label in result['value']['rectanglelabels']:
-                        label_counts[label] = label_counts.get(label, 0) + 1
-    
-    print(f"\n  Factures annotées : {len(completed_tasks)}")
-    print(f"\n  Annotations par type :")
-    for label, count in sorted(label_counts.items(), key=lambda x: x[1], reverse=True):
-        print(f"    • {label:25s} : {count:4d} occurrences")
-    
-    print(f"\n{Colors.BLUE}{'='*60}{Colors.RESET}\n")
-    
-    # Moyenne d'annotations par facture
-    total_annotations = sum(label_counts.values())
-    avg_per_invoice = total_annotations / len(completed_tasks) if completed_tasks else 0
-    print(f"  Moyenne : {avg_per_invoice:.1f} annotations par facture\n")
-    
+
+    if summary['delta_file']:
+        print(f"{Colors.GREEN}✅ Delta sauvegardé : {summary['delta_file']}{Colors.RESET}")
+    else:
+        print(f"{Colors.YELLOW}ℹ️  Aucune nouvelle annotation depuis le dernier export{Colors.RESET}")
+    print(f"{Colors.GREEN}✅ Index à jour : {export_dir / INDEX_FILENAME}{Colors.RESET}")
+
+    # Statistiques du delta
+    label_counts = summary['label_counts']
+    if label_counts:
+        print(f"\n{Colors.BLUE}{'='*60}{Colors.RESET}")
+        print(f"{Colors.BLUE}📊 STATISTIQUES (nouvelles annotations){Colors.RESET}")
+        print(f"{Colors.BLUE}{'='*60}{Colors.RESET}")
+
+        print(f"\n  Factures exportées : {summary['tasks']}")
+        print(f"\n  Annotations par type :")
+        for label, count in sorted(label_counts.items(), key=lambda x: x[1], reverse=True):
+            print(f"    • {label:25s} : {count:4d} occurrences")
+
+        print(f"\n{Colors.BLUE}{'='*60}{Colors.RESET}\n")
+
+        # Moyenne d'annotations par facture
+        total_annotations = sum(label_counts.values())
+        avg_per_invoice = total_annotations / summary['tasks'] if summary['tasks'] else 0
+        print(f"  Moyenne : {avg_per_invoice:.1f} annotations par facture\n")
+
     # Recommandations
-    if len(completed_tasks) < 100:
-        print(f"{Colors.YELLOW}💡 CONSEIL : Annotez au moins {100 - len(completed_tasks)} factures supplémentaires{Colors.RESET}")
+    if completed < 100:
+        print(f"{Colors.YELLOW}💡 CONSEIL : Annotez au moins {100 - completed} factures supplémentaires{Colors.RESET}")
     else:
         print(f"{Colors.GREEN}✨ Excellent ! Vous avez assez de données pour l'entraînement{Colors.RESET}")
-    
+
     print(f"\n{Colors.GREEN}🎉 Export terminé avec succès !{Colors.RESET}\n")
-    
+
     # Prochaine étape
     print(f"{Colors.BLUE}➡️  Prochaine étape :{Colors.RESET}")
     print(f"    python scripts/prepare_dataset.py\n")
-    
-    return export_file
+
+    return export_dir / INDEX_FILENAME
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Exporter les annotations depuis Label Studio")
+    parser.add_argument('--full', action='store_true', help="Tout réexporter (ignorer le curseur)")
+    args = parser.parse_args()
+
     config = load_config()
-    export_file = export_annotations(config)
+    export_file = export_annotations(config, full=args.full)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Script d'import du référentiel fournisseurs dans le registre local
+
+Le registre permet à l'API de remplir nom_fournisseur et
+adresse_fournisseur à partir du SIRET, sans OCR des blocs d'adresse.
+
+Usage:
+    python scripts/import_suppliers.py referentiel_fournisseurs.csv
+    python scripts/import_suppliers.py export.csv --siret-column SIRET --name-column "Raison sociale"
+"""
+
+import sys
+import yaml
+import argparse
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api.supplier_registry import SupplierRegistry
+
+# Couleurs
+class Colors:
+    GREEN = '\033[92m'
+    YELLOW = '\033[93m'
+    RED = '\033[91m'
+    BLUE = '\033[94m'
+    RESET = '\033[0m'
+
+
+def load_config():
+    """Charger la configuration"""
+    config_path = Path(__file__).parent.parent / 'config' / 'settings.yaml'
+
+    if not config_path.exists():
+        print(f"{Colors.RED}❌ Fichier de configuration non trouvé !{Colors.RESET}")
+        exit(1)
+
+    with open(config_path, 'r', encoding='utf-8') as f:
+        return yaml.safe_load(f)
+
+
+def main():
+    """Main"""
+    parser = argparse.ArgumentParser(description="Importer le référentiel fournisseurs")
+    parser.add_argument('csv_file', type=str, help='Export CSV du référentiel fournisseurs')
+    parser.add_argument('--db', type=str, help='Base SQLite du registre (défaut depuis config)')
+    parser.add_argument('--siret-column', type=str, default='siret', help='Colonne SIRET')
+    parser.add_argument('--name-column', type=str, default='nom', help='Colonne raison sociale')
+    parser.add_argument('--address-column', type=str, default='adresse', help='Colonne adresse')
+    args = parser.parse_args()
+
+    db_path = args.db
+    if db_path is None:
+        config = load_config()
+        db_path = config['api'].get('supplier_registry', {}).get('db_path', 'data/processed/suppliers.db')
+
+    csv_file = Path(args.csv_file)
+    if not csv_file.exists():
+        print(f"{Colors.RED}❌ Fichier non trouvé: {csv_file}{Colors.RESET}")
+        exit(1)
+
+    print(f"\n{Colors.BLUE}{'='*60}{Colors.RESET}")
+    print(f"{Colors.BLUE}🏢 IMPORT DU RÉFÉRENTIEL FOURNISSEURS{Colors.RESET}")
+    print(f"{Colors.BLUE}{'='*60}{Colors.RESET}\n")
+
+    registry = SupplierRegistry(db_path)
+    count = registry.load_csv(
+        str(csv_file),
+        siret_column=args.siret_column,
+        name_column=args.name_column,
+        address_column=args.address_column
+    )
+
+    print(f"{Colors.GREEN}✅ {count} fournisseurs importés{Colors.RESET}")
+    print(f"   Total dans le registre: {len(registry)}")
+    print(f"   Base: {db_path}\n")
+
+    if count == 0:
+        print(f"{Colors.YELLOW}💡 Vérifiez les noms de colonnes (--siret-column, --name-column, --address-column){Colors.RESET}\n")
+
+    registry.close()
+
+
+if __name__ == '__main__':
+    main()
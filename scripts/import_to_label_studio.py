@@ -5,19 +5,49 @@ Script d'import automatique des factures dans Label Studio
 Ce script scanne le dossier data/raw/invoices/ et importe
 toutes les factures (PDF, JPG, PNG) dans votre projet Label Studio.
 
+Les images ne sont pas insérées dans les tâches: les PDF sont rendus en
+parallèle (pool de processus) dans un répertoire de médias adressé par
+contenu, servi par le stockage « local files » de Label Studio
+(docker-compose.yml), et chaque tâche ne porte que l'URL de son image.
+
+Les doublons sont détectés localement, sans lister les tâches du projet:
+un index SQLite note l'empreinte SHA-256 (doublon exact, même renommé)
+et le dHash de la première page (quasi-doublon: rescan, PDF régénéré)
+de chaque facture importée. Les doublons exacts sont ignorés. Un dHash
+64 bits ne distingue pas deux factures différentes d'un même modèle
+fournisseur: les quasi-doublons sont donc importés, marqués dans la tâche
+(colonne near_duplicate_of) pour revue, et ignorés seulement avec
+--skip-near-duplicates.
+
+Les factures sont envoyées par lots via l'endpoint d'import en masse
+(/api/projects/{id}/import), sur plusieurs connexions réutilisées. Un lot
+en échec temporaire (réseau, 429, 5xx) est réessayé avec un délai
+croissant. Chaque lot importé est noté dans un manifest: une exécution
+interrompue reprend là où elle s'était arrêtée.
+
 Usage:
     python scripts/import_to_label_studio.py
+    python scripts/import_to_label_studio.py --batch-size 100 --workers 8
+    python scripts/import_to_label_studio.py --url http://localhost:8081   # serveur simulé
 """
 
 import os
+import sys
+import json
+import time
 import yaml
-import base64
+import argparse
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
-from label_studio_sdk import LabelStudio
-from tqdm import tqdm
-import fitz  # PyMuPDF pour convertir PDF en image
-from PIL import Image
-import io
+from typing import Callable, Dict, Iterable, List, Optional
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api.dedupe import DEFAULT_MAX_DISTANCE, HashIndex, classify, fingerprint_files
+from api.label_studio import LabelStudioClient, LabelStudioError, with_retries
+from api.media import MediaStore
 
 # Couleurs pour l'affichage terminal
 class Colors:
@@ -28,207 +58,440 @@ class Colors:
     RESET = '\033[0m'
 
 
+SUPPORTED_EXTENSIONS = ['.pdf', '.jpg', '.jpeg', '.png']
+
+DEFAULT_MANIFEST = 'data/label_studio/import_manifest.jsonl'
+DEFAULT_HASH_INDEX = 'data/label_studio/hash_index.db'
+
+# Répertoire des médias, et le même vu depuis le conteneur Label Studio
+DEFAULT_MEDIA_DIRECTORY = 'data/media'
+DEFAULT_DOCUMENT_ROOT = '/label-studio/files'
+
+
 def load_config():
     """Charger la configuration depuis settings.yaml"""
     config_path = Path(__file__).parent.parent / 'config' / 'settings.yaml'
-    
+
     if not config_path.exists():
         print(f"{Colors.RED}❌ Fichier de configuration non trouvé !{Colors.RESET}")
         print(f"{Colors.YELLOW}💡 Copiez settings.example.yaml vers settings.yaml et configurez-le{Colors.RESET}")
         exit(1)
-    
+
     with open(config_path, 'r', encoding='utf-8') as f:
         return yaml.safe_load(f)
 
 
 def get_invoice_files(invoices_dir):
     """Trouver tous les fichiers de factures"""
-    supported_extensions = ['.pdf', '.jpg', '.jpeg', '.png']
     invoice_files = []
-    
+
     if not os.path.exists(invoices_dir):
         print(f"{Colors.RED}❌ Dossier {invoices_dir} n'existe pas !{Colors.RESET}")
         print(f"{Colors.YELLOW}💡 Créez-le et placez-y vos factures{Colors.RESET}")
         exit(1)
-    
+
     for file_path in Path(invoices_dir).rglob('*'):
-        if file_path.suffix.lower() in supported_extensions:
+        if file_path.suffix.lower() in SUPPORTED_EXTENSIONS:
             invoice_files.append(file_path)
-    
-    return invoice_files
 
+    return sorted(invoice_files)
 
-def pdf_to_image_base64(pdf_path):
-    """Convertir la première page d'un PDF en image PNG base64"""
-    try:
-        # Ouvrir le PDF
-        doc = fitz.open(pdf_path)
-        page = doc[0]  # Première page
 
-        # Convertir en image avec bonne résolution
-        pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))  # 2x zoom pour bonne qualité
+class ImportManifest:
+    """Journal des lots importés (JSONL, une ligne par lot, écrit après chaque succès)"""
 
-        # Convertir en PNG bytes
-        img_bytes = pix.tobytes("png")
-        doc.close()
+    def __init__(self, path):
+        self.path = Path(path)
+        self.imported: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
 
-        # Encoder en base64
-        base64_bytes = base64.b64encode(img_bytes)
-        base64_string = base64_bytes.decode('utf-8')
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # Dernière ligne tronquée par un arrêt brutal
+                    task_ids = entry.get('task_ids') or []
+                    for i, file_key in enumerate(entry['files']):
+                        self.imported[file_key] = task_ids[i:i + 1]
 
-        return f"data:image/png;base64,{base64_string}"
-    except Exception as e:
-        raise Exception(f"Erreur conversion PDF: {e}")
+    def __contains__(self, file_key: str) -> bool:
+        return file_key in self.imported
 
+    def record(self, file_keys: List[str], task_ids: List[int]):
+        """Noter un lot importé (écriture durable avant de passer au suivant)"""
+        entry = {'files': file_keys, 'task_ids': task_ids, 'imported_at': time.time()}
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            for i, file_key in enumerate(file_keys):
+                self.imported[file_key] = task_ids[i:i + 1]
 
-def convert_file_to_base64(file_path):
-    """Convertir un fichier en base64 pour Label Studio"""
-    extension = file_path.suffix.lower()
 
-    # Si c'est un PDF, le convertir en image
-    if extension == '.pdf':
-        return pdf_to_image_base64(file_path)
+def make_task(invoice_file: Path, image_url: str, near_duplicate: Optional[Dict] = None) -> Dict:
+    """Tâche Label Studio d'une facture (image référencée par URL)"""
+    task = {
+        'data': {
+            'image': image_url,
+            'filename': invoice_file.name,
+            'file_path': str(invoice_file)
+        },
+        'meta': {
+            'file_size': invoice_file.stat().st_size,
+            'file_type': invoice_file.suffix
+        }
+    }
+    # Quasi-doublon à revoir: colonne filtrable dans le Data Manager
+    if near_duplicate is not None:
+        task['data']['near_duplicate_of'] = near_duplicate['filename']
+        task['data']['near_duplicate_distance'] = near_duplicate['distance']
+    return task
+
 
-    # Pour les images, lire directement
-    with open(file_path, 'rb') as f:
-        file_bytes = f.read()
-        base64_bytes = base64.b64encode(file_bytes)
-        base64_string = base64_bytes.decode('utf-8')
+def import_batch(client: LabelStudioClient, files: List[Path], manifest: ImportManifest,
+                 media: MediaStore, max_attempts: int = 5, backoff_seconds: float = 2.0,
+                 on_imported: Optional[Callable[[List[str], List[int]], None]] = None,
+                 near_duplicates: Optional[Dict[str, Dict]] = None) -> Dict:
+    """
+    Rendre et importer un lot de factures
 
-    # Déterminer le type MIME
-    mime_types = {
-        '.jpg': 'image/jpeg',
-        '.jpeg': 'image/jpeg',
-        '.png': 'image/png'
+    Args:
+        near_duplicates: Document le plus proche de chaque quasi-doublon (par chemin)
+
+    Returns:
+        {'imported': n, 'errors': [(fichier, message)]}
+    """
+    tasks, keys, errors = [], [], []
+    for invoice_file, image_url in zip(files, media.publish(files)):
+        if isinstance(image_url, Exception):
+            errors.append((str(invoice_file), f"Erreur de conversion: {image_url}"))
+            continue
+        tasks.append(make_task(invoice_file, image_url, (near_duplicates or {}).get(str(invoice_file))))
+        keys.append(str(invoice_file))
+
+    if tasks:
+        # L'import en masse n'est pas idempotent: après une erreur où le lot a pu
+        # être créé (réseau, 5xx), les fichiers déjà présents sont retirés du lot
+        created: Dict[str, int] = {}
+        pending = list(zip(keys, tasks))
+        uncertain = False
+
+        def attempt() -> None:
+            nonlocal pending, uncertain
+            if uncertain:
+                created.update(client.tasks_by_file_path([key for key, _ in pending]))
+                pending = [(key, task) for key, task in pending if key not in created]
+                uncertain = False
+                if not pending:
+                    return
+            try:
+                task_ids = client.import_tasks([task for _, task in pending])
+            except LabelStudioError as e:
+                uncertain = e.status_code is None or not 400 <= e.status_code < 500
+                raise
+            if len(task_ids) == len(pending):
+                created.update((key, task_id) for (key, _), task_id in zip(pending, task_ids))
+            pending = []
+
+        try:
+            with_retries(attempt, max_attempts, backoff_seconds)
+        except LabelStudioError as e:
+            if uncertain:
+                # Dernière erreur ambiguë: noter ce qui a été créé pour ne pas le réimporter
+                try:
+                    created.update(client.tasks_by_file_path([key for key, _ in pending]))
+                except LabelStudioError:
+                    pass
+            done = [key for key in keys if key in created]
+            if done:
+                manifest.record(done, [created[key] for key in done])
+                if on_imported:
+                    on_imported(done, [created[key] for key in done])
+            return {'imported': len(done),
+                    'errors': errors + [(key, str(e)) for key in keys if key not in created]}
+        task_ids = [created[key] for key in keys] if all(key in created for key in keys) else []
+        manifest.record(keys, task_ids)
+        if on_imported:
+            on_imported(keys, task_ids)
+    return {'imported': len(tasks), 'errors': errors}
+
+
+def import_files(client: LabelStudioClient, files: Iterable[Path], manifest: ImportManifest,
+                 media: MediaStore, batch_size: int = 50, workers: int = 4, max_attempts: int = 5,
+                 backoff_seconds: float = 2.0, progress: Optional[Callable[[int], None]] = None,
+                 on_imported: Optional[Callable[[List[str], List[int]], None]] = None,
+                 near_duplicates: Optional[Dict[str, Dict]] = None) -> Dict:
+    """
+    Importer des factures par lots parallèles (reprise via le manifest)
+
+    Args:
+        client: Client Label Studio (pool de connexions >= workers)
+        files: Factures à importer
+        manifest: Lots déjà importés (ignorés) et journal des nouveaux
+        media: Répertoire des médias (rendu des images)
+        batch_size: Factures par appel d'import
+        workers: Lots en cours simultanément
+        max_attempts: Tentatives par lot (échecs temporaires)
+        backoff_seconds: Délai avant la première nouvelle tentative (doublé ensuite)
+        progress: Appelé avec le nombre de factures traitées à chaque lot terminé
+        on_imported: Appelé avec les fichiers et identifiants de tâches de chaque lot importé
+        near_duplicates: Quasi-doublons à marquer pour revue (chemin -> document proche)
+
+    Returns:
+        Résumé: importées, déjà présentes, erreurs, durée, débit
+    """
+    started = time.perf_counter()
+    files = list(files)
+    pending = [f for f in files if str(f) not in manifest]
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    imported, errors = 0, []
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        running = set()
+        # Au plus 2 lots d'avance par worker: les images encodées restent bornées en mémoire
+        for batch in batches:
+            if len(running) >= workers * 2:
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    imported += result['imported']
+                    errors.extend(result['errors'])
+                    if progress:
+                        progress(result['imported'] + len(result['errors']))
+            running.add(executor.submit(import_batch, client, batch, manifest, media,
+                                        max_attempts, backoff_seconds, on_imported, near_duplicates))
+        for future in running:
+            result = future.result()
+            imported += result['imported']
+            errors.extend(result['errors'])
+            if progress:
+                progress(result['imported'] + len(result['errors']))
+
+    elapsed = time.perf_counter() - started
+    return {
+        'imported': imported,
+        'skipped': len(files) - len(pending),
+        'errors': errors,
+        'batches': len(batches),
+        'elapsed_s': elapsed,
+        'tasks_per_second': imported / elapsed if elapsed > 0 else 0.0
     }
-    mime_type = mime_types.get(extension, 'image/jpeg')
 
-    return f"data:{mime_type};base64,{base64_string}"
 
+def plan_imports(files: List[Path], index: HashIndex, max_distance: int = DEFAULT_MAX_DISTANCE,
+                 workers: Optional[int] = None) -> Dict:
+    """
+    Trier les nouveaux fichiers face à l'index (et entre eux)
+
+    Les quasi-doublons restent dans 'new' (importés) et sont aussi listés
+    dans 'near_duplicates' pour revue: deux factures d'un même modèle
+    fournisseur ont des dHash voisins sans être des doublons.
+
+    Returns:
+        {'new': [fichier], 'duplicates': [(fichier, document)],
+         'near_duplicates': [(fichier, document)], 'fingerprints': {fichier: (sha256, dhash)}}
+    """
+    plan = {'new': [], 'duplicates': [], 'near_duplicates': [], 'fingerprints': {}}
+    # Doublons à l'intérieur du lot à importer: index temporaire en mémoire
+    batch_index = HashIndex()
+    for path, (sha256, phash) in zip(files, fingerprint_files([str(f) for f in files], workers)):
+        plan['fingerprints'][str(path)] = (sha256, phash)
+        status, match = classify(index, str(path), sha256, phash, max_distance)
+        if status == 'new':
+            status, match = classify(batch_index, str(path), sha256, phash, max_distance)
+        if status == 'duplicate':
+            plan['duplicates'].append((path, match))
+            continue
+        if status == 'near_duplicate':
+            plan['near_duplicates'].append((path, match))
+        plan['new'].append(path)
+        batch_index.add_many([{'sha256': sha256, 'phash': phash, 'path': str(path), 'filename': path.name}])
+    batch_index.close()
+    return plan
 
-def import_to_label_studio(config):
+
+def rebuild_index(client: LabelStudioClient, index: HashIndex, manifest: ImportManifest,
+                  workers: Optional[int] = None) -> int:
+    """
+    Remplir l'index depuis le manifest et les tâches existantes (une seule fois)
+
+    Seuls les fichiers encore présents localement peuvent être indexés.
+    """
+    known = {path: ids[0] if ids else None for path, ids in manifest.imported.items()}
+    for task in client.iter_tasks():
+        file_path = task.get('data', {}).get('file_path')
+        if file_path:
+            known.setdefault(file_path, task.get('id'))
+    paths = [path for path in known if Path(path).is_file()]
+    fingerprints = fingerprint_files(paths, workers)
+    return index.add_many([
+        {'sha256': sha256, 'phash': phash, 'path': path, 'filename': Path(path).name, 'task_id': known[path]}
+        for path, (sha256, phash) in zip(paths, fingerprints)
+    ])
+
+
+def import_to_label_studio(config, url=None, batch_size=None, workers=None, manifest_path=None,
+                           skip_near_duplicates=False, rebuild=False):
     """Import principal des factures"""
-    
+    from tqdm import tqdm
+
+    import_config = config['label_studio'].get('bulk_import', {})
+    batch_size = batch_size or import_config.get('batch_size', 50)
+    workers = workers or import_config.get('workers', 4)
+    manifest_path = manifest_path or import_config.get('manifest', DEFAULT_MANIFEST)
+
     print(f"\n{Colors.BLUE}{'='*60}{Colors.RESET}")
     print(f"{Colors.BLUE}🚀 IMPORT DE FACTURES DANS LABEL STUDIO{Colors.RESET}")
     print(f"{Colors.BLUE}{'='*60}{Colors.RESET}\n")
-    
+
     # Connexion à Label Studio
     print(f"{Colors.YELLOW}📡 Connexion à Label Studio...{Colors.RESET}")
+    url = url or config['label_studio']['url']
+    client = LabelStudioClient(
+        url,
+        config['label_studio']['api_key'],
+        config['label_studio']['project_id'],
+        timeout=import_config.get('timeout', 120),
+        max_requests_per_minute=import_config.get('max_requests_per_minute', 0),
+        pool_size=workers
+    )
     try:
-        client = LabelStudio(base_url=config['label_studio']['url'], api_key=config['label_studio']['api_key'])
-        # A basic request to verify connection is working
-        me = client.users.whoami()
-        print("username:", me.username)
-        print("email:", me.email)
+        project = client.get_project()
         print(f"{Colors.GREEN}✅ Connecté avec succès !{Colors.RESET}\n")
-    except Exception as e:
+        print(f"{Colors.GREEN}📁 Projet trouvé : {project.get('title')}{Colors.RESET}")
+        print(f"   ID: {client.project_id}")
+        print(f"   Tâches existantes : {project.get('task_number')} \n")
+    except LabelStudioError as e:
         print(f"{Colors.RED}❌ Erreur de connexion : {e}{Colors.RESET}")
         print(f"{Colors.YELLOW}💡 Vérifiez que Label Studio est démarré (docker-compose up -d){Colors.RESET}")
-        print(f"{Colors.YELLOW}💡 Vérifiez votre API key dans config/settings.yaml{Colors.RESET}")
+        print(f"{Colors.YELLOW}💡 Vérifiez votre API key et le project_id dans config/settings.yaml{Colors.RESET}")
         exit(1)
-    
-    # Récupérer le projet
-    try:
-        project = client.projects.get(id=config['label_studio']['project_id'])
-        print(f"{Colors.GREEN}📁 Projet trouvé : {project.title}{Colors.RESET}")
-        print(f"   ID: {project.id}")
-        print(f"   Tâches existantes : {project.task_number} \n")
-    except Exception as e:
-        print(f"{Colors.RED}❌ Projet non trouvé : {e}{Colors.RESET}")
-        print(f"{Colors.YELLOW}💡 Vérifiez le project_id dans config/settings.yaml{Colors.RESET}")
-        exit(1)
-    
+
     # Trouver les factures
     invoices_dir = Path(config['dataset']['raw_data_path'])
     invoice_files = get_invoice_files(invoices_dir)
-    
+
     if not invoice_files:
         print(f"{Colors.YELLOW}⚠️  Aucune facture trouvée dans {invoices_dir}{Colors.RESET}")
         print(f"{Colors.YELLOW}💡 Placez vos factures (PDF, JPG, PNG) dans ce dossier{Colors.RESET}")
         exit(0)
-    
+
     print(f"{Colors.GREEN}📄 {len(invoice_files)} factures trouvées{Colors.RESET}\n")
-    
-    # Récupérer les tâches déjà importées pour éviter les doublons
-    existing_tasks = client.tasks.list(project=project.id)
-    existing_filenames = {task.data.get('filename') for task in existing_tasks if hasattr(task, 'data') and task.data and 'filename' in task.data}
-    
-    # Préparer les tâches à importer
-    tasks_to_import = []
-    skipped = 0
-
-    print(f"{Colors.YELLOW}🔄 Préparation des imports...{Colors.RESET}")
-    print(f"{Colors.YELLOW}💡 Les fichiers PDF seront automatiquement convertis en images PNG{Colors.RESET}\n")
-
-    for invoice_file in tqdm(invoice_files, desc="Traitement", unit="facture"):
-        filename = invoice_file.name
-        
-        # Vérifier si déjà importé
-        if filename in existing_filenames:
-            skipped += 1
-            continue
-        
-        # Convertir en base64
+
+    # Éviter les doublons: lots déjà notés dans le manifest, puis index des empreintes
+    manifest = ImportManifest(manifest_path)
+    index = HashIndex(import_config.get('hash_index', DEFAULT_HASH_INDEX))
+    render_workers = import_config.get('render_workers')
+    if rebuild or (len(index) == 0 and (manifest.imported or project.get('task_number'))):
+        print(f"{Colors.YELLOW}🔎 Construction de l'index des empreintes (une seule fois)...{Colors.RESET}")
+        print(f"{Colors.GREEN}✅ {rebuild_index(client, index, manifest, render_workers)} "
+              f"documents indexés{Colors.RESET}\n")
+
+    candidates = [f for f in invoice_files if str(f) not in manifest]
+    plan = plan_imports(candidates, index, import_config.get('near_duplicate_distance', DEFAULT_MAX_DISTANCE),
+                        render_workers)
+    for path, match in plan['duplicates']:
+        print(f"{Colors.YELLOW}♻️  Doublon exact ignoré : {path.name} = {match['filename']}{Colors.RESET}")
+    for path, match in plan['near_duplicates']:
+        print(f"{Colors.YELLOW}👯 Quasi-doublon{' ignoré' if skip_near_duplicates else ' importé, à revoir'} : "
+              f"{path.name} ≈ {match['filename']} (distance {match['distance']}){Colors.RESET}")
+
+    near_duplicates = {str(path): match for path, match in plan['near_duplicates']}
+    to_import = [path for path in plan['new'] if not (skip_near_duplicates and str(path) in near_duplicates)]
+    skipped = len(invoice_files) - len(candidates)
+    fingerprints = plan['fingerprints']
+
+    def record_in_index(keys, task_ids):
+        index.add_many([
+            {'sha256': fingerprints[key][0], 'phash': fingerprints[key][1], 'path': key,
+             'filename': Path(key).name, 'task_id': task_ids[i] if i < len(task_ids) else None}
+            for i, key in enumerate(keys) if key in fingerprints
+        ])
+
+    if to_import:
+        # Médias servis par Label Studio: <document_root>/media = media_directory
+        document_root = import_config.get('document_root', DEFAULT_DOCUMENT_ROOT).rstrip('/')
         try:
-            image_data = convert_file_to_base64(invoice_file)
-            
-            task = {
-                'data': {
-                    'image': image_data,
-                    'filename': filename,
-                    'file_path': str(invoice_file)
-                },
-                'meta': {
-                    'file_size': invoice_file.stat().st_size,
-                    'file_type': invoice_file.suffix
-                }
-            }
-            
-            tasks_to_import.append(task)
-            
-        except Exception as e:
-            print(f"\n{Colors.RED}❌ Erreur avec {filename}: {e}{Colors.RESET}")
-            continue
-    
-    # Importer les tâches
-    if tasks_to_import:
-        print(f"\n{Colors.YELLOW}📤 Import de {len(tasks_to_import)} nouvelles factures...{Colors.RESET}")
+            client.ensure_local_storage(f"{document_root}/media")
+        except LabelStudioError as e:
+            print(f"{Colors.RED}❌ Stockage « local files » indisponible : {e}{Colors.RESET}")
+            print(f"{Colors.YELLOW}💡 Vérifiez LABEL_STUDIO_LOCAL_FILES_* dans docker-compose.yml{Colors.RESET}")
+            exit(1)
+        media = MediaStore(
+            import_config.get('media_directory', DEFAULT_MEDIA_DIRECTORY),
+            workers=import_config.get('render_workers')
+        )
+
+        print(f"{Colors.YELLOW}📤 Import de {len(to_import)} nouvelles factures "
+              f"(lots de {batch_size}, {workers} en parallèle)...{Colors.RESET}")
+        print(f"{Colors.YELLOW}💡 Les fichiers PDF seront rendus en PNG dans {media.media_dir}{Colors.RESET}\n")
 
         try:
-            # Importer chaque tâche individuellement avec barre de progression
-            imported_count = 0
-            for task in tqdm(tasks_to_import, desc="Import", unit="facture"):
-                client.tasks.create(
-                    project=project.id,
-                    data=task['data'],
-                    meta=task.get('meta')
+            with tqdm(total=len(to_import), desc="Import", unit="facture") as bar:
+                summary = import_files(
+                    client, to_import, manifest, media,
+                    batch_size=batch_size,
+                    workers=workers,
+                    max_attempts=import_config.get('max_attempts', 5),
+                    backoff_seconds=import_config.get('backoff_seconds', 2),
+                    progress=bar.update,
+                    on_imported=record_in_index,
+                    near_duplicates=near_duplicates
                 )
-                imported_count += 1
-            print(f"{Colors.GREEN}✅ {imported_count} factures importées avec succès !{Colors.RESET}\n")
-        except Exception as e:
-            print(f"{Colors.RED}❌ Erreur d'import : {e}{Colors.RESET}")
-            if imported_count > 0:
-                print(f"{Colors.YELLOW}⚠️  {imported_count} factures ont été importées avant l'erreur{Colors.RESET}")
-            exit(1)
+        finally:
+            media.close()
+
+        print(f"{Colors.GREEN}✅ {summary['imported']} factures importées "
+              f"({summary['tasks_per_second']:.1f}/s){Colors.RESET}\n")
+        for file_key, message in summary['errors'][:20]:
+            print(f"{Colors.RED}❌ {file_key}: {message}{Colors.RESET}")
+        if summary['errors']:
+            print(f"{Colors.YELLOW}⚠️  {len(summary['errors'])} factures non importées: "
+                  f"relancez le script pour les reprendre{Colors.RESET}\n")
     else:
+        summary = {'imported': 0, 'errors': []}
         print(f"\n{Colors.YELLOW}ℹ️  Aucune nouvelle facture à importer{Colors.RESET}\n")
-    
+
     # Résumé
     print(f"{Colors.BLUE}{'='*60}{Colors.RESET}")
     print(f"{Colors.BLUE}📊 RÉSUMÉ{Colors.RESET}")
     print(f"{Colors.BLUE}{'='*60}{Colors.RESET}")
     print(f"  Factures trouvées     : {len(invoice_files)}")
     print(f"  Déjà importées        : {skipped}")
-    print(f"  Nouvelles importées   : {len(tasks_to_import)}")
+    print(f"  Doublons exacts       : {len(plan['duplicates'])}")
+    print(f"  Quasi-doublons        : {len(plan['near_duplicates'])}"
+          f"{' (ignorés)' if skip_near_duplicates else ' (importés, colonne near_duplicate_of)'}")
+    print(f"  Nouvelles importées   : {summary['imported']}")
+    print(f"  En erreur             : {len(summary['errors'])}")
     # Récupérer le nombre de tâches après l'import
-    updated_project = client.projects.get(id=project.id)
-    print(f"  Total dans le projet  : {updated_project.task_number}")
+    print(f"  Total dans le projet  : {client.get_project().get('task_number')}")
     print(f"{Colors.BLUE}{'='*60}{Colors.RESET}\n")
-    
-    print(f"{Colors.GREEN}✨ C'est prêt ! Rendez-vous sur {config['label_studio']['url']} pour commencer l'annotation{Colors.RESET}\n")
 
+    print(f"{Colors.GREEN}✨ C'est prêt ! Rendez-vous sur {url} pour commencer l'annotation{Colors.RESET}\n")
+    return 1 if summary['errors'] else 0
+
+
+def main():
+    """Main"""
+    parser = argparse.ArgumentParser(description="Importer les factures dans Label Studio")
+    parser.add_argument('--url', type=str, help="URL de Label Studio (défaut depuis config)")
+    parser.add_argument('--batch-size', type=int, help="Factures par appel d'import")
+    parser.add_argument('--workers', type=int, help="Lots importés en parallèle")
+    parser.add_argument('--manifest', type=str, help="Journal des lots importés (reprise)")
+    parser.add_argument('--skip-near-duplicates', action='store_true',
+                        help="Ignorer les quasi-doublons au lieu de les importer pour revue")
+    parser.add_argument('--rebuild-index', action='store_true',
+                        help="Indexer les documents déjà importés (manifest et tâches du projet)")
+    args = parser.parse_args()
 
-if __name__ == '__main__':
     config = load_config()
-    import_to_label_studio(config)
+    sys.exit(import_to_label_studio(config, args.url, args.batch_size, args.workers, args.manifest,
+                                    args.skip_near_duplicates, args.rebuild_index))
+
+
+if __name__ == '__main__':
+    main()
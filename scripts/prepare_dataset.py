@@ -8,10 +8,13 @@ et crée les splits train/val/test.
 Usage:
     python scripts/prepare_dataset.py
     python scripts/prepare_dataset.py --input exports/annotations_20240101.json
+
+Par défaut, l'entrée est l'index fusionné de l'export incrémental
+(data/exports/annotations_index.db), sinon le dernier export complet.
 """
 
 import os
-import json
+import sys
 import yaml
 import shutil
 import argparse
@@ -20,6 +23,11 @@ from typing import Dict, List, Tuple
 import random
 from tqdm import tqdm
 
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api.annotation_export import load_export_tasks
+
 # Couleurs
 class Colors:
     GREEN = '\033[92m'
@@ -37,7 +45,10 @@ def load_config():
 
 
 def find_latest_export(exports_dir: Path) -> Path:
-    """Trouver le dernier fichier d'export"""
+    """Trouver l'index de l'export incrémental, ou le dernier fichier d'export"""
+    index_file = exports_dir / 'annotations_index.db'
+    if index_file.exists():
+        return index_file
     export_files = list(exports_dir.glob('annotations_*.json'))
     if not export_files:
         raise FileNotFoundError(f"Aucun fichier d'export trouvé dans {exports_dir}")
@@ -92,10 +103,7 @@ def prepare_yolo_dataset(config: dict, export_file: Path):
 
     # Charger les annotations
     print(f"{Colors.YELLOW}📥 Chargement des annotations...{Colors.RESET}")
-    with open(export_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-
-    tasks = data['tasks']
+    tasks = load_export_tasks(export_file)
     print(f"{Colors.GREEN}✅ {len(tasks)} factures annotées chargées{Colors.RESET}\n")
 
     # Créer le mapping des labels
@@ -206,7 +214,7 @@ def main():
     parser.add_argument(
         '--input',
         type=str,
-        help="Fichier d'export JSON (optionnel, prend le plus récent par défaut)"
+        help="Index d'export (.db) ou fichier d'export JSON (optionnel, le plus récent par défaut)"
     )
     args = parser.parse_args()
 
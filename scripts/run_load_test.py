@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+Test de charge de l'API d'extraction
+
+Envoie les factures d'un répertoire sur /extract (ou /extract/batch s'il
+existe) et mesure débit, latences p50/p95/p99, taux d'erreur et durées
+par étage côté serveur (en-tête Server-Timing).
+
+Deux modes:
+    - boucle fermée : N clients envoient une requête dès la précédente reçue
+    - boucle ouverte: arrivées à débit fixe (loi de Poisson), indépendantes
+                      des réponses; la latence est mesurée depuis l'instant
+                      d'arrivée prévu (pas d'omission coordonnée)
+
+Usage:
+    python scripts/run_load_test.py --corpus data/raw/invoices --concurrency 8 --duration 60
+    python scripts/run_load_test.py --corpus benchmarks/corpus --rate 5 --duration 120 --output charge.json
+    python scripts/run_load_test.py --batch-size 10 --concurrency 2 --requests 50
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import requests
+import yaml
+
+# Couleurs
+class Colors:
+    GREEN = '\033[92m'
+    YELLOW = '\033[93m'
+    RED = '\033[91m'
+    BLUE = '\033[94m'
+    RESET = '\033[0m'
+
+
+SUPPORTED_EXTENSIONS = ('.pdf', '.jpg', '.jpeg', '.png')
+
+
+def load_config():
+    """Charger la configuration"""
+    config_path = Path(__file__).parent.parent / 'config' / 'settings.yaml'
+    with open(config_path, 'r', encoding='utf-8') as f:
+        return yaml.safe_load(f)
+
+
+def load_corpus(corpus_dir: Path) -> list:
+    """Charger les factures en mémoire (nom, contenu)"""
+    files = sorted(p for p in corpus_dir.rglob('*') if p.suffix.lower() in SUPPORTED_EXTENSIONS)
+    return [(p.name, p.read_bytes()) for p in files]
+
+
+def percentile(values, q: float) -> float:
+    """Percentile (interpolation linéaire), None si aucune valeur"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def parse_server_timing(header: str) -> dict:
+    """Durées (ms) de l'en-tête Server-Timing: 'ocr;dur=412.5, ...' -> {'ocr': 412.5}"""
+    timings = {}
+    for metric in (header or '').split(','):
+        parts = [part.strip() for part in metric.split(';')]
+        if not parts[0]:
+            continue
+        for param in parts[1:]:
+            if param.startswith('dur='):
+                try:
+                    timings[parts[0]] = float(param[4:])
+                except ValueError:
+                    pass
+    return timings
+
+
+class LoadTest:
+    """Générateur de charge sur /extract ou /extract/batch"""
+
+    def __init__(self, api_url: str, corpus: list, batch_size: int = 0, timeout: float = 120.0,
+                 seed: int = 0):
+        """
+        Args:
+            api_url: URL de base de l'API
+            corpus: Factures (nom, contenu)
+            batch_size: Fichiers par requête sur /extract/batch (0: /extract)
+            timeout: Timeout HTTP par requête (secondes)
+            seed: Graine pour l'ordre des fichiers et les arrivées
+        """
+        self.api_url = api_url.rstrip('/')
+        self.corpus = corpus
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.rng = random.Random(seed)
+        self.results = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._next_file = 0
+
+    @property
+    def endpoint(self) -> str:
+        return '/extract/batch' if self.batch_size else '/extract'
+
+    def _session(self) -> requests.Session:
+        """Une session HTTP (keep-alive) par thread"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def _files(self):
+        """Prochain(s) fichier(s) du corpus, en boucle"""
+        count = self.batch_size or 1
+        with self._lock:
+            picked = [self.corpus[(self._next_file + i) % len(self.corpus)] for i in range(count)]
+            self._next_file += count
+        field = 'files' if self.batch_size else 'file'
+        return [(field, (name, content)) for name, content in picked]
+
+    def send(self, scheduled: float, start_time: float) -> dict:
+        """
+        Envoyer une requête et noter le résultat
+
+        Args:
+            scheduled: Instant d'arrivée prévu (perf_counter)
+            start_time: Début du test (perf_counter)
+        """
+        files = self._files()
+        sent = time.perf_counter()
+        result = {
+            'scheduled_s': scheduled - start_time,
+            'wait_ms': (sent - scheduled) * 1000,  # Retard d'émission (client saturé)
+            'documents': len(files)
+        }
+
+        try:
+            response = self._session().post(f"{self.api_url}{self.endpoint}", files=files,
+                                            timeout=self.timeout)
+            result['status'] = response.status_code
+            result['server_timing'] = parse_server_timing(response.headers.get('Server-Timing'))
+            if response.status_code != 200:
+                result['error'] = f"http_{response.status_code}"
+            else:
+                data = response.json()
+                if isinstance(data, dict) and data.get('success') is False:
+                    result['error'] = f"extraction: {data.get('error')}"
+                elif isinstance(data, dict) and data.get('data'):
+                    result['quality_mode'] = data['data'].get('quality_mode')
+        except requests.exceptions.Timeout:
+            result['error'] = 'timeout'
+        except requests.exceptions.ConnectionError:
+            result['error'] = 'connection'
+        except Exception as e:
+            result['error'] = type(e).__name__
+
+        done = time.perf_counter()
+        result['latency_ms'] = (done - scheduled) * 1000
+        result['service_ms'] = (done - sent) * 1000
+        result['completed_s'] = done - start_time
+        with self._lock:
+            self.results.append(result)
+        return result
+
+    def run_closed(self, concurrency: int, duration: float = None, total: int = None):
+        """Boucle fermée: `concurrency` clients, une requête à la fois chacun"""
+        start = time.perf_counter()
+        remaining = [total]
+
+        def client():
+            while True:
+                if duration is not None and time.perf_counter() - start >= duration:
+                    return
+                if total is not None:
+                    with self._lock:
+                        if remaining[0] <= 0:
+                            return
+                        remaining[0] -= 1
+                self.send(time.perf_counter(), start)
+
+        threads = [threading.Thread(target=client, daemon=True) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - start
+
+    def run_open(self, rate: float, max_in_flight: int, duration: float = None, total: int = None):
+        """Boucle ouverte: arrivées de Poisson à `rate` requêtes/s"""
+        start = time.perf_counter()
+        next_arrival = start
+        sent = 0
+
+        with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+            while True:
+                if total is not None and sent >= total:
+                    break
+                if duration is not None and next_arrival - start >= duration:
+                    break
+
+                delay = next_arrival - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                # Si tous les workers sont occupés, l'attente compte dans la latence
+                executor.submit(self.send, next_arrival, start)
+                sent += 1
+                next_arrival += self.rng.expovariate(rate)
+
+        return time.perf_counter() - start
+
+
+def summarize(results: list, elapsed: float) -> dict:
+    """Débit, percentiles de latence, erreurs et durées serveur par étage"""
+    ok = [r for r in results if 'error' not in r]
+    latencies = [r['latency_ms'] for r in ok]
+    errors = Counter(r['error'] for r in results if 'error' in r)
+
+    stages = defaultdict(list)
+    for r in ok:
+        for name, ms in r.get('server_timing', {}).items():
+            stages[name].append(ms)
+
+    # Chronologie par seconde (graphes de capacité)
+    timeline = defaultdict(lambda: {'completed': 0, 'errors': 0, 'latencies': []})
+    for r in results:
+        bucket = timeline[int(r['completed_s'])]
+        if 'error' in r:
+            bucket['errors'] += 1
+        else:
+            bucket['completed'] += 1
+            bucket['latencies'].append(r['latency_ms'])
+
+    return {
+        'requests': len(results),
+        'succeeded': len(ok),
+        'documents': sum(r['documents'] for r in ok),
+        'elapsed_s': elapsed,
+        'throughput_rps': len(ok) / elapsed if elapsed else 0.0,
+        'throughput_docs_s': sum(r['documents'] for r in ok) / elapsed if elapsed else 0.0,
+        'error_rate': sum(errors.values()) / len(results) if results else 0.0,
+        'errors': dict(errors),
+        'latency_ms': {
+            'mean': sum(latencies) / len(latencies) if latencies else None,
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+            'max': max(latencies) if latencies else None
+        },
+        'server_timing_ms': {
+            name: {'mean': sum(values) / len(values), 'p95': percentile(values, 95)}
+            for name, values in stages.items()
+        },
+        'quality_modes': dict(Counter(r['quality_mode'] for r in ok if r.get('quality_mode'))),
+        'timeline': [
+            {'second': second, 'completed': bucket['completed'], 'errors': bucket['errors'],
+             'p95_ms': percentile(bucket['latencies'], 95)}
+            for second, bucket in sorted(timeline.items())
+        ]
+    }
+
+
+def print_summary(summary: dict):
+    """Afficher le résumé"""
+    latency = summary['latency_ms']
+    fmt = lambda v: f"{v:.0f} ms" if v is not None else "N/A"
+
+    print(f"\n{Colors.BLUE}📊 Résultats:{Colors.RESET}")
+    print(f"   Requêtes: {summary['requests']} ({summary['succeeded']} réussies) en {summary['elapsed_s']:.1f}s")
+    print(f"   Débit: {summary['throughput_rps']:.2f} req/s - {summary['throughput_docs_s']:.2f} docs/s")
+    print(f"   Latence: p50 {fmt(latency['p50'])} | p95 {fmt(latency['p95'])} | "
+          f"p99 {fmt(latency['p99'])} | max {fmt(latency['max'])}")
+
+    color = Colors.GREEN if summary['error_rate'] == 0 else Colors.RED
+    print(f"   {color}Erreurs: {summary['error_rate']:.1%}{Colors.RESET} {summary['errors'] or ''}")
+
+    if summary['server_timing_ms']:
+        print(f"\n{Colors.BLUE}   Étages serveur (moyenne / p95):{Colors.RESET}")
+        for name, stats in summary['server_timing_ms'].items():
+            print(f"      • {name:10s} {stats['mean']:8.1f} ms / {stats['p95']:8.1f} ms")
+
+    if summary['quality_modes']:
+        print(f"\n   Modes de qualité: {summary['quality_modes']}")
+
+
+def main():
+    """Main"""
+    parser = argparse.ArgumentParser(description="Test de charge de l'API d'extraction")
+    parser.add_argument('--api', type=str, help='URL de l\'API (défaut depuis config)')
+    parser.add_argument('--corpus', type=str, default='data/raw/invoices', help='Répertoire des factures')
+    parser.add_argument('--concurrency', type=int, default=4, help='Clients simultanés (boucle fermée)')
+    parser.add_argument('--rate', type=float, help='Arrivées par seconde (boucle ouverte)')
+    parser.add_argument('--max-in-flight', type=int, default=64, help='Requêtes simultanées max en boucle ouverte')
+    parser.add_argument('--duration', type=float, help='Durée du test (secondes)')
+    parser.add_argument('--requests', type=int, help='Nombre de requêtes')
+    parser.add_argument('--batch-size', type=int, default=0, help='Fichiers par requête sur /extract/batch')
+    parser.add_argument('--timeout', type=float, default=120, help='Timeout par requête (secondes)')
+    parser.add_argument('--seed', type=int, default=0, help='Graine (ordre des fichiers, arrivées)')
+    parser.add_argument('--output', type=str, help='Export JSON des résultats')
+    args = parser.parse_args()
+
+    if args.duration is None and args.requests is None:
+        args.duration = 30
+
+    if args.api:
+        api_url = args.api
+    else:
+        config = load_config()
+        api_url = f"http://{config['api']['host']}:{config['api']['port']}"
+
+    print(f"\n{Colors.BLUE}{'='*60}{Colors.RESET}")
+    print(f"{Colors.BLUE}🔥 TEST DE CHARGE DE L'API{Colors.RESET}")
+    print(f"{Colors.BLUE}{'='*60}{Colors.RESET}\n")
+
+    corpus = load_corpus(Path(args.corpus))
+    if not corpus:
+        print(f"{Colors.RED}❌ Aucune facture dans {args.corpus}{Colors.RESET}")
+        return
+
+    # /extract/batch seulement s'il est exposé par l'API
+    batch_size = args.batch_size
+    if batch_size:
+        try:
+            paths = requests.get(f"{api_url}/openapi.json", timeout=5).json().get('paths', {})
+        except Exception:
+            paths = {}
+        if '/extract/batch' not in paths:
+            print(f"{Colors.YELLOW}⚠️  /extract/batch non disponible: utilisation de /extract{Colors.RESET}")
+            batch_size = 0
+
+    test = LoadTest(api_url, corpus, batch_size=batch_size, timeout=args.timeout, seed=args.seed)
+    mode = (f"boucle ouverte, {args.rate} req/s" if args.rate
+            else f"boucle fermée, {args.concurrency} clients")
+    print(f"API: {api_url}{test.endpoint}")
+    print(f"Corpus: {len(corpus)} factures - {mode}\n")
+
+    started_at = datetime.now().isoformat(timespec='seconds')
+    if args.rate:
+        elapsed = test.run_open(args.rate, args.max_in_flight, duration=args.duration, total=args.requests)
+    else:
+        elapsed = test.run_closed(args.concurrency, duration=args.duration, total=args.requests)
+
+    summary = summarize(test.results, elapsed)
+    print_summary(summary)
+
+    if args.output:
+        report = {
+            'api_url': api_url,
+            'endpoint': test.endpoint,
+            'started_at': started_at,
+            'mode': 'open' if args.rate else 'closed',
+            'rate': args.rate,
+            'concurrency': None if args.rate else args.concurrency,
+            'max_in_flight': args.max_in_flight if args.rate else None,
+            'batch_size': batch_size,
+            'corpus': {'path': args.corpus, 'files': len(corpus)},
+            'summary': summary,
+            'requests': test.results
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n{Colors.GREEN}💾 Résultats: {args.output}{Colors.RESET}")
+
+    print(f"\n{Colors.BLUE}{'='*60}{Colors.RESET}\n")
+
+
+if __name__ == '__main__':
+    main()
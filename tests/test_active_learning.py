@@ -0,0 +1,134 @@
+"""
+Tests unitaires pour la sélection par apprentissage actif
+"""
+import json
+import pytest
+import sqlite3
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api.active_learning import (
+    ActiveLearningSelector,
+    jaccard_distance,
+    label_uncertainty,
+    layout_fingerprint,
+    training_fingerprints
+)
+from api.feedback import FeedbackQueue
+
+
+LABELS = ['numero_facture', 'montant_ttc', 'nom_fournisseur']
+
+
+def _field(label, confidence, x, y, value='x'):
+    return {'label': label, 'value': value, 'confidence': confidence,
+            'bbox': {'x': x, 'y': y, 'width': 0.1, 'height': 0.04}}
+
+
+class FakeExtraction:
+    def __init__(self, fields):
+        self.data = {'filename': 'f.png', 'fields': fields, 'overall_confidence': 0.6,
+                     'needs_review': True, 'model_version': 'v1', 'quality_mode': 'full'}
+
+    def model_dump_json(self) -> str:
+        return json.dumps(self.data)
+
+
+class NoClient:
+    timeout = 1
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = FeedbackQueue(tmp_path / "queue.db", tmp_path / "spool", NoClient())
+    yield queue
+    queue.close()
+
+
+def test_layout_fingerprint_and_distance():
+    """Test de l'empreinte (label x case) et de la distance de Jaccard"""
+    top = layout_fingerprint([('numero_facture', 0.1, 0.1), ('montant_ttc', 0.8, 0.9)], LABELS)
+    same = layout_fingerprint([('numero_facture', 0.15, 0.2), ('montant_ttc', 0.9, 0.8)], LABELS)
+    moved = layout_fingerprint([('numero_facture', 0.9, 0.1), ('montant_ttc', 0.8, 0.9)], LABELS)
+
+    assert top == same
+    assert jaccard_distance(top, same) == 0.0
+    assert jaccard_distance(top, moved) == pytest.approx(2 / 3)
+    assert layout_fingerprint([('inconnu', 0.5, 0.5)], LABELS) == 0
+
+
+def test_label_uncertainty():
+    """Test de l'incertitude par label (label obligatoire absent, valeur non lue)"""
+    uncertainty = label_uncertainty({'fields': [
+        _field('montant_ttc', 0.9, 0.5, 0.8),
+        _field('montant_ttc', 0.6, 0.5, 0.9),
+        _field('numero_facture', 0.95, 0.1, 0.1, value='[Non détecté]'),
+    ]}, required_labels=['nom_fournisseur'])
+
+    assert uncertainty['montant_ttc'] == pytest.approx(0.4)
+    assert uncertainty['numero_facture'] == 0.5
+    assert uncertainty['nom_fournisseur'] == 1.0
+
+
+def test_training_fingerprints(tmp_path):
+    """Test de la lecture des annotations YOLO du jeu d'entraînement"""
+    (tmp_path / "a.txt").write_text("0 0.1 0.1 0.2 0.05\n1 0.8 0.9 0.1 0.05\n")
+    (tmp_path / "b.txt").write_text("0 0.12 0.15 0.2 0.05\n1 0.85 0.85 0.1 0.05\n")
+    fingerprints = training_fingerprints(tmp_path, LABELS)
+    assert fingerprints == [layout_fingerprint([('numero_facture', 0.1, 0.1), ('montant_ttc', 0.8, 0.9)], LABELS)]
+
+
+def test_selection_within_budget_prefers_diverse_layouts(queue, tmp_path):
+    """Test du lot quotidien: budget respecté, mises en page variées, notation incrémentale"""
+    labels_dir = tmp_path / "train"
+    labels_dir.mkdir()
+    (labels_dir / "known.txt").write_text("0 0.1 0.1 0.2 0.05\n1 0.8 0.9 0.1 0.05\n")
+
+    known = [_field('numero_facture', 0.5, 0.05, 0.08), _field('montant_ttc', 0.5, 0.75, 0.88)]
+    new_layout = [_field('numero_facture', 0.6, 0.75, 0.08), _field('montant_ttc', 0.6, 0.05, 0.5)]
+    # Trois copies douteuses de la même mise en page nouvelle, une connue plus douteuse
+    assert queue.enqueue(b"1", ".png", "known.png", FakeExtraction(known), candidate=True)
+    for i in range(3):
+        queue.enqueue(f"new-{i}".encode(), ".png", f"new-{i}.png", FakeExtraction(new_layout), candidate=True)
+    assert queue.get_stats()['candidates'] == 4
+    assert queue.get_stats()['pending'] == 0
+
+    selector = ActiveLearningSelector(queue, LABELS, daily_budget=2, training_labels_dir=str(labels_dir))
+    assert selector.score_new() == 4
+    assert selector.score_new() == 0
+
+    selected = selector.run()
+    assert [item['filename'] for item in selected] == ["new-0.png", "known.png"]
+    assert queue.get_stats()['pending'] == 2
+    assert selector.remaining_budget() == 0
+    assert selector.run() == []
+
+    row = queue._conn.execute("SELECT * FROM feedback_queue WHERE filename = 'new-0.png'").fetchone()
+    task = queue._task(row)
+    assert task['meta']['active_learning_score'] == pytest.approx(selected[0]['score'])
+    assert task['meta']['uncertain_labels'] == []
+
+
+def test_expire_candidates_and_schema_migration(tmp_path):
+    """Test de l'expiration des candidates et de la mise à jour d'une ancienne base"""
+    conn = sqlite3.connect(str(tmp_path / "queue.db"))
+    conn.execute("CREATE TABLE feedback_queue (id INTEGER PRIMARY KEY AUTOINCREMENT, sha256 TEXT NOT NULL UNIQUE, "
+                 "file TEXT NOT NULL, filename TEXT NOT NULL, extraction TEXT NOT NULL, queued_at REAL NOT NULL, "
+                 "status TEXT NOT NULL DEFAULT 'pending', attempts INTEGER NOT NULL DEFAULT 0, "
+                 "next_attempt_at REAL NOT NULL DEFAULT 0, claimed_at REAL, sent_at REAL, task_id INTEGER, "
+                 "last_error TEXT)")
+    conn.close()
+
+    queue = FeedbackQueue(tmp_path / "queue.db", tmp_path / "spool", NoClient())
+    queue.enqueue(b"old", ".png", "old.png", FakeExtraction([]), candidate=True)
+    assert queue.expire_candidates(older_than=1e12) == 1
+    assert queue.get_stats()['candidates'] == 0
+    assert not list((tmp_path / "spool").iterdir())
+    queue.close()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
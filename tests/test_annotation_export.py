@@ -0,0 +1,209 @@
+"""
+Tests unitaires pour l'export incrémental des annotations (serveur simulé)
+"""
+import json
+import pytest
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api.annotation_export import AnnotationIndex, compact_task, export_incremental, load_export_tasks
+from api.label_studio import LabelStudioClient
+from benchmarks.mock_label_studio import MockLabelStudio
+from tests.test_label_studio_import import UrllibSession
+
+# Annotations postérieures à l'import des tâches (horodaté à l'heure courante)
+T0 = datetime.now(timezone.utc).replace(microsecond=0) + timedelta(days=1)
+
+
+def _server(count):
+    server = MockLabelStudio().start()
+    server._import([{'data': {'image': f"/data/local-files/?d=media/{i}.png", 'filename': f"facture_{i}.pdf"}}
+                    for i in range(count)])
+    return server
+
+
+def _client(server):
+    return LabelStudioClient(server.url, server.api_key, server.project_id,
+                             max_requests_per_minute=0, session=UrllibSession())
+
+
+def _read_delta(path):
+    return [json.loads(line) for line in Path(path).read_text().splitlines()]
+
+
+def test_first_export_streams_annotated_tasks(tmp_path):
+    """Test du premier export: seules les tâches annotées, par pages, curseur posé"""
+    server = _server(12)
+    try:
+        for task_id in range(1, 8):
+            server.annotate(task_id, ['montant_ttc', 'date_facture'], when=T0 + timedelta(minutes=task_id))
+        index = AnnotationIndex(str(tmp_path / "index.db"))
+        before = datetime.now(timezone.utc)
+        summary = export_incremental(_client(server), index, str(tmp_path / "deltas"), page_size=3)
+    finally:
+        server.stop()
+
+    assert summary['tasks'] == 7 and summary['upserted'] == 7
+    assert summary['annotated_tasks'] == len(index) == 7
+    assert summary['label_counts'] == {'montant_ttc': 7, 'date_facture': 7}
+    # Curseur: début de l'export, pas l'horodatage le plus récent lu
+    assert before <= datetime.fromisoformat(summary['cursor']) <= datetime.now(timezone.utc)
+    assert [task['id'] for task in _read_delta(summary['delta_file'])] == list(range(1, 8))
+    assert not list((tmp_path / "deltas").glob(".*.tmp"))
+    index.close()
+
+
+def test_incremental_export_only_fetches_changes(tmp_path):
+    """Test des exports suivants: uniquement les nouvelles annotations, rien si rien n'a changé"""
+    server = _server(10)
+    try:
+        client = _client(server)
+        index = AnnotationIndex(str(tmp_path / "index.db"))
+        for task_id in range(1, 6):
+            server.annotate(task_id, ['montant_ttc'], when=T0 + timedelta(minutes=task_id))
+        first = export_incremental(client, index, str(tmp_path / "deltas"))
+
+        server.annotate(6, ['numero_facture'], when=T0 + timedelta(hours=1))
+        server.annotate(2, ['date_facture'], when=T0 + timedelta(hours=2))
+        summary = export_incremental(client, index, str(tmp_path / "deltas"))
+
+        assert summary['previous_cursor'] == first['cursor']
+        # Les tâches relues sans changement ne sont pas réécrites
+        assert [task['id'] for task in _read_delta(summary['delta_file'])] == [2, 6]
+        assert summary['annotated_tasks'] == 6
+        updated = {task['id']: task for task in index.iter_tasks()}[2]
+        assert len(updated['annotations']) == 2
+
+        summary = export_incremental(client, index, str(tmp_path / "deltas"))
+        assert summary['delta_file'] is None and summary['tasks'] == 0
+    finally:
+        server.stop()
+        index.close()
+
+
+class EditingClient(LabelStudioClient):
+    """Client dont la première page lue est suivie d'une modification de la tâche 1"""
+
+    def __init__(self, server):
+        super().__init__(server.url, server.api_key, server.project_id,
+                         max_requests_per_minute=0, session=UrllibSession())
+        self.server = server
+        self.edited = False
+
+    def iter_tasks(self, page_size=1000, **params):
+        for task in super().iter_tasks(page_size=page_size, **params):
+            yield task
+            if not self.edited:
+                self.edited = True
+                self.server.annotate(1, ['date_facture'])
+
+
+def test_edits_during_export_are_not_lost(tmp_path):
+    """Test qu'une tâche modifiée pendant l'export ne fait sauter aucune tâche et est relue ensuite"""
+    server = _server(6)
+    try:
+        for task_id in range(1, 7):
+            server.annotate(task_id, ['montant_ttc'])
+        index = AnnotationIndex(str(tmp_path / "index.db"))
+        summary = export_incremental(EditingClient(server), index, str(tmp_path / "deltas"), page_size=2)
+        assert summary['tasks'] == 6
+
+        summary = export_incremental(_client(server), index, str(tmp_path / "deltas"), page_size=2)
+        assert [task['id'] for task in _read_delta(summary['delta_file'])] == [1]
+        assert len({task['id']: task for task in index.iter_tasks()}[1]['annotations']) == 2
+    finally:
+        server.stop()
+        index.close()
+
+
+class FailingClient(LabelStudioClient):
+    """Client dont la connexion tombe après la première page"""
+
+    def __init__(self, server):
+        super().__init__(server.url, server.api_key, server.project_id,
+                         max_requests_per_minute=0, session=UrllibSession())
+
+    def iter_tasks(self, page_size=1000, **params):
+        for i, task in enumerate(super().iter_tasks(page_size=page_size, **params)):
+            if i == page_size:
+                raise ConnectionError("connexion perdue")
+            yield task
+
+
+def test_interrupted_export_merges_nothing(tmp_path):
+    """Test qu'un export interrompu ne fusionne aucune tâche absente des deltas"""
+    server = _server(5)
+    try:
+        for task_id in range(1, 6):
+            server.annotate(task_id, ['montant_ttc'])
+        index = AnnotationIndex(str(tmp_path / "index.db"))
+        with pytest.raises(ConnectionError):
+            export_incremental(FailingClient(server), index, str(tmp_path / "deltas"), page_size=2)
+        assert len(index) == 0
+        assert index.cursor is None
+        assert not list((tmp_path / "deltas").iterdir())
+
+        summary = export_incremental(_client(server), index, str(tmp_path / "deltas"), page_size=2)
+        assert [task['id'] for task in _read_delta(summary['delta_file'])] == [1, 2, 3, 4, 5]
+        assert len(index) == 5
+    finally:
+        server.stop()
+        index.close()
+
+
+def test_removed_annotations_leave_index(tmp_path):
+    """Test qu'une tâche dont les annotations ont été supprimées sort de l'index"""
+    server = _server(3)
+    try:
+        client = _client(server)
+        index = AnnotationIndex(str(tmp_path / "index.db"))
+        server.annotate(1, ['montant_ttc'], when=T0)
+        server.annotate(2, ['montant_ttc'], when=T0)
+        export_incremental(client, index, str(tmp_path / "deltas"))
+
+        task = server.tasks[0]
+        task['annotations'], task['total_annotations'] = [], 0
+        task['updated_at'] = (T0 + timedelta(minutes=5)).isoformat()
+        summary = export_incremental(client, index, str(tmp_path / "deltas"))
+    finally:
+        server.stop()
+
+    assert summary['removed'] == 1
+    assert [task['id'] for task in index.iter_tasks()] == [2]
+    index.close()
+
+
+def test_compact_task_drops_inline_images():
+    """Test de la compaction: pas de base64, pas d'annotation annulée, champs réduits"""
+    task = {
+        'id': 4, 'updated_at': '2024-01-01T12:00:00+00:00', 'completed_at': None, 'predictions': [{'x': 1}],
+        'data': {'image': 'data:image/png;base64,' + 'A' * 1000, 'filename': 'f.pdf', 'original_path': '/x/f.pdf'},
+        'annotations': [
+            {'id': 1, 'result': [], 'was_cancelled': True},
+            {'id': 2, 'result': [{'value': {}}], 'was_cancelled': False, 'lead_time': 3.0}
+        ]
+    }
+    compact = compact_task(task)
+    assert compact['data'] == {'filename': 'f.pdf', 'original_path': '/x/f.pdf'}
+    assert [annotation['id'] for annotation in compact['annotations']] == [2]
+    assert 'lead_time' not in compact['annotations'][0] and 'predictions' not in compact
+
+
+def test_load_export_tasks_from_index_and_legacy_json(tmp_path):
+    """Test du chargement par prepare_dataset: index .db ou ancien export JSON"""
+    index = AnnotationIndex(str(tmp_path / "annotations_index.db"))
+    index.merge([compact_task({'id': 1, 'data': {'filename': 'a.pdf'}, 'annotations': [{'id': 1, 'result': []}]})])
+    index.close()
+    legacy = tmp_path / "annotations_20240101.json"
+    legacy.write_text(json.dumps({'tasks': [{'id': 9}]}))
+
+    assert [task['data']['filename'] for task in load_export_tasks(tmp_path / "annotations_index.db")] == ['a.pdf']
+    assert load_export_tasks(legacy) == [{'id': 9}]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,138 @@
+"""
+Tests unitaires pour l'extraction par lot
+"""
+import pytest
+import json
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api import batch
+from api.batch import BatchResult, Checkpoint, extraction_rows, iter_invoice_files, run_batch
+from api.models import BoundingBox, ExtractedField, InvoiceExtraction
+
+
+def _extraction(filename: str) -> InvoiceExtraction:
+    """Extraction de test à deux champs"""
+    return InvoiceExtraction(
+        filename=filename,
+        fields=[
+            ExtractedField(label="numero_facture", value="F-001", confidence=0.9,
+                           bbox=BoundingBox(x=0.1, y=0.1, width=0.2, height=0.05)),
+            ExtractedField(label="montant_ttc", value="120.00", confidence=0.8)
+        ],
+        overall_confidence=0.85,
+        needs_review=False,
+        model_version="test_v1"
+    )
+
+
+def test_iter_invoice_files(tmp_path):
+    """Test du parcours récursif (extensions filtrées, ordre stable)"""
+    (tmp_path / "b").mkdir()
+    for name in ["b/2.pdf", "a.PNG", "notes.txt", "b/1.jpg"]:
+        (tmp_path / name).write_bytes(b"")
+
+    files = [p.relative_to(tmp_path).as_posix() for p in iter_invoice_files(tmp_path)]
+    assert files == ["a.PNG", "b/1.jpg", "b/2.pdf"]
+
+
+def test_extraction_rows_one_per_field():
+    """Test d'une ligne par champ"""
+    rows = extraction_rows(BatchResult("x/f.pdf", _extraction("f.pdf"), None, 0.1))
+
+    assert [row['label'] for row in rows] == ["numero_facture", "montant_ttc"]
+    assert rows[0]['bbox_x'] == 0.1
+    assert rows[1]['bbox_x'] is None
+    assert rows[0]['quality_mode'] == "full"
+
+
+def test_checkpoint_resume(tmp_path):
+    """Test que seuls les fichiers réussis sont ignorés à la reprise"""
+    path = tmp_path / "run.checkpoint"
+    checkpoint = Checkpoint(path)
+    checkpoint.record([
+        BatchResult("a.pdf", _extraction("a.pdf"), None, 0.1),
+        BatchResult("b.pdf", None, "PDF corrompu", 0.1)
+    ])
+    checkpoint.close()
+    # Ligne tronquée par une interruption
+    with open(path, 'a') as f:
+        f.write('{"path": "c.pd')
+
+    resumed = Checkpoint(path)
+    assert "a.pdf" in resumed
+    assert "b.pdf" not in resumed
+    assert "c.pdf" not in resumed
+    resumed.close()
+
+
+def test_run_batch_resumes(tmp_path, monkeypatch):
+    """Test qu'une deuxième exécution ne retraite pas les fichiers terminés"""
+    for name in ["1.pdf", "2.pdf", "3.pdf"]:
+        (tmp_path / name).write_bytes(b"")
+    processed = []
+
+    def fake_extract_many(paths, **kwargs):
+        for path in paths:
+            processed.append(Path(path).name)
+            if Path(path).name == "3.pdf" and processed.count("3.pdf") == 1:
+                yield BatchResult(path, None, "OCR indisponible", 0.1)
+            else:
+                yield BatchResult(path, _extraction(Path(path).name), None, 0.1)
+
+    monkeypatch.setattr(batch, "extract_many", fake_extract_many)
+    output = tmp_path / "out" / "extractions.jsonl"
+
+    first = run_batch(str(tmp_path), str(output))
+    assert first['processed'] == 2 and first['errors'] == 1
+
+    second = run_batch(str(tmp_path), str(output))
+    assert second['skipped'] == 2 and second['processed'] == 1
+    assert processed == ["1.pdf", "2.pdf", "3.pdf", "3.pdf"]
+
+    rows = [json.loads(line) for line in output.read_text().splitlines()]
+    assert len(rows) == 6
+    assert {row['filename'] for row in rows} == {"1.pdf", "2.pdf", "3.pdf"}
+
+
+def test_run_batch_without_resume_replaces_output(tmp_path, monkeypatch):
+    """Test que --no-resume remplace la sortie au lieu d'y réécrire les documents"""
+    for name in ["1.pdf", "2.pdf"]:
+        (tmp_path / name).write_bytes(b"")
+
+    def fake_extract_many(paths, **kwargs):
+        for path in paths:
+            yield BatchResult(path, _extraction(Path(path).name), None, 0.1)
+
+    monkeypatch.setattr(batch, "extract_many", fake_extract_many)
+    output = tmp_path / "out" / "extractions.jsonl"
+
+    run_batch(str(tmp_path), str(output))
+    second = run_batch(str(tmp_path), str(output), resume=False)
+    assert second['processed'] == 2
+    assert len(output.read_text().splitlines()) == 4
+
+
+def test_parquet_parts_closed_before_checkpoint(tmp_path):
+    """Test que chaque groupe de lignes noté au checkpoint est dans une partie lisible"""
+    pq = pytest.importorskip("pyarrow.parquet")
+    writer = batch.ParquetWriter(str(tmp_path / "extractions.parquet"), row_group_size=2)
+    rows = extraction_rows(BatchResult("a.pdf", _extraction("a.pdf"), None, 0.1))
+
+    assert writer.write(rows)
+    # Partie complète avant la fermeture (interruption brutale possible ensuite)
+    assert pq.read_table(writer.paths[0]).num_rows == 2
+    assert writer.write(rows)
+    writer.close()
+    assert [Path(path).name for path in writer.paths] == ["extractions.parquet", "extractions-0001.parquet"]
+
+    replaced = batch.ParquetWriter(str(tmp_path / "extractions.parquet"), append=False)
+    assert replaced.path == str(tmp_path / "extractions.parquet")
+    assert not list(tmp_path.glob("*.parquet"))
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
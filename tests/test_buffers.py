@@ -0,0 +1,85 @@
+"""
+Tests unitaires pour les pools de buffers
+"""
+import pytest
+import threading
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api.buffers import BufferPool, PagePool
+
+
+def test_buffer_pool_reuses_memory():
+    """Test que les buffers de travail sont réutilisés"""
+    pool = BufferPool()
+    a = pool.get('gray', (100, 200))
+    b = pool.get('gray', (50, 80))
+
+    assert a.shape == (100, 200)
+    assert b.shape == (50, 80)
+    assert b.flags['C_CONTIGUOUS']
+    assert np.shares_memory(a, b)
+
+
+def test_buffer_pool_grows():
+    """Test qu'un buffer trop petit est agrandi"""
+    pool = BufferPool()
+    pool.get('resized', (10, 10))
+    big = pool.get('resized', (100, 100))
+
+    assert big.shape == (100, 100)
+    assert pool.nbytes() == 100 * 100
+
+
+def test_buffer_pool_is_thread_local():
+    """Test que chaque thread a ses propres buffers"""
+    pool = BufferPool()
+    main = pool.get('gray', (10, 10))
+    other = []
+
+    thread = threading.Thread(target=lambda: other.append(pool.get('gray', (10, 10))))
+    thread.start()
+    thread.join()
+
+    assert not np.shares_memory(main, other[0])
+
+
+def test_page_pool_reuse():
+    """Test de la réutilisation d'un buffer de page rendu"""
+    pool = PagePool(max_free=2)
+    page = pool.acquire((20, 30, 3))
+    pool.release(page)
+
+    again = pool.acquire((10, 30, 3))
+    assert np.shares_memory(page, again)
+    assert pool.get_stats()['reuses'] == 1
+    assert pool.get_stats()['allocations'] == 1
+
+
+def test_page_pool_bounded():
+    """Test que le pool garde au plus max_free buffers libres"""
+    pool = PagePool(max_free=2)
+    pages = [pool.acquire((10 * (i + 1), 10, 3)) for i in range(4)]
+    for page in pages:
+        pool.release(page)
+
+    stats = pool.get_stats()
+    assert stats['free_buffers'] == 2
+    # Les plus grands buffers sont conservés
+    assert stats['free_bytes'] == (30 + 40) * 10 * 3
+
+
+def test_page_pool_ignores_foreign_arrays():
+    """Test qu'un tableau non issu du pool est ignoré s'il n'est pas compatible"""
+    pool = PagePool()
+    pool.release(np.zeros((10, 10, 3), dtype=np.float32))
+    assert pool.get_stats()['free_buffers'] == 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
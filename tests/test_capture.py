@@ -0,0 +1,120 @@
+"""
+Tests unitaires pour la capture et le rejeu des requêtes
+"""
+import pytest
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api.capture import CaptureStore
+from api.replay import diff_fields
+
+
+class FakeExtraction:
+    """Résultat minimal (seul model_dump_json est utilisé)"""
+
+    def __init__(self, filename: str):
+        self.filename = filename
+
+    def model_dump_json(self) -> str:
+        return f'{{"filename": "{self.filename}", "fields": []}}'
+
+
+def _field(label, value, y, confidence=0.9):
+    return {'label': label, 'value': value, 'confidence': confidence,
+            'bbox': {'x': 10, 'y': y, 'width': 50, 'height': 10}}
+
+
+def test_capture_store_deduplicates_files(tmp_path):
+    """Test qu'un même contenu capturé deux fois n'est stocké qu'une fois"""
+    store = CaptureStore(tmp_path)
+    store.add(b"%PDF-facture", ".pdf", "a.pdf", FakeExtraction("a.pdf"), {'ocr': 0.25})
+    store.add(b"%PDF-facture", ".pdf", "b.pdf", FakeExtraction("b.pdf"), {'ocr': 0.5})
+
+    captures = list(store.iter_captures())
+    assert [c['filename'] for c in captures] == ["a.pdf", "b.pdf"]
+    assert captures[0]['path'] == captures[1]['path']
+    assert Path(captures[0]['path']).read_bytes() == b"%PDF-facture"
+    assert captures[1]['timings_ms'] == {'ocr': 500.0}
+    assert len(list((tmp_path / 'files').iterdir())) == 1
+
+
+def test_capture_store_evicts_oldest(tmp_path):
+    """Test que les captures les plus anciennes sont supprimées au-delà du plafond"""
+    store = CaptureStore(tmp_path, max_bytes=5000)
+    for i in range(5):
+        store.add(bytes([i]) * 1500, ".png", f"{i}.png", FakeExtraction(f"{i}.png"))
+
+    assert store.total_bytes <= 5000
+    names = [c['filename'] for c in store.iter_captures()]
+    assert names == ["3.png", "4.png"]
+    assert len(list((tmp_path / 'files').iterdir())) == 2
+
+    # Index reconstruit depuis le disque
+    reloaded = CaptureStore(tmp_path, max_bytes=5000)
+    assert [c['filename'] for c in reloaded.iter_captures()] == names
+    assert reloaded.total_bytes == store.total_bytes
+
+
+def test_capture_cap_shared_between_workers(tmp_path):
+    """Test que le plafond s'applique au répertoire entier (un index partagé par worker)"""
+    workers = [CaptureStore(tmp_path, max_bytes=5000) for _ in range(2)]
+    for i in range(6):
+        workers[i % 2].add(bytes([i]) * 1500, ".png", f"{i}.png", FakeExtraction(f"{i}.png"))
+
+    assert workers[0].total_bytes == workers[1].total_bytes <= 5000
+    assert [c['filename'] for c in workers[0].iter_captures()] == ["4.png", "5.png"]
+    assert len(workers[1]) == 2 and len(list((tmp_path / 'files').iterdir())) == 2
+
+
+def test_capture_index_rebuilt_from_legacy_directory(tmp_path):
+    """Test qu'un répertoire antérieur à l'index partagé est réindexé au démarrage"""
+    store = CaptureStore(tmp_path)
+    store.add(b"%PDF-a", ".pdf", "a.pdf", FakeExtraction("a.pdf"))
+    store.add(b"%PDF-b", ".pdf", "b.pdf", FakeExtraction("b.pdf"))
+    total = store.total_bytes
+    store.close()
+    for path in tmp_path.glob('index.db*'):
+        path.unlink()
+
+    reloaded = CaptureStore(tmp_path)
+    assert [c['filename'] for c in reloaded.iter_captures()] == ["a.pdf", "b.pdf"]
+    assert reloaded.total_bytes == total
+
+
+def test_capture_sampling_rate(tmp_path):
+    """Test du taux d'échantillonnage (désactivé à 0)"""
+    disabled = CaptureStore(tmp_path, sample_rate=0)
+    assert not any(disabled.should_capture() for _ in range(100))
+    store = CaptureStore(tmp_path, sample_rate=0.1, seed=42)
+    sampled = sum(store.should_capture() for _ in range(1000))
+    assert 50 < sampled < 150
+
+
+def test_diff_fields_pairs_by_position():
+    """Test que les champs de même label sont appariés dans l'ordre de lecture"""
+    captured = [
+        _field('ligne_produit', 'Vis x10', 200),
+        _field('ligne_produit', 'Écrou x5', 100),
+        _field('numero_facture', 'F-001', 10),
+        _field('date_facture', '01/01/2024', 20),
+    ]
+    replayed = [
+        _field('ligne_produit', 'Ecrou x5', 100, confidence=0.6),
+        _field('ligne_produit', 'Vis x10', 200),
+        _field('numero_facture', 'F-001', 10),
+        _field('montant_ttc', '120,00', 300),
+    ]
+
+    diff = diff_fields(captured, replayed)
+    assert diff['same'] == 2
+    assert diff['changed'] == [{'label': 'ligne_produit', 'before': 'Écrou x5', 'after': 'Ecrou x5',
+                                'confidence_delta': pytest.approx(-0.3)}]
+    assert diff['missing'] == [{'label': 'date_facture', 'value': '01/01/2024'}]
+    assert diff['added'] == [{'label': 'montant_ttc', 'value': '120,00'}]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,140 @@
+"""
+Tests unitaires pour l'index des doublons (SHA-256 + dHash)
+"""
+import hashlib
+import pytest
+import random
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api.dedupe import HashIndex, classify, dhash, fingerprint_file, hamming
+import scripts.import_to_label_studio as import_script
+from scripts.import_to_label_studio import make_task, plan_imports
+
+
+def _page(width=90, height=120, seed=0, noise=0):
+    """Page synthétique: blocs de texte sombres sur fond clair"""
+    rng = random.Random(seed)
+    pixels = [235] * (width * height)
+    for _ in range(12):
+        x, y = rng.randrange(width - 30), rng.randrange(height - 8)
+        for dy in range(6):
+            for dx in range(rng.randrange(10, 30)):
+                pixels[(y + dy) * width + x + dx] = 40
+    noise_rng = random.Random(seed + 1000)
+    return [min(255, max(0, p + noise_rng.randint(-noise, noise))) for p in pixels]
+
+
+def test_dhash_stable_under_noise():
+    """Test du dHash: proche pour un rescan bruité, éloigné pour une autre page"""
+    original = dhash(_page(seed=1), 90, 120)
+    rescan = dhash(_page(seed=1, noise=6), 90, 120)
+    other = dhash(_page(seed=2), 90, 120)
+
+    assert 0 <= original < 1 << 64
+    assert hamming(original, rescan) <= 6
+    assert hamming(original, other) > 10
+
+
+def test_exact_and_near_lookup(tmp_path):
+    """Test des recherches exacte (SHA-256) et par bandes (quasi-doublons)"""
+    index = HashIndex(str(tmp_path / "index.db"))
+    base = (1 << 63) | 0x0F0F_F0F0_1234_5678  # Bit de poids fort: stockage signé
+    index.add_many([{'sha256': 'a' * 64, 'phash': base, 'path': '/x/a.pdf', 'filename': 'a.pdf', 'task_id': 7},
+                    {'sha256': 'b' * 64, 'phash': None, 'path': '/x/b.pdf', 'filename': 'b.pdf'}])
+    assert len(index) == 2
+
+    assert classify(index, '/y/copie.pdf', 'a' * 64, None)[1]['task_id'] == 7
+    status, match = classify(index, '/y/scan.pdf', 'c' * 64, base ^ 0b10110)
+    assert status == 'near_duplicate' and match['filename'] == 'a.pdf' and match['distance'] == 3
+    # 7 bits différents, un par octet: encore trouvé par l'octet intact
+    far = base ^ sum(1 << (8 * band) for band in range(7))
+    assert index.near(far, max_distance=7)[0]['distance'] == 7
+    assert classify(index, '/y/new.pdf', 'd' * 64, far, max_distance=6) == ('new', None)
+    with pytest.raises(ValueError):
+        index.near(base, max_distance=8)
+    index.close()
+
+
+def test_plan_imports_skips_renamed_duplicates(tmp_path):
+    """Test du tri avant import: doublons de l'index et du lot lui-même"""
+    files = []
+    for name, content in [("a.png", b"A"), ("a-renomme.png", b"A"), ("b.png", b"B"), ("c.png", b"C")]:
+        path = tmp_path / name
+        path.write_bytes(content)
+        files.append(path)
+
+    index = HashIndex()
+    index.add_many([{'sha256': hashlib.sha256(b"C").hexdigest(), 'phash': None,
+                     'path': 'ancien/c.png', 'filename': 'c.png'}])
+    plan = plan_imports(files, index, workers=0)
+
+    assert plan['new'] == [files[0], files[2]]
+    assert [(path.name, match['filename']) for path, match in plan['duplicates']] == [
+        ("a-renomme.png", "a.png"), ("c.png", "c.png")]
+    assert plan['fingerprints'][str(files[2])][0] == hashlib.sha256(b"B").hexdigest()
+
+
+def _template_invoice(number, n_lines, width=90, height=120):
+    """Facture synthétique d'un même modèle fournisseur: en-tête fixe, lignes variables"""
+    rng = random.Random(number)
+    pixels = [235] * (width * height)
+
+    def block(x, y, w, h=4):
+        for dy in range(h):
+            for dx in range(w):
+                pixels[(y + dy) * width + x + dx] = 40
+
+    block(5, 5, 30)                            # Logo / nom du fournisseur
+    block(55, 5, 30)                           # Numéro de facture
+    block(55, 12, 10 + number % 15)            # Client
+    for line in range(n_lines):                # Lignes de produits
+        block(5, 30 + 6 * line, 40 + rng.randrange(20))
+        block(70, 30 + 6 * line, 8 + rng.randrange(8))
+    block(60, 105, 20 + number % 7)            # Total
+    return pixels
+
+
+def test_distinct_invoices_from_one_template_are_imported(tmp_path, monkeypatch):
+    """Test que des factures différentes d'un même modèle sont importées, seulement marquées"""
+    layouts = [(101, 3), (202, 5), (303, 12)]
+    files, fingerprints = [], []
+    for number, n_lines in layouts:
+        path = tmp_path / f"facture_{number}.png"
+        path.write_bytes(f"facture {number}".encode())
+        files.append(path)
+        fingerprints.append((hashlib.sha256(path.read_bytes()).hexdigest(),
+                             dhash(_template_invoice(number, n_lines), 90, 120)))
+    monkeypatch.setattr(import_script, 'fingerprint_files', lambda paths, workers=None: fingerprints)
+
+    plan = plan_imports(files, HashIndex(), workers=0)
+
+    # Le dHash 64 bits les rapproche: signalées, mais aucune n'est perdue
+    assert plan['near_duplicates']
+    assert plan['new'] == files and plan['duplicates'] == []
+
+    path, match = plan['near_duplicates'][0]
+    task = make_task(path, "/data/local-files/?d=media/x.png", match)
+    assert task['data']['near_duplicate_of'] == match['filename']
+    assert 'near_duplicate_of' not in make_task(files[0], "/data/local-files/?d=media/y.png")['data']
+
+
+def test_fingerprint_file_renders_first_page(tmp_path):
+    """Test des empreintes d'un PDF (rendu de la première page)"""
+    fitz = pytest.importorskip("fitz")
+    path = tmp_path / "facture.pdf"
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), "FACTURE 2024-001")
+    doc.save(str(path))
+    doc.close()
+
+    sha256, phash = fingerprint_file(str(path))
+    assert sha256 == hashlib.sha256(path.read_bytes()).hexdigest()
+    assert phash is not None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
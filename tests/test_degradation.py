@@ -0,0 +1,89 @@
+"""
+Tests unitaires pour les modes de qualité dégradés sous charge
+"""
+import pytest
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api.degradation import LoadGovernor, modes_from_config, queue_threshold
+
+
+CONFIG = {
+    'priority_labels': ['montant_ttc', 'numero_facture', 'date_facture'],
+    'deferred_labels': ['ligne_produit'],
+    'modes': [
+        {'name': 'reduced', 'queue_depth': 8, 'p95_ms': 4000, 'skip_denoise': True},
+        {'name': 'fast', 'queue_depth': 16, 'skip_denoise': True, 'imgsz': 480, 'defer': True},
+        {'name': 'minimal', 'queue_depth': 32, 'skip_denoise': True, 'imgsz': 320,
+         'defer': True, 'priority_only': True},
+    ]
+}
+
+
+def test_modes_from_config():
+    """Test de la construction des modes depuis settings.yaml"""
+    reduced, fast, minimal = modes_from_config(CONFIG)
+
+    assert reduced.skip_denoise and reduced.imgsz is None
+    assert reduced.should_ocr('ligne_produit')
+    assert not fast.should_ocr('ligne_produit')
+    assert fast.should_ocr('nom_fournisseur')
+    assert minimal.should_ocr('montant_ttc')
+    assert not minimal.should_ocr('nom_fournisseur')
+
+
+def test_queue_depth_selects_mode():
+    """Test que la profondeur de file choisit le mode"""
+    governor = LoadGovernor(modes_from_config(CONFIG), cooldown_seconds=0)
+
+    assert governor.select(0).name == 'full'
+    assert governor.select(10).name == 'reduced'
+    assert governor.select(40).name == 'minimal'
+    assert governor.select(0).name == 'full'
+    assert governor.get_stats()['applied'] == {'full': 2, 'reduced': 1, 'fast': 0, 'minimal': 1}
+
+
+def test_p95_triggers_degradation():
+    """Test que la latence p95 récente déclenche la dégradation"""
+    governor = LoadGovernor(modes_from_config(CONFIG), min_samples=10)
+
+    for _ in range(20):
+        governor.record_latency(5.0)
+
+    assert governor.p95_ms() == pytest.approx(5000)
+    assert governor.select(0).name == 'reduced'
+
+
+def test_recovery_waits_for_cooldown():
+    """Test que le retour à un mode plus complet attend le délai"""
+    governor = LoadGovernor(modes_from_config(CONFIG), cooldown_seconds=60)
+
+    assert governor.select(20).name == 'fast'
+    # Charge retombée: le mode dégradé est conservé pendant le délai
+    assert governor.select(0).name == 'fast'
+    # Mais une nouvelle hausse est appliquée immédiatement
+    assert governor.select(40).name == 'minimal'
+
+
+def test_queue_thresholds_follow_pipeline_capacity():
+    """Test des seuils relatifs: dérivés des queue_size, toujours atteignables"""
+    config = {'modes': [{'name': 'reduced', 'queue_fill': 0.3}, {'name': 'fast', 'queue_fill': 0.6},
+                        {'name': 'minimal', 'queue_fill': 0.9}]}
+    # Files par défaut: 8 + 4 + 8 + 8 = 28 documents
+    assert [mode.queue_depth for mode in modes_from_config(config, 28)] == [9, 17, 26]
+    assert [mode.queue_depth for mode in modes_from_config(config, 56)] == [17, 34, 51]
+
+    # Un seuil absolu hors d'atteinte est ramené à la capacité
+    assert [mode.queue_depth for mode in modes_from_config(CONFIG, 28)] == [8, 16, 28]
+    governor = LoadGovernor(modes_from_config(CONFIG, 28), cooldown_seconds=0)
+    assert governor.select(28).name == 'minimal'
+
+    with pytest.raises(ValueError):
+        queue_threshold({'name': 'reduced', 'queue_fill': 0.5})
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
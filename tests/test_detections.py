@@ -0,0 +1,85 @@
+"""
+Tests unitaires pour les résultats de détection compacts
+"""
+import pytest
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api.detections import Detections
+
+
+class FakeBoxes:
+    """Équivalent minimal de ultralytics Boxes"""
+    def __init__(self, data):
+        self.data = np.asarray(data, dtype=np.float32)
+
+
+class FakeResults:
+    """Équivalent minimal d'un résultat ultralytics"""
+    def __init__(self, data, names):
+        self.boxes = FakeBoxes(data)
+        self.names = names
+
+
+NAMES = {0: 'numero_facture', 1: 'montant_ttc'}
+
+
+@pytest.fixture
+def detections():
+    """Deux détections sur une page de 1000 x 2000 pixels"""
+    results = FakeResults([
+        [100, 200, 300, 260, 0.9, 0],
+        [500, 1800, 900, 1900, 0.7, 1],
+    ], NAMES)
+    return Detections.from_results(results)
+
+
+def test_from_results(detections):
+    """Test de la conversion en tableau structuré"""
+    assert len(detections) == 2
+    assert detections.labels() == ['numero_facture', 'montant_ttc']
+    assert detections.cls.tolist() == [0, 1]
+    assert detections.conf.tolist() == pytest.approx([0.9, 0.7])
+    assert detections.xyxy[1].tolist() == [500, 1800, 900, 1900]
+
+
+def test_normalized(detections):
+    """Test de la normalisation vectorisée par la taille de page"""
+    boxes = detections.normalized(width=1000, height=2000)
+
+    assert boxes.shape == (2, 4)
+    assert boxes[0].tolist() == pytest.approx([0.1, 0.1, 0.2, 0.03])
+    assert boxes[1].tolist() == pytest.approx([0.5, 0.9, 0.4, 0.05])
+
+
+def test_empty_results():
+    """Test d'une page sans détection"""
+    detections = Detections.from_results(FakeResults(np.empty((0, 6)), NAMES))
+
+    assert len(detections) == 0
+    assert detections.labels() == []
+    assert detections.normalized(100, 100).shape == (0, 4)
+
+
+def test_tracking_column_is_ignored():
+    """Test qu'un identifiant de suivi (7 colonnes) ne décale pas conf/cls"""
+    results = FakeResults([[0, 0, 10, 10, 42, 0.8, 1]], NAMES)
+    detections = Detections.from_results(results)
+
+    assert detections.conf.tolist() == pytest.approx([0.8])
+    assert detections.labels() == ['montant_ttc']
+
+
+def test_select(detections):
+    """Test de la sélection d'un sous-ensemble"""
+    high = detections.select(detections.conf > 0.8)
+    assert high.labels() == ['numero_facture']
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
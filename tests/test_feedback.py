@@ -0,0 +1,228 @@
+"""
+Tests unitaires pour la file d'envoi vers Label Studio
+"""
+import json
+import pytest
+import sys
+import time
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api.feedback import FeedbackQueue
+from api.label_studio import LabelStudioClient, LabelStudioError, prediction_from_extraction
+
+
+EXTRACTION = {
+    'filename': 'facture.png',
+    'fields': [
+        {'label': 'montant_ttc', 'value': '120,00', 'confidence': 0.6,
+         'bbox': {'x': 0.5, 'y': 0.8, 'width': 0.2, 'height': 0.05}},
+        {'label': 'numero_facture', 'value': '[Non détecté]', 'confidence': 0.4,
+         'bbox': {'x': 0.1, 'y': 0.1, 'width': 0.3, 'height': 0.04}},
+    ],
+    'overall_confidence': 0.5,
+    'needs_review': True,
+    'model_version': 'invoice_model_test',
+    'quality_mode': 'full'
+}
+
+
+class FakeExtraction:
+    def model_dump_json(self) -> str:
+        return json.dumps(EXTRACTION)
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, body=None, headers=None):
+        self.status_code = status_code
+        self.body = body or {}
+        self.headers = headers or {}
+        self.text = json.dumps(self.body)
+
+    def json(self):
+        return self.body
+
+
+class HTMLResponse(FakeResponse):
+    """Page d'erreur HTML d'un proxy (corps non JSON)"""
+
+    def __init__(self, status_code: int = 200):
+        super().__init__(status_code)
+        self.text = "<html>Bad gateway</html>"
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class FakeSession:
+    """Session requests simulée: réponses programmées, requêtes enregistrées"""
+
+    def __init__(self, responses, existing=None):
+        self.responses = list(responses)
+        self.existing = existing or []  # Tâches déjà présentes (recherche par data.sha256)
+        self.headers = {}
+        self.calls = []
+        self.lookups = []
+
+    def get(self, url, params=None, timeout=None):
+        query = json.loads(params['query'])
+        values = {item['value'] for item in query['filters']['items']}
+        self.lookups.append(sorted(values))
+        return FakeResponse(200, {'tasks': [task for task in self.existing if task['data']['sha256'] in values]})
+
+    def post(self, url, json=None, params=None, timeout=None):
+        self.calls.append((url, json))
+        return self.responses.pop(0)
+
+
+def _queue(tmp_path, responses, existing=None, **kwargs):
+    session = FakeSession(responses, existing)
+    client = LabelStudioClient("http://ls:8080/", "secret", 3, max_requests_per_minute=0, session=session)
+    return FeedbackQueue(tmp_path / "queue.db", tmp_path / "spool", client, **kwargs), session
+
+
+def test_prediction_in_percent():
+    """Test de la conversion des boîtes en prédiction RectangleLabels"""
+    prediction = prediction_from_extraction(EXTRACTION)
+    first, second = prediction['result']
+
+    assert prediction['model_version'] == 'invoice_model_test'
+    assert first['value'] == {'x': 50.0, 'y': 80.0, 'width': 20.0, 'height': 5.0,
+                              'rotation': 0, 'rectanglelabels': ['montant_ttc']}
+    assert first['meta'] == {'text': ['120,00']}
+    assert 'meta' not in second
+
+
+def test_enqueue_and_send_batch(tmp_path):
+    """Test de l'envoi par lot: tâches avec prédictions, fichiers supprimés"""
+    queue, session = _queue(tmp_path, [FakeResponse(201, {'task_ids': [11, 12]})])
+    assert queue.enqueue(b"png-1", ".PNG", "a.png", FakeExtraction())
+    assert not queue.enqueue(b"png-1", ".png", "a-bis.png", FakeExtraction())
+    assert queue.enqueue(b"png-2", ".png", "b.png", FakeExtraction())
+
+    assert queue.flush() == 2
+    url, tasks = session.calls[0]
+    assert url == "http://ls:8080/api/projects/3/import"
+    assert session.headers['Authorization'] == "Token secret"
+    assert [task['data']['filename'] for task in tasks] == ["a.png", "b.png"]
+    assert tasks[0]['data']['image'].startswith("data:image/png;base64,")
+    assert tasks[0]['predictions'][0]['result'][0]['from_name'] == 'label'
+
+    assert queue.get_stats()['sent'] == 2
+    assert not list((tmp_path / "spool").iterdir())
+    queue.close()
+
+
+def test_retry_with_backoff_then_give_up(tmp_path):
+    """Test des nouvelles tentatives (5xx) puis de l'abandon"""
+    queue, session = _queue(tmp_path, [FakeResponse(503), FakeResponse(503)],
+                            max_attempts=2, backoff_seconds=0)
+    queue.enqueue(b"png", ".png", "a.png", FakeExtraction())
+
+    with pytest.raises(LabelStudioError):
+        queue.send_batch()
+    stats = queue.get_stats()
+    assert stats['pending'] == 1 and "503" in stats['last_error']
+
+    with pytest.raises(LabelStudioError):
+        queue.send_batch()
+    assert queue.get_stats()['failed'] == 1
+    assert queue.send_batch() == 0
+
+    # Relance manuelle: le fichier a été conservé
+    assert queue.retry_failed() == 1
+    session.responses.append(FakeResponse(201, {'task_ids': [5]}))
+    assert queue.send_batch() == 1
+    queue.close()
+
+
+def test_client_error_not_retried(tmp_path):
+    """Test qu'un refus définitif (400) n'est pas réessayé"""
+    queue, _ = _queue(tmp_path, [FakeResponse(400, {'detail': 'invalid'})])
+    queue.enqueue(b"png", ".png", "a.png", FakeExtraction())
+
+    assert queue.flush() == 0
+    assert queue.get_stats()['failed'] == 1
+    queue.close()
+
+
+def test_uncertain_send_reconciled_before_retry(tmp_path):
+    """Test qu'après un envoi incertain, les documents déjà créés ne sont pas renvoyés"""
+    queue, session = _queue(tmp_path, [FakeResponse(504)], backoff_seconds=0)
+    queue.enqueue(b"png-1", ".png", "a.png", FakeExtraction())
+    queue.enqueue(b"png-2", ".png", "b.png", FakeExtraction())
+    with pytest.raises(LabelStudioError):
+        queue.send_batch()
+    assert session.lookups == []
+
+    # Le premier POST a été appliqué pour a.png malgré le 504
+    sha_a = session.calls[0][1][0]['data']['sha256']
+    session.existing = [{'id': 41, 'data': {'sha256': sha_a}}]
+    session.responses.append(FakeResponse(201, {'task_ids': [42]}))
+    assert queue.flush() == 2
+
+    assert len(session.lookups[0]) == 2
+    assert [task['data']['filename'] for task in session.calls[1][1]] == ["b.png"]
+    assert queue.get_stats()['sent'] == 2
+    assert not list((tmp_path / "spool").iterdir())
+    queue.close()
+
+
+def test_manual_flush_ignores_scheduled_delays(tmp_path):
+    """Test du lancement manuel: délais déjà programmés levés, lots illisibles sans arrêt"""
+    queue, session = _queue(tmp_path, [FakeResponse(503)], backoff_seconds=3600, batch_size=1)
+    queue.enqueue(b"png-1", ".png", "a.png", FakeExtraction())
+    with pytest.raises(LabelStudioError):
+        queue.send_batch()
+    assert queue.send_batch() == 0  # Nouvelle tentative dans une heure
+
+    # Un document sans fichier en tête de file ne bloque pas les suivants
+    queue.enqueue(b"png-2", ".png", "b.png", FakeExtraction())
+    queue.enqueue(b"png-3", ".png", "c.png", FakeExtraction())
+    for path in (tmp_path / "spool").iterdir():
+        if path.read_bytes() == b"png-2":
+            path.unlink()
+
+    assert queue.make_due() == 1
+    session.responses += [FakeResponse(201, {'task_ids': [7]}), FakeResponse(201, {'task_ids': [8]})]
+    assert queue.flush() == 2
+    assert queue.get_stats()['failed'] == 1
+    queue.close()
+
+
+def test_invalid_json_response_is_retryable_error(tmp_path):
+    """Test qu'une réponse non JSON devient une LabelStudioError (document gardé en file)"""
+    queue, _ = _queue(tmp_path, [HTMLResponse()], backoff_seconds=0)
+    queue.enqueue(b"png", ".png", "a.png", FakeExtraction())
+
+    with pytest.raises(LabelStudioError) as error:
+        queue.send_batch()
+    assert error.value.retryable and error.value.status_code == 200
+    assert queue.get_stats()['pending'] == 1
+    queue.close()
+
+
+def test_sender_thread_survives_unexpected_errors(tmp_path):
+    """Test que le thread d'envoi continue après une exception inattendue"""
+    queue, _ = _queue(tmp_path, [], flush_interval=0.01)
+    calls = []
+
+    def flush():
+        calls.append(1)
+        raise KeyError('task_ids')
+
+    queue.flush = flush
+    queue.start()
+    deadline = time.monotonic() + 5
+    while len(calls) < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    alive = queue._thread.is_alive()
+    queue.stop()
+    queue.close()
+    assert len(calls) >= 3 and alive
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
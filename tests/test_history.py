@@ -0,0 +1,157 @@
+"""
+Tests unitaires pour l'historique des extractions
+"""
+import hashlib
+import json
+import pytest
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api.history import HistoryStore, file_sha256
+
+
+class FakeExtraction:
+    """Résultat minimal (seul model_dump_json est utilisé)"""
+
+    def __init__(self, filename, confidence, supplier=None, model_version='v1'):
+        fields = [
+            {'label': 'montant_ttc', 'value': '120,00', 'confidence': confidence,
+             'bbox': {'x': 0.5, 'y': 0.8, 'width': 0.2, 'height': 0.05}},
+            {'label': 'numero_facture', 'value': '[Non détecté]', 'confidence': 0.3,
+             'bbox': {'x': 0.1, 'y': 0.1, 'width': 0.3, 'height': 0.04}},
+        ]
+        if supplier:
+            fields.append({'label': 'nom_fournisseur', 'value': supplier, 'confidence': 0.9,
+                           'bbox': {'x': 0.1, 'y': 0.02, 'width': 0.4, 'height': 0.05}})
+        self.data = {
+            'filename': filename,
+            'fields': fields,
+            'overall_confidence': confidence,
+            'needs_review': confidence < 0.85,
+            'model_version': model_version,
+            'quality_mode': 'full'
+        }
+
+    def model_dump_json(self) -> str:
+        return json.dumps(self.data)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = HistoryStore(tmp_path / "history.db", batch_size=2, flush_interval=0.05)
+    yield store
+    store.close()
+
+
+def test_record_and_get(store):
+    """Test de l'écriture asynchrone et de la relecture d'une extraction"""
+    store.record(FakeExtraction("a.pdf", 0.9, supplier="ACME"), "abc123", {'ocr': 0.2, 'total': 0.5})
+    store.flush()
+
+    [row] = store.recent()
+    assert row['filename'] == "a.pdf" and row['supplier'] == "ACME"
+    assert row['total_ms'] == pytest.approx(500)
+    assert not row['needs_review']
+
+    entry = store.get(row['id'])
+    assert entry['sha256'] == "abc123"
+    assert entry['timings'] == {'ocr': 200.0, 'total': 500.0}
+    assert [f['label'] for f in entry['fields']] == ['montant_ttc', 'numero_facture', 'nom_fournisseur']
+    assert store.get(row['id'] + 1) is None
+
+
+def test_totals_from_daily_aggregates(store):
+    """Test des agrégats journaliers (sans parcours de l'historique)"""
+    for i, confidence in enumerate([0.9, 0.7, 0.95, 0.6, 0.8]):
+        store.record(FakeExtraction(f"{i}.pdf", confidence, model_version=f"v{i % 2}"))
+    store.flush()
+
+    totals = store.totals()
+    assert totals['extractions'] == 5
+    assert totals['average_confidence'] == pytest.approx(0.79)
+    assert totals['review_rate'] == pytest.approx(0.6)
+    assert store.totals(days=1)['extractions'] == 5
+    assert {row['model_version'] for row in store.daily()} == {'v0', 'v1'}
+
+
+def test_filters_and_pagination(store):
+    """Test des filtres (fournisseur, confiance) et de la pagination"""
+    for i in range(5):
+        store.record(FakeExtraction(f"{i}.pdf", 0.5 + i * 0.1, supplier="ACME" if i % 2 else "Globex"))
+    store.flush()
+
+    first_page = store.recent(limit=2)
+    assert [row['filename'] for row in first_page] == ["4.pdf", "3.pdf"]
+    second_page = store.recent(limit=2, before_id=first_page[-1]['id'])
+    assert [row['filename'] for row in second_page] == ["2.pdf", "1.pdf"]
+
+    assert [row['filename'] for row in store.recent(supplier="ACME")] == ["3.pdf", "1.pdf"]
+    assert len(store.recent(max_confidence=0.65)) == 2
+
+    suppliers = store.suppliers()
+    assert suppliers[0]['supplier'] == "Globex" and suppliers[0]['extractions'] == 3
+
+    assert suppliers[0]['review_rate'] == pytest.approx(2 / 3)
+
+    labels = {row['label']: row for row in store.label_stats(days=1)}
+    assert labels['numero_facture']['missing_rate'] == 1.0
+    assert labels['montant_ttc']['fields'] == 5
+    assert len(store.low_confidence_fields('montant_ttc', 0.65)) == 2
+
+
+def test_writer_survives_invalid_extraction(store):
+    """Test qu'un champ sans boîte est écrit et qu'un lot invalide n'arrête pas l'écriture"""
+    extraction = FakeExtraction("a.pdf", 0.9)
+    extraction.data['fields'][1]['bbox'] = None
+    store.record(extraction)
+    broken = FakeExtraction("b.pdf", 0.9)
+    del broken.data['filename']
+    store.record(broken)
+    store.flush()
+
+    store.record(FakeExtraction("c.pdf", 0.9))
+    store.flush()
+    assert [row['filename'] for row in store.recent()] == ["c.pdf"]
+
+
+def test_aggregates_backfilled_for_existing_database(tmp_path):
+    """Test du calcul des agrégats par label et fournisseur pour une base antérieure"""
+    store = HistoryStore(tmp_path / "history.db", flush_interval=0.05)
+    store.record(FakeExtraction("a.pdf", 0.9, supplier="ACME"))
+    store.flush()
+    store._conn.executescript("DELETE FROM label_daily; DELETE FROM supplier_daily;")
+    store.close()
+
+    store = HistoryStore(tmp_path / "history.db")
+    try:
+        assert {row['label']: row['fields'] for row in store.label_stats()} == {
+            'montant_ttc': 1, 'numero_facture': 1, 'nom_fournisseur': 1}
+        assert store.suppliers()[0]['supplier'] == "ACME"
+    finally:
+        store.close()
+
+
+def test_queries_use_indexes(store):
+    """Test que les requêtes filtrées utilisent les index (pas de parcours complet)"""
+    plans = {
+        "SELECT * FROM extractions WHERE supplier = 'ACME' ORDER BY id DESC": "idx_extractions_supplier",
+        "SELECT * FROM extractions WHERE extracted_at >= 0": "idx_extractions_time",
+        "SELECT * FROM fields WHERE label = 'montant_ttc' AND confidence < 0.5": "idx_fields_label_confidence",
+    }
+    for sql, index in plans.items():
+        plan = ' '.join(row[-1] for row in store._conn.execute(f"EXPLAIN QUERY PLAN {sql}"))
+        assert index in plan, plan
+
+
+def test_file_sha256(tmp_path):
+    """Test de l'empreinte d'un fichier"""
+    path = tmp_path / "facture.pdf"
+    path.write_bytes(b"%PDF-1.4")
+    assert file_sha256(path) == hashlib.sha256(b"%PDF-1.4").hexdigest()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
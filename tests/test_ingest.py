@@ -0,0 +1,143 @@
+"""
+Tests unitaires pour le service d'ingestion sur répertoire surveillé
+"""
+import pytest
+import json
+import sys
+import time
+from concurrent.futures import Future
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api.ingest import IngestService
+
+
+class FakeExtraction:
+    """Résultat minimal d'extraction"""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.needs_review = False
+        self.overall_confidence = 0.9
+
+    def model_dump_json(self, indent=None):
+        return json.dumps({'filename': self.filename})
+
+
+class FakeExtractor:
+    """Extracteur synchrone: échoue sur les fichiers nommés 'corrompu'"""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, file_path, filename=None):
+        self.submitted.append(filename)
+        future = Future()
+        if 'corrompu' in filename:
+            future.set_exception(ValueError("PDF corrompu"))
+        else:
+            future.set_result(FakeExtraction(filename))
+        return future
+
+
+def _service(tmp_path, extractor, settle_seconds=0.0):
+    service = IngestService(
+        extractor,
+        spool_dir=tmp_path / "spool",
+        processed_dir=tmp_path / "processed",
+        failed_dir=tmp_path / "failed",
+        results_dir=tmp_path / "results",
+        settle_seconds=settle_seconds,
+        use_inotify=False
+    )
+    service.start()
+    return service
+
+
+def test_partial_files_are_debounced(tmp_path):
+    """Test qu'un fichier n'est traité qu'une fois sa taille stable"""
+    service = _service(tmp_path, FakeExtractor(), settle_seconds=0.05)
+    invoice = tmp_path / "spool" / "facture.pdf"
+    invoice.write_bytes(b"%PDF-1.4 debut")
+    (tmp_path / "spool" / "scan.pdf.part").write_bytes(b"%PDF")
+
+    assert service.scan() == []
+    invoice.write_bytes(b"%PDF-1.4 debut et fin")
+    time.sleep(0.06)
+    assert service.scan() == []  # Taille modifiée: délai relancé
+    time.sleep(0.06)
+    assert service.scan() == [invoice]
+
+
+def test_processed_and_failed_files_are_moved(tmp_path):
+    """Test du rangement des fichiers traités et en erreur"""
+    extractor = FakeExtractor()
+    service = _service(tmp_path, extractor)
+    (tmp_path / "spool" / "facture.pdf").write_bytes(b"%PDF")
+    (tmp_path / "spool" / "corrompu.pdf").write_bytes(b"%PDF")
+
+    service.scan()
+    for path in service.scan():
+        service.dispatch(path)
+    service.drain()
+
+    assert sorted(extractor.submitted) == ["corrompu.pdf", "facture.pdf"]
+    assert list((tmp_path / "spool").glob("*.pdf")) == []
+    assert (tmp_path / "processed" / "facture.pdf").exists()
+    assert json.loads((tmp_path / "results" / "facture.json").read_text())['filename'] == "facture.pdf"
+    assert (tmp_path / "failed" / "corrompu.pdf").exists()
+    assert "PDF corrompu" in (tmp_path / "failed" / "corrompu.error.json").read_text()
+    assert service.get_stats()['ingested'] == 1
+    assert service.get_stats()['failed'] == 1
+
+
+class PendingExtractor:
+    """Extracteur dont les extractions restent en cours jusqu'à résolution"""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, file_path, filename=None):
+        future = Future()
+        self.submitted.append((Path(file_path).read_bytes(), filename, future))
+        return future
+
+
+def test_same_name_files_in_flight_are_kept(tmp_path):
+    """Test que deux scan.pdf en cours en même temps sont traités et rangés tous les deux"""
+    extractor = PendingExtractor()
+    service = _service(tmp_path, extractor)
+    spool = tmp_path / "spool"
+
+    for content in (b"%PDF-premier", b"%PDF-second"):
+        (spool / "scan.pdf").write_bytes(content)
+        service.dispatch(spool / "scan.pdf")
+
+    assert [(content, name) for content, name, _ in extractor.submitted] == [
+        (b"%PDF-premier", "scan.pdf"), (b"%PDF-second", "scan.pdf")]
+    for _, name, future in extractor.submitted:
+        future.set_result(FakeExtraction(name))
+    service.drain()
+
+    processed = sorted(path.read_bytes() for path in (tmp_path / "processed").iterdir())
+    assert processed == [b"%PDF-premier", b"%PDF-second"]
+    assert (tmp_path / "processed" / "scan.pdf").exists()
+    assert service.get_stats()['ingested'] == 2
+
+
+def test_orphans_are_recovered(tmp_path):
+    """Test que les fichiers réservés avant un arrêt brutal sont repris"""
+    claim_dir = tmp_path / "spool" / ".processing"
+    claim_dir.mkdir(parents=True)
+    (claim_dir / "facture.pdf").write_bytes(b"%PDF")
+
+    _service(tmp_path, FakeExtractor())
+
+    assert (tmp_path / "spool" / "facture.pdf").exists()
+    assert not (claim_dir / "facture.pdf").exists()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,188 @@
+"""
+Tests unitaires pour l'import en masse dans Label Studio (serveur simulé)
+"""
+import json
+import pytest
+import sys
+import urllib.error
+import urllib.parse
+import urllib.request
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api.label_studio import LabelStudioClient, LabelStudioError, with_retries
+from api.media import MediaStore, media_name
+from benchmarks.mock_label_studio import MockLabelStudio
+from scripts.import_to_label_studio import ImportManifest, import_files
+
+
+class UrllibResponse:
+    def __init__(self, status_code, body, headers):
+        self.status_code = status_code
+        self.text = body.decode('utf-8')
+        self.headers = headers
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class UrllibSession:
+    """Session minimale (interface de requests.Session) sur urllib"""
+
+    def __init__(self):
+        self.headers = {}
+
+    def _request(self, method, url, json_body=None, params=None, timeout=None):
+        if params:
+            url = f"{url}?{urllib.parse.urlencode(params)}"
+        data = json.dumps(json_body).encode('utf-8') if json_body is not None else None
+        request = urllib.request.Request(url, data=data, method=method,
+                                         headers={**self.headers, 'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                return UrllibResponse(response.status, response.read(), dict(response.headers))
+        except urllib.error.HTTPError as e:
+            return UrllibResponse(e.code, e.read(), dict(e.headers))
+
+    def get(self, url, params=None, timeout=None):
+        return self._request('GET', url, params=params, timeout=timeout)
+
+    def post(self, url, json=None, params=None, timeout=None):
+        return self._request('POST', url, json_body=json, params=params, timeout=timeout)
+
+
+def _invoices(tmp_path, count):
+    invoices = tmp_path / "invoices"
+    invoices.mkdir()
+    files = []
+    for i in range(count):
+        path = invoices / f"facture_{i:02d}.png"
+        path.write_bytes(b"png-" + bytes([i]))
+        files.append(path)
+    return files
+
+
+@pytest.fixture
+def media(tmp_path):
+    media = MediaStore(tmp_path / "media", workers=0)
+    yield media
+    media.close()
+
+
+def _client(server, api_key=None):
+    return LabelStudioClient(server.url, api_key or server.api_key, server.project_id,
+                             max_requests_per_minute=0, session=UrllibSession())
+
+
+def test_bulk_import_in_batches(tmp_path, media):
+    """Test de l'import par lots parallèles et du manifest"""
+    files = _invoices(tmp_path, 23)
+    with MockLabelStudio() as server:
+        client = _client(server)
+        manifest = ImportManifest(tmp_path / "manifest.jsonl")
+        summary = import_files(client, files, manifest, media, batch_size=5, workers=3)
+
+        assert summary['imported'] == 23 and summary['errors'] == []
+        assert summary['batches'] == 5
+        assert server.stats['imports'] == 5
+        assert {task['data']['filename'] for task in client.iter_tasks(page_size=10)} == {f.name for f in files}
+        assert client.get_project()['task_number'] == 23
+
+    lines = (tmp_path / "manifest.jsonl").read_text().splitlines()
+    assert len(lines) == 5
+    assert sorted(ImportManifest(tmp_path / "manifest.jsonl").imported) == sorted(str(f) for f in files)
+
+
+def test_resume_from_manifest(tmp_path, media):
+    """Test de la reprise: les lots déjà notés ne sont pas réimportés"""
+    files = _invoices(tmp_path, 10)
+    manifest_path = tmp_path / "manifest.jsonl"
+    ImportManifest(manifest_path).record([str(f) for f in files[:6]], list(range(1, 7)))
+    with open(manifest_path, 'a') as f:
+        f.write('{"files": ["tronqué')  # Arrêt brutal pendant l'écriture
+
+    with MockLabelStudio() as server:
+        summary = import_files(_client(server), files, ImportManifest(manifest_path), media,
+                               batch_size=4, workers=2)
+        assert summary['skipped'] == 6 and summary['imported'] == 4
+        assert [task['data']['filename'] for task in server.tasks] == [f.name for f in files[6:]]
+
+
+def test_transient_failures_retried(tmp_path, media):
+    """Test des nouvelles tentatives sur 503 (aucune facture perdue)"""
+    files = _invoices(tmp_path, 20)
+    with MockLabelStudio(failure_rate=0.4, seed=3) as server:
+        summary = import_files(_client(server), files, ImportManifest(tmp_path / "m.jsonl"), media,
+                               batch_size=2, workers=2, max_attempts=20, backoff_seconds=0)
+        assert summary['imported'] == 20
+        assert server.stats['failures'] > 0
+        assert len(server.tasks) == 20
+
+
+def test_lost_responses_not_duplicated(tmp_path, media):
+    """Test qu'un lot créé malgré une erreur (504) n'est pas réimporté en double"""
+    files = _invoices(tmp_path, 12)
+    with MockLabelStudio(lost_response_rate=0.5, seed=1) as server:
+        manifest = ImportManifest(tmp_path / "m.jsonl")
+        summary = import_files(_client(server), files, manifest, media,
+                               batch_size=3, workers=2, max_attempts=10, backoff_seconds=0)
+        assert server.stats['lost_responses'] > 0
+        assert summary['imported'] == 12 and summary['errors'] == []
+        assert sorted(task['data']['file_path'] for task in server.tasks) == sorted(str(f) for f in files)
+        tasks = {task['data']['file_path']: task['id'] for task in server.tasks}
+        assert {key: ids[0] for key, ids in manifest.imported.items()} == tasks
+
+
+def test_client_errors_not_retried(tmp_path, media):
+    """Test qu'un jeton refusé n'est pas réessayé et que rien n'est noté"""
+    files = _invoices(tmp_path, 3)
+    with MockLabelStudio() as server:
+        client = _client(server, api_key="wrong")
+        with pytest.raises(LabelStudioError) as error:
+            with_retries(client.get_project, max_attempts=3, backoff_seconds=0)
+        assert error.value.status_code == 401
+
+        summary = import_files(client, files, ImportManifest(tmp_path / "m.jsonl"), media,
+                               max_attempts=1)
+        assert summary['imported'] == 0 and len(summary['errors']) == 3
+        assert not (tmp_path / "m.jsonl").exists()
+
+
+def test_tasks_reference_content_addressed_media(tmp_path, media):
+    """Test des tâches par URL: une image par contenu, stockage local déclaré une fois"""
+    files = _invoices(tmp_path, 2)
+    copy = tmp_path / "invoices" / "copie.png"
+    copy.write_bytes(files[0].read_bytes())
+
+    with MockLabelStudio() as server:
+        client = _client(server)
+        assert client.ensure_local_storage("/label-studio/files/media")['id'] == 1
+        assert client.ensure_local_storage("/label-studio/files/media")['id'] == 1
+        assert len(server.storages) == 1
+
+        import_files(client, files + [copy], ImportManifest(tmp_path / "m.jsonl"), media)
+        urls = {task['data']['filename']: task['data']['image'] for task in server.tasks}
+
+    name = media_name(files[0])
+    assert urls['facture_00.png'] == urls['copie.png'] == f"/data/local-files/?d=media/{name}"
+    assert not urls['facture_01.png'].startswith("data:")
+    assert (tmp_path / "media" / name).read_bytes() == files[0].read_bytes()
+    assert len(list((tmp_path / "media").rglob("*.png"))) == 2
+
+
+def test_media_rendered_in_process_pool(tmp_path):
+    """Test du rendu dans le pool de processus (erreurs remontées par fichier)"""
+    files = _invoices(tmp_path, 3)
+    media = MediaStore(tmp_path / "media", workers=2)
+    try:
+        results = media.publish(files + [tmp_path / "absente.png"])
+    finally:
+        media.close()
+    assert all(url.startswith("/data/local-files/?d=media/") for url in results[:3])
+    assert isinstance(results[3], OSError)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,53 @@
+"""
+Tests unitaires pour le calcul des résultats du test de charge
+"""
+import pytest
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+pytest.importorskip("requests")
+
+from scripts.run_load_test import parse_server_timing, percentile, summarize
+
+
+def test_percentile():
+    """Test des percentiles (interpolation linéaire)"""
+    values = list(range(1, 101))
+    assert percentile(values, 50) == pytest.approx(50.5)
+    assert percentile(values, 99) == pytest.approx(99.01)
+    assert percentile([], 95) is None
+
+
+def test_parse_server_timing():
+    """Test de la lecture de l'en-tête Server-Timing"""
+    header = "decode;dur=35.2, detect;dur=61.8, ocr;desc=\"tesseract\";dur=412.5, cache"
+    assert parse_server_timing(header) == {'decode': 35.2, 'detect': 61.8, 'ocr': 412.5}
+    assert parse_server_timing(None) == {}
+
+
+def test_summarize():
+    """Test du résumé: débit, erreurs, étages serveur"""
+    results = [
+        {'latency_ms': 100.0, 'completed_s': 0.5, 'documents': 1,
+         'server_timing': {'ocr': 80.0}, 'quality_mode': 'full'},
+        {'latency_ms': 300.0, 'completed_s': 1.2, 'documents': 1,
+         'server_timing': {'ocr': 250.0}, 'quality_mode': 'reduced'},
+        {'latency_ms': 5000.0, 'completed_s': 1.9, 'documents': 1, 'error': 'timeout'},
+    ]
+    summary = summarize(results, elapsed=2.0)
+
+    assert summary['succeeded'] == 2
+    assert summary['throughput_rps'] == pytest.approx(1.0)
+    assert summary['error_rate'] == pytest.approx(1 / 3)
+    assert summary['errors'] == {'timeout': 1}
+    assert summary['latency_ms']['max'] == 300.0
+    assert summary['server_timing_ms']['ocr']['mean'] == pytest.approx(165.0)
+    assert summary['quality_modes'] == {'full': 1, 'reduced': 1}
+    assert [b['second'] for b in summary['timeline']] == [0, 1]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
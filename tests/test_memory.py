@@ -0,0 +1,63 @@
+"""
+Tests unitaires pour la surveillance mémoire des workers
+"""
+import pytest
+import sys
+import tracemalloc
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api.memory import MemoryWatchdog, rss_bytes
+
+
+def test_rss_bytes_positive():
+    """Test que la RSS du processus est mesurée"""
+    assert rss_bytes() > 1024**2
+
+
+def test_recycle_after_max_requests():
+    """Test que le recyclage est demandé une seule fois après N requêtes"""
+    watchdog = MemoryWatchdog(max_requests=3, jitter=0)
+    reasons = [watchdog.record_request() for _ in range(5)]
+
+    assert reasons[:2] == [None, None]
+    assert "3 requêtes" in reasons[2]
+    assert reasons[3:] == [None, None]
+    assert watchdog.get_stats()['recycle_pending'] == reasons[2]
+
+
+def test_recycle_above_rss_ceiling():
+    """Test du recyclage au-delà du plafond de RSS"""
+    assert MemoryWatchdog(max_rss_mb=1).record_request().startswith("RSS")
+    assert MemoryWatchdog(max_rss_mb=1024**2).record_request() is None
+    assert MemoryWatchdog().record_request() is None
+
+
+def test_max_requests_jitter():
+    """Test que le jitter reste dans ± la fraction configurée"""
+    limits = {MemoryWatchdog(max_requests=1000, jitter=0.1, seed=seed).max_requests for seed in range(20)}
+    assert all(900 <= limit <= 1100 for limit in limits)
+    assert len(limits) > 1
+
+
+def test_snapshot_diff_finds_growth():
+    """Test que le diff de snapshots désigne la ligne qui alloue"""
+    watchdog = MemoryWatchdog()
+    assert watchdog.diff() is None
+
+    watchdog.take_snapshot()
+    try:
+        leak = [bytearray(1024) for _ in range(2000)]
+        entries = watchdog.diff(limit=5)
+        assert entries[0]['size_diff_kb'] > 1500
+        assert "test_memory.py" in entries[0]['location']
+        del leak
+    finally:
+        watchdog.stop_tracing()
+    assert not tracemalloc.is_tracing()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,119 @@
+"""
+Tests unitaires pour les statistiques par fenêtres glissantes
+"""
+import pytest
+import sqlite3
+import sys
+import threading
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api.metrics import MetricsStore, RingWindow
+
+NOW = 1_700_000_000.0
+
+
+def test_ring_window_slides():
+    """Test que les seaux sortis de la fenêtre ne sont plus comptés"""
+    window = RingWindow(60, 1)
+    window.add(NOW, [1, 0, 0, 0.9, 0])
+    window.add(NOW + 30, [1, 0, 0, 0.8, 0])
+
+    assert window.totals(NOW + 30)[0] == 2
+    assert window.totals(NOW + 61)[0] == 1
+    assert window.totals(NOW + 200)[0] == 0
+
+    # La case du premier seau est recyclée un tour plus tard
+    window.add(NOW + 60, [1, 0, 0, 0.5, 0])
+    assert window.totals(NOW + 60)[0] == 2
+
+
+def test_windows_and_success_rate():
+    """Test des fenêtres 1m/1h/24h et des taux calculés"""
+    store = MetricsStore()
+    store.record_extraction(0.9, False, 0.2, now=NOW - 7200)
+    store.record_extraction(0.5, True, 0.4, now=NOW - 120)
+    store.record_extraction(0.95, False, 0.1, now=NOW - 5)
+    store.record_error(now=NOW - 5)
+
+    stats = store.get_stats(now=NOW)
+    assert stats['scope'] == 'worker'
+    assert stats['1m']['extractions'] == 1 and stats['1m']['errors'] == 1
+    assert stats['1h']['extractions'] == 2
+    assert stats['24h']['extractions'] == 3
+    assert stats['total']['extractions'] == 3
+
+    # 2 acceptées sans revue sur 4 documents traités
+    assert stats['24h']['success_rate'] == pytest.approx(0.5)
+    assert stats['24h']['error_rate'] == pytest.approx(0.25)
+    assert stats['1h']['average_latency_ms'] == pytest.approx(250)
+
+
+def test_concurrent_updates():
+    """Test qu'aucune mise à jour n'est perdue entre threads"""
+    store = MetricsStore()
+
+    def worker():
+        for _ in range(1000):
+            store.record_extraction(0.9, False, 0.01)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert store.get_stats()['total']['extractions'] == 8000
+
+
+def test_aggregation_across_workers(tmp_path):
+    """Test que deux stores sur la même base voient les compteurs de l'autre"""
+    db = tmp_path / "metrics.db"
+    first = MetricsStore(db, flush_interval=60)
+    second = MetricsStore(db, flush_interval=60)
+    try:
+        first.record_extraction(0.9, False, 0.1)
+        first.record_error()
+        second.record_extraction(0.8, True, 0.1)
+        first.flush()
+
+        stats = second.get_stats()
+        assert stats['scope'] == 'all'
+        assert stats['total']['extractions'] == 2
+        assert stats['1m']['errors'] == 1
+        assert second.get_stats('worker')['total']['extractions'] == 1
+    finally:
+        first.close()
+        second.close()
+
+    # Compteurs persistés après fermeture
+    reopened = MetricsStore(db)
+    assert reopened.get_stats()['total']['extractions'] == 2
+    reopened.close()
+
+
+def test_failed_flush_keeps_counters(tmp_path):
+    """Test qu'un flush refusé (base verrouillée) ne perd pas les compteurs"""
+    db = tmp_path / "metrics.db"
+    store = MetricsStore(db, flush_interval=60)
+    store._conn.execute("PRAGMA busy_timeout = 50")
+    blocker = sqlite3.connect(str(db))
+    try:
+        store.record_extraction(0.9, False, 0.1)
+        blocker.execute("BEGIN EXCLUSIVE")
+        with pytest.raises(sqlite3.Error):
+            store.flush()
+        blocker.rollback()
+
+        store.flush()
+        assert store._pending == {}
+        assert store.get_stats()['total']['extractions'] == 1
+    finally:
+        blocker.close()
+        store.close()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
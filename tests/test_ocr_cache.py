@@ -0,0 +1,115 @@
+"""
+Tests unitaires pour le cache OCR
+"""
+import pytest
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api.ocr_cache import UNCACHEABLE_LABELS, OCRCache, content_hash, hamming_distance
+
+
+PROFILE = "nom_fournisseur|--oem 3 --psm 6"
+
+
+def test_hamming_distance():
+    """Test de la distance de Hamming"""
+    assert hamming_distance(0b1010, 0b1010) == 0
+    assert hamming_distance(0b1010, 0b1000) == 1
+    assert hamming_distance(0, (1 << 256) - 1) == 256
+
+
+def test_exact_hit():
+    """Test d'un hit exact"""
+    cache = OCRCache(max_entries=10, max_distance=0)
+    cache.put(PROFILE, 12345, "ACME SARL")
+
+    assert cache.get("nom_fournisseur", PROFILE, 12345) == "ACME SARL"
+    assert cache.get("nom_fournisseur", PROFILE, 12344) is None
+
+
+def test_near_hit_within_tolerance():
+    """Test d'un hit approché (distance <= tolérance)"""
+    cache = OCRCache(max_entries=10, max_distance=3)
+    # Bit de tête: longueur de la grille du dHash
+    h = (1 << 256) | (1 << 200) | (1 << 100) | 0xFFFF
+    cache.put(PROFILE, h, "ACME SARL")
+
+    # 3 bits différents, répartis sur plusieurs bandes
+    near = h ^ (1 << 5) ^ (1 << 120) ^ (1 << 250)
+    assert cache.get("nom_fournisseur", PROFILE, near) == "ACME SARL"
+
+    # 4 bits différents: hors tolérance
+    far = near ^ (1 << 60)
+    assert cache.get("nom_fournisseur", PROFILE, far) is None
+
+
+def test_content_hash_distinguishes_similar_rois():
+    """Test de l'empreinte exacte: un pixel ou une forme différente change la clé"""
+    import numpy as np
+
+    roi = np.full((16, 120), 255, dtype=np.uint8)
+    roi[4:12, 10:100] = 0
+    other = roi.copy()
+    other[11, 99] = 255
+    assert content_hash(roi) == content_hash(roi.copy())
+    assert content_hash(roi) != content_hash(other)
+    assert content_hash(roi) != content_hash(roi.reshape(32, 60))
+
+    cache = OCRCache(max_entries=10)
+    assert cache.max_distance == 0
+    cache.put(PROFILE, cache.fingerprint(roi), "ACME SARL")
+    assert cache.get("nom_fournisseur", PROFILE, cache.fingerprint(other)) is None
+
+
+def test_identifiers_never_cached():
+    """Test que le SIRET et les montants sont exclus du cache"""
+    assert {'siret_fournisseur', 'numero_facture', 'montant_ttc'} <= UNCACHEABLE_LABELS
+    assert 'nom_fournisseur' not in UNCACHEABLE_LABELS
+
+
+def test_profile_isolation():
+    """Test que les profils OCR ne se mélangent pas"""
+    cache = OCRCache(max_entries=10, max_distance=2)
+    cache.put(PROFILE, 42, "ACME SARL")
+
+    assert cache.get("adresse_fournisseur", "adresse_fournisseur|--oem 3 --psm 6", 42) is None
+
+
+def test_lru_eviction():
+    """Test de l'éviction LRU quand le cache est plein"""
+    cache = OCRCache(max_entries=2, max_distance=0)
+    cache.put(PROFILE, 1, "A")
+    cache.put(PROFILE, 2, "B")
+
+    # Accéder à 1 le rend plus récent que 2
+    assert cache.get("nom_fournisseur", PROFILE, 1) == "A"
+    cache.put(PROFILE, 3, "C")
+
+    assert len(cache) == 2
+    assert cache.get("nom_fournisseur", PROFILE, 2) is None
+    assert cache.get("nom_fournisseur", PROFILE, 1) == "A"
+    assert cache.get("nom_fournisseur", PROFILE, 3) == "C"
+
+
+def test_hit_rate_per_label():
+    """Test des statistiques de hit par label"""
+    cache = OCRCache(max_entries=10, max_distance=0)
+    cache.put(PROFILE, 7, "ACME SARL")
+
+    cache.get("nom_fournisseur", PROFILE, 7)
+    cache.get("nom_fournisseur", PROFILE, 8)
+    cache.get("siret_fournisseur", "siret_fournisseur|--oem 3 --psm 6", 9)
+
+    stats = cache.get_stats()
+    assert stats['entries'] == 1
+    assert stats['labels']['nom_fournisseur']['hits'] == 1
+    assert stats['labels']['nom_fournisseur']['hit_rate'] == pytest.approx(0.5)
+    assert stats['labels']['siret_fournisseur']['hit_rate'] == 0.0
+    assert stats['hit_rate'] == pytest.approx(1 / 3)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
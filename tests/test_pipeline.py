@@ -0,0 +1,131 @@
+"""
+Tests unitaires pour le pipeline d'extraction par étages
+"""
+import pytest
+import threading
+import time
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api.pipeline import DocumentContext, Pipeline, PipelineFull, Stage, run_stages
+
+
+def _append(name):
+    """Étage de test qui trace son passage"""
+    def func(ctx):
+        ctx.extras.setdefault('trace', []).append(name)
+    return func
+
+
+def test_run_stages_sequential():
+    """Test de l'exécution séquentielle des étages"""
+    stages = [Stage('a', _append('a')), Stage('b', _append('b'))]
+    ctx = run_stages(stages, DocumentContext('/tmp/facture.pdf'))
+
+    assert ctx.extras['trace'] == ['a', 'b']
+    assert ctx.filename == 'facture.pdf'
+    assert set(ctx.timings) == {'a', 'b'}
+
+
+def test_submit_and_output():
+    """Test de la soumission d'un document et de la transformation du résultat"""
+    pipeline = Pipeline(
+        [Stage('a', _append('a')), Stage('b', _append('b'), workers=2)],
+        output=lambda ctx: ctx.extras['trace']
+    )
+    try:
+        assert pipeline.submit(DocumentContext('x.pdf')).result(timeout=5) == ['a', 'b']
+    finally:
+        pipeline.shutdown()
+
+
+def test_non_blocking_submit_when_full():
+    """Test de la soumission non bloquante: PipelineFull quand la file d'entrée est pleine"""
+    release = threading.Event()
+    pipeline = Pipeline([Stage('lent', lambda ctx: release.wait(5), queue_size=1)])
+    try:
+        first = pipeline.submit(DocumentContext('1.pdf'))
+        time.sleep(0.1)  # Le worker a pris le premier document
+        second = pipeline.submit(DocumentContext('2.pdf'), block=False)
+        started = time.perf_counter()
+        with pytest.raises(PipelineFull):
+            pipeline.submit(DocumentContext('3.pdf'), block=False)
+        assert time.perf_counter() - started < 0.5
+
+        release.set()
+        first.result(timeout=5)
+        second.result(timeout=5)
+    finally:
+        release.set()
+        pipeline.shutdown()
+
+
+def test_stage_error_propagates():
+    """Test qu'une erreur d'étage est remontée par la future"""
+    def fail(ctx):
+        raise ValueError("image illisible")
+
+    pipeline = Pipeline([Stage('decode', fail), Stage('b', _append('b'))])
+    try:
+        future = pipeline.submit(DocumentContext('x.pdf'))
+        with pytest.raises(ValueError):
+            future.result(timeout=5)
+    finally:
+        pipeline.shutdown()
+
+
+def test_stages_overlap():
+    """Test que deux documents se chevauchent entre étages"""
+    active = set()
+    overlap = threading.Event()
+    lock = threading.Lock()
+
+    def slow(name):
+        def func(ctx):
+            with lock:
+                active.add(name)
+                if len(active) == 2:
+                    overlap.set()
+            time.sleep(0.05)
+            with lock:
+                active.discard(name)
+        return func
+
+    pipeline = Pipeline([Stage('detect', slow('detect')), Stage('ocr', slow('ocr'))])
+    try:
+        futures = [pipeline.submit(DocumentContext(f'{i}.pdf')) for i in range(4)]
+        for future in futures:
+            future.result(timeout=5)
+        assert overlap.is_set()
+    finally:
+        pipeline.shutdown()
+
+
+def test_imap_yields_all_results():
+    """Test du traitement d'un flux de documents"""
+    pipeline = Pipeline([Stage('a', _append('a'), workers=3, queue_size=2)],
+                        output=lambda ctx: ctx.filename)
+    try:
+        contexts = (DocumentContext(f'{i}.pdf') for i in range(20))
+        names = {future.result() for future in pipeline.imap(contexts)}
+        assert names == {f'{i}.pdf' for i in range(20)}
+    finally:
+        pipeline.shutdown()
+
+
+def test_queue_depths_and_shutdown():
+    """Test des profondeurs de file et de l'arrêt"""
+    pipeline = Pipeline([Stage('decode', _append('a')), Stage('ocr', _append('b'))])
+    assert pipeline.queue_depths() == {'decode': 0, 'ocr': 0}
+
+    pipeline.start()
+    pipeline.shutdown()
+    with pytest.raises(RuntimeError):
+        pipeline.submit(DocumentContext('x.pdf'))
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,165 @@
+"""
+Tests unitaires pour la pré-annotation des tâches Label Studio (serveur simulé)
+"""
+import pytest
+import sys
+from concurrent.futures import Future
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api.label_studio import LabelStudioClient
+from api.pre_annotate import pending_tasks, pre_annotate, without_ocr
+from benchmarks.mock_label_studio import MockLabelStudio
+from tests.test_label_studio_import import UrllibSession
+
+
+class FakeExtraction:
+    def __init__(self, filename, model_version):
+        self.data = {
+            'filename': filename,
+            'model_version': model_version,
+            'overall_confidence': 0.8,
+            'fields': [
+                {'label': 'montant_ttc', 'value': '120,00', 'confidence': 0.9,
+                 'bbox': {'x': 0.5, 'y': 0.8, 'width': 0.2, 'height': 0.05}},
+                {'label': 'date_facture', 'value': '[Non détecté]', 'confidence': 0.7,
+                 'bbox': {'x': 0.1, 'y': 0.1, 'width': 0.2, 'height': 0.05}}
+            ]
+        }
+
+    def model_dump(self):
+        return self.data
+
+
+class FakeStage:
+    def __init__(self, name):
+        self.name = name
+
+
+class FakeExtractor:
+    """Extracteur simulé: submit() renvoie une Future déjà résolue"""
+
+    def __init__(self, model_version="best_v1", failing=()):
+        self.model_version = model_version
+        self.failing = set(failing)
+        self.submitted = []
+        self.stages = [FakeStage(name) for name in ('decode', 'detect', 'ocr', 'assemble')]
+
+    def submit(self, file_path, filename=None):
+        self.submitted.append(filename)
+        future = Future()
+        if filename in self.failing:
+            future.set_exception(ValueError("Impossible de lire l'image"))
+        else:
+            future.set_result(FakeExtraction(filename, self.model_version))
+        return future
+
+
+def _server(tmp_path, count):
+    invoices = tmp_path / "invoices"
+    invoices.mkdir()
+    tasks = []
+    for i in range(count):
+        path = invoices / f"facture_{i:02d}.png"
+        path.write_bytes(b"png")
+        tasks.append({'data': {'image': f"/data/local-files/?d=media/{i}.png", 'filename': path.name,
+                               'file_path': str(path)}})
+    server = MockLabelStudio().start()
+    server._import(tasks)
+    return server
+
+
+def _client(server):
+    return LabelStudioClient(server.url, server.api_key, server.project_id,
+                             max_requests_per_minute=0, session=UrllibSession())
+
+
+def test_unlabeled_tasks_get_predictions_in_batches(tmp_path):
+    """Test de la pré-annotation par lots: tâches non annotées seulement, schéma RectangleLabels"""
+    server = _server(tmp_path, 10)
+    try:
+        server.annotate(3, ['montant_ttc'])
+        summary = pre_annotate(_client(server), FakeExtractor(), batch_size=4, backoff_seconds=0)
+        tasks = server.tasks
+    finally:
+        server.stop()
+
+    assert summary['tasks'] == summary['predicted'] == 9
+    assert summary['batches'] == server.stats['prediction_imports'] == 3
+    assert summary['boxes'] == 18 and summary['errors'] == []
+    assert tasks[2]['predictions'] == []
+
+    prediction = tasks[0]['predictions'][0]
+    assert prediction['model_version'] == "best_v1"
+    region = prediction['result'][0]
+    assert (region['from_name'], region['to_name'], region['type']) == ('label', 'image', 'rectanglelabels')
+    assert region['value']['rectanglelabels'] == ['montant_ttc'] and region['value']['x'] == 50
+    assert region['meta'] == {'text': ['120,00']}
+    assert 'meta' not in prediction['result'][1]
+
+
+def test_rerun_skips_tasks_predicted_by_same_model(tmp_path):
+    """Test de la reprise: une tâche déjà prédite par ce modèle est ignorée, pas par un nouveau"""
+    server = _server(tmp_path, 5)
+    try:
+        client = _client(server)
+        assert pre_annotate(client, FakeExtractor(), limit=2)['predicted'] == 2
+
+        summary = pre_annotate(client, FakeExtractor(), batch_size=2)
+        assert summary['tasks'] == summary['predicted'] == 3
+
+        assert pre_annotate(client, FakeExtractor())['tasks'] == 0
+        assert pre_annotate(client, FakeExtractor("best_v2"))['predicted'] == 5
+        assert [len(task['predictions']) for task in server.tasks] == [2] * 5
+    finally:
+        server.stop()
+
+
+def test_missing_files_and_extraction_errors_reported(tmp_path):
+    """Test des erreurs par tâche: fichier introuvable, extraction en échec, envoi en échec"""
+    server = _server(tmp_path, 4)
+    Path(server.tasks[1]['data']['file_path']).unlink()
+    try:
+        extractor = FakeExtractor(failing={'facture_02.png'})
+        summary = pre_annotate(_client(server), extractor, invoices_dir=tmp_path / "invoices")
+        assert summary['missing_files'] == [2]
+        assert summary['errors'] == [(3, "Extraction: Impossible de lire l'image")]
+        assert summary['predicted'] == 2
+
+        server.failure_rate = 1.0
+        summary = pre_annotate(_client(server), FakeExtractor("best_v2"), max_attempts=2, backoff_seconds=0)
+        assert summary['predicted'] == 0
+        assert [task_id for task_id, _ in summary['errors']] == [1, 3, 4]
+        assert all(message.startswith("Envoi: HTTP 503") for _, message in summary['errors'])
+    finally:
+        server.stop()
+
+
+def test_tasks_annotated_during_job_do_not_shift_pages(tmp_path):
+    """Test du parcours par curseur: une tâche annotée pendant le job ne fait sauter aucune tâche"""
+    server = _server(tmp_path, 6)
+    try:
+        client = _client(server)
+        listed = []
+        for task in pending_tasks(client, "best_v1", page_size=2):
+            listed.append(task['id'])
+            if task['id'] == 2:
+                # Annotateurs au travail pendant le job
+                server.annotate(1, ['montant_ttc'])
+                server.annotate(2, ['montant_ttc'])
+    finally:
+        server.stop()
+
+    assert listed == [1, 2, 3, 4, 5, 6]
+
+
+def test_without_ocr_removes_ocr_stage():
+    """Test du mode boîtes seules: l'étage OCR est retiré du pipeline"""
+    extractor = without_ocr(FakeExtractor())
+    assert [stage.name for stage in extractor.stages] == ['decode', 'detect', 'assemble']
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,93 @@
+"""
+Tests unitaires pour le profilage par échantillonnage
+"""
+import pytest
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api.profiling import RequestProfile, SamplingProfiler, SlowestProfiles
+
+
+def _busy(seconds: float):
+    """Boucle CPU (fonction reconnaissable dans les piles)"""
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        sum(range(1000))
+
+
+def test_sampling_profiler_collapsed_stacks():
+    """Test que la capture produit des piles collapsed avec la fonction active"""
+    worker = threading.Thread(target=_busy, args=(0.3,), name="worker-test")
+    worker.start()
+    profile = SamplingProfiler(interval=0.002).run(0.2)
+    worker.join()
+
+    lines = profile.strip().splitlines()
+    assert lines
+    stack, count = lines[0].rsplit(' ', 1)
+    assert int(count) > 0
+    assert any(line.startswith("worker-test;") and "_busy" in line for line in lines)
+
+
+def test_request_profile_attaches_stage():
+    """Test que seuls les étages rattachés sont échantillonnés, préfixés par l'étage"""
+    profile = RequestProfile("facture.pdf")
+    with profile.attach("ocr"):
+        _busy(0.1)
+    time.sleep(0.02)
+    count = sum(profile.samples.values())
+
+    assert count > 0
+    assert all(stack.startswith("ocr;") for stack in profile.samples)
+    _busy(0.05)
+    assert sum(profile.samples.values()) == count
+
+
+def test_profile_read_while_sampled(tmp_path):
+    """Test que le profil peut être enregistré pendant que l'échantillonneur écrit"""
+    profile = RequestProfile("facture.pdf")
+    stop = threading.Event()
+
+    def sample():
+        i = 0
+        while not stop.is_set():
+            profile.add_sample(f"ocr;frame_{i % 5000}")
+            i += 1
+
+    writer = threading.Thread(target=sample)
+    writer.start()
+    try:
+        store = SlowestProfiles(tmp_path, keep=50)
+        for i in range(20):
+            assert store.offer(profile, 1.0 + i, {'ocr': 1.0})
+    finally:
+        stop.set()
+        writer.join()
+    assert sum(profile.snapshot().values()) >= store.list()[0]['samples'] > 0
+
+
+def test_slowest_profiles_keeps_top_n(tmp_path):
+    """Test que seuls les N profils les plus lents sont conservés"""
+    store = SlowestProfiles(tmp_path, keep=2)
+    for total in (0.5, 2.0, 1.0, 0.1):
+        profile = RequestProfile(f"{total}.pdf")
+        profile.samples["ocr;image_to_string"] = 3
+        store.offer(profile, total, {'ocr': total})
+        time.sleep(0.001)  # Noms horodatés distincts
+
+    kept = store.list()
+    assert [p['filename'] for p in kept] == ["2.0.pdf", "1.0.pdf"]
+    assert len(list(tmp_path.glob("*.collapsed"))) == 2
+    assert store.path(kept[0]['name']).read_text() == "ocr;image_to_string 3\n"
+
+    # Rechargés depuis le disque au redémarrage
+    assert [p['filename'] for p in SlowestProfiles(tmp_path, keep=2).list()] == ["2.0.pdf", "1.0.pdf"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
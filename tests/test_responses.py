@@ -0,0 +1,59 @@
+"""
+Tests unitaires pour les réponses à sérialisation rapide
+"""
+import pytest
+import json
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api.models import BoundingBox, ExtractedField, ExtractionResponse, InvoiceExtraction
+from api.responses import FastJSONResponse, MsgPackResponse, negotiate_response, msgpack
+
+
+def _response(construct: bool) -> ExtractionResponse:
+    """Réponse d'extraction validée ou construite sans validation"""
+    build = (lambda model, **kw: model.model_construct(**kw)) if construct else (lambda model, **kw: model(**kw))
+    field = build(ExtractedField, label="montant_ttc", value="1234.56", confidence=0.91,
+                  bbox=build(BoundingBox, x=0.1, y=0.2, width=0.3, height=0.05))
+    extraction = build(InvoiceExtraction, filename="facture.pdf", fields=[field],
+                       overall_confidence=0.91, needs_review=False, model_version="test_v1")
+    return build(ExtractionResponse, success=True, data=extraction, message="Extraction réussie")
+
+
+def test_fast_json_matches_validated_model():
+    """Test que le chemin rapide produit le même JSON que le modèle validé"""
+    trusted = _response(construct=True)
+    validated = _response(construct=False)
+
+    fast = json.loads(FastJSONResponse(trusted).body)
+    reference = json.loads(validated.model_dump_json())
+
+    assert fast['data']['fields'] == reference['data']['fields']
+    assert fast['error'] is None
+    assert 'extracted_at' in fast['data']
+    # Le résultat reste valide pour le schéma publié
+    ExtractionResponse.model_validate(fast)
+
+
+def test_negotiate_defaults_to_json():
+    """Test de la négociation: JSON par défaut"""
+    response = negotiate_response(_response(construct=True), accept="*/*")
+    assert isinstance(response, FastJSONResponse)
+    assert response.media_type == "application/json"
+
+
+@pytest.mark.skipif(msgpack is None, reason="msgpack non installé")
+def test_negotiate_msgpack():
+    """Test de la négociation MessagePack"""
+    response = negotiate_response(_response(construct=True), accept="application/msgpack")
+    assert isinstance(response, MsgPackResponse)
+
+    data = msgpack.unpackb(response.body, raw=False)
+    assert data['data']['fields'][0]['label'] == "montant_ttc"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,107 @@
+"""
+Tests unitaires pour le regroupement des requêtes identiques
+"""
+import pytest
+import asyncio
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api.singleflight import SingleFlight
+
+
+def test_concurrent_identical_requests_share_one_execution():
+    """Test que des requêtes identiques simultanées partagent une exécution"""
+    flight = SingleFlight()
+    calls = []
+
+    async def extraction():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "résultat"
+
+    async def scenario():
+        return await asyncio.gather(*[flight.do("sha:v1", extraction) for _ in range(5)])
+
+    results = asyncio.run(scenario())
+
+    assert results == ["résultat"] * 5
+    assert len(calls) == 1
+    stats = flight.get_stats()
+    assert stats['executions'] == 1
+    assert stats['coalesced'] == 4
+    assert stats['coalescing_rate'] == pytest.approx(0.8)
+    assert stats['in_flight'] == 0
+
+
+def test_different_keys_run_separately():
+    """Test que des clés différentes ne sont pas regroupées"""
+    flight = SingleFlight()
+
+    async def scenario():
+        return await asyncio.gather(
+            flight.do("a:v1", lambda: asyncio.sleep(0.01, result="a")),
+            flight.do("a:v2", lambda: asyncio.sleep(0.01, result="b")),
+        )
+
+    assert asyncio.run(scenario()) == ["a", "b"]
+    assert flight.get_stats()['coalesced'] == 0
+
+
+def test_sequential_requests_are_not_cached():
+    """Test qu'une requête arrivée après la fin de l'exécution relance le traitement"""
+    flight = SingleFlight()
+    calls = []
+
+    async def extraction():
+        calls.append(1)
+        return len(calls)
+
+    async def scenario():
+        first = await flight.do("k", extraction)
+        second = await flight.do("k", extraction)
+        return first, second
+
+    assert asyncio.run(scenario()) == (1, 2)
+
+
+def test_error_is_shared():
+    """Test que l'erreur est propagée à toutes les requêtes regroupées"""
+    flight = SingleFlight()
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise ValueError("PDF corrompu")
+
+    async def scenario():
+        return await asyncio.gather(*[flight.do("k", failing) for _ in range(3)],
+                                    return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(r, ValueError) for r in results)
+    assert flight.in_flight() == 0
+
+
+def test_leader_cancellation_does_not_cancel_followers():
+    """Test qu'une requête annulée n'interrompt pas les requêtes rattachées"""
+    flight = SingleFlight()
+
+    async def extraction():
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    async def scenario():
+        leader = asyncio.ensure_future(flight.do("k", extraction))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do("k", extraction))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(scenario()) == "ok"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
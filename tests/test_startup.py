@@ -0,0 +1,83 @@
+"""
+Tests du temps de démarrage: l'import de l'API ne charge pas les dépendances lourdes
+"""
+import pytest
+import importlib.util
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(ROOT))
+
+# Budget d'import de api.app (secondes, cumulé d'après -X importtime)
+IMPORT_BUDGET_SECONDS = 1.5
+
+HEAVY_MODULES = ['torch', 'ultralytics', 'cv2', 'fitz', 'pytesseract']
+
+requires_api = pytest.mark.skipif(
+    importlib.util.find_spec("fastapi") is None, reason="fastapi non installé"
+)
+
+
+def _run(code: str) -> subprocess.CompletedProcess:
+    """Exécuter du code dans un interpréteur neuf"""
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True, timeout=120
+    )
+
+
+@requires_api
+def test_import_does_not_load_heavy_modules():
+    """Test que l'import de api.app ne charge ni torch, ni cv2, ni fitz..."""
+    code = (
+        "import sys, api.app\n"
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    result = _run(code)
+    assert result.returncode == 0, result.stderr[-2000:]
+    assert result.stdout.strip() == ""
+
+
+@requires_api
+def test_import_time_budget():
+    """Test que l'import de api.app reste sous le budget"""
+    result = _run("import api.app")
+    assert result.returncode == 0, result.stderr[-2000:]
+
+    # Ligne "import time: self [us] | cumulative | package" du module api.app
+    cumulative = None
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \|\s*api\.app$", line)
+        if match:
+            cumulative = int(match.group(1))
+
+    assert cumulative is not None
+    assert cumulative / 1e6 < IMPORT_BUDGET_SECONDS
+
+
+def test_lazy_import_defers_loading():
+    """Test que lazy_import ne charge le module qu'au premier accès"""
+    from api.lazy import LazyModule, lazy_import
+
+    module = lazy_import("colorsys")
+    if isinstance(module, LazyModule):
+        assert not module.is_loaded()
+        assert module.rgb_to_hsv(1, 0, 0)[0] == 0
+        assert module.is_loaded()
+
+
+def test_config_is_cached():
+    """Test que la configuration n'est lue qu'une fois"""
+    from api.config import get_config
+
+    path = ROOT / "config" / "settings.example.yaml"
+    assert get_config(str(path)) is get_config(str(path))
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
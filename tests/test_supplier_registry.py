@@ -0,0 +1,104 @@
+"""
+Tests unitaires pour le registre fournisseurs
+"""
+import pytest
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire parent au path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api.supplier_registry import SupplierRegistry, is_valid_siret, normalize_siret
+
+
+# SIRET valides (clé de Luhn)
+SIRET_ACME = "73282932000074"
+SIRET_ACME_2 = "73282932000082"
+SIRET_BETA = "55208131766522"
+
+
+@pytest.fixture
+def registry(tmp_path):
+    """Registre avec deux fournisseurs"""
+    registry = SupplierRegistry(str(tmp_path / "suppliers.db"))
+    registry.add_many([
+        {'siret': SIRET_ACME, 'nom': 'ACME SARL', 'adresse': '1 rue de Paris, 75001 Paris'},
+        {'siret': SIRET_BETA, 'nom': 'BETA SA', 'adresse': '2 avenue de Lyon, 69001 Lyon'},
+    ])
+    yield registry
+    registry.close()
+
+
+def test_is_valid_siret():
+    """Test de la clé de Luhn"""
+    assert is_valid_siret(SIRET_ACME)
+    assert is_valid_siret(SIRET_BETA)
+    assert not is_valid_siret("73282932000075")
+    assert not is_valid_siret("1234")
+
+
+def test_normalize_siret():
+    """Test du nettoyage d'un SIRET lu par OCR"""
+    assert normalize_siret("SIRET : 732 829 320 00074") == SIRET_ACME
+    assert normalize_siret("732 829 32O 0OO74") == SIRET_ACME
+    # Forme juridique après le SIRET: pas de chiffre en trop
+    assert normalize_siret("732 829 320 00074 SAS") == SIRET_ACME
+    assert normalize_siret("SIRET 732 829 320 000 74 Sarl") == SIRET_ACME
+    assert normalize_siret("SIRET: 732.829.320.00074 - SA au capital de 10 000") == SIRET_ACME
+    # Dernier chiffre mal lu: conservé quand il complète les 14 chiffres
+    assert normalize_siret("732 829 320 0007O") == "73282932000070"
+
+
+def test_exact_lookup(registry):
+    """Test de la recherche exacte"""
+    supplier = registry.lookup("732 829 320 00074")
+    assert supplier['nom'] == 'ACME SARL'
+    assert supplier['match'] == 'exact'
+
+
+def test_fuzzy_lookup(registry):
+    """Test de la recherche avec une erreur OCR d'un chiffre"""
+    # Dernier chiffre mal lu, le SIRET lu n'est plus valide
+    supplier = registry.lookup("55208131766523")
+    assert supplier['siret'] == SIRET_BETA
+    assert supplier['match'] in ('fuzzy', 'siren')
+
+    assert registry.lookup("55208131766523", fuzzy=False) is None
+
+
+def test_siren_lookup_ambiguous(registry):
+    """Test qu'un SIREN partagé par plusieurs établissements n'est pas résolu"""
+    registry.add_many([{'siret': SIRET_ACME_2, 'nom': 'ACME Lyon', 'adresse': 'Lyon'}])
+    assert registry.lookup("73282932099999") is None
+
+
+def test_valid_siret_of_other_establishment_not_resolved(registry):
+    """Test qu'un SIRET valide absent du registre ne tombe pas sur un autre établissement"""
+    assert is_valid_siret("73282932000017")
+    assert registry.lookup("73282932000017") is None
+
+
+def test_unknown_siret(registry):
+    """Test d'un SIRET inconnu"""
+    assert registry.lookup("11111111111111") is None
+    assert registry.lookup("illisible") is None
+
+
+def test_load_csv(tmp_path):
+    """Test du chargement d'un CSV (séparateur point-virgule)"""
+    csv_file = tmp_path / "fournisseurs.csv"
+    csv_file.write_text(
+        "siret;nom;adresse\n"
+        f"{SIRET_ACME};ACME SARL;1 rue de Paris\n"
+        "invalide;Sans SIRET;Nulle part\n",
+        encoding="utf-8"
+    )
+
+    registry = SupplierRegistry(str(tmp_path / "suppliers.db"))
+    assert registry.load_csv(str(csv_file)) == 1
+    assert registry.lookup(SIRET_ACME)['adresse'] == '1 rue de Paris'
+    registry.close()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])